@@ -2,15 +2,17 @@ import datetime
 import json
 import math
 import logging
+import numpy as np
 import pandas as pd
 import pytz
 import ephem
 from requests import get
 import matplotlib.pyplot as plt
 import knmi
+from dao.lib import da_sun
 from dao.lib.da_graph import GraphBuilder
 from dao.lib.db_manager import DBmanagerObj
-from sqlalchemy import Table, select, func, and_
+from sqlalchemy import select, func, and_
 
 
 # noinspection PyUnresolvedReferences
@@ -190,6 +192,24 @@ class Meteo:
             value = 0.0
         return value
 
+    def sun_position_array(self, utc_time: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Array-versie van sun_position
+        :param utc_time: array met utc-timestamps in sec
+        :return: tuple met arrays hoogte (h) en azimuth (A) in radialen
+        """
+        return da_sun.sun_position(utc_time, self.latitude, self.longitude)
+
+    def get_dif_rad_factor_array(self, utc_time: np.ndarray) -> np.ndarray:
+        """
+        Array-versie van get_dif_rad_factor
+        :param utc_time: array met utc-timestamps in sec
+        :return: maximale theoretische straling op horizontaal vlak
+        """
+        # een half uur verder voor berekenen van gem zonpositie in dat uur.
+        sun_h, _ = self.sun_position_array(np.asarray(utc_time, dtype=float) + 1800)
+        return np.where(sun_h > 0, 360 * 1.37 * np.sin(sun_h), 0.0)
+
     @staticmethod
     def is_aws(station: int):
         """
@@ -302,6 +322,59 @@ class Meteo:
             q_tot = q_difc + q_dirc
         return q_tot
 
+    def solar_rad_array(
+        self,
+        utc_time: np.ndarray,
+        radiation: np.ndarray,
+        h_col: float,
+        a_col: float,
+    ) -> np.ndarray:
+        """
+        Array-versie van solar_rad
+        :param utc_time: array met utc tijden in sec
+        :param radiation: array met globale straling in J/cm²
+        :param h_col: hoogte van de collector in radialen
+        :param a_col: azimuth van de collector in radialen
+        :return: array met de straling (direct en diffuus) in J/cm² op het collectorvlak
+        """
+        return self.solar_rad_matrix(utc_time, radiation, [h_col], [a_col])[0]
+
+    def solar_rad_matrix(
+        self,
+        utc_time: np.ndarray,
+        radiation: np.ndarray,
+        h_col: np.ndarray,
+        a_col: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Berekent de straling voor meerdere collectorvlakken in een keer,
+        de zonnestand wordt maar een keer berekend
+        :param utc_time: array (T) met utc tijden in sec
+        :param radiation: array (T) met globale straling in J/cm²
+        :param h_col: array (S) met hoogte van de collectoren in radialen
+        :param a_col: array (S) met azimuth van de collectoren in radialen
+        :return: matrix (S x T) met de straling (direct en diffuus) in J/cm² per collectorvlak
+        """
+        utc_time = np.asarray(utc_time, dtype=float)
+        radiation = np.asarray(radiation, dtype=float)
+        h_col = np.asarray(h_col, dtype=float)[:, np.newaxis]
+        a_col = np.asarray(a_col, dtype=float)[:, np.newaxis]
+        sun_h, sun_a = self.sun_position_array(utc_time)
+        dir_rad_factor = np.minimum(
+            2.0, da_sun.direct_radiation_factor(h_col, a_col, sun_h, sun_a)
+        )
+        # maximale straling op horz.vlak
+        q_oz = self.get_dif_rad_factor_array(utc_time)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            k_t = np.clip(radiation / q_oz, 0.2, 0.8)
+        q_dif0 = np.where(q_oz > 0, radiation * (1 - 1.12 * k_t), radiation)
+        q_dir0 = radiation - q_dif0
+        coshcol = np.cos(h_col)
+        q_difc = q_dif0 * (1 + coshcol + 0.2 * (1 - coshcol)) / 2
+        q_tot = q_difc + q_dir0 * dir_rad_factor
+        q_tot = np.where(radiation <= 5, radiation, q_tot)
+        return np.where(radiation <= 0, 0.0, q_tot)
+
     """
     def solar_rad_df(self, global_rad):
         '''
@@ -605,12 +678,7 @@ class Meteo:
         date_utc = int(date.timestamp())
 
         # Reflect existing tables from the database
-        values_table = Table(
-            "prognoses", self.db_da.metadata, autoload_with=self.db_da.engine
-        )
-        variabel_table = Table(
-            "variabel", self.db_da.metadata, autoload_with=self.db_da.engine
-        )
+        values_table = self.db_da.get_table("prognoses")
 
         # Construct the inner query
         inner_query = (
@@ -621,8 +689,7 @@ class Meteo:
             )
             .where(
                 and_(
-                    variabel_table.c.code == "temp",
-                    values_table.c.variabel == variabel_table.c.id,
+                    values_table.c.variabel == self.db_da.get_variabel_id("temp"),
                     values_table.c.time >= date_utc,
                 )
             )
@@ -707,6 +774,36 @@ class Meteo:
         q_tot = self.solar_rad(float(utc_time), global_rad, hcol, acol)
         return q_tot
 
+    def calc_solar_rad_array(
+        self, solar_opt, utc_time: np.ndarray, global_rad: np.ndarray
+    ) -> np.ndarray:
+        """
+        Array-versie van calc_solar_rad
+        :param solar_opt: definitie van paneel (tilt en orientation in graden)
+        :param utc_time: array met utc tijden in seconden
+        :param global_rad: array met globale straling in J/cm²
+        :return: array met alle straling op paneel J/cm²
+        """
+        tilt = min(90, max(0, solar_opt.tilt))
+        hcol = math.radians(tilt)
+        acol = math.radians(solar_opt.orientation)
+        return self.solar_rad_array(utc_time, global_rad, hcol, acol)
+
+
+    def calc_solar_rad_matrix(
+        self, solar_opts: list, utc_time: np.ndarray, global_rad: np.ndarray
+    ) -> np.ndarray:
+        """
+        Matrix-versie van calc_solar_rad voor meerdere panelen/strings
+        :param solar_opts: lijst met definities van panelen (tilt en orientation in graden)
+        :param utc_time: array (T) met utc tijden in seconden
+        :param global_rad: array (T) met globale straling in J/cm²
+        :return: matrix (S x T) met alle straling per paneel J/cm²
+        """
+        hcol = [math.radians(min(90, max(0, opt.tilt))) for opt in solar_opts]
+        acol = [math.radians(opt.orientation) for opt in solar_opts]
+        return self.solar_rad_matrix(utc_time, global_rad, hcol, acol)
+
 
 """
 def main():
@@ -0,0 +1,117 @@
+"""
+Gevectoriseerde berekening van de zonnestand.
+Volgt de formules van de NOAA Solar Calculator (gebaseerd op Meeus),
+inclusief correctie voor atmosferische refractie.
+Alle functies werken op numpy-arrays met utc-timestamps (sec), zodat de zonnestand
+voor een hele reeks tijdstippen in een keer wordt berekend.
+Boven de horizon is het verschil met ephem kleiner dan 0.05°.
+"""
+
+import numpy as np
+
+
+def sun_position(
+    utc_time: np.ndarray | float, latitude: float, longitude: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Berekent de positie van de zon
+    :param utc_time: array met utc-timestamps in sec
+    :param latitude: noorderbreedte in graden
+    :param longitude: oosterlengte in graden
+    :return: tuple met arrays hoogte (elevatie, incl. refractie) en azimuth in radialen,
+        azimuth: 0 = zuid, 0.5 pi = west, pi = noord, 1.5 pi = oost (zelfde als Meteo.sun_position)
+    """
+    utc_time = np.asarray(utc_time, dtype=float)
+    julian_day = utc_time / 86400.0 + 2440587.5
+    jc = (julian_day - 2451545.0) / 36525.0  # juliaanse eeuwen sinds J2000
+
+    geom_mean_long = np.radians((280.46646 + jc * (36000.76983 + jc * 0.0003032)) % 360)
+    geom_mean_anom = np.radians(357.52911 + jc * (35999.05029 - 0.0001537 * jc))
+    eccent = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+    eq_of_ctr = (
+        np.sin(geom_mean_anom) * (1.914602 - jc * (0.004817 + 0.000014 * jc))
+        + np.sin(2 * geom_mean_anom) * (0.019993 - 0.000101 * jc)
+        + np.sin(3 * geom_mean_anom) * 0.000289
+    )
+    true_long = np.degrees(geom_mean_long) + eq_of_ctr
+    omega = np.radians(125.04 - 1934.136 * jc)
+    app_long = np.radians(true_long - 0.00569 - 0.00478 * np.sin(omega))
+    mean_obliq = 23 + (26 + (21.448 - jc * (46.815 + jc * (0.00059 - jc * 0.001813))) / 60) / 60
+    obliq_corr = np.radians(mean_obliq + 0.00256 * np.cos(omega))
+    declination = np.arcsin(np.sin(obliq_corr) * np.sin(app_long))
+
+    var_y = np.tan(obliq_corr / 2) ** 2
+    eq_of_time = 4 * np.degrees(
+        var_y * np.sin(2 * geom_mean_long)
+        - 2 * eccent * np.sin(geom_mean_anom)
+        + 4 * eccent * var_y * np.sin(geom_mean_anom) * np.cos(2 * geom_mean_long)
+        - 0.5 * var_y**2 * np.sin(4 * geom_mean_long)
+        - 1.25 * eccent**2 * np.sin(2 * geom_mean_anom)
+    )  # minuten
+
+    minutes_utc = (utc_time % 86400) / 60
+    true_solar_time = (minutes_utc + eq_of_time + 4 * longitude) % 1440
+    hour_angle = np.radians(true_solar_time / 4 - 180)
+
+    lat = np.radians(latitude)
+    cos_zenith = np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(
+        declination
+    ) * np.cos(hour_angle)
+    zenith = np.arccos(np.clip(cos_zenith, -1.0, 1.0))
+    elevation = np.pi / 2 - zenith
+
+    # azimuth vanaf noord met de klok mee
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cos_az = (np.sin(lat) * np.cos(zenith) - np.sin(declination)) / (
+            np.cos(lat) * np.sin(zenith)
+        )
+    az_acos = np.arccos(np.clip(np.nan_to_num(cos_az), -1.0, 1.0))
+    azimuth_north = np.where(
+        hour_angle > 0, (az_acos + np.pi) % (2 * np.pi), (3 * np.pi - az_acos) % (2 * np.pi)
+    )
+
+    elevation = elevation + _refraction(elevation)
+    # zelfde conventie als Meteo.sun_position: 0 = zuid
+    azimuth = (azimuth_north + np.pi) % (2 * np.pi)
+    return elevation, azimuth
+
+
+def _refraction(elevation: np.ndarray) -> np.ndarray:
+    """
+    Atmosferische refractie (NOAA-benadering)
+    :param elevation: geometrische hoogte van de zon in radialen
+    :return: correctie in radialen
+    """
+    e = np.degrees(elevation)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tan_e = np.tan(elevation)
+        high = 58.1 / tan_e - 0.07 / tan_e**3 + 0.000086 / tan_e**5
+        low = 1735 + e * (-518.2 + e * (103.4 + e * (-12.79 + e * 0.711)))
+        below = -20.772 / tan_e
+    arcsec = np.select(
+        [e > 85, e > 5, e > -0.575], [0.0, high, low], default=below
+    )
+    return np.radians(np.nan_to_num(arcsec) / 3600)
+
+
+def direct_radiation_factor(
+    hcol: float, acol: float, hzon: np.ndarray, azon: np.ndarray
+) -> np.ndarray:
+    """
+    Array-versie van Meteo.direct_radiation_factor:
+    omrekenfactor van directe zonnestraling op het collectorvlak, alles in radialen
+    :param hcol: helling van de collector: 0 = horizontaal, 0.5 pi verticaal
+    :param acol: azimuth van de collector: 0 = zuid, -0,5 pi = oost, +0,5 pi = west
+    :param hzon: array met hoogte van de zon
+    :param azon: array met azimuth van de zon
+    :return: array met omrekenfactoren, 0 als de zon onder de horizon staat
+    """
+    hzon = np.asarray(hzon, dtype=float)
+    azon = np.asarray(azon, dtype=float)
+    sin_hzon = np.sin(hzon)
+    factor = np.maximum(
+        0.0,
+        np.cos(hcol) * sin_hzon + np.sin(hcol) * np.cos(hzon) * np.cos(acol - azon),
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(hzon > 0, factor / sin_hzon, 0.0)
@@ -146,3 +146,20 @@ def make_db_ha(
             if result is not None:
                 _db_ha = result
         return _db_ha
+
+
+def reset_db_connections() -> None:
+    """
+    Forget both singletons and dispose of their engines.
+
+    The next ``make_db_da`` / ``make_db_ha`` call builds a new instance from the
+    configuration passed to it.  Used when replaying a captured calculation
+    (``da_replay``) against a different database within the same process.
+    """
+    global _db_da, _db_ha
+    with _db_lock:
+        for db in (_db_da, _db_ha):
+            if db is not None:
+                db.engine.dispose()
+        _db_da = None
+        _db_ha = None
@@ -6,16 +6,19 @@ from sqlalchemy import (
     Table,
     MetaData,
     select,
-    insert,
-    update,
     func,
     and_,
     text,
     TIMESTAMP,
 )
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from pandas.api.types import is_numeric_dtype
 import sqlalchemy_utils
 import os
 import logging
+import threading
 
 from dao.prog.utils import interpolate
 
@@ -28,6 +31,9 @@ class DBmanagerObj(object):
     Database manager class.
     """
 
+    # aantal records per executemany in savedata
+    SAVE_BATCH_SIZE = 1000
+
     def __init__(
         self,
         db_dialect: str,
@@ -85,6 +91,9 @@ class DBmanagerObj(object):
         with self.engine.connect():
             pass
         self.metadata = MetaData()
+        # cache van gereflecteerde tabellen (in self.metadata) en van code -> variabel.id
+        self._cache_lock = threading.RLock()
+        self._variabel_ids: dict[str, int] | None = None
 
     @staticmethod
     def db_url(
@@ -131,6 +140,63 @@ class DBmanagerObj(object):
             f"{lineno} in {filename}"
         )
 
+    def get_table(self, table_name: str) -> Table:
+        """
+        Retourneert de tabel; de structuur wordt eenmaal per proces uit de database gelezen
+        :param table_name: naam van de tabel
+        :return: Table
+        """
+        table = self.metadata.tables.get(table_name)
+        if table is None:
+            with self._cache_lock:
+                table = self.metadata.tables.get(table_name)
+                if table is None:
+                    table = Table(table_name, self.metadata, autoload_with=self.engine)
+        return table
+
+    def reflect_tables(self, table_names: list[str]):
+        """
+        Leest de structuur van de tabellen vooraf in
+        :param table_names: lijst met tabelnamen
+        """
+        for table_name in table_names:
+            self.get_table(table_name)
+
+    def get_variabel_ids(self, reload: bool = False) -> dict[str, int]:
+        """
+        :param reload: opnieuw inlezen uit de database
+        :return: dict met per code het id uit tabel variabel
+        """
+        with self._cache_lock:
+            if self._variabel_ids is None or reload:
+                variabel_table = self.get_table("variabel")
+                query = select(variabel_table.c.code, variabel_table.c.id)
+                with self.engine.connect() as connection:
+                    self._variabel_ids = {
+                        row.code: row.id for row in connection.execute(query)
+                    }
+            return self._variabel_ids
+
+    def get_variabel_id(self, code: str) -> int | None:
+        """
+        :param code: de code van de variabele, bv "cons"
+        :return: het id uit tabel variabel, None als de code onbekend is
+        """
+        variabel_ids = self.get_variabel_ids()
+        if code not in variabel_ids:
+            # mogelijk toegevoegd door een ander proces
+            variabel_ids = self.get_variabel_ids(reload=True)
+        return variabel_ids.get(code)
+
+    def invalidate_cache(self):
+        """
+        Wist de cache van tabellen en variabel-codes,
+        na wijzigingen in de structuur of in tabel variabel (check_db)
+        """
+        with self._cache_lock:
+            self.metadata.clear()
+            self._variabel_ids = None
+
     # Custom function to handle from_unixtime
     def from_unixtime(self, column):
         if self.db_dialect == "sqlite":
@@ -223,84 +289,92 @@ class DBmanagerObj(object):
         else:  # mysql/mariadb
             return func.date_format(func.from_unixtime(column), "%Y-%m-%d %H:00")
 
+    def _upsert_statement(self, table: Table):
+        """
+        Maakt een insert-statement dat bij een bestaand record (variabel, time)
+        de waarde bijwerkt, met de upsert van het betreffende dialect
+        :param table: values of prognoses
+        :return: het statement
+        """
+        if self.db_dialect == "sqlite":
+            stmt = sqlite_insert(table)
+            return stmt.on_conflict_do_update(
+                index_elements=["variabel", "time"],
+                set_={"value": stmt.excluded.value},
+            )
+        elif self.db_dialect == "postgresql":
+            stmt = postgresql_insert(table)
+            return stmt.on_conflict_do_update(
+                index_elements=["variabel", "time"],
+                set_={"value": stmt.excluded.value},
+            )
+        else:  # mysql/mariadb
+            stmt = mysql_insert(table)
+            return stmt.on_duplicate_key_update(value=stmt.inserted.value)
+
     def savedata(self, df: pd.DataFrame, tablename: str = "values"):
         """
         save data in dateframe,
-        if id exist then update else insert
+        if record (variabel, time) exist then update else insert
+        Alle records worden in een transactie met een upsert opgeslagen.
+        Waarden die niet numeriek, NaN of inf zijn en onbekende codes worden overgeslagen.
         Args:
             df: Dataframe that we wish to save in table tablename
                columns
                code	string
-               calculated datetime, 0 if realised
                time	timestamp in sec
                value	float
             tablename: values or prognoses
         """
         logging.debug(f"Opslaan dataframe:\n{df.to_string()}")
+        if len(df) == 0:
+            return
 
-        # with self.engine.connect() as connection:
-        connection = self.engine.connect()
-        try:
-            self.log_pool_status()
-            # Reflect existing tables from the database
-            values_table = Table(tablename, self.metadata, autoload_with=self.engine)
-            variabel_table = Table("variabel", self.metadata, autoload_with=self.engine)
-            df = df.reset_index()  # make sure indexes pair with number of rows
-            df["tijd"] = df["time"].apply(
-                lambda x: datetime.datetime.fromtimestamp(int(float(x))).strftime(
-                    "%Y-%m-%d %H:%M"
-                )
+        # alleen numerieke, eindige waarden
+        values = df["value"]
+        if is_numeric_dtype(values.dtype):
+            numeric = pd.Series(True, index=df.index)
+        else:
+            numeric = values.map(
+                lambda x: isinstance(x, (int, float, np.integer, np.floating))
             )
-            for index, dfrow in df.iterrows():
-                logging.debug(
-                    f"Save record: {dfrow['tijd']} {dfrow['code']} "
-                    f"{dfrow['time']} {dfrow['value']}"
-                )
-                code = dfrow["code"]
-                time = dfrow["time"]
-                value = dfrow["value"]
-                if not isinstance(value, (int, float)):
-                    continue
-                if pd.isna(value):
-                    continue
-                if value == float("inf"):
-                    continue
-
-                # Get the variabel_id
-                select_variabel = select(variabel_table.c.id).where(
-                    variabel_table.c.code == code
-                )
-                variabel_result = connection.execute(select_variabel).first()
-                if variabel_result:
-                    variabel_id = variabel_result[0]
-                else:
-                    logging.error(f"Onbekende code opslaan data: {code}")
-                    continue
+        values = pd.to_numeric(values.where(numeric), errors="coerce").astype(float)
+        valid = numeric & np.isfinite(values)
+        records = pd.DataFrame(
+            {
+                "code": df["code"][valid].to_numpy(),
+                "time": df["time"][valid].astype(float).astype("int64").to_numpy(),
+                "value": values[valid].to_numpy(),
+            }
+        )
+        if len(records) == 0:
+            return
 
-                # Query to check if the record exists
-                select_value = select(values_table.c.id).where(
-                    (values_table.c.variabel == variabel_id)
-                    & (values_table.c.time == time)
+        self.log_pool_status()
+        values_table = self.get_table(tablename)
+        # codes in een keer opzoeken
+        code_ids = {}
+        for code in records["code"].unique().tolist():
+            variabel_id = self.get_variabel_id(code)
+            if variabel_id is None:
+                logging.error(f"Onbekende code opslaan data: {code}")
+            else:
+                code_ids[code] = variabel_id
+        with self.engine.begin() as connection:
+            records["variabel"] = records["code"].map(code_ids)
+            records = records[records["variabel"].notna()]
+            # bij dubbele records geldt de laatste waarde
+            records = records.drop_duplicates(subset=["variabel", "time"], keep="last")
+            rows = [
+                {"variabel": int(variabel), "time": int(time), "value": float(value)}
+                for variabel, time, value in zip(
+                    records["variabel"], records["time"], records["value"]
                 )
-                value_result = connection.execute(select_value).first()
-                if value_result:
-                    # Update existing record
-                    value_id = value_result[0]
-                    update_value = (
-                        update(values_table)
-                        .values(value=value)
-                        .where(values_table.c.id == value_id)
-                    )
-                    connection.execute(update_value)
-                else:
-                    # Record does not exist, perform insert
-                    insert_value = insert(values_table).values(
-                        variabel=variabel_id, time=time, value=value
-                    )
-                    connection.execute(insert_value)
-            connection.commit()
-        finally:
-            connection.close()
+            ]
+            stmt = self._upsert_statement(values_table)
+            for i in range(0, len(rows), self.SAVE_BATCH_SIZE):
+                connection.execute(stmt, rows[i : i + self.SAVE_BATCH_SIZE])
+        logging.debug(f"{len(rows)} records opgeslagen in {tablename}")
         self.log_pool_status()
 
     def get_time_border_record(
@@ -320,21 +394,13 @@ class DBmanagerObj(object):
                  "'  and `values`.`variabel` = `variabel`.`id` "
                  "ORDER BY `time` desc LIMIT 1")
         """
-        # Reflect existing tables from the database
-        with self.engine.connect() as connection:
-            values_table = Table(table_name, self.metadata, autoload_with=connection)
-            variabel_table = Table("variabel", self.metadata, autoload_with=connection)
+        values_table = self.get_table(table_name)
 
         # Construct the query
         query = select(
             self.from_unixtime(values_table.c.time).label("tijd"),
             values_table.c.value,
-        ).where(
-            and_(
-                variabel_table.c.code == code,
-                values_table.c.variabel == variabel_table.c.id,
-            )
-        )
+        ).where(values_table.c.variabel == self.get_variabel_id(code))
 
         if latest:
             query = query.order_by(values_table.c.time.desc()).limit(1)
@@ -350,10 +416,8 @@ class DBmanagerObj(object):
         return result
 
     def get_prognose_field(self, field: str, start, end=None, interval="1hour"):
-        values_table = Table("prognoses", self.metadata, autoload_with=self.engine)
+        values_table = self.get_table("prognoses")
         t1 = values_table.alias("t1")
-        variabel_table = Table("variabel", self.metadata, autoload_with=self.engine)
-        v1 = variabel_table.alias("v1")
         # Build the SQLAlchemy query
         query = select(
             t1.c.time.label("time"),
@@ -361,8 +425,7 @@ class DBmanagerObj(object):
             t1.c.value.label(field),
         ).where(
             and_(
-                t1.c.variabel == v1.c.id,
-                v1.c.code == field,
+                t1.c.variabel == self.get_variabel_id(field),
                 t1.c.time
                 >= start,  # self.unix_timestamp(start.strftime('%Y-%m-%d %H:%M:%S'))
             )
@@ -396,17 +459,12 @@ class DBmanagerObj(object):
         return df
 
     def get_prognose_data(self, start, end=None, interval="1hour"):
-        values_table = Table("prognoses", self.metadata, autoload_with=self.engine)
-        variabel_table = Table("variabel", self.metadata, autoload_with=self.engine)
+        values_table = self.get_table("prognoses")
         if interval == "1hour":
             # Aliases for the values table
             t1 = values_table.alias("t1")
             t0 = values_table.alias("t0")
 
-            # Aliases for the variabel table
-            v1 = variabel_table.alias("v1")
-            v0 = variabel_table.alias("v0")
-
             # Build the SQLAlchemy query
             query = select(
                 t1.c.time.label("time"),
@@ -416,10 +474,8 @@ class DBmanagerObj(object):
             ).where(
                 and_(
                     t1.c.time == t0.c.time,
-                    t1.c.variabel == v1.c.id,
-                    v1.c.code == "gr",
-                    t0.c.variabel == v0.c.id,
-                    v0.c.code == "temp",
+                    t1.c.variabel == self.get_variabel_id("gr"),
+                    t0.c.variabel == self.get_variabel_id("temp"),
                     t1.c.time
                     >= start,  # self.unix_timestamp(start.strftime('%Y-%m-%d %H:%M:%S'))
                 )
@@ -465,7 +521,10 @@ class DBmanagerObj(object):
                 else:
                     result_df[new_field] = fld_df[field]
             if result_df is not None:
-                result_df["time"] = result_df["tijd"].astype(int) // 1e9
+                # utc-timestamp in sec, net als bij 1hour; "tijd" is lokale tijd
+                result_df["time"] = [
+                    int(t.timestamp()) for t in result_df["tijd"].dt.to_pydatetime()
+                ]
             return result_df
 
     def get_column_data(
@@ -503,8 +562,7 @@ class DBmanagerObj(object):
         sqlQuery += "ORDER BY `time`;"
         # print (sqlQuery)
         """
-        variabel_table = Table("variabel", self.metadata, autoload_with=self.engine)
-        values_table = Table(tablename, self.metadata, autoload_with=self.engine)
+        values_table = self.get_table(tablename)
         hour_column = self.hour_start(values_table.c.time).label("uur")
         if agg_func is None:
             time_column = values_table.c.time.label("time")
@@ -526,8 +584,7 @@ class DBmanagerObj(object):
             agg_column,
         ).where(
             and_(
-                variabel_table.c.code == column_name,
-                values_table.c.variabel == variabel_table.c.id,
+                values_table.c.variabel == self.get_variabel_id(column_name),
                 values_table.c.time >= self.unix_timestamp(start),
             )
         )
@@ -567,16 +624,11 @@ class DBmanagerObj(object):
         :param end: eindmoment , default nu
         :return: dataframe
         """
-        values_table = Table("values", self.metadata, autoload_with=self.engine)
+        values_table = self.get_table("values")
         # Aliases for the values table
         t1 = values_table.alias("t1")
         t2 = values_table.alias("t2")
 
-        variabel_table = Table("variabel", self.metadata, autoload_with=self.engine)
-        # Aliases for the variabel table
-        v1 = variabel_table.alias("v1")
-        v2 = variabel_table.alias("v2")
-
         # Build the SQLAlchemy query
         query = select(
             func.sum(t1.c.value).label("consumed"),
@@ -584,10 +636,8 @@ class DBmanagerObj(object):
         ).where(
             and_(
                 t1.c.time == t2.c.time,
-                t1.c.variabel == v1.c.id,
-                v1.c.code == "cons",
-                t2.c.variabel == v2.c.id,
-                v2.c.code == "prod",
+                t1.c.variabel == self.get_variabel_id("cons"),
+                t2.c.variabel == self.get_variabel_id("prod"),
                 t1.c.time >= self.unix_timestamp(start.strftime("%Y-%m-%d %H:%M:%S")),
                 t1.c.time < self.unix_timestamp(end.strftime("%Y-%m-%d %H:%M:%S")),
             )
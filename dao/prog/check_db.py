@@ -17,7 +17,6 @@ from sqlalchemy import (
     insert,
     update,
     text,
-    and_,
     delete,
     literal_column,
     inspect,
@@ -30,6 +29,7 @@ import sys
 #  sys.path.append("../")
 from dao.prog.config.loader import ConfigurationLoader
 from dao.lib.db_connections import make_db_da
+from dao.prog.da_telemetry import telemetry_table
 from pathlib import Path
 from version import __version__
 from utils import version_number
@@ -89,20 +89,12 @@ class CheckDB:
         :return:
         """
 
-        variabel_table = Table(
-            "variabel", self.db_da.metadata, autoload_with=self.engine
-        )
-        values_table = Table(tablename, self.db_da.metadata, autoload_with=self.engine)
+        values_table = self.db_da.get_table(tablename)
         query = select(
             values_table.c.time.label("time"),
             literal_column("'" + column_name + "'").label("code"),
             values_table.c.value.label("value"),
-        ).where(
-            and_(
-                variabel_table.c.code == column_name,
-                values_table.c.variabel == variabel_table.c.id,
-            )
-        )
+        ).where(values_table.c.variabel == self.db_da.get_variabel_id(column_name))
         query = query.order_by("time")
 
         with self.engine.connect() as connection:
@@ -114,7 +106,7 @@ class CheckDB:
         tablename: str,
         variabel_id: int,
     ):
-        values_table = Table(tablename, self.db_da.metadata, autoload_with=self.engine)
+        values_table = self.db_da.get_table(tablename)
         delete_stmt = delete(values_table).where(
             values_table.c.variabel == variabel_id,
         )
@@ -363,6 +355,9 @@ class CheckDB:
         # Voeg indexen toe op kolom `time` in de values en prognoses tabel, indien niet bestaand
         self.ensure_time_indexes()
 
+        # tabel "telemetry" voor de kengetallen van de berekening, indien niet bestaand
+        telemetry_table(metadata).create(self.engine, checkfirst=True)
+
         # timezone in postgresql could be wrong, check and report
         if self.db_da.db_dialect == "postgresql":
             with self.db_da.engine.connect() as con:
@@ -377,6 +372,9 @@ class CheckDB:
                     )
                     print("Update de timezone (zie DOCS.md)")
 
+        # gewijzigde structuur en variabelen opnieuw inlezen
+        self.db_da.invalidate_cache()
+
         if l_version < n_version:
             # update version number database
             moment = datetime.datetime.fromtimestamp(
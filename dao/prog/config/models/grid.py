@@ -42,6 +42,17 @@ class GridConfig(BaseModel):
             "x-ui-section": "Power Configuration",
         },
     )
+    entity_grid_power: Optional[EntityId] = Field(
+        default=None,
+        alias="entity grid power",
+        description="HA entity with the actual grid power",
+        json_schema_extra={
+            "x-help": "Optional: Home Assistant sensor with the actual power on the grid-point in W (positive = consumption from the grid, negative = production to the grid). Used by the dispatcher of the scheduler to correct the grid setpoint between calculations.",
+            "x-unit": "W",
+            "x-ui-section": "Power Configuration",
+            "x-ui-widget-filter": "sensor",
+        },
+    )
 
     model_config = ConfigDict(
         extra="allow",
@@ -73,7 +73,101 @@ class SchedulerConfig(BaseModel):
             "x-order": 2,
         },
     )
+    live_model: bool = Field(
+        default=False,
+        alias="live model",
+        description="Keep the optimization model alive between calculations",
+        json_schema_extra={
+            "x-help": "When enabled, the scheduler keeps the optimization model in memory. A next calculation with the same intervals only updates what changed (start SoC, EV level, boiler temperature, prices, solar forecast) instead of rebuilding the model, and starts from the previous solution. Useful when calc_optimum runs every few minutes.",
+            "x-ui-section": "Scheduler",
+            "x-order": 3,
+        },
+    )
+    dispatch_interval: int = Field(
+        default=0,
+        ge=0,
+        le=300,
+        alias="dispatch interval",
+        description="Seconds between real-time corrections of the setpoints (0 = off)",
+        json_schema_extra={
+            "x-help": "When > 0, the scheduler corrects the battery and grid setpoints every so many seconds (10-30 is typical) without solving the optimization. The batteries follow the planned SoC of the current interval and the grid absorbs the deviation from the forecast (sun, baseload). Uses the stored plan of the last calculation and, if configured, the grid power entity.",
+            "x-unit": "s",
+            "x-ui-section": "Scheduler",
+            "x-order": 4,
+        },
+    )
+    skip_unchanged: bool = Field(
+        default=False,
+        alias="skip unchanged",
+        description="Skip a scheduled calculation when the inputs have not changed",
+        json_schema_extra={
+            "x-help": "When enabled, a scheduled calc_optimum first compares its inputs (prices, meteo and solar forecasts, battery/EV SoC, boiler temperature, device states, values taken from HA entities and the settings) with those of the stored plan. If nothing changed beyond the tolerances below, the stored plan is sent to HA again for the current interval and the optimization is skipped. The reason for recalculating or skipping is logged.",
+            "x-ui-section": "Scheduler",
+            "x-order": 5,
+        },
+    )
+    skip_tolerance_price: float = Field(
+        default=0.005,
+        ge=0,
+        alias="skip tolerance price",
+        description="Allowed price change per interval for skipping a calculation",
+        json_schema_extra={
+            "x-help": "Maximum change of the consumption or production price of an interval that still counts as unchanged.",
+            "x-unit": "€/kWh",
+            "x-ui-section": "Scheduler",
+            "x-order": 6,
+        },
+    )
+    skip_tolerance_prognose: float = Field(
+        default=5.0,
+        ge=0,
+        alias="skip tolerance prognose",
+        description="Allowed forecast change for skipping a calculation",
+        json_schema_extra={
+            "x-help": "Maximum change of a forecast value (temperature, irradiation, solar production, baseload), as a percentage of the largest value of that forecast.",
+            "x-unit": "%",
+            "x-ui-section": "Scheduler",
+            "x-order": 7,
+        },
+    )
+    skip_tolerance_soc: float = Field(
+        default=2.0,
+        ge=0,
+        alias="skip tolerance soc",
+        description="Allowed SoC change for skipping a calculation",
+        json_schema_extra={
+            "x-help": "Maximum change of the state of charge of a battery or EV that still counts as unchanged.",
+            "x-unit": "%",
+            "x-ui-section": "Scheduler",
+            "x-order": 8,
+        },
+    )
+    skip_tolerance_temperature: float = Field(
+        default=1.0,
+        ge=0,
+        alias="skip tolerance temperature",
+        description="Allowed boiler temperature change for skipping a calculation",
+        json_schema_extra={
+            "x-help": "Maximum change of the actual boiler temperature that still counts as unchanged.",
+            "x-unit": "°C",
+            "x-ui-section": "Scheduler",
+            "x-order": 9,
+        },
+    )
+    skip_max_age: int = Field(
+        default=60,
+        ge=0,
+        alias="skip max age",
+        description="Maximum age of the stored plan for skipping a calculation",
+        json_schema_extra={
+            "x-help": "A stored plan older than this is always recalculated, even when the inputs did not change.",
+            "x-unit": "min",
+            "x-ui-section": "Scheduler",
+            "x-order": 10,
+        },
+    )
     model_config = ConfigDict(
+        populate_by_name=True,
         json_schema_extra={
             "x-ui-group": "DAO",
             "x-order": 18,
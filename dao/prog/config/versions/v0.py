@@ -218,6 +218,54 @@ class ConfigurationV0(DAOConfigBaseModel):
             "x-order": 3,
         },
     )
+    fine_horizon: Optional[int] = Field(
+        default=None,
+        alias="fine horizon",
+        ge=1,
+        le=48,
+        description="Hours with full interval resolution, after that coarser blocks",
+        json_schema_extra={
+            "x-help": "Number of hours from the start of the calculation that are optimized with the full resolution of 'interval'. After that the intervals are merged into blocks of 'coarse interval', which makes the optimization much smaller. Leave empty to use the full resolution for the whole horizon.",
+            "x-unit": "hours",
+            "x-ui-group": "DAO",
+            "x-ui-section": "Optimization",
+            "x-order": 4,
+        },
+    )
+    coarse_interval: Literal["1hour", "2hour", "3hour"] = Field(
+        default="1hour",
+        alias="coarse interval",
+        description="Block length after the fine horizon",
+        json_schema_extra={
+            "x-help": "Length of the blocks used after 'fine horizon'. Only used when 'fine horizon' is set. With a heat pump the blocks are at most one hour.",
+            "x-ui-group": "DAO",
+            "x-ui-section": "Optimization",
+            "x-order": 5,
+        },
+    )
+    solver: Literal["cbc", "highs"] = Field(
+        default="cbc",
+        description="MIP solver for the optimization",
+        json_schema_extra={
+            "x-help": "Solver used for the optimization. 'cbc' (default) is included with python-mip. 'highs' uses HiGHS and requires the python package highspy; when highspy is not installed CBC is used.",
+            "x-ui-group": "DAO",
+            "x-ui-section": "Optimization",
+            "x-order": 6,
+        },
+    )
+    max_solve_time: Optional[int] = Field(
+        default=60,
+        alias="max solve time",
+        ge=1,
+        description="Maximum solver time per optimization stage",
+        json_schema_extra={
+            "x-help": "Maximum wall-clock time of the solver per stage of the strategy. When the time is up the best solution found so far is used. When no solution is found at all, the setpoints of the previous plan for the current interval are sent to HA. Leave empty for no time limit.",
+            "x-unit": "seconds",
+            "x-ui-group": "DAO",
+            "x-ui-section": "Optimization",
+            "x-order": 7,
+        },
+    )
 
     # User Interface
     notifications: NotificationsConfig = Field(
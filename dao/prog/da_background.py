@@ -0,0 +1,70 @@
+"""
+Nabewerking van de optimaliseringsberekening op de achtergrond.
+Direct na het oplossen worden de instellingen voor het eerste interval naar HA
+gestuurd; het afdrukken van de resultaten, het opslaan van de prognoses en het
+maken van de grafiek volgen daarna in een eigen thread. Een fout of vertraging in
+die nabewerking kan het aansturen van HA dan niet meer tegenhouden.
+Er loopt hooguit een nabewerking tegelijk: een volgende berekening (die hetzelfde
+blijvende model kan gebruiken) wacht eerst tot de vorige nabewerking klaar is.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable
+
+from dao.prog.utils import error_handling
+
+
+class BackgroundStage:
+    def __init__(self, name: str = "dao_results"):
+        """
+        :param name: naam van de thread
+        """
+        self.name = name
+        self._thread: threading.Thread | None = None
+        # duur van de laatste nabewerking in sec
+        self.duration: float | None = None
+        # de laatste nabewerking is zonder fout afgerond
+        self.succeeded: bool | None = None
+
+    def _run(self, func: Callable, args: tuple):
+        start = time.perf_counter()
+        self.succeeded = False
+        try:
+            func(*args)
+            self.succeeded = True
+        except Exception as ex:
+            error_handling(ex)
+            logging.error(f"Fout in de nabewerking van de berekening: {ex}")
+        finally:
+            self.duration = time.perf_counter() - start
+            logging.info(f"Nabewerking afgerond in {self.duration:.2f} sec")
+
+    def start(self, func: Callable, *args):
+        """
+        Start de nabewerking, een nog lopende vorige nabewerking wordt eerst afgewacht
+        :param func: de uit te voeren functie
+        :param args: argumenten van de functie
+        """
+        self.wait()
+        # geen daemon: het proces wacht bij afsluiten op de nabewerking
+        self._thread = threading.Thread(
+            target=self._run, args=(func, args), name=self.name
+        )
+        self._thread.start()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Wacht tot de lopende nabewerking klaar is
+        :param timeout: maximale wachttijd in sec, None: onbeperkt
+        :return: True als er geen nabewerking meer loopt
+        """
+        if self._thread is None:
+            return True
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        if self._thread.is_alive():
+            return False
+        self._thread = None
+        return True
@@ -7,14 +7,14 @@ import threading
 import pytz
 import warnings
 from dataclasses import dataclass
-from requests import get
 import json
 import hassapi as hass
+import numpy as np
 import pandas as pd
 from subprocess import PIPE, run
 import logging
 from logging import Handler
-from sqlalchemy import Table, select, func, and_
+from sqlalchemy import select, func, and_
 
 # from dao.prog.solar_predictor import SolarPredictor
 from dao.prog.utils import get_tibber_data, error_handling
@@ -23,12 +23,14 @@ from pathlib import Path
 from dao.prog.config.loader import ConfigurationLoader
 from dao.lib.db_connections import make_db_da, make_db_ha
 from dao.lib.da_meteo import Meteo
+from dao.prog.solar_service import SolarPredictionService
 from dao.lib.da_prices import DaPrices
 from dao.prog.utils import interpolate
+from dao.prog.da_background import BackgroundStage
+from dao.prog.da_ha_client import HaClient
 
 # from db_manager import DBmanagerObj
-from typing import Union
-from hassapi.models import StateList
+from hassapi.models import State
 
 
 @dataclass
@@ -65,7 +67,7 @@ class NotificationHandler(Handler):
             self.hass.set_value(self.entity, msg)
 
 
-class DaBase(hass.Hass):
+class DaBase(HaClient):
     _config = None
     _loader = None
     _init_lock = threading.Lock()
@@ -78,6 +80,12 @@ class DaBase(hass.Hass):
             sys.path.append(new_path)
         self.make_data_path()
         self.debug = False
+        # blijvend model van de optimalisering (alleen in de scheduler)
+        self.live_model = None
+        # berekening overslaan bij ongewijzigde invoer (alleen in de scheduler)
+        self.skip_unchanged = False
+        # nabewerking van de berekening (resultaten, opslaan, grafiek) op de achtergrond
+        self.results_stage = BackgroundStage()
         self.tasks = self.generate_tasks()
         self.log_level = logging.INFO
         self.notification_entity = None
@@ -150,13 +158,10 @@ class DaBase(hass.Hass):
             self.hasstoken = _tok.resolve(self.loader.secrets)
 
         super().__init__(hassurl=self.hassurl, token=self.hasstoken, timeout=10)
-        headers = {
-            "Authorization": "Bearer " + self.hasstoken,
-            "content-type": "application/json",
-        }
-        resp = get(self.hassurl + "api/config", headers=headers)
-        resp_dict = json.loads(resp.text)
-        logging.debug(f"hass/api/config: {resp.text}")
+        # momentopname van alle HA-states tijdens een berekening (zie take_state_snapshot)
+        self.state_snapshot: dict[str, State] | None = None
+        resp_dict = self._get("config")
+        logging.debug(f"hass/api/config: {resp_dict}")
         self.ha_context = HAContext(
             latitude=resp_dict["latitude"],
             longitude=resp_dict["longitude"],
@@ -164,6 +169,7 @@ class DaBase(hass.Hass):
             country=resp_dict["country"] or "NL",
         )
         self.time_zone = self.ha_context.time_zone
+        self.solar_service = SolarPredictionService(self.db_da, self.time_zone)
         self.meteo = Meteo(
             self.config,
             self.db_da,
@@ -236,21 +242,60 @@ class DaBase(hass.Hass):
         self.db_da.log_pool_status()
         warnings.simplefilter("ignore", ResourceWarning)
 
-    def set_value(self, entity_id: str, value: Union[int, float, str]) -> StateList:
-        try:
-            result = super().set_value(entity_id, value)
-            state = self.get_state(entity_id).state
-            if isinstance(value, (int, float)):
-                if round(float(state), 5) != round(float(value), 5):
-                    raise ValueError
-            else:
-                if state != value:
-                    raise ValueError
-        except Exception:
-            logging.error(f"Fout bij schrijven naar {entity_id}, waarde {value}")
-            # error_handling(ex)
-            raise
-        return result
+    def take_state_snapshot(self, record: bool = True) -> dict[str, State]:
+        """
+        Haalt met een request (/api/states) de states van alle entiteiten op.
+        Zolang de snapshot actief is worden alle get_state-aanroepen daaruit bediend,
+        zodat alle invoer van een berekening van hetzelfde moment is.
+        :param record: bewaar de snapshot in data/log voor het naspelen van een berekening
+        :return: dict met per entity_id de state
+        """
+        start = time.perf_counter()
+        raw_states = self._get("states")
+        self.state_snapshot = {s["entity_id"]: State(**s) for s in raw_states}
+        logging.info(
+            f"Snapshot van {len(self.state_snapshot)} HA-entiteiten opgehaald in "
+            f"{time.perf_counter() - start:.2f} sec"
+        )
+        if record:
+            file_name = (
+                "../data/log/ha_states_"
+                + datetime.datetime.now().strftime("%Y-%m-%d__%H-%M")
+                + ".json"
+            )
+            try:
+                with open(file_name, "w") as f:
+                    json.dump(raw_states, f)
+            except Exception as ex:
+                logging.warning(f"Snapshot HA-states kan niet worden bewaard: {ex}")
+        return self.state_snapshot
+
+    def load_state_snapshot(self, file_name: str) -> dict[str, State]:
+        """
+        Laadt een eerder bewaarde snapshot (zie take_state_snapshot) om een
+        berekening na te spelen
+        :param file_name: het json-bestand met de states
+        :return: dict met per entity_id de state
+        """
+        with open(file_name, "r") as f:
+            raw_states = json.load(f)
+        self.state_snapshot = {s["entity_id"]: State(**s) for s in raw_states}
+        return self.state_snapshot
+
+    def release_state_snapshot(self):
+        self.state_snapshot = None
+
+    def get_state(self, entity_id: str) -> State:
+        if self.state_snapshot is not None:
+            state = self.state_snapshot.get(entity_id)
+            if state is not None:
+                return state
+        return super().get_state(entity_id)
+
+    def state_written(self, entity_id: str, state: State):
+        # de snapshot bijwerken met de teruggelezen state
+        if self.state_snapshot is not None:
+            self.state_snapshot[entity_id] = state
 
     @staticmethod
     def generate_tasks():
@@ -379,17 +424,23 @@ class DaBase(hass.Hass):
         :param df: het dataframe met de code van de variabelen in de kolomheader
         :return: None
         """
-        df_db = pd.DataFrame(columns=["time", "code", "value"])
         df = df.reset_index(drop=True)
         columns = df.columns.values.tolist()[1:]
         tz = pytz.timezone(self.time_zone)
-        for index in range(min(len(tijd), len(df))):
-            dt = pd.to_datetime(tijd[index])
-            dt = tz.localize(dt)
-            utc = int(dt.timestamp())
-            for c in columns:
-                db_row = [str(utc), c, float(df.loc[index, c])]
-                df_db.loc[df_db.shape[0]] = db_row
+        rows = min(len(tijd), len(df))
+        utc = [
+            str(int(tz.localize(pd.to_datetime(tijd[index])).timestamp()))
+            for index in range(rows)
+        ]
+        # rij voor rij, per rij alle kolommen: de volgorde van voorheen
+        df_db = pd.DataFrame(
+            {
+                "time": [t for t in utc for _ in columns],
+                "code": columns * rows,
+                "value": df[columns].to_numpy(dtype=float)[:rows].ravel(),
+            },
+            columns=["time", "code", "value"],
+        )
         logging.debug("Save calculated data:\n{}".format(df_db.to_string()))
         self.db_da.savedata(df_db, tablename=tablename)
         return
@@ -442,6 +493,40 @@ class DaBase(hass.Hass):
             prod = min(prod, max_power)
         return prod
 
+    def calc_prod_solar_array(
+        self,
+        solar_options: list,
+        utc_time: np.ndarray,
+        global_rad: np.ndarray,
+        hour_fraction: float,
+    ) -> np.ndarray:
+        """
+        berekent de productie van meerdere solar-devices in een keer,
+        alle strings van alle devices worden als een matrix doorgerekend
+        :param solar_options: lijst met de instellingen van de devices
+        :param utc_time: array (T) met timestamps in utc seconden
+        :param global_rad: array (T) met de globale straling
+        :param hour_fraction: de uurfractie
+        :return: matrix (devices x T) met de productie in kWh
+        """
+        strings = []
+        yield_factors = []
+        device_index = []
+        max_power = np.full(len(solar_options), np.inf)
+        for d, solar_opt in enumerate(solar_options):
+            device_strings = solar_opt.strings if solar_opt.strings else [solar_opt]
+            for string in device_strings:
+                strings.append(string)
+                yield_factors.append(string.yield_factor)
+                device_index.append(d)
+            if solar_opt.max_power is not None:
+                max_power[d] = solar_opt.max_power
+        rad = self.meteo.calc_solar_rad_matrix(strings, utc_time, global_rad)
+        prod_str = rad * (np.array(yield_factors, dtype=float) * hour_fraction)[:, None]
+        prod = np.zeros((len(solar_options), prod_str.shape[1]))
+        np.add.at(prod, np.array(device_index), prod_str)
+        return np.minimum(prod, max_power[:, None])
+
     def calc_da_avg(self) -> float:
         """
         calculates the average of the last '24' hour values of the day ahead prices
@@ -458,12 +543,7 @@ class DaBase(hass.Hass):
         )
         """
         # Reflect existing tables from the database
-        values_table = Table(
-            "values", self.db_da.metadata, autoload_with=self.db_da.engine
-        )
-        variabel_table = Table(
-            "variabel", self.db_da.metadata, autoload_with=self.db_da.engine
-        )
+        values_table = self.db_da.get_table("values")
 
         # Construct the inner query
         inner_query = (
@@ -474,8 +554,7 @@ class DaBase(hass.Hass):
             )
             .where(
                 and_(
-                    variabel_table.c.code == "da",
-                    values_table.c.variabel == variabel_table.c.id,
+                    values_table.c.variabel == self.db_da.get_variabel_id("da"),
                 )
             )
             .order_by(values_table.c.time.desc())
@@ -559,6 +638,7 @@ class DaBase(hass.Hass):
 
         clean_folder("../data/log", "*.log")
         clean_folder("../data/log", "dashboard.log.*")
+        clean_folder("../data/log", "ha_states_*.json")
         clean_folder("../data/images", "*.png")
 
     def calc_optimum_met_debug(self):
@@ -575,6 +655,10 @@ class DaBase(hass.Hass):
 
         dacalc = DaCalc(self.file_name)
         dacalc.debug = False
+        dacalc.live_model = self.live_model
+        dacalc.skip_unchanged = self.skip_unchanged
+        dacalc.results_stage = self.results_stage
+        dacalc.write_lock = self.write_lock
         dacalc.calc_optimum()
 
     @staticmethod
@@ -601,73 +685,163 @@ class DaBase(hass.Hass):
         :param _ml_prediction: boolean default None(= from config)
         :return:
         """
-        from dao.prog.solar_predictor import SolarPredictor
-
         if _ml_prediction is None:
             ml_prediction = solar_option.ml_prediction
         else:
             ml_prediction = _ml_prediction
         if interval is None:
             interval = self.interval
-            interval_s = self.interval_s
-        else:
-            interval_s = 900 if interval == "15min" else 3600
         solar_name = solar_option.name.replace(" ", "_").replace("-", "_")
         if ml_prediction:
-            solar_predictor = SolarPredictor()
-            try:
-                solar_prog = solar_predictor.predict_solar_device(
-                    solar_option, vanaf, tot
-                )
-                if solar_prog.isnull().any().any():
-                    logging.warning(
-                        f"NaN-waarden aangetroffen in voorspelling van {solar_name}"
-                        f"Deze zijn op '0' gezet"
-                    )
-                    solar_prog.fillna(0, inplace=True)
-            except FileNotFoundError as ex:
-                logging.warning(ex)
+            ml_progs = self.calc_solar_predictions_ml(
+                [solar_option], vanaf, tot, interval=interval
+            )
+            if solar_name not in ml_progs:
                 logging.info(
                     f"Voor {solar_option.name} is geen model "
                     f"en dus wordt DAO-predictor gebruikt"
                 )
-
                 result = self.calc_solar_predictions(
                     solar_option, vanaf, tot, interval=interval, _ml_prediction=False
                 )
                 if _ml_prediction:
                     result["prediction"] = pd.NA
                 return result
+            solar_prog = ml_progs[solar_name]
+        else:
+            solar_prog = self.calc_solar_predictions_dao(
+                [solar_option], vanaf, tot, interval=interval
+            )
+            solar_prog = solar_prog.rename(columns={solar_name: "prediction"})
+        solar_prog.reset_index(drop=True, inplace=True)
+        return solar_prog
+
+    def calc_solar_predictions_ml(
+        self,
+        solar_options: list,
+        vanaf: datetime.datetime,
+        tot: datetime.datetime,
+        interval: str = None,
+    ) -> dict[str, pd.DataFrame]:
+        """
+        berekent met de ml-modellen de solar production van meerdere devices,
+        alle devices gebruiken hetzelfde weerframe
+        :param solar_options: lijst met de solar-devices
+        :param vanaf: datetime start
+        :param tot: datetime tot
+        :param interval: 15"min of 1 hour of None, als None wordt self.interval genomen
+        :return: per device (naam met "_") een dataframe met o.a. de kolommen
+            "tijd" en "prediction", devices zonder model ontbreken
+        """
+        if interval is None:
+            interval = self.interval
+        predictions = self.solar_service.predict_devices(solar_options, vanaf, tot)
+        result = {}
+        for solar_name, solar_prog in predictions.items():
+            if solar_prog.isnull().any().any():
+                logging.warning(
+                    f"NaN-waarden aangetroffen in voorspelling van {solar_name}"
+                    f"Deze zijn op '0' gezet"
+                )
+                solar_prog.fillna(0, inplace=True)
             solar_prog["tijd"] = pd.to_datetime(solar_prog["date_time"])
             if interval == "15min":
                 solar_prog = interpolate(solar_prog, "prediction", quantity=True)
-            while (
-                len(solar_prog) > 0
-                and solar_prog["tijd"].iloc[0].tz_localize(None) < vanaf
-            ):
-                solar_prog = solar_prog.iloc[1:]
+            solar_prog = solar_prog[solar_prog["tijd"].dt.tz_localize(None) >= vanaf]
+            result[solar_name] = solar_prog.reset_index(drop=True)
+        return result
+
+    def calc_solar_predictions_dao(
+        self,
+        solar_options: list,
+        vanaf: datetime.datetime,
+        tot: datetime.datetime,
+        interval: str = None,
+    ) -> pd.DataFrame:
+        """
+        berekent met de DAO-predictor de solar production van meerdere devices,
+        de prognose van de straling wordt maar een keer opgehaald
+        :param solar_options: lijst met de solar-devices
+        :param vanaf: datetime start
+        :param tot: datetime tot
+        :param interval: 15"min of 1 hour of None, als None wordt self.interval genomen
+        :return: dataframe met kolom "tijd" en per device (naam met "_") de productie
+        """
+        if interval is None:
+            interval = self.interval
+            interval_s = self.interval_s
         else:
-            solar_prog = pd.DataFrame(columns=["tijd", "prediction"])
-            start_ts = datetime.datetime(
-                year=vanaf.year, month=vanaf.month, day=vanaf.day, hour=vanaf.hour
-            ).timestamp()
-            prog_data = self.db_da.get_prognose_data(
-                start=start_ts, end=tot.timestamp(), interval=interval
-            )
-            prog_data.index = pd.to_datetime(prog_data["tijd"])
-            while len(prog_data) > 0 and prog_data.iloc[0]["tijd"] < vanaf:
-                prog_data = prog_data.iloc[1:]
-            index = 0
-            for row in prog_data.itertuples():
-                h_frac = interval_s / 3600
-                prod = self.calc_prod_solar(
-                    solar_option, row.time, row.glob_rad, h_frac
-                )
-                prod = round(prod, 3)
-                solar_prog.loc[solar_prog.shape[0]] = [row.tijd, prod]
+            interval_s = 900 if interval == "15min" else 3600
+        solar_names = [
+            solar_option.name.replace(" ", "_").replace("-", "_")
+            for solar_option in solar_options
+        ]
+        start_ts = datetime.datetime(
+            year=vanaf.year, month=vanaf.month, day=vanaf.day, hour=vanaf.hour
+        ).timestamp()
+        prog_data = self.db_da.get_prognose_data(
+            start=start_ts, end=tot.timestamp(), interval=interval
+        )
+        if prog_data is None or len(prog_data) == 0:
+            return pd.DataFrame(columns=["tijd"] + solar_names)
+        prog_data = prog_data[prog_data["tijd"] >= vanaf]
+        prod = self.calc_prod_solar_array(
+            solar_options,
+            prog_data["time"].to_numpy(dtype=float),
+            prog_data["glob_rad"].to_numpy(dtype=float),
+            interval_s / 3600,
+        )
+        solar_prog = pd.DataFrame(
+            np.round(prod, 3).T, columns=solar_names, index=prog_data.index
+        )
+        solar_prog.insert(0, "tijd", prog_data["tijd"])
         solar_prog.reset_index(drop=True, inplace=True)
         return solar_prog
 
+    def calc_solar_predictions_all(
+        self,
+        solar_options: list,
+        vanaf: datetime.datetime,
+        tot: datetime.datetime,
+        interval: str = None,
+    ) -> pd.DataFrame:
+        """
+        berekent de solar production van meerdere devices, de ml-devices en de
+        overige devices worden elk in een keer berekend
+        :param solar_options: lijst met de solar-devices
+        :param vanaf: datetime start
+        :param tot: datetime tot
+        :param interval: 15"min of 1 hour of None, als None wordt self.interval genomen
+        :return: dataframe met kolom "tijd" en per device (naam met "_") de productie
+        """
+        ml_options = [opt for opt in solar_options if opt.ml_prediction]
+        ml_progs = {}
+        if len(ml_options) > 0:
+            ml_progs = self.calc_solar_predictions_ml(
+                ml_options, vanaf, tot, interval=interval
+            )
+        solar_names = [
+            opt.name.replace(" ", "_").replace("-", "_") for opt in solar_options
+        ]
+        # devices zonder ml-voorspelling of zonder model met de DAO-predictor
+        dao_options = [
+            opt
+            for opt, solar_name in zip(solar_options, solar_names)
+            if solar_name not in ml_progs
+        ]
+        result = None
+        if len(dao_options) > 0:
+            result = self.calc_solar_predictions_dao(
+                dao_options, vanaf, tot, interval=interval
+            )
+        for solar_name, solar_prog in ml_progs.items():
+            if result is None:
+                result = solar_prog[["tijd"]].copy()
+            result[solar_name] = solar_prog["prediction"]
+        if result is None:
+            return pd.DataFrame(columns=["tijd"])
+        return result[["tijd"] + solar_names]
+
     @staticmethod
     def train_ml_predictions():
         from dao.prog.solar_predictor import SolarPredictor
@@ -724,6 +898,8 @@ class DaBase(hass.Hass):
             )
             self.db_da.log_pool_status()
             getattr(self, run_task["function"])()
+            # de nabewerking logt nog in het logbestand van deze taak
+            self.results_stage.wait()
             self.set_last_activity()
             self.db_da.log_pool_status()
         except Exception:
@@ -0,0 +1,1223 @@
+"""
+Batterijen in de optimaliseringsberekening.
+Per batterij worden de laad- en ontlaadtrappen (vermogen en rendement), de
+grenzen van de SoC, de cycluskosten en de pv op de dc-kant (mppt) uit de
+instellingen en HA gelezen. Laden en ontladen wordt via sos-gewichten over de
+trappen gemodelleerd; de energiebalans op de dc-kant koppelt ac, batterij en pv.
+"""
+
+import datetime as dt
+import logging
+
+import numpy as np
+import pandas as pd
+from mip import xsum, BINARY, CONTINUOUS, EQUAL, LESS_OR_EQUAL
+
+from dao.prog.da_build import (
+    add_var_block,
+    add_constr_family,
+    add_interleaved,
+    constr_family,
+)
+from dao.prog.da_components import CalcContext, Component
+from dao.prog.da_horizon import expand_rows
+from dao.prog.da_solar import switch_pv
+from dao.prog.da_solver import add_sos
+
+
+class BatteryComponent(Component):
+    name = "battery"
+
+    def prepare(self, ctx: CalcContext) -> bool:
+        calc = ctx.calc
+        B = len(calc.battery_options)
+        if B == 0:
+            return False
+        U = ctx.U
+        uur = ctx.uur
+        ha_getter = ctx.ha_getter
+        prog_data = ctx.prog_data
+        interval_fraction = ctx.interval_fraction
+        # accu capaciteit
+        # 2 batterijen 50V 280Ah
+        self.one_soc = []
+        self.kwh_cycle_cost = []
+        self.start_soc = []
+        self.lower_limit = []
+        self.upper_limit = []
+        self.opt_low_level = []
+        self.penalty_low_soc = []
+        # pv_dc = []  # pv bruto productie per batterij per uur
+        # pv_dc_hour_sum = []
+        # pv_from_dc_hour_sum = []
+        #   de som van pv_dc productie geleverd aan ac per uur
+        # eff_ac_to_dc = []
+        # eff_dc_to_ac = []
+        self.eff_dc_to_bat = []
+        self.eff_bat_to_dc = []
+        # max_ac_to_dc = []
+        # max_dc_to_ac = []
+
+        self.CS = []
+        self.DS = []
+        # in kW
+        self.max_charge_power = []
+        self.max_discharge_power = []
+        self.reduce_power_high_soc = []
+        self.reduce_power_low_soc = []
+        self.reduce_power_hours = []
+        self.max_dc_from_bat_power = []
+        self.max_dc_to_bat_power = []
+        self.avg_eff_dc_to_ac = []
+        self.pv_dc_num = []
+        self.pv_prod_dc = []
+        self.pv_prod_ac = []
+        self.charge_stages = []
+        self.discharge_stages = []
+        for b in range(B):
+            self.pv_prod_ac.append([])
+            self.pv_prod_dc.append([])
+            # model_dump() converts BatteryStage objects to plain dicts so that
+            # dict-subscript notation can be used throughout the MIP model build loop.
+            # Converting to attribute access would require changing hundreds of
+            # downstream ["power"] / ["efficiency"] references.
+            # The zero-power sentinel is guaranteed by BatteryConfig.validate_stages_sorted.
+            self.charge_stages.append(
+                [s.model_dump() for s in calc.battery_options[b].charge_stages]
+            )
+            self.discharge_stages.append(
+                [s.model_dump() for s in calc.battery_options[b].discharge_stages]
+            )
+
+            # noinspection PyTypeChecker
+            self.max_charge_power.append(int(self.charge_stages[b][-1]["power"]) / 1000)
+            # CS is aantal charge stages
+            self.CS.append(len(self.charge_stages[b]))
+            self.max_discharge_power.append(
+                self.discharge_stages[b][-1]["power"] / 1000
+            )
+
+            # reduced power
+            red_hours = calc.battery_options[b].reduced_hours or {}
+            red_power = []
+            reduced = False
+            for u in range(U):
+                red_power.append(
+                    max(self.max_charge_power[b], self.max_discharge_power[b])
+                )
+            for key, value in red_hours.items():
+                reduced = True
+                hour = int(key)
+                power = value / 1000
+                for u in range(U):
+                    int_uur = int(uur[u][0:2])
+                    if int_uur == hour:
+                        red_power[u] = power
+            self.reduce_power_hours.append(red_power)
+            if reduced:
+                if calc.log_level == logging.DEBUG:
+                    logging.debug(f"Reduced hours for {calc.battery_options[b].name}")
+                    logging.info(f"hour max-power(kW)")
+                    for u in range(U):
+                        logging.info(f"{uur[u]} {red_power[u]:6.3f}")
+                else:
+                    logging.info(
+                        f"Reduced hours applied for {calc.battery_options[b].name}"
+                    )
+            else:
+                logging.info(
+                    f"No reduced hours applied for {calc.battery_options[b].name}"
+                )
+
+            _bat_to_dc_max = calc.battery_options[b].bat_to_dc_max_power
+            self.max_dc_from_bat_power.append(
+                self.max_discharge_power[b] * 2
+                if _bat_to_dc_max is None
+                else _bat_to_dc_max.resolve(ha_getter) / 1000
+            )
+            _dc_to_bat_max = calc.battery_options[b].dc_to_bat_max_power
+            self.max_dc_to_bat_power.append(
+                self.max_charge_power[b] * 2
+                if _dc_to_bat_max is None
+                else _dc_to_bat_max.resolve(ha_getter) / 1000
+            )
+
+            # reduce power low soc
+            red_power_low_soc = sorted(
+                calc.battery_options[b].reduce_power_low_soc or [],
+                key=lambda x: x.soc,
+            )
+            if len(red_power_low_soc) == 1:
+                logging.warning(
+                    f"For reduced power at low soc there must be two entries, "
+                    f"one found."
+                )
+                red_power_low_soc = []
+            for rpl in range(len(red_power_low_soc) - 1):
+                helling = (
+                    red_power_low_soc[rpl + 1].power - red_power_low_soc[rpl].power
+                ) / (red_power_low_soc[rpl + 1].soc - red_power_low_soc[rpl].soc)
+                red_power_low_soc[rpl]._helling = helling
+                logging.info(
+                    f"Reduced power applied during discharging at low soc, between "
+                    f"{red_power_low_soc[rpl].soc}% and "
+                    f"{red_power_low_soc[rpl + 1].soc}% power is reduced from "
+                    f"{red_power_low_soc[rpl].power}W until "
+                    f"{red_power_low_soc[rpl + 1].power}W"
+                )
+            if not red_power_low_soc:
+                logging.info(f"No reduced power applied during discharging at low soc")
+            self.reduce_power_low_soc.append(red_power_low_soc)
+
+            # reduce power high soc
+            red_power_high_soc = sorted(
+                calc.battery_options[b].reduce_power_high_soc or [],
+                key=lambda x: x.soc,
+            )
+            if len(red_power_high_soc) == 1:
+                logging.warning(
+                    f"For reduced power at high soc there must be two entries, "
+                    f"one found"
+                )
+                red_power_high_soc = []
+            for rph in range(len(red_power_high_soc) - 1):
+                helling = (
+                    red_power_high_soc[rph + 1].power - red_power_high_soc[rph].power
+                ) / (red_power_high_soc[rph + 1].soc - red_power_high_soc[rph].soc)
+                red_power_high_soc[rph]._helling = helling
+                logging.info(
+                    f"Reduced power applied during charging at high soc, between "
+                    f"{red_power_high_soc[rph].soc}% and "
+                    f"{red_power_high_soc[rph + 1].soc}% power is reduced from "
+                    f"{red_power_high_soc[rph].power}W until "
+                    f"{red_power_high_soc[rph + 1].power}W"
+                )
+            if not red_power_high_soc:
+                logging.info(f"No reduced power applied during charging at high soc")
+            self.reduce_power_high_soc.append(red_power_high_soc)
+
+            # DS is aantal discharge stages
+            self.DS.append(len(self.discharge_stages[b]))
+            sum_eff = 0
+            for ds in range(self.DS[b])[1:]:
+                sum_eff += self.discharge_stages[b][ds]["efficiency"]
+            self.avg_eff_dc_to_ac.append(sum_eff / (self.DS[b] - 1))
+
+            ac = float(calc.battery_options[b].capacity)
+            self.one_soc.append(ac / 100)  # 1% van 28 kWh = 0,28 kWh
+            self.kwh_cycle_cost.append(calc.battery_options[b].cycle_cost)
+            logging.debug(f"cycle cost: {self.kwh_cycle_cost[b]} eur/kWh")
+
+            self.eff_dc_to_bat.append(
+                float(calc.battery_options[b].dc_to_bat_efficiency)
+            )
+            # fractie van 1
+            self.eff_bat_to_dc.append(
+                float(calc.battery_options[b].bat_to_dc_efficiency)
+            )
+            # fractie van 1
+
+            self.lower_limit.append(
+                calc.battery_options[b].lower_limit.resolve(ha_getter)
+            )
+            self.upper_limit.append(
+                calc.battery_options[b].upper_limit.resolve(ha_getter)
+            )
+            _opt_lvl_field = calc.battery_options[b].optimal_lower_level
+            opt_low_lvl = float(
+                _opt_lvl_field.resolve(ha_getter)
+                if _opt_lvl_field is not None
+                else self.lower_limit[b]
+            )
+            if opt_low_lvl < self.lower_limit[b]:
+                logging.warning(
+                    f"'optimal lower level' is lower defined as 'lower limit'."
+                    f" 'Optimal lower level' is adjusted to "
+                    f"'lower limit' ({self.lower_limit[b]})"
+                )
+                opt_low_lvl = self.lower_limit[b]
+
+            self.opt_low_level.append(opt_low_lvl)
+
+            # penalty in euro/%.hour
+            self.penalty_low_soc.append(calc.battery_options[b].penalty_low_soc)
+
+            if ctx.start_soc is None:
+                try:
+                    start_soc_str = ""
+                    start_soc_str = calc.get_state(
+                        calc.battery_options[b].entity_actual_level
+                    ).state
+                    start_soc_num = float(start_soc_str)
+                    self.start_soc.append(start_soc_num)
+                except Exception as ex:
+                    logging.warning(
+                        f"{ex} :"
+                        f"No actual level info recieved from "
+                        f"{calc.battery_options[b].entity_actual_level}, "
+                        f"but recieved '{start_soc_str}', "
+                        f"assumed 50%"
+                    )
+                    self.start_soc.append(50)
+            else:
+                self.start_soc.append(ctx.start_soc)
+            logging.info(
+                f"Startwaarde SoC {calc.battery_options[b].name}: {self.start_soc[b]}%\n"
+            )
+
+            # pv dc mppt
+            self.pv_dc_num.append(len(calc.battery_options[b].solar))
+            # pv_dc_bat = []
+            for s in range(self.pv_dc_num[b]):
+                self.pv_prod_dc[b].append([])
+                self.pv_prod_ac[b].append([])
+                solar_name = calc.battery_options[b].solar[s].name.replace(" ", "_")
+                solar_series = prog_data[solar_name]
+                for u in range(U):
+                    # pv_prod productie van batterij b van solar s in uur u, in kWh
+                    prod_dc = max(0.0, solar_series[u]) * interval_fraction[u]
+                    eff = 1
+                    for ds in range(self.DS[b]):
+                        if self.discharge_stages[b][ds]["power"] / 1000 > prod_dc:
+                            eff = self.discharge_stages[b][ds]["efficiency"]
+                            break
+                    prod_ac = prod_dc * eff
+                    self.pv_prod_dc[b][s].append(prod_dc)
+                    self.pv_prod_ac[b][s].append(prod_ac)
+
+        # gewenste SoC aan het eind van de berekening
+        self.min_soc_end_opt = []
+        self.max_soc_end_opt = []
+        for b in range(B):
+            entity_min_soc_end = calc.battery_options[b].entity_min_soc_end_opt
+            if entity_min_soc_end is None:
+                min_soc_end_opt = 0
+            else:
+                min_soc_end_opt = float(calc.get_state(entity_min_soc_end).state)
+
+            entity_max_soc_end = calc.battery_options[b].entity_max_soc_end_opt
+            if entity_max_soc_end is None:
+                max_soc_end_opt = 100
+            else:
+                max_soc_end_opt = float(calc.get_state(entity_max_soc_end).state)
+            if max_soc_end_opt <= min_soc_end_opt:
+                raise ValueError(
+                    f"'max soc end opt' ({max_soc_end_opt}) moet groter zijn dan "
+                    f"'min soc end opt' ({min_soc_end_opt}); "
+                    f"het programma kan nu geen optimale oplossing berekenem"
+                )
+            self.min_soc_end_opt.append(min_soc_end_opt)
+            self.max_soc_end_opt.append(max_soc_end_opt)
+        return True
+
+    def build(self, model, ctx: CalcContext):
+        calc = ctx.calc
+        B = len(self.one_soc)
+        U = ctx.U
+        pl = ctx.pl
+        pt = ctx.pt
+        hour_fraction = ctx.hour_fraction
+        # de stromen zijn in kW, het verbruik in de balans in kWh
+        self.hour_fraction = hour_fraction
+        # energie per uur, vanuit dc gezien
+        # ac_to_dc = [[model.add_var(var_type=CONTINUOUS, lb=0, ub=hour_fraction[u] * \
+        #                max_ac_to_dc[b]) for u in range(U)] for b in range(B) ]
+        # hernoemd naar dc_from_ac
+        # totaal elektra van ac naar de busbar, ieder uur
+
+        # alle variabelen definieren alles in W tenzij aangegeven
+        # mppt aan/uit eventueel bij netto prijzen onder nul
+        self.pv_dc_on_off = [
+            [
+                [model.add_var(var_type=BINARY) for _ in range(U)]
+                for _ in range(self.pv_dc_num[b])
+            ]
+            for b in range(B)
+        ]
+        self.pv_prod_dc_sum = [
+            [
+                model.add_var(
+                    var_type=CONTINUOUS, lb=0, ub=2 * self.max_discharge_power[b]
+                )
+                for _ in range(U)
+            ]
+            for b in range(B)
+        ]
+
+        """
+        # declaraties laden ac_to_dc met aan uit zonder sos #######################################
+        #ac_to_dc: wat er gaat er vanuit ac naar de omvormer
+        ac_to_dc = [[model.add_var(var_type=CONTINUOUS, lb=0, ub=max_charge_power[b])
+                     for u in range(U)] for b in range(B)]
+        ac_to_dc_on = [[model.add_var(var_type=BINARY) for u in range(U)] for b in range(B)]
+
+        # elektra per vermogensklasse van ac naar de busbar, ieder uur
+        ac_to_dc_st = [[[model.add_var(var_type=CONTINUOUS, lb=0,
+                        ub=charge_stages[b][cs]["power"]/1000)
+                        for u in range(U)] for cs in range(CS[b])] for b in range(B)]
+        # vermogens klasse aan/uit
+        ac_to_dc_st_on = [[[model.add_var(var_type=BINARY)
+            for u in range(U)] for cs in range(CS[b])] for b in range(B)]
+        # tot hier declaraties laden zonder sos ##################################################
+        """
+        # declaraties laden met sos ###############################################################
+        self.ac_to_dc_samples = [
+            [self.charge_stages[b][cs]["power"] / 1000 for cs in range(self.CS[b])]
+            for b in range(B)
+        ]
+        dc_from_ac_samples = [
+            [
+                (
+                    self.charge_stages[b][cs]["efficiency"]
+                    * self.charge_stages[b][cs]["power"]
+                    / 1000
+                )
+                for cs in range(self.CS[b])
+            ]
+            for b in range(B)
+        ]
+        self.ac_to_dc = [
+            add_var_block(
+                model,
+                U,
+                ub=np.minimum(self.reduce_power_hours[b], self.max_charge_power[b]),
+            )
+            for b in range(B)
+        ]
+        # tegelijk laden en ontladen kost energie (rendement < 1); bij positieve
+        # prijzen is dat nooit voordelig en zijn de aan/uit-variabelen overbodig,
+        # behalve waar de teruglevering kan worden begrensd: daar zou de batterij
+        # de opwekking die niet kan worden teruggeleverd weg kunnen stoken;
+        # bij een blijvend model hangt de opbouw niet van de prijzen af
+        export_capped = ctx.export_capped
+        self.bat_exclusive = [
+            calc.live_model is not None or pl[u] <= 0 or pt[u] <= 0 or export_capped[u]
+            for u in range(U)
+        ]
+        self.ac_to_dc_on = [
+            [
+                model.add_var(var_type=BINARY) if self.bat_exclusive[u] else None
+                for u in range(U)
+            ]
+            for _ in range(B)
+        ]
+        self.ac_to_dc_w = [
+            add_var_block(model, (U, self.CS[b]), ub=1) for b in range(B)
+        ]
+        # declaraties laden tot hier met sos ####################################################
+
+        """
+        # vanaf hier decalaties ontladen zonder sos #############################################
+        ac_from_dc = [
+            [
+                model.add_var(
+                    var_type=CONTINUOUS,
+                    lb=0,
+                    ub=min(reduce_power[b][u], max_discharge_power[b]),
+                )
+                for u in range(U)
+            ]
+            for b in range(B)
+        ]
+        ac_from_dc_on = [
+            [model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(B)
+        ]
+
+        # elektra per vermogensklasse van busbar naar ac, ieder uur
+        ac_from_dc_st = [
+            [
+                [
+                    model.add_var(
+                        var_type=CONTINUOUS,
+                        lb=0,
+                        ub=discharge_stages[b][ds]["power"] / 1000,
+                    )
+                    for _ in range(U)
+                ]
+                for ds in range(DS[b])
+            ]
+            for b in range(B)
+        ]
+        ac_from_dc_st_on = [
+            [[model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(DS[b])]
+            for b in range(B)
+        ]
+        # tot hier declaraties ontladen zonder sos ###############################################
+        """
+
+        # vanaf hier declaraties ontladen met sos  ###############################################
+        self.ac_from_dc_samples = [
+            [(self.discharge_stages[b][ds]["power"] / 1000) for ds in range(self.DS[b])]
+            for b in range(B)
+        ]
+        dc_to_ac_samples = [
+            [
+                (
+                    self.discharge_stages[b][ds]["power"]
+                    / (self.discharge_stages[b][ds]["efficiency"] * 1000)
+                )
+                for ds in range(self.DS[b])
+            ]
+            for b in range(B)
+        ]
+        self.ac_from_dc = [
+            add_var_block(
+                model,
+                U,
+                ub=np.minimum(self.reduce_power_hours[b], self.max_discharge_power[b]),
+            )
+            for b in range(B)
+        ]
+        self.ac_from_dc_on = [
+            [
+                model.add_var(var_type=BINARY) if self.bat_exclusive[u] else None
+                for u in range(U)
+            ]
+            for _ in range(B)
+        ]
+        self.ac_from_dc_w = [
+            add_var_block(model, (U, self.DS[b]), ub=1) for b in range(B)
+        ]
+        # tot hier declaraties ontladen met sos ###############################################
+
+        # energiebalans dc
+        self.dc_from_ac = [
+            add_var_block(model, U, ub=self.max_charge_power[b]) for b in range(B)
+        ]
+        self.dc_to_ac = [
+            add_var_block(model, U, ub=max(dc_to_ac_samples[b], default=0))
+            for b in range(B)
+        ]
+        self.dc_from_bat = [
+            add_var_block(model, U, ub=self.max_dc_from_bat_power[b]) for b in range(B)
+        ]
+        self.dc_to_bat = [
+            add_var_block(model, U, ub=self.max_dc_to_bat_power[b]) for b in range(B)
+        ]
+
+        # SoC
+        self.soc = [
+            add_var_block(
+                model,
+                U + 1,
+                lb=min(self.start_soc[b], self.lower_limit[b]),
+                ub=max(self.start_soc[b], self.upper_limit[b]),
+            )
+            for b in range(B)
+        ]
+
+        self.soc_low = [
+            add_var_block(
+                model,
+                U + 1,
+                lb=min(self.start_soc[b], self.lower_limit[b]),
+                ub=self.opt_low_level[b],
+            )
+            for b in range(B)
+        ]
+        self.soc_mid = [
+            add_var_block(
+                model,
+                U + 1,
+                ub=-self.opt_low_level[b] + max(self.start_soc[b], self.upper_limit[b]),
+            )
+            for b in range(B)
+        ]
+
+        # alle constraints, per batterij een familie over alle intervallen
+        hour_fraction_np = np.asarray(hour_fraction)
+        for b in range(B):
+            # laden, alles uitgedrukt in vermogen kW
+            # vanaf hier laden met aan/uit zonder sos
+            """
+            for cs in range(CS[b]):
+                model += (ac_to_dc_st[b][cs][u] <=
+                    charge_stages[b][cs]["power"] * 
+                    ac_to_dc_st_on[b][cs][u]/1000)
+            for cs in range(CS[b])[1:]:
+                model += (ac_to_dc_st[b][cs][u] >=
+                    charge_stages[b][cs - 1]["power"] * 
+                    ac_to_dc_st_on[b][cs][u]/1000)
+
+            model += ac_to_dc[b][u] == xsum(ac_to_dc_st[b][cs][u] for cs in range(CS[b]))
+            model += (xsum(ac_to_dc_st_on[b][cs][u] for cs in range(CS[b]))) <= 1
+            model += dc_from_ac[b][u] == xsum(ac_to_dc_st[b][cs][u] * \
+                                charge_stages[b][cs]["efficiency"] 
+                                for cs in range(CS[b]))
+            # tot hier laden met aan/uit zonder sos #######################################
+            """
+            # vanaf hier laden met sos ######################################################
+            families = [
+                constr_family([(1, self.ac_to_dc_w[b])], EQUAL, 1),
+                constr_family(
+                    [
+                        (self.ac_to_dc_samples[b], self.ac_to_dc_w[b]),
+                        (-1, self.ac_to_dc[b]),
+                    ],
+                    EQUAL,
+                ),
+                constr_family(
+                    [
+                        (dc_from_ac_samples[b], self.ac_to_dc_w[b]),
+                        (-1, self.dc_from_ac[b]),
+                    ],
+                    EQUAL,
+                ),
+            ]
+            # tot hier constraints laden met sos
+
+            """
+            # vanaf hier ontladen met aan/uit
+            for ds in range(DS[b]):
+                model += (
+                    ac_from_dc_st[b][ds][u]
+                    <= discharge_stages[b][ds]["power"]
+                    * ac_from_dc_st_on[b][ds][u]
+                    / 1000
+                )
+            for ds in range(DS[b])[1:]:
+                model += (
+                    ac_from_dc_st[b][ds][u]
+                    >= discharge_stages[b][ds - 1]["power"]
+                    * ac_from_dc_st_on[b][ds][u]
+                    / 1000
+                )
+
+            model += ac_from_dc[b][u] == xsum(
+                ac_from_dc_st[b][ds][u] for ds in range(DS[b])
+            )
+            model += (xsum(ac_from_dc_st_on[b][ds][u] for ds in range(DS[b]))) <= 1
+            model += dc_to_ac[b][u] == xsum(
+                ac_from_dc_st[b][ds][u] / discharge_stages[b][ds]["efficiency"]
+                for ds in range(DS[b])
+            )
+            #tot hier ontladen met aan/uit
+            """
+
+            # vanaf hier ontladen met sos ######################################################
+            families += [
+                constr_family([(1, self.ac_from_dc_w[b])], LESS_OR_EQUAL, 1),
+                constr_family(
+                    [
+                        (self.ac_from_dc_samples[b], self.ac_from_dc_w[b]),
+                        (-1, self.ac_from_dc[b]),
+                    ],
+                    EQUAL,
+                ),
+                constr_family(
+                    [
+                        (dc_to_ac_samples[b], self.ac_from_dc_w[b]),
+                        (-1, self.dc_to_ac[b]),
+                    ],
+                    EQUAL,
+                ),
+            ]
+            # tot hier constraints ontladen met sos
+            add_interleaved(model, families)
+            for u in range(U):
+                add_sos(
+                    model, list(zip(self.ac_to_dc_w[b][u], self.ac_to_dc_samples[b])), 2
+                )
+                add_sos(
+                    model,
+                    list(zip(self.ac_from_dc_w[b][u], self.ac_from_dc_samples[b])),
+                    2,
+                )
+
+        """
+        constraints reduced charging power at low or high soc
+        max_power[u] x 1000 <= max_power_0 + helling x (soc[u] – soc_0)
+        max_power[u] x 1000 <= max_power_0 + helling x soc[u] – helling x soc_0
+        max_power[u] x 1000 - helling x soc[u] <= max_power_0 - helling x soc_0
+        
+        """
+        # low soc
+        for b in range(B):
+            red_power = self.reduce_power_low_soc[b]
+            for rpl in range(len(red_power) - 1):
+                helling = int(red_power[rpl]._helling / 2)
+                add_constr_family(
+                    model,
+                    [
+                        (1000, self.dc_from_bat[b]),
+                        (-helling, self.soc[b][:U]),
+                        (-helling, self.soc[b][1:]),
+                    ],
+                    LESS_OR_EQUAL,
+                    red_power[rpl].power - 2 * helling * red_power[rpl].soc,
+                )
+        # high soc
+        for b in range(B):
+            red_power = self.reduce_power_high_soc[b]
+            for rph in range(len(red_power) - 1):
+                helling = int(red_power[rph]._helling / 2)
+                add_constr_family(
+                    model,
+                    [
+                        (1000, self.dc_to_bat[b]),
+                        (-helling, self.soc[b][:U]),
+                        (-helling, self.soc[b][1:]),
+                    ],
+                    LESS_OR_EQUAL,
+                    red_power[rph].power - 2 * helling * red_power[rph].soc,
+                )
+
+        for b in range(B):
+            add_constr_family(
+                model,
+                [(1, self.soc[b]), (-1, self.soc_low[b]), (-1, self.soc_mid[b])],
+                EQUAL,
+            )
+            model += self.soc[b][0] == self.start_soc[b]
+
+            model += self.soc[b][U] >= max(
+                self.opt_low_level[b] / 2, self.min_soc_end_opt[b]
+            )
+            model += self.soc[b][U] <= self.max_soc_end_opt[b]
+            families = [
+                constr_family(
+                    [
+                        (1, self.soc[b][1:]),
+                        (-1, self.soc[b][:U]),
+                        (
+                            -self.eff_dc_to_bat[b] * hour_fraction_np / self.one_soc[b],
+                            self.dc_to_bat[b],
+                        ),
+                        (
+                            hour_fraction_np
+                            / (self.eff_bat_to_dc[b] * self.one_soc[b]),
+                            self.dc_from_bat[b],
+                        ),
+                    ],
+                    EQUAL,
+                )
+            ]
+            # pv_prod_dc is in kWh, pv_prod_dc_sum in kW
+            pv_terms = [(1, self.pv_prod_dc_sum[b])]
+            if self.pv_dc_num[b] > 0:
+                pv_terms.append(
+                    (
+                        -np.asarray(self.pv_prod_dc[b]).T / hour_fraction_np[:, None],
+                        np.asarray(self.pv_dc_on_off[b], dtype=object).T,
+                    )
+                )
+            families += [
+                constr_family(pv_terms, EQUAL),
+                constr_family(
+                    [
+                        (1, self.dc_from_ac[b]),
+                        (1, self.dc_from_bat[b]),
+                        (1, self.pv_prod_dc_sum[b]),
+                        (-1, self.dc_to_ac[b]),
+                        (-1, self.dc_to_bat[b]),
+                    ],
+                    EQUAL,
+                ),
+                constr_family(
+                    [
+                        (1, self.dc_from_ac[b]),
+                        (-self.max_charge_power[b], self.ac_to_dc_on[b]),
+                    ],
+                    LESS_OR_EQUAL,
+                    rows=self.bat_exclusive,
+                ),
+                constr_family(
+                    [
+                        (1, self.ac_from_dc[b]),
+                        (-self.max_discharge_power[b], self.ac_from_dc_on[b]),
+                    ],
+                    LESS_OR_EQUAL,
+                    rows=self.bat_exclusive,
+                ),
+                constr_family(
+                    [(1, self.ac_to_dc_on[b]), (1, self.ac_from_dc_on[b])],
+                    LESS_OR_EQUAL,
+                    1,
+                    rows=self.bat_exclusive,
+                ),
+            ]
+            add_interleaved(model, families)
+            for s in range(self.pv_dc_num[b]):
+                entity_pv_switch = calc.battery_options[b].solar[s].entity_pv_switch
+                if entity_pv_switch == "":
+                    entity_pv_switch = None
+                if entity_pv_switch is None:
+                    for u in range(U):
+                        model += self.pv_dc_on_off[b][s][u] == 1
+
+        # SoC: bereikbaar vanaf de start-SoC met maximaal laden/ontladen
+        for b in range(B):
+            soc_up = soc_down = 0.0
+            for u in range(U):
+                soc_up += (
+                    self.dc_to_bat[b][u].ub
+                    * self.eff_dc_to_bat[b]
+                    * hour_fraction[u]
+                    / self.one_soc[b]
+                )
+                soc_down += (
+                    self.dc_from_bat[b][u].ub * hour_fraction[u] / self.eff_bat_to_dc[b]
+                ) / self.one_soc[b]
+                ctx.bound_pass.tighten(
+                    self.soc[b][u + 1],
+                    lb=self.start_soc[b] - soc_down,
+                    ub=self.start_soc[b] + soc_up,
+                )
+
+    def consumption(self, u: int):
+        return (
+            xsum(
+                ac_to_dc[u] - ac_from_dc[u]
+                for ac_to_dc, ac_from_dc in zip(self.ac_to_dc, self.ac_from_dc)
+            )
+            * self.hour_fraction[u]
+        )
+
+    def max_consumption(self, u: int) -> float:
+        return sum(ac_to_dc[u].ub for ac_to_dc in self.ac_to_dc) * self.hour_fraction[u]
+
+    def max_production(self, u: int) -> float:
+        return (
+            sum(ac_from_dc[u].ub for ac_from_dc in self.ac_from_dc)
+            * self.hour_fraction[u]
+        )
+
+    def costs(self, model, ctx: CalcContext):
+        B = len(self.one_soc)
+        U = ctx.U
+        hour_fraction = ctx.hour_fraction
+        #  cycle cost per batterij
+        self.cycle_cost = [model.add_var(var_type=CONTINUOUS, lb=0) for _ in range(B)]
+        for b in range(B):
+            model += self.cycle_cost[b] == xsum(
+                (self.dc_to_bat[b][u] + self.dc_from_bat[b][u])
+                * self.kwh_cycle_cost[b]
+                * hour_fraction[u]
+                for u in range(U)
+            )
+
+        #  penalty cost per batterij
+        self.penalty_cost = [model.add_var(var_type=CONTINUOUS) for _ in range(B)]
+        for b in range(B):
+            model += self.penalty_cost[b] == xsum(
+                (self.opt_low_level[b] - self.soc_low[b][u])
+                * self.penalty_low_soc[b]
+                * hour_fraction[u]
+                for u in range(U)
+            )
+
+        if ctx.calc.salderen:
+            self.p_bat = ctx.p_avg
+        else:
+            self.p_bat = sum(ctx.pt) / U
+
+        # waarde van de opgeslagen energie boven het optimale minimum
+        return xsum(self.cycle_cost[b] + self.penalty_cost[b] for b in range(B)) + xsum(
+            (self.soc_mid[b][0] - self.soc_mid[b][U])
+            * self.one_soc[b]
+            * self.eff_bat_to_dc[b]
+            * self.avg_eff_dc_to_ac[b]
+            * self.p_bat
+            for b in range(B)
+        )
+
+    def warm_start(self, warm_start, ctx: CalcContext):
+        interval_tijd = ctx.tijd[: ctx.U]
+        for b in range(len(self.one_soc)):
+            warm_start.add_group(f"ac_to_dc_on_{b}", interval_tijd, self.ac_to_dc_on[b])
+            warm_start.add_group(
+                f"ac_from_dc_on_{b}", interval_tijd, self.ac_from_dc_on[b]
+            )
+
+    def setpoint(self, u: int, ctx: CalcContext) -> dict:
+        B = len(self.one_soc)
+        return {
+            "battery": [
+                int(1000 * (self.ac_to_dc[b][u].x - self.ac_from_dc[b][u].x))
+                for b in range(B)
+            ],
+            # gepland SoC-verloop, voor de dispatcher
+            "soc_start": [round(self.soc[b][u].x, 2) for b in range(B)],
+            "soc_end": [round(self.soc[b][u + 1].x, 2) for b in range(B)],
+            # zonder opwekking staat de schakelaar aan
+            "pv_dc_on": [
+                [
+                    bool(
+                        self.pv_dc_on_off[b][s][u].x == 1
+                        or self.pv_prod_dc[b][s][u] == 0.0
+                    )
+                    for s in range(self.pv_dc_num[b])
+                ]
+                for b in range(B)
+            ],
+        }
+
+    def extract(self, solution, ctx: CalcContext):
+        calc = ctx.calc
+        B = len(self.one_soc)
+        U = ctx.U
+        uur = ctx.uur
+        tijd = ctx.tijd
+        interval_end = ctx.interval_end
+        interval_steps = ctx.interval_steps
+        hour_fraction = ctx.hour_fraction
+        hf = np.asarray(hour_fraction[:U], dtype=float)
+        ac_to_dc_x = solution.get(self.ac_to_dc, (B, U))
+        ac_from_dc_x = solution.get(self.ac_from_dc, (B, U))
+        dc_from_ac_x = solution.get(self.dc_from_ac, (B, U))
+        dc_to_ac_x = solution.get(self.dc_to_ac, (B, U))
+        dc_from_bat_x = solution.get(self.dc_from_bat, (B, U))
+        dc_to_bat_x = solution.get(self.dc_to_bat, (B, U))
+        soc_x = solution.get(self.soc, (B, U + 1))
+        self.dc_from_ac_x = dc_from_ac_x
+        self.dc_to_ac_x = dc_to_ac_x
+        # aantal intervallen waarin de teruglevering kan worden begrensd en een
+        # batterij tegelijk laadt en ontlaadt: opwekking wegstoken
+        self.sink_intervals_x = int(
+            np.sum(
+                (dc_from_ac_x > 1e-6)
+                & (dc_to_ac_x > 1e-6)
+                & np.asarray(ctx.export_capped, dtype=bool)
+            )
+        )
+        self.dc_from_bat_x = dc_from_bat_x
+        self.dc_to_bat_x = dc_to_bat_x
+        self.pv_prod_dc_sum_x = solution.get(self.pv_prod_dc_sum, (B, U))
+        self.accu_in_x = (ac_to_dc_x * hf).sum(axis=0)
+        self.accu_out_x = (ac_from_dc_x * hf).sum(axis=0)
+        # totale bruto pv_dc->ac productie
+        self.pv_ac_x = (
+            np.array(
+                [
+                    self.pv_prod_ac[b][s][:U]
+                    for b in range(B)
+                    for s in range(self.pv_dc_num[b])
+                ],
+                dtype=float,
+            )
+            .reshape(-1, U)
+            .sum(axis=0)
+        )
+        # overzicht per ac-accu:
+        pd.options.display.float_format = "{:6.2f}".format
+        df_accu = []
+        for b in range(B):
+            cols = [
+                [
+                    "uur",
+                    "ac->",
+                    "eff",
+                    "->dc",
+                    "pv->dc",
+                    "dc->",
+                    "eff",
+                    "->bat",
+                    "o_eff",
+                    "SoC",
+                ],
+                ["", "kWh", "%", "kWh", "kWh", "kWh", "%", "kWh", "%", "%"],
+            ]
+            ac_to_dc_netto = (ac_to_dc_x[b] - ac_from_dc_x[b]) * hf
+            dc_from_ac_netto = (dc_from_ac_x[b] - dc_to_ac_x[b]) * hf
+            dc_to_bat_netto = (dc_to_bat_x[b] - dc_from_bat_x[b]) * hf
+            bat_from_dc_netto = (
+                dc_to_bat_x[b] * self.eff_dc_to_bat[b]
+                - dc_from_bat_x[b] / self.eff_bat_to_dc[b]
+            ) * hf
+            pv_prod = (
+                solution.get(self.pv_dc_on_off[b], (self.pv_dc_num[b], U))
+                * np.array(self.pv_prod_dc[b], dtype=float).reshape(-1, U)
+            ).sum(axis=0)
+            # rendementen, "--" als die niet gedefinieerd zijn
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ac_to_dc_eff = np.where(
+                    ac_to_dc_netto > 0,
+                    dc_from_ac_netto * 100.0 / ac_to_dc_netto,
+                    ac_to_dc_netto * 100.0 / dc_from_ac_netto,
+                )
+                dc_to_bat_eff = np.where(
+                    dc_to_bat_netto > 0,
+                    bat_from_dc_netto * 100.0 / dc_to_bat_netto,
+                    dc_to_bat_netto * 100.0 / bat_from_dc_netto,
+                )
+            ac_to_dc_def = (ac_to_dc_netto > 0) | (dc_from_ac_netto < 0)
+            dc_to_bat_def = (dc_to_bat_netto > 0) | (bat_from_dc_netto < 0)
+            overall_eff = ac_to_dc_eff * dc_to_bat_eff / 100
+            overall_def = (
+                (pv_prod <= 0) & (ac_to_dc_netto != 0) & ac_to_dc_def & dc_to_bat_def
+            )
+            columns = [
+                [str(uur[u]) for u in range(U)],
+                ac_to_dc_netto,
+                np.where(ac_to_dc_def, ac_to_dc_eff.astype(object), "--").tolist(),
+                dc_from_ac_netto,
+                pv_prod,
+                dc_to_bat_netto,
+                np.where(dc_to_bat_def, dc_to_bat_eff.astype(object), "--").tolist(),
+                bat_from_dc_netto,
+                np.where(overall_def, overall_eff.astype(object), "--").tolist(),
+                soc_x[b, 1:],
+            ]
+            df_accu.append(pd.DataFrame(dict(enumerate(columns))))
+            df_accu[b].columns = pd.MultiIndex.from_arrays(cols)
+
+            if calc.log_level == logging.INFO:
+                # debug laden en ontladen
+                active = (ac_to_dc_x[b] > 0.0) | (ac_from_dc_x[b] > 0.0)
+                for u in np.flatnonzero(active).tolist():
+                    if ac_to_dc_x[b][u] > 0.0:
+                        logging.info(
+                            f"Laad volume in uur {u} {uur[u]} "
+                            f"{ac_from_dc_x[b][u] * hour_fraction[u]} kWh"
+                        )
+                        for cs in range(self.CS[b]):
+                            if self.ac_to_dc_w[b][u][cs].x > 0:
+                                logging.info(
+                                    f"{cs} {self.ac_to_dc_w[b][u][cs].x} "
+                                    f"{self.ac_to_dc_samples[b][cs]}"
+                                )
+                    if ac_from_dc_x[b][u] > 0.0:
+                        logging.info(
+                            f"Ontlaad volume in uur {u} {uur[u]} "
+                            f"{ac_from_dc_x[b][u] * hour_fraction[u]} kWh"
+                        )
+                        for ds in range(self.DS[b]):
+                            if self.ac_from_dc_w[b][u][ds].x > 0:
+                                logging.info(
+                                    f"{ds} {self.ac_from_dc_w[b][u][ds].x} "
+                                    f"{self.ac_from_dc_samples[b][ds]}"
+                                )
+
+            # df_accu[b].loc['total'] = df_accu[b].select_dtypes(numpy.number).sum()
+            # df_accu[b] = df_accu[b].astype({"uur": int})
+            # df_accu[b].set_index(["uur"])
+            # df_accu[b][~df_accu[b].index.duplicated()]
+            try:
+                df_accu[b].loc["Total"] = df_accu[b].sum(axis=0, numeric_only=True)
+                totals = True
+            except Exception as ex:
+                logging.info(ex)
+                logging.info(
+                    f"Totals of accu {calc.battery_options[b].name} "
+                    f"cannot be calculated"
+                )
+                totals = False
+
+            if totals:
+                # Kolom "uur" kan string "Totaal" krijgen door eerst naar object te casten
+                df_accu[b].iloc[:, 0] = df_accu[b].iloc[:, 0].astype(object)
+                df_accu[b].iloc[:, 0] = df_accu[b].iloc[:, 0].astype(object)
+                df_accu[b].iloc[-1, 0] = "Totaal"
+                df_accu[b].iloc[-1, 2] = np.nan  # eff (ac->dc)
+                df_accu[b].iloc[-1, 6] = np.nan  # eff (dc->bat)
+                df_accu[b].iloc[-1, 8] = np.nan  # o_eff
+                df_accu[b].iloc[-1, 9] = np.nan  # SoC
+                df_accu[b] = df_accu[b].fillna("")
+            logging.info(
+                f"In- en uitgaande energie per {calc.interval_name} batterij "
+                f"{calc.battery_options[b].name}"
+                f"\n{df_accu[b].to_string(index=False)}"
+            )
+
+        # soc dataframe maken
+        tijd_soc = tijd.copy()
+        tijd_soc.append(interval_end[U - 1])
+        # gewogen gemiddelde soc over alle batterijen
+        cap = np.asarray(self.one_soc[:B], dtype=float)
+        sum_soc = (cap[:, np.newaxis] * soc_x).sum(axis=0)
+        data_soc = {
+            "tijd": tijd_soc,
+            "soc": np.round(100 * sum_soc / (cap * 100).sum(), 1),
+        }
+        for b in range(B):
+            data_soc["soc_" + str(b)] = soc_x[b]
+        self.df_soc = pd.DataFrame(data_soc)
+        self.df_soc.index = pd.to_datetime(self.df_soc["tijd"])
+
+        if not calc.debug:
+            # samengevoegde intervallen worden per basisinterval opgeslagen
+            tijd_soc, df_soc_save = expand_rows(
+                tijd_soc, self.df_soc, interval_steps, calc.interval_s, levels=True
+            )
+            calc.save_df(tablename="prognoses", tijd=tijd_soc, df=df_soc_save)
+
+        self.battery_storage = float(
+            sum(
+                (self.soc_mid[b][0].x - self.soc_mid[b][U].x)
+                * self.one_soc[b]
+                * self.eff_bat_to_dc[b]
+                * self.avg_eff_dc_to_ac[b]
+                * self.p_bat
+                for b in range(B)
+            )
+        )
+        self.cycle_cost_x = float(solution.get(self.cycle_cost).sum())
+        self.penalty_cost_x = float(solution.get(self.penalty_cost).sum())
+
+    def actuate(self, ha, ctx: CalcContext):
+        B = len(self.one_soc)
+        hour_fraction = ctx.hour_fraction
+        for b in range(B):
+            # vermogen aan ac kant
+            netto_vermogen_bat = int(
+                1000 * (self.ac_to_dc[b][0].x - self.ac_from_dc[b][0].x)
+            )
+            minimum_power = int(ha.battery_options[b].minimum_power)
+            battery_state_on_value = ha.battery_options[b].entity_set_operating_mode_on
+            battery_state_off_value = ha.battery_options[
+                b
+            ].entity_set_operating_mode_off
+            bat_name = ha.battery_options[b].name
+            stop_inverter_id = ha.battery_options[b].entity_stop_inverter
+            if abs(netto_vermogen_bat) <= 20:
+                netto_vermogen_bat = 0
+                new_state = battery_state_off_value
+                stop_omvormer = None
+            elif ctx.grid_balance:
+                new_state = battery_state_on_value
+                stop_omvormer = None
+            elif (
+                minimum_power > 0
+                and abs(netto_vermogen_bat) < minimum_power
+                and stop_inverter_id is not None
+                and (
+                    len(self.reduce_power_low_soc[b]) == 0
+                    or self.start_soc[b]
+                    > self.reduce_power_low_soc[b][
+                        len(self.reduce_power_low_soc[b]) - 1
+                    ].soc
+                )
+                and (
+                    len(self.reduce_power_high_soc[b]) == 0
+                    or self.start_soc[b] < self.reduce_power_high_soc[b][0].soc
+                )
+            ):
+                new_state = battery_state_on_value
+                new_ts = (
+                    ctx.start_dt.timestamp()
+                    + (abs(netto_vermogen_bat) / minimum_power) * ha.interval_s
+                )
+                stop_omvormer = dt.datetime.fromtimestamp(int(new_ts))
+                if netto_vermogen_bat > 0:
+                    netto_vermogen_bat = minimum_power
+                else:
+                    netto_vermogen_bat = -minimum_power
+            elif self.ac_to_dc[b][0].x > 0.0:  # laden met optimaal vermogen
+                sum_weight_factor = 0
+                sum_power = 0  # in W
+                for cs in range(self.CS[b]):
+                    wf = self.ac_to_dc_w[b][0][cs].x
+                    if wf > 0:
+                        sum_weight_factor += wf
+                        sum_power += wf * self.charge_stages[b][cs]["power"]
+                if sum_power > 0:
+                    new_state = battery_state_on_value
+                    netto_vermogen_bat = round(sum_power)
+                stop_omvormer = None
+            elif self.ac_from_dc[b][0].x > 0.0:  # ontladen met optimaal vermogen
+                sum_weight_factor = 0
+                sum_power = 0  # in W
+                for ds in range(self.DS[b]):
+                    wf = self.ac_from_dc_w[b][0][ds].x
+                    if wf > 0:
+                        sum_weight_factor += wf
+                        sum_power += wf * self.discharge_stages[b][ds]["power"]
+                if sum_power > 0:
+                    new_state = battery_state_on_value
+                    netto_vermogen_bat = -round(sum_power)
+                stop_omvormer = None
+            else:
+                new_state = battery_state_on_value
+                stop_omvormer = None
+            if stop_omvormer is not None and stop_inverter_id is None:
+                stop_omvormer = None
+            if stop_omvormer is None:
+                stop_str = "2000-01-01 00:00:00"
+            else:
+                stop_str = stop_omvormer.strftime("%Y-%m-%d %H:%M")
+            # stromen in het eerste interval (kWh), zoals in het overzicht per accu
+            to_battery = (
+                self.dc_to_bat[b][0].x - self.dc_from_bat[b][0].x
+            ) * hour_fraction[0]
+            first_pv = 0
+            for s in range(self.pv_dc_num[b]):
+                first_pv += self.pv_dc_on_off[b][s][0].x * self.pv_prod_dc[b][s][0]
+            first_ac = (
+                self.dc_from_ac[b][0].x - self.dc_to_ac[b][0].x
+            ) * hour_fraction[0]
+            from_battery = int(-to_battery * 1000 / hour_fraction[0])
+            from_pv = int(first_pv * 1000 / hour_fraction[0])
+            from_ac = int(first_ac * 1000 / hour_fraction[0])
+            calculated_soc = round(self.soc[b][1].x, 1)
+            logging.info(f"Cycle cost {bat_name}: {self.cycle_cost[b].x:<0.2f} euro")
+            if ha.debug:
+                logging.info(
+                    f"Netto vermogen naar(+)/uit(-) batterij {bat_name} "
+                    f"zou zijn: {netto_vermogen_bat} W"
+                )
+                if stop_omvormer:
+                    logging.info(f"tot: {stop_str}")
+            else:
+                ha.set_entity_value(
+                    "entity set power feedin",
+                    ha.battery_options[b],
+                    netto_vermogen_bat,
+                )
+                ha.set_entity_option(
+                    "entity set operating mode", ha.battery_options[b], new_state
+                )
+                tot_str = f" tot: {stop_str}" if stop_omvormer else ""
+                logging.info(
+                    f"Netto vermogen naar(+)/uit(-) omvormer {bat_name}: "
+                    f"{netto_vermogen_bat} W {tot_str}"
+                )
+                if stop_inverter_id is not None:
+                    ha.call_service(
+                        "set_datetime",
+                        entity_id=stop_inverter_id,
+                        datetime=stop_str,
+                    )
+                ha.set_entity_value(
+                    "entity from battery", ha.battery_options[b], from_battery
+                )
+                logging.info(f"Vermogen uit batterij: {from_battery}W")
+                ha.set_entity_value("entity from pv", ha.battery_options[b], from_pv)
+                logging.info(f"Vermogen dat binnenkomt van pv: {from_pv}W")
+                ha.set_entity_value("entity from ac", ha.battery_options[b], from_ac)
+                logging.info(f"Vermogen dat binnenkomt van ac: {from_ac}W")
+                ha.set_entity_value(
+                    "entity calculated soc", ha.battery_options[b], calculated_soc
+                )
+                logging.info(f"Waarde SoC na eerste uur: {calculated_soc}%")
+
+        self.switch_pv_dc(ha, self.setpoint(0, ctx))
+
+    def switch_pv_dc(self, ha, setpoint: dict):
+        """
+        Zet de schakelaars van de zonnepanelen aan de dc-kant
+        """
+        for options, pv_dc_on in zip(ha.battery_options, setpoint.get("pv_dc_on", [])):
+            for solar, pv_on in zip(options.solar, pv_dc_on):
+                if solar.entity_pv_switch:
+                    switch_pv(ha, solar.entity_pv_switch, pv_on, solar.name)
+
+    def actuate_setpoint(self, ha, setpoint: dict):
+        for b, power in enumerate(setpoint["battery"][: len(ha.battery_options)]):
+            options = ha.battery_options[b]
+            if abs(power) <= 20:
+                power = 0
+                new_state = options.entity_set_operating_mode_off
+            else:
+                new_state = options.entity_set_operating_mode_on
+            if ha.debug:
+                logging.info(
+                    f"Netto vermogen naar(+)/uit(-) omvormer {options.name} "
+                    f"zou zijn: {power} W"
+                )
+                continue
+            ha.set_entity_value("entity set power feedin", options, power)
+            ha.set_entity_option("entity set operating mode", options, new_state)
+            logging.info(
+                f"Netto vermogen naar(+)/uit(-) omvormer {options.name}: {power} W"
+            )
+        self.switch_pv_dc(ha, setpoint)
@@ -0,0 +1,586 @@
+"""
+De boiler in de optimaliseringsberekening.
+Per boiler wordt vooraf berekend tussen welke intervallen de boiler kan worden
+opgewarmd en wat opwarmen vanaf ieder interval kost; in het model wordt een van die
+startmomenten (binair) gekozen. De energie in de boiler aan het einde van de
+horizon wordt gewaardeerd tegen de gemiddelde prijs.
+"""
+
+import logging
+import math
+
+import pandas as pd
+from mip import xsum, BINARY, CONTINUOUS
+
+from dao.prog.da_components import CalcContext, Component
+from dao.prog.da_horizon import step_to_interval, intervals_for_steps
+
+
+class BoilerComponent(Component):
+    name = "boiler"
+
+    def prepare(self, ctx: CalcContext) -> bool:
+        calc = ctx.calc
+        calc.boiler_present = (
+            calc.boiler_options.boiler_present if calc.boiler_options else False
+        )
+        if calc.boiler_present:
+            entity_boiler_enabled = calc.boiler_options.entity_enabled
+            if entity_boiler_enabled is None:
+                calc.boiler_enabled = True
+            else:
+                calc.boiler_enabled = (
+                    calc.get_state(entity_boiler_enabled).state == "on"
+                )
+        else:
+            calc.boiler_enabled = False
+        if not (calc.boiler_present and calc.boiler_enabled):
+            logging.info(
+                f"Boiler niet aanwezig of staat uit, boiler wordt niet ingepland"
+            )
+            return False
+        return True
+
+    def build(self, model, ctx: CalcContext):
+        calc = ctx.calc
+        U = ctx.U
+        tijd = ctx.tijd
+        uur = ctx.uur
+        pl = ctx.pl
+        p_avg = ctx.p_avg
+        interval_steps = ctx.interval_steps
+        interval_fraction = ctx.interval_fraction
+        interval_start_step = ctx.interval_start_step
+        horizon_len = ctx.horizon_len
+        ha_getter = ctx.ha_getter
+        # aantal opwarm-intervallen
+        self.est_needed_intv = [0 for _ in range(U)]
+        self.boiler_start = None
+        # boiler is aan het verwarmen
+        self.boiler_on = [model.add_var(var_type=BINARY) for _ in range(U)]
+        # boiler begint met verwarmen
+        self.boiler_st = [model.add_var(var_type=BINARY) for _ in range(U)]
+        entity_boiler_instant_start = calc.boiler_options.entity_instant_start
+        if entity_boiler_instant_start is None:
+            boiler_instant_start = False
+        else:
+            boiler_instant_start = (
+                calc.get_state(entity_boiler_instant_start).state == "on"
+            )
+        logging.info(
+            f"Boiler direct opwarmen staat {'aan' if boiler_instant_start else 'uit'}"
+        )
+        # 50 huidige boilertemperatuur ophalen uit ha
+        boiler_act_temp = float(
+            calc.get_state(calc.boiler_options.entity_actual_temp).state
+        )
+        self.boiler_setpoint = float(
+            calc.get_state(calc.boiler_options.entity_setpoint).state
+        )
+        if boiler_act_temp > self.boiler_setpoint + 1:
+            logging.warning(
+                f"Je setpoint ({self.boiler_setpoint}) is lager de actuele "
+                f"temperatuur ({boiler_act_temp}). Het verdient aanbeveling je "
+                f"setpoint hoger in te stellen"
+            )
+        self.boiler_setpoint = max(self.boiler_setpoint, boiler_act_temp)
+        logging.info(f"Boiler setpoint {self.boiler_setpoint} °C")
+        self.boiler_hysterese = float(
+            calc.get_state(calc.boiler_options.entity_hysterese).state
+        )
+        # 0.5 K/uur afkoeling per uur, omrekenen naar afkoeling per interval
+        logging.info(f"Boiler hysterese {self.boiler_hysterese} K")
+
+        cooling_rate = calc.boiler_options.cooling_rate.resolve(ha_getter)  # FlexFloat
+        logging.info(f"Boiler cooling rate {cooling_rate} K/uur")
+        boiler_cooling = cooling_rate * calc.interval_s / 3600
+
+        # 45 °C grens daaronder kan worden verwarmd
+        boiler_bovengrens = calc.boiler_options.heating_allowed_below.resolve(
+            ha_getter
+        )  # FlexFloat
+        logging.info(f"Boiler heating allowed below {boiler_bovengrens} °C")
+
+        # maximeren op setpoint
+        boiler_bovengrens = min(boiler_bovengrens, self.boiler_setpoint)
+        # 37 °C als boiler onder ondergrens komt moet er worden verwarmd
+        self.boiler_ondergrens = self.boiler_setpoint - self.boiler_hysterese
+        if boiler_bovengrens <= self.boiler_ondergrens:
+            logging.warning(
+                f"Het programma heeft geen speelruimte tussen "
+                f"heating allowed below {boiler_bovengrens} en de boiler ondergrens"
+                f" {self.boiler_ondergrens}"
+                f"(= setpoint {self.boiler_setpoint} - hysterese {self.boiler_hysterese}"
+            )
+            boiler_bovengrens = self.boiler_ondergrens + 1
+            logging.info(
+                f"De waarde voor heating_allowed_below is verhoogd naar "
+                f"{boiler_bovengrens}"
+            )
+        # volume in  liter
+        vol = calc.boiler_options.volume
+        # spec heat in kJ/K = vol in liter * 4,2 kJ/k.liter + 100 kg boiler * 0,5 kJ/k.kg
+        self.spec_heat_boiler = 1.1 * (vol * 4.2 + 100 * 0.5)  # kJ/K
+        # cop flexfloat
+        self.cop_boiler = calc.boiler_options.cop.resolve(ha_getter)
+        # kWh elektriciteit / K
+        # spec_elec_boiler = spec_heat_boiler / 3600 * cop_boiler
+        # elektrisch vermogen in W
+        power_boiler = float(calc.boiler_options.elec_power)  # W
+        self.boiler_heated_by_heatpump = calc.boiler_options.boiler_heated_by_heatpump
+        # delta t in een step
+        # heat rate = power * cop * sec.p.interval /spec vermogen in K/step
+        heat_rate = (
+            power_boiler
+            * self.cop_boiler
+            * calc.interval_s
+            / (self.spec_heat_boiler * 1000)
+        )
+        boiler_end_temp = max(
+            self.boiler_ondergrens, boiler_act_temp - horizon_len * boiler_cooling
+        )
+        max_steps = math.ceil((self.boiler_setpoint - boiler_end_temp) / heat_rate)
+        # interval-index waarop boiler kan worden verwarmd
+        # de indexen worden berekend in basisintervallen en daarna
+        # omgezet naar de (eventueel samengevoegde) intervallen
+        if boiler_instant_start or (boiler_act_temp <= self.boiler_ondergrens):
+            boiler_start_index = 0
+            self.boiler_start = 0
+        else:
+            boiler_start_index = int(
+                max(
+                    0,
+                    min(
+                        horizon_len - 1 - max_steps,
+                        math.floor(
+                            (boiler_act_temp - boiler_bovengrens) / boiler_cooling
+                        ),
+                    ),
+                )
+            )
+
+        # interval-index waarop boiler nog aan kan
+        # (41-40)/0.4=2.5
+        boiler_end_temp = boiler_act_temp - horizon_len * boiler_cooling
+        if boiler_instant_start or (boiler_act_temp <= self.boiler_ondergrens):
+            boiler_end_index = 1
+        else:
+            boiler_end_index = int(
+                min(
+                    horizon_len - max_steps,
+                    max(
+                        boiler_start_index + 1,
+                        math.floor(
+                            (boiler_act_temp - self.boiler_ondergrens) / boiler_cooling
+                        ),
+                    ),
+                )
+            )
+            boiler_start_index = step_to_interval(
+                interval_start_step, boiler_start_index
+            )
+            boiler_end_index = step_to_interval(interval_start_step, boiler_end_index)
+        self.boiler_temp = [
+            model.add_var(
+                var_type=CONTINUOUS,
+                lb=min(
+                    boiler_act_temp, self.boiler_setpoint - self.boiler_hysterese - 10
+                ),
+                ub=self.boiler_setpoint + 10,
+            )
+            for _ in range(U + 1)
+        ]  # end temp boiler
+
+        if (boiler_start_index > boiler_end_index) or (
+            boiler_end_temp >= boiler_bovengrens
+        ):  # geen boiler opwarming in deze periode
+            logging.info(
+                f"Boiler wordt niet ingepland, omdat de verwachte "
+                f"eindtemperatuur {boiler_end_temp} °C hoger is dan de "
+                f"opwarmgrens {boiler_bovengrens} °C."
+            )
+            self.c_b = [
+                model.add_var(var_type=CONTINUOUS, lb=0, ub=0) for _ in range(U)
+            ]  # consumption boiler
+            model += xsum(self.boiler_on[j] for j in range(U)) == 0
+            model += xsum(self.boiler_st[j] for j in range(U)) == 0
+            logging.debug(f"Boiler: er  wordt geen opwarming inpland")
+            boiler_end_temp = boiler_act_temp - boiler_cooling * horizon_len
+            logging.debug(
+                f"Boiler eind temperatuur zonder opwarmen: {boiler_end_temp:.2f}"
+            )
+            model += self.boiler_temp[0] == boiler_act_temp
+            for u in range(U):
+                # opwarming in K = kWh opwarming * 3600 = kJ / spec heat boiler - 3
+                model += (
+                    self.boiler_temp[u + 1]
+                    == self.boiler_temp[u] - boiler_cooling * interval_steps[u]
+                )
+        else:
+            logging.info(
+                f"Boiler opwarmen wordt ingepland tussen: "
+                f"{tijd[boiler_start_index].strftime('%Y-%m-%d %H:%M')} en "
+                f"{tijd[min(boiler_end_index, U - 1)].strftime('%Y-%m-%d %H:%M')}"
+            )
+            est_boiler_temp = [
+                (boiler_act_temp - boiler_cooling * interval_start_step[u])
+                for u in range(U)
+            ]
+            est_needed_heat = [0.0 for _ in range(U)]
+            est_needed_elec = [0.0 for _ in range(U)]
+            est_needed_elec_st = []
+            # cb_hr_run = []
+            est_elec_cost = [0.0 for _ in range(U)]
+            est_boiler_endtemp = [0.0 for _ in range(U)]
+            est_boiler_endvalue = [0.0 for _ in range(U)]
+            est_netto_cost = [0.0 for _ in range(U)]
+            # needed_time = [0 for _ in range(U)]
+            # needed_heat = sp * (setpoint - act_temp - 4 - cooling*plan_periode)/3600 in kWh
+
+            # consumption in one interval = kWh per uur of per 15min
+            cons_interval = power_boiler * calc.interval_s / 3600000
+            # tempverlies door menging bij starten opwarmen in K
+            # mix_los = 1.2
+            logging.info(
+                f"Boiler verbruik in 1 {calc.interval_name}: {cons_interval} kWh"
+            )
+            boiler_netto_cost = None
+            for u in range(U):
+                # benodigde warmte voor opwarmen vanaf interval u in kWh
+                est_needed_heat[u] = max(
+                    0.0,
+                    float(
+                        self.spec_heat_boiler
+                        * (self.boiler_setpoint - est_boiler_temp[u])
+                        / 3600
+                    ),
+                )
+                # opstart elektra in kWh
+                start_needed_elec = 0.1
+                # benogde elektra bij opwarmen vanaf interval u in kWh
+                est_needed_elec[u] = (
+                    start_needed_elec + est_needed_heat[u] / self.cop_boiler
+                )
+                # benodigde aantallen intervallen
+                num_intervals = intervals_for_steps(
+                    interval_steps,
+                    u,
+                    math.ceil(
+                        (est_needed_elec[u] * 1000 / power_boiler)
+                        * 3600
+                        / calc.interval_s
+                    ),
+                )
+                # verdelen van benodigde elektra over de intervallen
+                self.est_needed_intv[u] = num_intervals
+                est_needed_elec_st.append([])
+                # cb_hr_run.append([])
+                # for _ in range(U):
+                #     cb_hr_run[u].append(0.0)
+                used = 0.0
+                for j in range(num_intervals + 1):
+                    use = min(
+                        max(0, est_needed_elec[u] - used),
+                        cons_interval
+                        * interval_steps[min(u + j, U - 1)]
+                        * interval_fraction[min(u + j, U - 1)],
+                    )
+                    est_elec_cost[u] += use * pl[min(u + j, U - 1)]
+                    est_needed_elec_st[u].append(use)
+                    # if u + j < U:
+                    #    cb_hr_run[u][u + j] = use
+                    used += use
+                    if used >= est_needed_elec[u]:
+                        break
+                # aantal basisintervallen na het opwarmen
+                steps_after = (
+                    horizon_len
+                    - interval_start_step[min(u + self.est_needed_intv[u], U)]
+                    - max(0, u + self.est_needed_intv[u] - U)
+                )
+                est_boiler_endtemp[u] = (
+                    self.boiler_setpoint - boiler_cooling * steps_after
+                )
+                est_boiler_endvalue[u] = (
+                    (est_boiler_endtemp[u] - boiler_act_temp)  # boiler_ondergrens)
+                    * (self.spec_heat_boiler / (3600 * self.cop_boiler))
+                    * p_avg
+                )
+                est_netto_cost[u] = est_elec_cost[u] - est_boiler_endvalue[u]
+                if u + num_intervals >= U:
+                    boiler_end_index = min(boiler_end_index, u)
+                    break
+                if (
+                    (u >= boiler_start_index)
+                    and (u <= boiler_end_index)
+                    and (
+                        (boiler_netto_cost is None)
+                        or (est_netto_cost[u] < boiler_netto_cost)
+                    )
+                ):
+                    boiler_netto_cost = est_netto_cost[u]
+                    self.boiler_start = u
+
+            # if calc.debug:
+            #     df_interval = pd.DataFrame(cb_hr_run)
+            #     logging.debug(f"Interval boiler:\n{df_interval.to_string()}\n")
+
+            if calc.log_level == logging.INFO:
+                df_boiler = pd.DataFrame(
+                    {
+                        "tijd": tijd,
+                        "act_temp": est_boiler_temp,
+                        "heat": est_needed_heat,
+                        "elec": est_needed_elec,
+                        "interval": self.est_needed_intv,
+                        "cost": est_elec_cost,
+                        "end_temp": est_boiler_endtemp,
+                        "end_value": est_boiler_endvalue,
+                        "netto_cost": est_netto_cost,
+                    }
+                )
+                logging.info(f"Prognose boiler:\n{df_boiler.to_string()}\n")
+
+            # c_b = consumption boiler in kWh per interval
+            self.c_b = [
+                model.add_var(
+                    var_type=CONTINUOUS, lb=0, ub=cons_interval * interval_steps[u]
+                )
+                for u in range(U)
+            ]
+            model += xsum(self.boiler_st[u] for u in range(U)) == 1
+
+            # korte bocht oplossing
+            """
+            if self.boiler_start is None:
+                for u in range(U):
+                    model += self.c_b[u] == 0.0
+                    model += self.boiler_on[u] == 1
+            else:
+                logging.info(
+                    f"Boiler start wordt ingezet op {tijd[self.boiler_start]} met "
+                    f"{self.est_needed_intv[self.boiler_start]} intervallen"
+                )
+                for u in range(U):
+                    if u == self.boiler_start:
+                        model += self.boiler_st[u] == 1
+                    else:
+                        model += self.boiler_st[u] == 0
+                    if (
+                        self.boiler_start
+                        <= u
+                        < self.boiler_start + self.est_needed_intv[self.boiler_start]
+                    ):
+                        model += (
+                            self.c_b[u]
+                            == est_needed_elec_st[self.boiler_start][u - self.boiler_start]
+                        )
+                        model += self.boiler_on[u] == 1
+                    else:
+                        model += self.c_b[u] == 0.0
+                        model += self.boiler_on[u] == 0
+            """
+            # beste oplossing
+
+            for u in range(U)[0:boiler_start_index]:
+                model += self.c_b[u] == 0
+                model += self.boiler_on[u] == 0
+                model += self.boiler_st[u] == 0
+
+            for u in range(U)[boiler_end_index + 1 :]:
+                logging.debug(f"u {u}, {uur[u]}")
+                model += self.boiler_st[u] == 0
+                if u > boiler_end_index + self.est_needed_intv[boiler_end_index] - 1:
+                    model += self.boiler_on[u] == 0
+                    model += self.c_b[u] == 0
+            model += (
+                xsum(
+                    self.boiler_st[u]
+                    for u in range(U)[boiler_start_index:boiler_end_index]
+                )
+                == 1
+            )
+            for u in range(U)[
+                boiler_start_index : boiler_end_index
+                + self.est_needed_intv[boiler_end_index]
+            ]:
+                model += self.c_b[u] == xsum(
+                    self.boiler_st[j] * est_needed_elec_st[j][u - j]
+                    for j in range(U)[max(0, u - self.est_needed_intv[u] + 1) : u + 1]
+                    if u - j < len(est_needed_elec_st[j])
+                )
+                """
+                logging.debug(f"uur {u}: {uur[u]} est_needed_intv[u]:{self.est_needed_intv[u]}")
+                for j in range(U)[max(0, u - self.est_needed_intv[u]+1): u + 1]:
+                    logging.debug(f"len(est_needed_elec_st[j]): {len(est_needed_elec_st[j])}")
+                    if self.est_needed_intv[u]>0 and u - j < len(est_needed_elec_st[j]):
+                        logging.debug(f"j: {j}, est_needed_elec_st[j][u - j]: "
+                              f"{est_needed_elec_st[j][u - j]}")
+                """
+                model += self.boiler_on[u] == xsum(
+                    self.boiler_st[j]
+                    for j in range(U)[
+                        max(boiler_start_index, u - self.est_needed_intv[u] + 1) : u + 1
+                    ]
+                    if u - j < len(est_needed_elec_st[j])
+                )
+
+            """
+                j_vanaf = u - self.est_needed_intv[u]
+                j_tot = min(u + 1, len(cb_hr_run))
+                logging.debug(u, j_vanaf, j_tot)
+                model += self.c_b[u] == xsum(
+                    self.boiler_st[j] * cb_hr_run[j][u]
+                    for j in range(U)[j_vanaf: j_tot]
+                )
+                model += self.boiler_on[u] == 0 #xsum(
+                    # boiler_st[j]
+                    # for j in range(U)[u - est_needed_intv[u]: u + 1]
+                    # for j in range(U)[
+                    #    max(boiler_start_index, u - est_needed_intv[u] + 1): u + 1]
+                    # if u - j < len(est_needed_elec_st[j])
+                # )
+
+            
+            for u in range(U)[
+                boiler_start_index : min(
+                    boiler_end_index, U - self.est_needed_intv[U - 1]
+                )
+                + 1
+            ]:
+                model += self.boiler_st[u] * self.est_needed_intv[u] <= xsum(
+                    self.boiler_on[u + j] for j in range(self.est_needed_intv[u])
+                )
+
+            for u in range(U)[
+                boiler_start_index : boiler_end_index
+                + self.est_needed_intv[boiler_end_index-1]-1
+            ]:
+                u_str = f"{u} {uur[u]}: "
+                for u1 in range(U)[u - self.est_needed_intv[u] + 1 : u + 1]:
+                    if (u1 + self.est_needed_intv[u1] - 1) >= u >= u1:
+                        u_str += f"{u1}, "
+                logging.info(u_str)
+                model += self.boiler_on[u] == xsum(
+                    self.boiler_st[u1] * ((u1 + self.est_needed_intv[u1] - 1) >= u >= u1)
+                    for u1 in range(U)[u - self.est_needed_intv[u] + 1 : u+1]
+                )
+            """
+            model += self.boiler_temp[0] == boiler_act_temp
+            for u in range(U):
+                # opwarming in K = kWh opwarming * 3600 = kJ / spec heat boiler - 3
+                model += (
+                    self.boiler_temp[u + 1]
+                    == self.boiler_temp[u]
+                    # - mix_los * boiler_st[u]
+                    - boiler_cooling * interval_steps[u]
+                    + self.c_b[u] * self.cop_boiler * 3600 / self.spec_heat_boiler
+                )
+
+    def consumption(self, u: int):
+        return self.c_b[u]
+
+    def max_consumption(self, u: int) -> float:
+        return self.c_b[u].ub
+
+    def costs(self, model, ctx: CalcContext):
+        # waarde energie boiler
+        U = ctx.U
+        return (
+            -(self.boiler_temp[U] - self.boiler_temp[0])
+            * (self.spec_heat_boiler / (3600 * self.cop_boiler))
+            * ctx.p_avg
+        )
+
+    def warm_start(self, warm_start, ctx: CalcContext):
+        warm_start.add_group("boiler_on", ctx.tijd[: ctx.U], self.boiler_on)
+
+    def setpoint(self, u: int, ctx: CalcContext) -> dict:
+        return {"boiler": float(self.c_b[u].x) > 0.0}
+
+    def extract(self, solution, ctx: CalcContext):
+        U = ctx.U
+        self.c_b_x = solution.get(self.c_b)
+        self.boiler_temp_x = solution.get(self.boiler_temp)
+        boiler_at_23 = (
+            self.boiler_temp_x[U] - (self.boiler_setpoint - self.boiler_hysterese)
+        ) * (self.spec_heat_boiler / (3600 * self.cop_boiler))
+        logging.info(f"Waarde boiler om 23 uur: {boiler_at_23:<0.2f} kWh")
+        # verandering van de energie in de boiler in euro
+        self.boiler_storage = (
+            (self.boiler_temp_x[0] - self.boiler_temp_x[U])
+            * (self.spec_heat_boiler / (3600 * self.cop_boiler))
+            * ctx.p_avg
+        )
+
+    def actuate(self, ha, ctx: CalcContext):
+        U = ctx.U
+        uur = ctx.uur
+        tijd = ctx.tijd
+        p_avg = ctx.p_avg
+        # debug logging boiler results
+        logging.debug("\nBOILER")
+        logging.debug("nr  uur st on  cons   temp")
+        for u in range(U):
+            logging.debug(
+                f"{u:.0f} {uur[u]}  {self.boiler_st[u].x:.0f}  {self.boiler_on[u].x:.0f}  {self.c_b[u].x:.2f}  "
+                f"{self.boiler_temp[u].x:.2f}"
+            )
+        logging.debug("\n")
+        self.actuate_setpoint(ha, self.setpoint(0, ctx))
+        boiler_st_index = -1
+        for u in range(U):
+            if self.boiler_st[u].x == 1:
+                boiler_st_index = u
+                break
+        if boiler_st_index >= 0:
+            boiler_start_opwarmen = tijd[boiler_st_index]
+            logging.info(
+                f"Boiler opwarmen ingepland vanaf: {boiler_start_opwarmen} "
+                f"met {self.est_needed_intv[boiler_st_index]} interval(len)"
+            )
+
+        # waarde energie boiler
+        boiler_waarde_el = (self.boiler_temp[U].x - self.boiler_ondergrens) * (
+            self.spec_heat_boiler / (3600 * self.cop_boiler)
+        )
+        boiler_waarde_fin = boiler_waarde_el * p_avg
+        logging.info(
+            f"Boiler temperatuur {self.boiler_temp[U].x:.1f} °C, "
+            f" waardering: {boiler_waarde_el:.3f} kWh = {boiler_waarde_fin:.2f} euro"
+        )
+
+    def actuate_setpoint(self, ha, setpoint: dict):
+        if "boiler" not in setpoint or not ha.boiler_options:
+            return
+        boiler_activate_entity = ha.boiler_options.activate_entity
+        boiler_switch_entity = ha.boiler_options.switch_entity
+        if setpoint["boiler"]:
+            if ha.debug:
+                logging.info("Boiler opwarmen zou zijn geactiveerd")
+            else:
+                if boiler_activate_entity is None and boiler_switch_entity is None:
+                    logging.warning(
+                        "Er zijn geen entities gedefinieerd voor het opwarmen van de boiler"
+                    )
+                if boiler_activate_entity:
+                    ha.call_service(
+                        ha.boiler_options.activate_service,
+                        boiler_activate_entity,
+                    )
+                if boiler_switch_entity:
+                    ha.turn_on(boiler_switch_entity)
+                # "input_button.hw_trigger")
+                logging.info("Boiler opwarmen geactiveerd")
+        else:
+            logging.info(f"Boiler opwarmen niet geactiveerd")
+            # een schakelaar die nog aan staat gaat uit
+            if (
+                boiler_switch_entity
+                and ha.get_state(boiler_switch_entity).state == "on"
+            ):
+                if ha.debug:
+                    logging.info("Boiler zou zijn uitgeschakeld")
+                else:
+                    ha.turn_off(boiler_switch_entity)
+                    logging.info("Boiler uitgeschakeld")
@@ -0,0 +1,114 @@
+"""
+Afgeleide grenzen van de modelvariabelen.
+Tijdens de modelbouw worden de grenzen van variabelen die ruim zijn gedeclareerd
+(bv. het verbruik van de warmtepomp) aangescherpt met waarden die uit de instellingen
+en de invoer volgen. Hoe krapper de grenzen, hoe beter de LP-relaxatie en hoe minder
+nodes de solver nodig heeft. Met relaxation_bounds wordt de LP-relaxatie met de ruime
+en met de aangescherpte grenzen berekend, zodat de winst in het log zichtbaar is.
+"""
+
+import logging
+import numbers
+
+from mip import Var, OptimizationStatus
+
+from dao.prog.da_live_model import LiveModel
+
+
+class BoundPass:
+    def __init__(self, model):
+        """
+        :param model: mip.Model of LiveModel
+        """
+        self.model = model
+        # per aangescherpte variabele: (variabele, oorspronkelijke lb, ub)
+        self.changes: list[tuple[Var, float, float]] = []
+
+    def tighten(
+        self,
+        var: Var,
+        lb: numbers.Real | None = None,
+        ub: numbers.Real | None = None,
+    ) -> bool:
+        """
+        Scherpt de grenzen van een variabele aan, grenzen worden nooit ruimer
+        :param var: de variabele
+        :param lb: afgeleide ondergrens, None: ongewijzigd
+        :param ub: afgeleide bovengrens, None: ongewijzigd
+        :return: True als een grens is aangescherpt
+        """
+        old_lb = var.lb
+        old_ub = var.ub
+        new_lb = old_lb if lb is None else max(old_lb, lb)
+        new_ub = old_ub if ub is None else min(old_ub, ub)
+        if new_lb > new_ub:
+            logging.warning(
+                f"Afgeleide grenzen [{new_lb}, {new_ub}] van {var.name} "
+                f"zijn strijdig en worden niet gebruikt"
+            )
+            return False
+        if new_lb == old_lb and new_ub == old_ub:
+            return False
+        self.changes.append((var, old_lb, old_ub))
+        set_bounds(self.model, var, new_lb, new_ub)
+        return True
+
+    def _relaxation(self) -> float | None:
+        status = self.model.optimize(relax=True)
+        if status != OptimizationStatus.OPTIMAL:
+            return None
+        return self.model.objective_value
+
+    def relaxation_bounds(self) -> tuple[float | None, float | None]:
+        """
+        Berekent de LP-relaxatie van de huidige doelfunctie met de oorspronkelijke
+        en met de aangescherpte grenzen; daarna gelden weer de aangescherpte grenzen
+        :return: (waarde met oorspronkelijke grenzen, waarde met aangescherpte grenzen)
+        """
+        tight = self._relaxation()
+        tight_bounds = [(var, var.lb, var.ub) for var, _, _ in self.changes]
+        for var, lb, ub in reversed(self.changes):
+            var.lb = lb
+            var.ub = ub
+        loose = self._relaxation()
+        for var, lb, ub in tight_bounds:
+            var.lb = lb
+            var.ub = ub
+        return loose, tight
+
+
+def set_bounds(model, var: Var, lb: numbers.Real, ub: numbers.Real):
+    """
+    Zet de grenzen van een variabele, bij een LiveModel wordt ook
+    de bewaarde opbouw bijgewerkt
+    """
+    if isinstance(model, LiveModel):
+        model.set_bounds(var, lb, ub)
+    else:
+        var.lb = lb
+        var.ub = ub
+
+
+def log_relaxation_gap(
+    loose: float | None, tight: float | None, objective: float | None
+) -> dict:
+    """
+    Logt de gap tussen de oplossing en de LP-relaxatie, met en zonder
+    aangescherpte grenzen
+    :return: dict met de LP-waarden en gaps voor calc_stats
+    """
+    stats = {"lp_bound_loose": loose, "lp_bound_tight": tight}
+    if loose is None or tight is None or objective is None:
+        return stats
+    stats["lp_gap_loose"] = objective - loose
+    stats["lp_gap_tight"] = objective - tight
+    if stats["lp_gap_loose"] > 1e-9:
+        improvement = 100 * (1 - stats["lp_gap_tight"] / stats["lp_gap_loose"])
+    else:
+        improvement = 0.0
+    logging.info(
+        f"LP-relaxatie: {loose:.4f} -> {tight:.4f} euro, gap met oplossing "
+        f"{stats['lp_gap_loose']:.4f} -> {stats['lp_gap_tight']:.4f} euro "
+        f"({improvement:.1f}% kleiner)"
+    )
+    return stats
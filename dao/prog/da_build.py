@@ -0,0 +1,116 @@
+"""
+Bouwstenen voor het opbouwen van het MIP-model per blok.
+Variabelen worden per blok gedeclareerd (numpy-array over bv. interval en stap)
+en constraints worden per familie toegevoegd vanuit numpy coefficient-arrays:
+een rij per interval (of per element van het blok). De rijen worden direct als
+LinExpr opgebouwd, zonder de tussenliggende expressies van "+", "*" en xsum.
+Werkt met mip.Model en met LiveModel.
+"""
+
+import numbers
+
+import numpy as np
+from mip import LinExpr, CONTINUOUS, INF
+
+
+def add_var_block(
+    model,
+    shape: int | tuple,
+    var_type: str = CONTINUOUS,
+    lb: numbers.Real | np.ndarray = 0.0,
+    ub: numbers.Real | np.ndarray = INF,
+) -> np.ndarray:
+    """
+    Declareert een blok variabelen
+    :param model: mip.Model of LiveModel
+    :param shape: vorm van het blok, bv (U,) of (U, CS)
+    :param var_type: CONTINUOUS, BINARY of INTEGER
+    :param lb: ondergrens, getal of array (wordt uitgebreid naar shape)
+    :param ub: bovengrens, getal of array (wordt uitgebreid naar shape)
+    :return: numpy-array (dtype object) met de variabelen
+    """
+    shape = (shape,) if isinstance(shape, int) else tuple(shape)
+    lbs = np.broadcast_to(np.asarray(lb, dtype=float), shape).ravel().tolist()
+    ubs = np.broadcast_to(np.asarray(ub, dtype=float), shape).ravel().tolist()
+    block = np.empty(len(lbs), dtype=object)
+    for i in range(len(lbs)):
+        block[i] = model.add_var(var_type=var_type, lb=lbs[i], ub=ubs[i])
+    return block.reshape(shape)
+
+
+def constr_family(
+    terms: list[tuple],
+    sense: str,
+    rhs: numbers.Real | np.ndarray = 0.0,
+    rows: np.ndarray | None = None,
+) -> list[LinExpr | None]:
+    """
+    Bouwt een familie constraints op, rij n:
+    som over de termen van som_k coeffs[n, k] * vars[n, k]  (sense)  rhs[n]
+    :param terms: lijst met (coeffs, vars); vars is een array met variabelen met
+        vorm (N,) of (N, K), coeffs een getal of array die naar die vorm wordt
+        uitgebreid. Bij vorm (N, K) wordt per rij over K gesommeerd.
+    :param sense: "<", ">" of "=" (zoals mip: LESS_OR_EQUAL, GREATER_OR_EQUAL, EQUAL)
+    :param rhs: rechterlid, getal of array met lengte N
+    :param rows: optioneel boolean-array met lengte N: alleen deze rijen
+    :return: per rij de constraint, None voor rijen die vervallen
+    """
+    num_rows = len(terms[0][1])
+    row_vars = [[] for _ in range(num_rows)]
+    row_coeffs = [[] for _ in range(num_rows)]
+    for coeffs, variables in terms:
+        variables = np.asarray(variables, dtype=object)
+        values = np.broadcast_to(np.asarray(coeffs, dtype=float), variables.shape)
+        width = variables.size // num_rows if num_rows > 0 else 0
+        variables = variables.reshape(num_rows, width).tolist()
+        values = values.reshape(num_rows, width).tolist()
+        for n in range(num_rows):
+            row_vars[n] += variables[n]
+            row_coeffs[n] += values[n]
+    rhs = np.broadcast_to(np.asarray(rhs, dtype=float), (num_rows,)).tolist()
+    selected = np.ones(num_rows, dtype=bool) if rows is None else rows
+    family = []
+    for n in range(num_rows):
+        expr = {}
+        if selected[n]:
+            for var, coeff in zip(row_vars[n], row_coeffs[n]):
+                if var is not None and coeff != 0:
+                    expr[var] = expr.get(var, 0.0) + coeff
+        if len(expr) == 0:
+            family.append(None)
+        else:
+            family.append(LinExpr(const=-rhs[n], sense=sense, expr=expr))
+    return family
+
+
+def add_constr_family(
+    model,
+    terms: list[tuple],
+    sense: str,
+    rhs: numbers.Real | np.ndarray = 0.0,
+    rows: np.ndarray | None = None,
+) -> int:
+    """
+    Voegt een familie constraints toe (zie constr_family)
+    :param model: mip.Model of LiveModel
+    :return: aantal toegevoegde constraints
+    """
+    return add_interleaved(model, [constr_family(terms, sense, rhs, rows)])
+
+
+def add_interleaved(model, families: list[list[LinExpr | None]]) -> int:
+    """
+    Voegt families over dezelfde intervallen toe, per interval de rijen van alle
+    families na elkaar: dezelfde volgorde als een lus over de intervallen.
+    De volgorde van de rijen heeft invloed op de zoekweg van de solver.
+    :param model: mip.Model of LiveModel
+    :param families: lijsten met constraints (constr_family), even lang
+    :return: aantal toegevoegde constraints
+    """
+    added = 0
+    for row in zip(*families):
+        for constr in row:
+            if constr is not None:
+                model.add_constr(constr)
+                added += 1
+    return added
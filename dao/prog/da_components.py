@@ -0,0 +1,304 @@
+"""
+Componenten van de optimaliseringsberekening.
+De berekening bestaat per apparaat (de devices in config/models/devices) uit
+drie fasen: modelbouw ("build"), uitlezen van de oplossing ("extract") en het
+aansturen van HA ("actuate"). ComponentPipeline houdt per component en fase de
+rekentijd bij en bij de modelbouw het aantal variabelen en constraints dat de
+component aan het model toevoegt. Zo is per apparaat te zien wat het kost.
+Zonnepanelen, batterijen, boiler, auto's, warmtepomp en apparaten zijn een
+Component: die worden alleen geregistreerd als het apparaat aanwezig is en
+meedoet. Een apparaat dat niet is geregistreerd voegt niets aan het model toe.
+"""
+
+import datetime as dt
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import pandas as pd
+from mip import xsum
+
+from dao.prog.da_live_model import LiveModel
+
+# de componenten in de volgorde van de berekening
+COMPONENTS = (
+    "solar",
+    "battery",
+    "boiler",
+    "ev",
+    "heating",
+    "machines",
+    "bounds",
+    "grid",
+)
+PHASES = ("build", "extract", "actuate")
+
+
+def model_size(model) -> tuple[int, int]:
+    """
+    :param model: mip.Model of LiveModel
+    :return: (aantal variabelen, aantal constraints) van de lopende opbouw
+    """
+    if isinstance(model, LiveModel):
+        return model.build_size()
+    return model.num_cols, model.num_rows
+
+
+@dataclass
+class CalcContext:
+    """
+    De invoer die de componenten delen: de intervallen van het model, prijzen,
+    prognoses en de berekening zelf (instellingen en HA)
+    """
+
+    calc: Any
+    inputs: Any
+    start_dt: dt.datetime
+    # bij testen: vaste start-SoC van batterijen en auto's
+    start_soc: float | None
+    start_ev_soc: float | None
+    tijd: list
+    interval_end: list
+    uur: list
+    pl: list
+    pt: list
+    p_avg: float
+    # basislast per interval in kWh
+    b_l: list
+    hour_fraction: list
+    interval_fraction: list
+    interval_steps: list
+    interval_start_step: list
+    # aantal basisintervallen in de horizon
+    horizon_len: int
+    prog_data: pd.DataFrame
+    # opwekking van de zonnepanelen per interval (ac en dc) in kWh
+    pv_org_ac: list
+    pv_org_dc: list
+    # opwekking per installatie aan de ac-kant per interval in kWh
+    solar_prod: list
+    ha_getter: Callable
+    bound_pass: Any = None
+    components: "ComponentPipeline" = None
+    # het net balanceert in het eerste interval (voor het aansturen)
+    grid_balance: bool = False
+
+    @property
+    def U(self) -> int:
+        return len(self.pl)
+
+    @property
+    def export_capped(self) -> list[bool]:
+        """
+        :return: per interval True als de prognose van de zonnepanelen na aftrek
+            van de basislast meer is dan de netaansluiting kan terugleveren: daar
+            kan de teruglevering worden begrensd
+        """
+        return [
+            self.pv_org_ac[u]
+            + self.pv_org_dc[u]
+            - self.b_l[u] * self.interval_fraction[u]
+            > self.calc.grid_max_power * self.hour_fraction[u]
+            for u in range(self.U)
+        ]
+
+
+class Component:
+    """
+    Een apparaat in de berekening. prepare leest de instellingen en HA en
+    bepaalt of het apparaat meedoet; alleen dan wordt de component geregistreerd.
+    build bouwt het deel van het model, extract leest na het oplossen de
+    resultaten uit en actuate stuurt het apparaat in HA aan.
+    """
+
+    name = ""
+
+    def prepare(self, ctx: CalcContext) -> bool:
+        """
+        :return: True als het apparaat meedoet in de berekening
+        """
+        return True
+
+    def build(self, model, ctx: CalcContext):
+        raise NotImplementedError
+
+    def consumption(self, u: int):
+        """
+        :return: netto afname van het apparaat van het net in interval u in kWh
+            (LinExpr)
+        """
+        return 0
+
+    def max_consumption(self, u: int) -> float:
+        """
+        :return: bovengrens van de afname in interval u in kWh
+        """
+        return 0.0
+
+    def max_production(self, u: int) -> float:
+        """
+        :return: bovengrens van de levering aan het net in interval u in kWh
+        """
+        return 0.0
+
+    def costs(self, model, ctx: CalcContext):
+        """
+        Voegt de kosten van het apparaat aan het model toe
+        :return: de kosten in euro voor de doelfunctie (LinExpr)
+        """
+        return 0
+
+    def warm_start(self, warm_start, ctx: CalcContext):
+        """
+        Geeft de binaire variabelen op voor de warme start (zie da_warmstart)
+        """
+
+    def setpoint(self, u: int, ctx: CalcContext) -> dict:
+        """
+        :return: de instellingen van interval u voor het noodplan (zie da_fallback)
+        """
+        return {}
+
+    def extract(self, solution, ctx: CalcContext):
+        """
+        Leest de resultaten uit de oplossing (da_results.Solution) en logt het
+        overzicht van het apparaat
+        """
+
+    def actuate(self, ha, ctx: CalcContext):
+        """
+        Stuurt het apparaat aan
+        :param ha: de berekening (DaBase), voor het lezen en schrijven van HA
+        """
+
+    def actuate_setpoint(self, ha, setpoint: dict):
+        """
+        Stuurt het apparaat aan met de instellingen van een interval uit het
+        bewaarde plan; werkt zonder model en zonder prepare
+        :param ha: de berekening (DaBase), voor het lezen en schrijven van HA
+        :param setpoint: de instellingen van het interval (zie setpoint en
+            FallbackPlan.current), zonder de sleutels van de component als het
+            apparaat bij de berekening van het plan niet meedeed
+        """
+
+
+class ComponentPipeline:
+    def __init__(self):
+        self.model = None
+        # per (component, fase): tijd, bij de modelbouw ook variabelen en constraints
+        self.stats: dict[tuple[str, str], dict] = {}
+        self._current = None
+        # de geregistreerde componenten in de volgorde van de berekening
+        self.registered: list[Component] = []
+
+    def register(self, component: Component, ctx: CalcContext) -> bool:
+        """
+        Registreert een component als het apparaat meedoet
+        :param component: de component
+        :param ctx: de invoer van de berekening
+        :return: True als de component is geregistreerd
+        """
+        if component.name not in COMPONENTS:
+            raise ValueError(f"Onbekende component {component.name}")
+        if not component.prepare(ctx):
+            return False
+        self.registered.append(component)
+        return True
+
+    def __iter__(self):
+        return iter(self.registered)
+
+    def get(self, name: str) -> Component | None:
+        """
+        :return: de geregistreerde component, None als het apparaat niet meedoet
+        """
+        return next((c for c in self.registered if c.name == name), None)
+
+    def names(self) -> tuple[str, ...]:
+        return tuple(component.name for component in self.registered)
+
+    def build(self, model, ctx: CalcContext):
+        """
+        Bouwt per geregistreerde component het deel van het model
+        """
+        self.model = model
+        for component in self.registered:
+            self.begin(component.name, model=model)
+            component.build(model, ctx)
+        self.end()
+
+    def costs(self, model, ctx: CalcContext):
+        """
+        :return: de som van de kosten van de geregistreerde componenten
+        """
+        terms = []
+        for component in self.registered:
+            self.begin(component.name, model=model)
+            terms.append(component.costs(model, ctx))
+        self.end()
+        return xsum(terms)
+
+    def extract(self, solution, ctx: CalcContext):
+        for component in self.registered:
+            self.begin(component.name, "extract")
+            component.extract(solution, ctx)
+        self.end()
+
+    def actuate(self, ha, ctx: CalcContext):
+        for component in self.registered:
+            self.begin(component.name, "actuate")
+            component.actuate(ha, ctx)
+        self.end()
+
+    def begin(self, name: str, phase: str = "build", model=None):
+        """
+        Sluit de lopende component af en begint de volgende
+        :param name: naam van de component, een van COMPONENTS
+        :param phase: een van PHASES
+        :param model: het model, alleen nodig bij de eerste component van de opbouw
+        """
+        if name not in COMPONENTS or phase not in PHASES:
+            raise ValueError(f"Onbekende component {name} of fase {phase}")
+        self.end()
+        if model is not None:
+            self.model = model
+        size = model_size(self.model) if phase == "build" else (0, 0)
+        self._current = (name, phase, time.perf_counter(), size)
+
+    def end(self):
+        """
+        Sluit de lopende component af
+        """
+        if self._current is None:
+            return
+        name, phase, start, size = self._current
+        self._current = None
+        stats = self.stats.setdefault((name, phase), {"time": 0.0})
+        stats["time"] += time.perf_counter() - start
+        if phase == "build":
+            new_size = model_size(self.model)
+            stats["variables"] = stats.get("variables", 0) + new_size[0] - size[0]
+            stats["constraints"] = stats.get("constraints", 0) + new_size[1] - size[1]
+
+    def report(self, phase: str) -> dict:
+        """
+        Logt per component de statistiek van een fase
+        :param phase: een van PHASES
+        :return: dict per component met de statistiek, voor calc_stats
+        """
+        self.end()
+        result = {}
+        for name in COMPONENTS:
+            stats = self.stats.get((name, phase))
+            if stats is None:
+                continue
+            result[name] = dict(stats)
+            line = f"{name:<9} {stats['time']:>6.3f} sec"
+            if phase == "build":
+                line += (
+                    f" {stats['variables']:>6} variabelen"
+                    f" {stats['constraints']:>6} constraints"
+                )
+            logging.info(f"Component {phase} {line}")
+        return result
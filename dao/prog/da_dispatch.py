@@ -0,0 +1,205 @@
+"""
+Snelle bijsturing tussen de optimaliseringsberekeningen (dispatcher).
+De optimalisering plant per interval het vermogen van het net en van de
+batterijen; tussen twee berekeningen wordt er niets gecorrigeerd voor afwijkingen
+van de prognoses (zon, basislast). De dispatcher draait in de scheduler iedere
+"dispatch interval" seconden, leest de actuele SoC van de batterijen en het
+actuele vermogen op het net en berekent zonder MIP nieuwe setpoints uit het
+bewaarde plan (zie da_fallback):
+- de batterijen volgen het geplande SoC-verloop: het verschil tussen de geplande
+  en de actuele SoC wordt over de rest van het interval weggewerkt;
+- het net vangt de afwijking op: het grid setpoint wordt het actuele verbruik
+  (zonder batterijen) plus het nieuwe vermogen van de batterijen.
+Een setpoint wordt alleen geschreven als het meer dan DISPATCH_DEADBAND W afwijkt
+van de vorige waarde.
+"""
+
+import datetime as dt
+import logging
+import threading
+import time
+
+from dao.prog.da_fallback import FallbackPlan
+
+# minimale wijziging in W voordat een setpoint opnieuw wordt geschreven
+DISPATCH_DEADBAND = 50
+# de SoC-afwijking wordt over minimaal deze tijd (sec) weggewerkt
+MIN_HORIZON_S = 300
+# onder dit vermogen (W) gaat de omvormer uit, zoals bij de optimalisering
+MIN_BATTERY_POWER = 20
+
+
+def dispatch_setpoints(
+    interval: dict,
+    moment: dt.datetime,
+    socs: list[float | None],
+    capacities: list[float],
+    max_charge: list[float],
+    max_discharge: list[float],
+    grid_power: float | None,
+    battery_power: list[float],
+    max_grid: float | None = None,
+) -> dict:
+    """
+    Berekent de setpoints voor het moment uit het geplande interval
+    :param interval: het interval uit het plan, met start, end, grid (W),
+        battery (W per batterij, + is laden) en soc_start/soc_end (% per batterij)
+    :param moment: het actuele tijdstip
+    :param socs: actuele SoC per batterij in %, None: onbekend
+    :param capacities: capaciteit per batterij in kWh
+    :param max_charge: maximaal laadvermogen per batterij in W
+    :param max_discharge: maximaal ontlaadvermogen per batterij in W
+    :param grid_power: actueel vermogen op het net in W (+ is afname),
+        None: niet gemeten
+    :param battery_power: het laatst ingestelde vermogen per batterij in W
+    :param max_grid: maximaal vermogen van de netaansluiting in W
+    :return: dict met grid (W) en battery (W per batterij)
+    """
+    start = dt.datetime.fromisoformat(interval["start"])
+    end = dt.datetime.fromisoformat(interval["end"])
+    span = max((end - start).total_seconds(), 1.0)
+    elapsed = min(max((moment - start).total_seconds(), 0.0), span)
+    remaining_h = max(span - elapsed, MIN_HORIZON_S) / 3600
+    soc_start = interval.get("soc_start", [])
+    soc_end = interval.get("soc_end", [])
+    planned = interval["battery"]
+    battery = []
+    for b, power in enumerate(planned):
+        if b < len(soc_start) and b < len(soc_end) and socs[b] is not None:
+            soc_plan = soc_start[b] + (soc_end[b] - soc_start[b]) * elapsed / span
+            # afwijking in Wh over de resterende tijd
+            power += (soc_plan - socs[b]) * capacities[b] * 10 / remaining_h
+        power = min(max(power, -max_discharge[b]), max_charge[b])
+        battery.append(0 if abs(power) <= MIN_BATTERY_POWER else round(power))
+    if grid_power is None:
+        # zonder meting: het plan plus de wijziging van de batterijen
+        grid = interval["grid"] + sum(battery) - sum(planned)
+    else:
+        # actueel verbruik zonder batterijen plus het nieuwe batterijvermogen
+        grid = grid_power - sum(battery_power) + sum(battery)
+    if max_grid is not None:
+        grid = min(max(grid, -max_grid), max_grid)
+    return {"grid": round(grid), "battery": battery}
+
+
+class Dispatcher:
+    def __init__(self, dabase, period: int, plan: FallbackPlan | None = None):
+        """
+        :param dabase: DaBase (HaClient) van de scheduler
+        :param period: tijd tussen twee bijsturingen in sec
+        :param plan: het bewaarde plan, default FallbackPlan()
+        """
+        self.dabase = dabase
+        self.period = period
+        self.plan = FallbackPlan() if plan is None else plan
+        # het plan-interval waarop de laatste setpoints zijn gebaseerd
+        self._plan_key = None
+        # de laatst geschreven setpoints
+        self.grid = None
+        self.battery = []
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def _read_float(self, entity_id: str | None) -> float | None:
+        if entity_id is None:
+            return None
+        try:
+            return float(self.dabase.read_state(entity_id).state)
+        except Exception as ex:
+            logging.debug(f"Dispatcher: {entity_id} niet gelezen: {ex}")
+            return None
+
+    def tick(self, moment: dt.datetime | None = None) -> dict | None:
+        """
+        Een keer bijsturen
+        :param moment: tijdstip, default nu
+        :return: de berekende setpoints, None als er geen plan is
+        """
+        moment = dt.datetime.now() if moment is None else moment
+        interval = self.plan.current(moment)
+        if interval is None:
+            return None
+        options = self.dabase.config.battery
+        grid_options = self.dabase.config.grid
+        if len(interval["battery"]) != len(options):
+            logging.debug("Dispatcher: het plan past niet bij de batterijen")
+            return None
+        key = (interval.get("saved"), interval["start"])
+        if key != self._plan_key:
+            # nieuw plan of nieuw interval: de optimalisering heeft het plan
+            # zelf al naar HA gestuurd
+            self._plan_key = key
+            self.grid = interval["grid"]
+            self.battery = list(interval["battery"])
+        socs = [self._read_float(option.entity_actual_level) for option in options]
+        max_charge = [
+            max((stage.power for stage in option.charge_stages), default=0)
+            for option in options
+        ]
+        max_discharge = [
+            max((stage.power for stage in option.discharge_stages), default=0)
+            for option in options
+        ]
+        setpoints = dispatch_setpoints(
+            interval,
+            moment,
+            socs,
+            [option.capacity for option in options],
+            max_charge,
+            max_discharge,
+            self._read_float(grid_options.entity_grid_power),
+            self.battery,
+            grid_options.max_power * 1000,
+        )
+        with self.dabase.write_lock:
+            for b, power in enumerate(setpoints["battery"]):
+                if abs(power - self.battery[b]) < DISPATCH_DEADBAND:
+                    continue
+                option = options[b]
+                off = abs(power) <= MIN_BATTERY_POWER
+                if option.entity_set_operating_mode is not None and off != (
+                    abs(self.battery[b]) <= MIN_BATTERY_POWER
+                ):
+                    self.dabase.select_option(
+                        option.entity_set_operating_mode,
+                        (
+                            option.entity_set_operating_mode_off
+                            if off
+                            else option.entity_set_operating_mode_on
+                        ),
+                    )
+                if option.entity_set_power_feedin is not None:
+                    self.dabase.set_value(option.entity_set_power_feedin, power)
+                self.battery[b] = power
+                logging.debug(f"Dispatcher: batterij {option.name} {power} W")
+            grid = setpoints["grid"]
+            if abs(grid - self.grid) >= DISPATCH_DEADBAND:
+                if grid_options.entity_grid_setpoint is not None:
+                    self.dabase.set_value(grid_options.entity_grid_setpoint, grid)
+                self.grid = grid
+                logging.debug(f"Dispatcher: grid set point {grid} W")
+        return setpoints
+
+    def run(self):
+        while not self._stop.is_set():
+            start = time.monotonic()
+            if self.dabase.active:
+                try:
+                    self.tick()
+                except Exception as ex:
+                    logging.warning(f"Fout in de dispatcher: {ex}")
+            self._stop.wait(max(0.0, self.period - (time.monotonic() - start)))
+
+    def start(self):
+        logging.info(f"Dispatcher gestart, iedere {self.period} sec")
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.run, name="dao_dispatch", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,936 @@
+"""
+Elektrische auto's in de optimaliseringsberekening.
+Per auto wordt uit HA gelezen of de auto thuis en ingeplugd is, het actuele en het
+gewenste laadniveau en het tijdstip waarop de auto klaar moet zijn. Het laden wordt
+ingepland met laadstappen (ampères) per interval; de lader wordt per interval
+helemaal, gedeeltelijk of niet ingeschakeld en ieder start/stop kost wat.
+"""
+
+import datetime as dt
+import logging
+import math
+
+import numpy as np
+from mip import (
+    xsum,
+    BINARY,
+    INTEGER,
+    CONTINUOUS,
+    EQUAL,
+    LESS_OR_EQUAL,
+    GREATER_OR_EQUAL,
+)
+
+from dao.prog.da_build import add_var_block, constr_family, add_interleaved
+from dao.prog.da_components import CalcContext, Component
+from dao.prog.da_horizon import step_to_interval
+
+
+class EvComponent(Component):
+    name = "ev"
+
+    def prepare(self, ctx: CalcContext) -> bool:
+        calc = ctx.calc
+        EV = len(calc.ev_options)
+        if EV == 0:
+            return False
+        U = ctx.U
+        tijd = ctx.tijd
+        interval_end = ctx.interval_end
+        interval_start_step = ctx.interval_start_step
+        start_dt = ctx.start_dt
+        ha_getter = ctx.ha_getter
+        # per auto (naam, entity schakelaar, entity ampère) voor de evaluatie na
+        # het versturen van de schrijfacties
+        self.ev_evaluation = []
+        self.actual_soc = []
+        self.wished_level = []
+        self.level_margin = []
+        self.ready_u = []
+        self.ev_ready_dt = []
+        self.intervals_needed = []
+        self.max_power = []
+        self.energy_needed = []
+        self.ev_plugged_in = []
+        self.ev_position = []
+        #  now_dt = dt.datetime.now()
+        self.ev_charge_stages = []
+        self.ampere_factor = []
+        self.ev_instant_charge = []
+        self.ev_switch_cost = []
+        self.ev_low_soc_cost = []
+        self.ev_capacity = []
+        self.ECS = []
+        for e in range(EV):
+            self.ev_capacity.append(calc.ev_options[e].capacity)
+            # plugged = calc.get_state(calc.ev_options["entity plugged in"]).state
+            try:
+                plugged_in = (
+                    calc.get_state(calc.ev_options[e].entity_plugged_in).state == "on"
+                )
+            except Exception as ex:
+                logging.error(f"EV: entity plugged in: {ex}")
+                plugged_in = False
+            self.ev_plugged_in.append(plugged_in)
+            try:
+                position = calc.get_state(calc.ev_options[e].entity_position).state
+            except Exception as ex:
+                logging.error(f"EV: entity position: {ex}")
+                position = "away"
+            self.ev_position.append(position)
+            try:
+                soc_state = float(
+                    calc.get_state(calc.ev_options[e].entity_actual_level).state
+                )
+            except Exception as ex:
+                logging.error(f"EV: entity actual level: {ex}")
+                soc_state = 100.0
+            if ctx.start_ev_soc is not None:
+                soc_state = ctx.start_ev_soc
+
+            # onderstaande regel eventueel voor testen
+            # soc_state = min(soc_state, 90.0)
+
+            self.actual_soc.append(soc_state)
+            entity_ev_instant_start = calc.ev_options[e].entity_instant_start
+            if entity_ev_instant_start is None:
+                instant_charge = False
+            else:
+                instant_charge = calc.get_state(entity_ev_instant_start).state == "on"
+            self.ev_instant_charge.append(instant_charge)
+            if instant_charge:
+                entity_ev_instant_level = calc.ev_options[e].entity_instant_level
+                if entity_ev_instant_level is None:
+                    wished_lvl = 100.0
+                else:
+                    wished_lvl = float(calc.get_state(entity_ev_instant_level).state)
+            else:
+                wished_lvl = float(
+                    calc.get_state(
+                        calc.ev_options[e].charge_scheduler.entity_set_level
+                    ).state
+                )
+            self.wished_level.append(wished_lvl)
+            self.ev_switch_cost.append(calc.ev_options[e].switch_cost)
+            self.ev_low_soc_cost.append(calc.ev_options[e].low_soc_cost)
+            self.level_margin.append(
+                calc.ev_options[e].charge_scheduler.level_margin
+                if calc.ev_options[e].charge_scheduler
+                else 0
+            )
+            ready_str = calc.get_state(
+                calc.ev_options[e].charge_scheduler.entity_ready_datetime
+            ).state
+            if len(ready_str) > 9:
+                # dus met datum en tijd
+                ready = dt.datetime.strptime(ready_str, "%Y-%m-%d %H:%M:%S")
+            else:
+                ready = dt.datetime.strptime(ready_str, "%H:%M:%S")
+                ready = dt.datetime(
+                    start_dt.year,
+                    start_dt.month,
+                    start_dt.day,
+                    ready.hour,
+                    ready.minute,
+                )
+                if (ready.hour == start_dt.hour and ready.minute < start_dt.minute) or (
+                    ready.hour < start_dt.hour
+                ):
+                    ready = ready + dt.timedelta(days=1)
+            hours_avail = max(0, (ready - start_dt).total_seconds() / 3600)
+            if instant_charge:
+                # instant charge has no real deadline, so bound hours_avail by the
+                # planning horizon instead of the (possibly stale) configured ready time
+                horizon_end = interval_end[U - 1]
+                hours_avail = max(0, (horizon_end - start_dt).total_seconds() / 3600)
+            # model_dump() is required here: after building the list, two computed
+            # keys ("power" and "accu_power") are injected into each dict at runtime
+            # based on ampere × voltage and efficiency.  These derived values don't
+            # exist on EVChargeStage, so plain mutable dicts are necessary.
+            ev_stages = [s.model_dump() for s in calc.ev_options[e].charge_stages]
+            if ev_stages[0]["ampere"] != 0.0:
+                ev_stages = [{"ampere": 0.0, "efficiency": 1}] + ev_stages
+            if instant_charge:
+                ev_stages = [ev_stages[0], ev_stages[-1]]
+            self.ev_charge_stages.append(ev_stages)
+            self.ECS.append(len(self.ev_charge_stages[e]))
+            max_ampere = self.ev_charge_stages[e][-1]["ampere"]
+            try:
+                max_ampere = float(max_ampere)
+            except ValueError:
+                max_ampere = 10
+            charge_three_phase = calc.ev_options[e].charge_three_phase.resolve(
+                ha_getter
+            )
+            if charge_three_phase:
+                ampere_f = 3
+            else:
+                ampere_f = 1
+            self.ampere_factor.append(ampere_f)
+            self.max_power.append(max_ampere * ampere_f * 230 / 1000)  # vermogen in kW
+            logging.info(f"Instellingen voor laden van EV: {calc.ev_options[e].name}")
+            logging.info(f"Direct laden is {'aan' if instant_charge else 'uit'}")
+            logging.info(f" Ampere  Effic. Grid kW Accu kW")
+            for cs in range(self.ECS[e]):
+                if not ("efficiency" in self.ev_charge_stages[e][cs]):
+                    self.ev_charge_stages[e][cs]["efficiency"] = 1
+                self.ev_charge_stages[e][cs]["power"] = (
+                    self.ev_charge_stages[e][cs]["ampere"]
+                    * 230
+                    * self.ampere_factor[e]
+                    / 1000
+                )
+                self.ev_charge_stages[e][cs]["accu_power"] = (
+                    self.ev_charge_stages[e][cs]["power"]
+                    * self.ev_charge_stages[e][cs]["efficiency"]
+                )
+                logging.info(
+                    f"{self.ev_charge_stages[e][cs]['ampere']:>7.2f} "
+                    f"{self.ev_charge_stages[e][cs]['efficiency']:>7.2f} "
+                    f"{self.ev_charge_stages[e][cs]['power']:>7.2f} "
+                    f"{self.ev_charge_stages[e][cs]['accu_power']:>7.2f}"
+                )
+
+            """
+            #test voor bug
+            self.ev_plugged_in.append(True)
+            self.wished_level.append(float(
+                calc.get_state(calc.ev_options[e]["charge scheduler"]["entity set level"]).state))
+            self.ev_position.append("home")
+            self.actual_soc.append(40)
+            self.max_power.append(10 * 230 / 1000)
+            #tot hier
+            """
+            logging.info(f"Capaciteit accu: {self.ev_capacity[e]} kWh")
+            logging.info(f"Maximaal laadvermogen: {self.max_power[e]} kW")
+            logging.info(f"Klaar met laden op: {ready.strftime('%d-%m-%Y %H:%M:%S')}")
+            logging.info(f"Huidig laadniveau: {self.actual_soc[e]} %")
+            logging.info(f"Gewenst laadniveau:{self.wished_level[e]} %")
+            logging.info(f"Marge voor het laden: {self.level_margin[e]} %")
+            logging.info(f"Locatie: {self.ev_position[e]}")
+            logging.info(f"Ingeplugged:{self.ev_plugged_in[e]}")
+            e_needed = (
+                self.ev_capacity[e] * (self.wished_level[e] - self.actual_soc[e]) / 100
+            )
+            max_possible = (
+                self.max_power[e]
+                * hours_avail
+                * self.ev_charge_stages[e][-1]["efficiency"]
+            )
+            if (
+                (e_needed > max_possible)
+                and self.ev_plugged_in[e]
+                and (self.ev_position[e] == "home")
+            ):
+                logging.warning(
+                    f"Er is te weinig tijd om tot {self.wished_level[e]}% te laden"
+                )
+                self.wished_level[e] = (
+                    self.actual_soc[e] + max_possible * 100 / self.ev_capacity[e]
+                )
+                logging.info(
+                    f"Bijgesteld gewenst laadniveau:{self.wished_level[e]:.1f} %"
+                )
+                e_needed = max_possible  # ev_capacity[e] * (wished_level[e] - actual_soc[e]) / 100
+            e_needed = max(0, e_needed)  # nooit minder dan 0
+            self.energy_needed.append(e_needed)  # in kWh
+            logging.info(f"Benodigde netto energie: {self.energy_needed[e]:.3f} kWh")
+            # uitgedrukt in aantal uren; bijvoorbeeld 1,5
+            time_needed = self.energy_needed[e] / (
+                self.max_power[e] * self.ev_charge_stages[e][-1]["efficiency"]
+            )
+            hrs_needed = math.floor(time_needed)
+            min_needed = math.ceil((time_needed - hrs_needed) * 60)
+            logging.info(f"Tijd nodig om te laden: {hrs_needed}:{min_needed} uur")
+            if instant_charge:
+                ready = start_dt + dt.timedelta(hours=hrs_needed, minutes=min_needed)
+            old_switch_state = calc.get_state(calc.ev_options[e].charge_switch).state
+            old_ampere_state = calc.get_state(
+                calc.ev_options[e].entity_set_charging_ampere
+            ).state
+            # afgerond naar boven in hele uren
+            int_needed = math.ceil(
+                time_needed if calc.interval == "1hour" else time_needed * 4
+            )
+            self.intervals_needed.append(int_needed)
+            logging.info(
+                f"Afgerond naar hele intervallen: {self.intervals_needed[e]} "
+                f"{calc.interval_name}"
+            )
+            logging.info(f"Stand laden schakelaar: {old_switch_state}")
+            logging.info(f"Stand aantal ampere laden: {old_ampere_state} A")
+            ready_index = U
+            reden = ""
+            if (self.wished_level[e] - self.level_margin[e]) <= self.actual_soc[e]:
+                reden = (
+                    f" werkelijk niveau ({self.actual_soc[e]:.1f}%) hoger is of gelijk aan "
+                    f"gewenst niveau ({self.wished_level[e]:.1f}% minus de marge "
+                    f"{self.level_margin[e]}%),"
+                )
+            if not (self.ev_position[e] == "home"):
+                reden = reden + " auto is niet huis,"
+            if not self.ev_plugged_in[e]:
+                reden = reden + " auto is niet ingeplugd,"
+            if not (tijd[0] < ready):
+                reden = reden + f" opgegeven tijdstip ({str(ready)}) is verouderd,"
+            if tijd[U - 1] < ready:
+                reden = reden + (
+                    f" opgegeven tijdstip ({str(ready)}) ligt voorbij de "
+                    f"planningshorizon ({tijd[U - 1]}),"
+                )
+            if (
+                self.ev_plugged_in[e]
+                and (self.ev_position[e] == "home")
+                and (self.wished_level[e] - self.level_margin[e] > self.actual_soc[e])
+                and (tijd[0] < ready)
+            ):
+                if instant_charge:
+                    ready_index = step_to_interval(
+                        interval_start_step, max(0, self.intervals_needed[e] - 1)
+                    )
+                else:
+                    for u in range(U):
+                        if interval_end[u] >= ready:
+                            ready_index = u
+                            break
+            if ready_index == U:
+                if len(reden) > 0:
+                    reden = reden[:-1] + "."
+                logging.info(f"Opladen wordt niet ingepland, omdat{reden}")
+            else:
+                logging.info(f"Opladen wordt ingepland.")
+            self.ready_u.append(ready_index)
+            self.ev_ready_dt.append(ready)
+        return True
+
+    def build(self, model, ctx: CalcContext):
+        calc = ctx.calc
+        EV = len(calc.ev_options)
+        U = ctx.U
+        tijd = ctx.tijd
+        hour_fraction = ctx.hour_fraction
+        # charger_on = [[model.add_var(var_type=BINARY) for u in range(U)] for e in range(EV)]
+        # charger_ampere = [[model.add_var(var_type=CONTINUOUS, lb=0,
+        #                     ub= charge_stages[e][-1]["ampere"])
+        #                     for cs in range(ECS[e])] for e in range(EV)]
+        self.stage_consumption = [
+            add_var_block(model, (self.ECS[e], U), ub=self.max_power[e])
+            for e in range(EV)
+        ]
+        self.stage_factor = [
+            add_var_block(model, (self.ECS[e], U), ub=1) for e in range(EV)
+        ]
+        self.stage_on = [
+            add_var_block(model, (self.ECS[e], U), var_type=BINARY, ub=1)
+            for e in range(EV)
+        ]
+
+        self.c_ev = [
+            add_var_block(model, U, ub=self.max_power[e]) for e in range(EV)
+        ]  # consumption charger
+
+        self.p_ev = [
+            add_var_block(model, U) for _ in range(EV)  # , ub=max_power[e])
+        ]  # consumption vermogen in kW
+
+        self.ev_accu_in = [
+            add_var_block(model, U, ub=self.max_power[e]) for e in range(EV)
+        ]  # load battery in kWh
+
+        self.ev_soc_kwh = [
+            add_var_block(model, U) for _ in range(EV)
+        ]  # soc in kWh na ieder interval
+
+        self.ev_is_on = [
+            [model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(EV)
+        ]
+
+        self.ev_is_off = [
+            [model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(EV)
+        ]
+
+        self.ev_is_partial = [
+            [model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(EV)
+        ]
+
+        self.ev_boundary_stop = [
+            [model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(EV)
+        ]
+
+        self.ev_partial_sum = [
+            model.add_var(var_type=INTEGER, lb=0) for e in range(EV)
+        ]  # sum is_partial
+
+        self.ev_boundary_sum = [
+            model.add_var(var_type=INTEGER, lb=0) for e in range(EV)
+        ]  # sum is_boundaru
+
+        self.ev_start_stops_sum = [
+            model.add_var(var_type=INTEGER, lb=0) for e in range(EV)
+        ]  # sum of ev starts
+
+        self.ev_delta_soc = [
+            add_var_block(model, U) for _ in range(EV)
+        ]  # delta soc in kWh between wished and actual
+
+        self.low_soc_penalty_int = [
+            add_var_block(model, U) for _ in range(EV)
+        ]  # penalty per interval in eur
+
+        ev_energy_slack = 0.001  # kWh
+        # minimale schakelduur voor de laadpaal (seconden). Korter is niet
+        # uitvoerbaar: een relais dat een paar seconden dichtvalt levert niets
+        # nuttigs op, en de stoptijd wordt afgerond op hele minuten.
+        ev_min_duty_s = 300.0
+
+        for e in range(EV):
+            if (self.energy_needed[e] > 0) and (self.ready_u[e] < U):
+                # kleinste hoeveelheid energie die met deze minimumduur nog
+                # geleverd kan worden (kWh). Is er minder nodig, dan zou de eis
+                # het model onoplosbaar maken en slaan we hem over.
+                min_stage_accu = min(
+                    self.ev_charge_stages[e][cs]["accu_power"]
+                    for cs in range(1, self.ECS[e])
+                    if self.ev_charge_stages[e][cs]["accu_power"] > 0
+                )
+                min_deliverable = min_stage_accu * ev_min_duty_s / 3600
+                apply_min_duty = (
+                    self.energy_needed[e] >= min_deliverable + ev_energy_slack
+                )
+                if not apply_min_duty:
+                    logging.info(
+                        f"EV {calc.ev_options[e].name}: minimale schakelduur van "
+                        f"{ev_min_duty_s:.0f} s wordt niet toegepast; er is maar "
+                        f"{self.energy_needed[e]:.3f} kWh nodig en de kortste "
+                        f"schakelactie levert al {min_deliverable:.3f} kWh."
+                    )
+
+                # laden, alles uitgedrukt in vermogen kW
+                # per interval tot en met de deadline een rij in iedere familie
+                n = self.ready_u[e] + 1
+                # uur-fractie per interval: het laatste interval loopt
+                # maar tot de deadline, de rest is een heel interval
+                hr_fraction = np.array(hour_fraction[:n])
+                hr_fraction[-1] = (
+                    self.ev_ready_dt[e] - tijd[n - 1]
+                ).total_seconds() / 3600
+
+                # stage_factor is een fractie van hr_fraction, niet van een
+                # heel uur. De minimale duty verschilt dus per interval. Is
+                # het interval zelf korter dan de minimumduur, dan wordt
+                # min_duty 1: helemaal aan of helemaal uit.
+                min_duty = np.zeros(n)
+                if apply_min_duty:
+                    pos = hr_fraction > 0
+                    min_duty[pos] = np.minimum(
+                        1.0, ev_min_duty_s / (hr_fraction[pos] * 3600)
+                    )
+
+                # per interval (rij) de variabelen per stap (kolom)
+                on = self.stage_on[e][:, :n].T
+                factor = self.stage_factor[e][:, :n].T
+                consumption = self.stage_consumption[e][:, :n].T
+                power = np.array([stage["power"] for stage in self.ev_charge_stages[e]])
+                accu_power = np.array(
+                    [stage["accu_power"] for stage in self.ev_charge_stages[e]]
+                )
+
+                families = []
+                for cs in range(self.ECS[e]):
+                    families += [
+                        constr_family(
+                            [(1, on[:, cs]), (-1, factor[:, cs])], LESS_OR_EQUAL, 0.9999
+                        ),
+                        constr_family(
+                            [(1, on[:, cs]), (-1, factor[:, cs])], GREATER_OR_EQUAL
+                        ),
+                    ]
+                    # een echte stap staat uit, of draait minstens
+                    # ev_min_duty_s seconden
+                    if cs >= 1:
+                        families.append(
+                            constr_family(
+                                [(1, factor[:, cs]), (-min_duty, on[:, cs])],
+                                GREATER_OR_EQUAL,
+                                rows=min_duty > 0,
+                            )
+                        )
+                for cs in range(self.ECS[e]):
+                    # daadwerkelijk ac verbruik (kWh) per stage =
+                    # vermogen van de stap x oplaadfactor (0..1) x uur-fractie
+                    families.append(
+                        constr_family(
+                            [
+                                (1, consumption[:, cs]),
+                                (-power[cs] * hr_fraction, factor[:, cs]),
+                            ],
+                            EQUAL,
+                        )
+                    )
+                    """
+                    # idem met schakelaar
+                    model += (
+                        self.stage_consumption[e][cs][u]
+                        <= self.max_power[e] * self.stage_on[e][cs][u]
+                    )
+                    """
+                # soc in kWh: begin-soc, daarna de soc van het vorige interval
+                soc_start = self.actual_soc[e] * self.ev_capacity[e] / 100
+                previous_soc = np.empty(n, dtype=object)
+                previous_soc[1:] = self.ev_soc_kwh[e][: n - 1]
+                families += [
+                    # som van alle oplaadfactoren is 1
+                    constr_family([(1, factor)], EQUAL, 1),
+                    # per interval mag maar een echte laadstap aan staan.
+                    # een lader kan niet tegelijk op 6 A en op 10 A staan.
+                    # stap 0 (0 A) doet hier niet mee: die vangt het deel van
+                    # het interval op waarin niet geladen wordt. zo blijft
+                    # deellading binnen een interval mogelijk.
+                    constr_family([(1, on[:, 1:])], LESS_OR_EQUAL, 1),
+                    constr_family([(1, self.c_ev[e][:n]), (-1, consumption)], EQUAL),
+                    # het vermogen per ev per uur
+                    constr_family(
+                        [(1, self.p_ev[e][:n]), (-power[1:], on[:, 1:])], EQUAL
+                    ),
+                    constr_family(
+                        [
+                            (1, self.ev_accu_in[e][:n]),
+                            (-accu_power * hr_fraction[:, None], factor),
+                        ],
+                        EQUAL,
+                    ),
+                    constr_family(
+                        [
+                            (1, self.ev_soc_kwh[e][:n]),
+                            (-1, previous_soc),
+                            (-1, self.ev_accu_in[e][:n]),
+                        ],
+                        EQUAL,
+                        np.where(np.arange(n) == 0, soc_start, 0.0),
+                    ),
+                    constr_family(
+                        [(1, self.ev_delta_soc[e][:n]), (1, self.ev_soc_kwh[e][:n])],
+                        EQUAL,
+                        self.wished_level[e] * self.ev_capacity[e] / 100,
+                    ),
+                    constr_family(
+                        [
+                            (1, self.low_soc_penalty_int[e][:n]),
+                            (
+                                -self.ev_low_soc_cost[e]
+                                * np.asarray(hour_fraction[:n]),
+                                self.ev_delta_soc[e][:n],
+                            ),
+                        ],
+                        EQUAL,
+                    ),
+                ]
+                add_interleaved(model, families)
+
+                eps = 0.0001
+                for u in range(U)[: self.ready_u[e] + 1]:
+                    # ev_is_off
+                    # model += sf >= ev_is_off[e][u]
+                    model += self.stage_factor[e][0][u] >= self.ev_is_off[e][u]
+                    model += (
+                        self.stage_factor[e][0][u]
+                        <= 1 - eps + eps * self.ev_is_off[e][u]
+                    )
+
+                    # ev_is_on
+                    # model += sf <= 1 - ev_is_on[e][u]
+                    model += self.stage_factor[e][0][u] <= (1 - self.ev_is_on[e][u])
+
+                    # ev_is_partial
+                    # model += sf >= eps * ev_is_partial[e][u]
+                    model += (
+                        self.stage_factor[e][0][u] >= eps * self.ev_is_partial[e][u]
+                    )
+
+                    # model += sf <= (1 - eps) * ev_is_partial[e][u] + ev_is_off[e][u]
+                    model += (
+                        self.stage_factor[e][0][u]
+                        <= (1 - eps) * self.ev_is_partial[e][u] + self.ev_is_off[e][u]
+                    )
+
+                    # precies één toestand
+                    model += (
+                        self.ev_is_on[e][u]
+                        + self.ev_is_off[e][u]
+                        + self.ev_is_partial[e][u]
+                    ) == 1
+
+                    if u == self.ready_u[e]:
+                        model += self.ev_boundary_stop[e][u] == self.ev_is_on[e][u]
+                    else:
+                        model += self.ev_boundary_stop[e][u] <= self.ev_is_on[e][u]
+                        model += self.ev_boundary_stop[e][u] <= self.ev_is_off[e][u + 1]
+                        model += self.ev_boundary_stop[e][u] >= (
+                            self.ev_is_on[e][u] + self.ev_is_off[e][u + 1] - 1
+                        )
+
+                # zonder stop-entiteit kan de lader niet halverwege een
+                # interval stoppen. interval 0 moet dan helemaal aan of
+                # helemaal uit zijn. alleen interval 0 telt, want alleen dat
+                # interval wordt echt naar de lader gestuurd; de rest van het
+                # plan wordt later opnieuw berekend.
+                can_stop = (not self.ev_instant_charge[e]) and (
+                    calc.ev_options[e].entity_stop_charging is not None
+                )
+                if (not can_stop) and (self.ready_u[e] > 0):
+                    model += self.ev_is_partial[e][0] == 0
+
+                model += self.ev_partial_sum[e] == xsum(
+                    self.ev_is_partial[e][u] for u in range(self.ready_u[e] + 1)
+                )
+                model += self.ev_boundary_sum[e] == xsum(
+                    self.ev_boundary_stop[e][u] for u in range(self.ready_u[e] + 1)
+                )
+
+                model += (
+                    self.ev_start_stops_sum[e]
+                    == (self.ev_partial_sum[e] + self.ev_boundary_sum[e]) * 2 - 2
+                )
+
+                # equality relaxed to a small epsilon band: energy_needed[e]
+                # is computed outside the model via `hours_avail` (raw
+                # timestamp subtraction), while the sum below is realized
+                # inside the model via the independently-derived
+                # hour_fraction[u] / hr_fraction chain. These normally agree
+                # to many decimal places but are not guaranteed bit-
+                # identical; pinning to an exact equality at the computed
+                # ceiling (max_possible, see energy_needed[e] derivation
+                # above) can turn a trivially-achievable target into a hard
+                # infeasibility from float noise alone. 1 Wh (0.001 kWh) is
+                # far below anything physically meaningful here.
+                model += (
+                    xsum(self.ev_accu_in[e][u] for u in range(self.ready_u[e] + 1))
+                    <= self.energy_needed[e] + ev_energy_slack
+                )
+                model += (
+                    xsum(self.ev_accu_in[e][u] for u in range(self.ready_u[e] + 1))
+                    >= self.energy_needed[e] - ev_energy_slack
+                )
+                for u in range(U)[self.ready_u[e] + 1 :]:
+                    model += self.c_ev[e][u] == 0
+                    model += self.p_ev[e][u] == 0
+                    model += self.ev_accu_in[e][u] == 0
+                    model += self.ev_is_partial[e][u] == 0
+                    model += self.ev_boundary_stop[e][u] == 0
+                    model += self.ev_delta_soc[e][u] == 0
+                    model += self.low_soc_penalty_int[e][u] == 0
+
+                """
+                max_beschikbaar = 0
+                for u in range(self.ready_u[e] + 1):
+                    model += self.c_ev[e][u] <= charger_on[e][u] * hour_fraction[u] * self.max_power[e]
+                    max_beschikbaar += hour_fraction[u] * self.max_power[e]
+                for u in range(self.ready_u[e] + 1, U):
+                    model += charger_on[e][u] == 0
+                    model += self.c_ev[e][u] == 0
+                model += xsum(charger_on[e][j] for j in range(self.ready_u[e] + 1)) == hours_needed[e]
+                model += xsum(self.c_ev[e][u] for u in range(self.ready_u[e] + 1)) == 
+                            min(max_beschikbaar, self.energy_needed[e])
+                """
+            else:
+                model += xsum(self.c_ev[e][u] for u in range(U)) == 0
+                for u in range(U):
+                    model += self.c_ev[e][u] == 0
+                    model += self.p_ev[e][u] == 0
+                    model += self.ev_accu_in[e][u] == 0
+                    model += self.ev_is_partial[e][u] == 0
+                    model += self.ev_boundary_stop[e][u] == 0
+                model += self.ev_start_stops_sum[e] == 0
+
+        # afgeleide grenzen: maximaal laadvermogen per interval
+        for e in range(EV):
+            for u in range(U):
+                ctx.bound_pass.tighten(
+                    self.c_ev[e][u], ub=self.max_power[e] * hour_fraction[u]
+                )
+                ctx.bound_pass.tighten(
+                    self.ev_accu_in[e][u], ub=self.max_power[e] * hour_fraction[u]
+                )
+                ctx.bound_pass.tighten(self.p_ev[e][u], ub=self.max_power[e])
+                for cs in range(self.ECS[e]):
+                    ctx.bound_pass.tighten(
+                        self.stage_consumption[e][cs][u],
+                        ub=self.ev_charge_stages[e][cs]["power"] * hour_fraction[u],
+                    )
+
+    def consumption(self, u: int):
+        return xsum(c_ev[u] for c_ev in self.c_ev)
+
+    def max_consumption(self, u: int) -> float:
+        return sum(c_ev[u].ub for c_ev in self.c_ev)
+
+    def costs(self, model, ctx: CalcContext):
+        EV = len(self.c_ev)
+        U = ctx.U
+        # switch cost per ev
+        self.switch_cost = [model.add_var(var_type=CONTINUOUS, lb=0) for _ in range(EV)]
+        for e in range(EV):
+            model += (
+                self.switch_cost[e]
+                == self.ev_switch_cost[e] * self.ev_start_stops_sum[e]
+            )
+
+        self.low_soc_penalty = [
+            model.add_var(var_type=CONTINUOUS, lb=0) for _ in range(EV)
+        ]
+        # sum of all penalty's
+
+        for e in range(EV):
+            model += self.low_soc_penalty[e] == xsum(
+                self.low_soc_penalty_int[e][u] for u in range(U)
+            )
+        return xsum(self.switch_cost[e] + self.low_soc_penalty[e] for e in range(EV))
+
+    def warm_start(self, warm_start, ctx: CalcContext):
+        interval_tijd = ctx.tijd[: ctx.U]
+        for e in range(len(self.c_ev)):
+            warm_start.add_group(f"ev_is_on_{e}", interval_tijd, self.ev_is_on[e])
+            for cs in range(self.ECS[e]):
+                warm_start.add_group(
+                    f"ev_stage_on_{e}_{cs}", interval_tijd, self.stage_on[e][cs]
+                )
+
+    def setpoint(self, u: int, ctx: CalcContext) -> dict:
+        ev_ampere = []
+        for e in range(len(self.c_ev)):
+            stages = [
+                cs
+                for cs in range(self.ECS[e])[1:]
+                if self.stage_factor[e][cs][u].x > 1e-4
+            ]
+            if len(stages) > 0:
+                cs = max(stages, key=lambda k: self.stage_factor[e][k][u].x)
+                ev_ampere.append(self.ev_charge_stages[e][cs]["ampere"])
+            else:
+                ev_ampere.append(0)
+        return {"ev_ampere": ev_ampere}
+
+    def extract(self, solution, ctx: CalcContext):
+        EV = len(self.c_ev)
+        self.c_ev_x = solution.get(self.c_ev, (EV, ctx.U)).sum(axis=0)
+        self.switch_cost_x = float(solution.get(self.switch_cost).sum())
+        self.low_soc_penalty_x = float(solution.get(self.low_soc_penalty).sum())
+
+    def actuate(self, ha, ctx: CalcContext):
+        EV = len(self.c_ev)
+        U = ctx.U
+        tijd = ctx.tijd
+        interval_end = ctx.interval_end
+        hour_fraction = ctx.hour_fraction
+        start_dt = ctx.start_dt
+        uur = ctx.uur
+        """
+        # build the first line (hour + amps)
+        amps = "    ".join(f"{self.ev_charge_stages[e][cs]['ampere']:4.1f}A" for cs in range(self.ECS[e]))
+        line1 = f"uur   {amps}"
+        logging.info(line1)
+            
+        # build the second header line
+        line2 = "    cons   power    on    off   part  bound"
+        logging.info(line2)
+            
+        # if you had subsequent columns per stop, build them the same way:
+        # cols = "    ".join(str(value) for value in some_list)
+        # logging.info(f"{some_label}   {cols}")            
+        """
+        for e in range(EV):
+            if self.ready_u[e] < U:
+                if ha.log_level <= logging.INFO:
+                    logging.info(f"Inzet-factor laden {ha.ev_options[e].name} per stop")
+                    amps = "         ".join(
+                        f"{self.ev_charge_stages[e][cs]['ampere']:4.1f}A"
+                        for cs in range(self.ECS[e])
+                    )
+                    line1 = f"  uur        {amps}   cons   power     on   off  part bound    soc   delta    cost"
+                    logging.info(line1)
+
+                    for u in range(self.ready_u[e] + 1):
+                        line2 = f"{uur[u]}  "
+                        stages = "   ".join(
+                            f"{self.stage_factor[e][cs][u].x:.4f}({self.stage_on[e][cs][u].x})"
+                            for cs in range(self.ECS[e])
+                        )
+                        line2 += stages + (
+                            f"  {self.c_ev[e][u].x:.3f}  {self.p_ev[e][u].x:.3f} "
+                            f"   {self.ev_is_on[e][u].x}"
+                            f"   {self.ev_is_off[e][u].x}"
+                            f"   {self.ev_is_partial[e][u].x}"
+                            f"   {self.ev_boundary_stop[e][u].x}"
+                            f"   {self.ev_soc_kwh[e][u].x:.3f}"
+                            f"   {self.ev_delta_soc[e][u].x:.3f}"
+                            f"   {self.low_soc_penalty_int[e][u].x:.3f}"
+                        )
+                        logging.info(line2)
+
+            start_ev_laden = stop_ev_laden = None
+            for u in range(U):
+                if self.c_ev[e][u].x > 0:
+                    if start_ev_laden is None:
+                        start_ev_laden = tijd[u]
+                else:
+                    if start_ev_laden is not None and self.c_ev[e][u - 1].x > 0:
+                        stop_ev_laden = tijd[u]
+            if start_ev_laden is not None:
+                if stop_ev_laden is None:
+                    stop_ev_laden = interval_end[U - 1]
+                logging.info(
+                    f"{ha.ev_options[e].name} wordt geladen tussen "
+                    f"{start_ev_laden} en {stop_ev_laden}"
+                )
+            else:
+                logging.info(f"Laden van {ha.ev_options[e].name} is niet ingepland")
+            logging.info(f"Aantal partial stops: {self.ev_partial_sum[e].x:2.0f}")
+            logging.info(f"Aantal boundary stops: {self.ev_boundary_sum[e].x:2.0f}")
+            logging.info(f"Aantal start/stops: {self.ev_start_stops_sum[e].x:2.0f}")
+            logging.info(f"Penalty per start/stop: {self.ev_switch_cost[e]:4.3f}")
+            logging.info(f"Totale switch kosten: {self.switch_cost[e].x:4.2f}")
+            entity_charge_switch = ha.ev_options[e].charge_switch
+            entity_charging_ampere = ha.ev_options[e].entity_set_charging_ampere
+            if self.ev_instant_charge[e]:
+                entity_stop_laden = None
+            else:
+                entity_stop_laden = ha.ev_options[e].entity_stop_charging
+            old_switch_state = ha.get_state(entity_charge_switch).state
+            old_ampere_state = ha.get_state(entity_charging_ampere).state
+            new_ampere_state = 0
+            new_switch_state = "off"
+            new_state_stop_laden = None  # "2000-01-01 00:00:00"
+
+            line = "  ".join(
+                f"{self.stage_factor[e][cs][0].x:.2f}" for cs in range(self.ECS[e])[1:]
+            )
+            logging.debug(line)
+            # na de exclusiviteits-constraint hoort er maar een laadstap
+            # actief te zijn. we nemen de stap met het grootste aandeel,
+            # niet de eerste. hele kleine waarden zijn rekenruis van de
+            # solver en negeren we.
+            stage_tol = 1e-4
+            active_stages = [
+                cs
+                for cs in range(self.ECS[e])[1:]
+                if self.stage_factor[e][cs][0].x > stage_tol
+            ]
+            if len(active_stages) > 1:
+                logging.warning(
+                    f"Meer dan een laadstap actief voor "
+                    f"{ha.ev_options[e].name}: {active_stages}. "
+                    f"De stap met het grootste aandeel wordt gebruikt."
+                )
+            if len(active_stages) > 0:
+                cs = max(active_stages, key=lambda k: self.stage_factor[e][k][0].x)
+                stage_fraction = self.stage_factor[e][cs][0].x
+                new_ampere_state = self.ev_charge_stages[e][cs]["ampere"]
+                if new_ampere_state > 0:
+                    new_switch_state = "on"
+                if (stage_fraction < 1) and (
+                    self.energy_needed[e] > (self.ev_accu_in[e][0].x + 0.01)
+                ):
+                    # stage_fraction is een deel van dit interval, niet van
+                    # een heel uur. daarom maal hour_fraction[0].
+                    new_ts = (
+                        start_dt.timestamp() + stage_fraction * hour_fraction[0] * 3600
+                    )
+                    stop_laden = dt.datetime.fromtimestamp(int(new_ts))
+                    new_state_stop_laden = stop_laden.strftime("%Y-%m-%d %H:%M")
+            ev_name = ha.ev_options[e].name
+            logging.info(f"Berekeningsuitkomst voor opladen van {ev_name}:")
+            logging.info(
+                f"- aantal ampere {new_ampere_state}A (was {old_ampere_state}A)"
+            )
+            logging.info(
+                f"- stand schakelaar '{new_switch_state}' (was '{old_switch_state}')"
+            )
+            if not (entity_stop_laden is None) and not (new_state_stop_laden is None):
+                logging.info(f"- stop laden op {new_state_stop_laden}")
+            logging.info(f"- positie: {self.ev_position[e]}")
+            logging.info(f"- ingeplugd: {self.ev_plugged_in[e]}")
+
+            if self.ev_position[e] == "home" and self.ev_plugged_in[e]:
+                if float(new_ampere_state) > 0.0:
+                    if old_switch_state == "off":
+                        if ha.debug:
+                            logging.info(
+                                f"Laden van {ev_name} zou zijn aangezet "
+                                f"met {new_ampere_state} ampere"
+                            )
+                        else:
+                            logging.info(
+                                f"Laden van {ev_name} aangezet "
+                                f"met {new_ampere_state} ampere via "
+                                f"'{entity_charging_ampere}'"
+                            )
+                            ha.set_value(entity_charging_ampere, new_ampere_state)
+                            ha.turn_on(entity_charge_switch)
+                            if not (entity_stop_laden is None) and not (
+                                new_state_stop_laden is None
+                            ):
+                                ha.call_service(
+                                    "set_datetime",
+                                    entity_id=entity_stop_laden,
+                                    datetime=new_state_stop_laden,
+                                )
+                    if old_switch_state == "on":
+                        if ha.debug:
+                            logging.info(
+                                f"Laden van {ev_name} zou zijn doorgegaan "
+                                f"met {new_ampere_state} A"
+                            )
+                        else:
+                            logging.info(
+                                f"Laden van {ev_name} is doorgegaan "
+                                f"met {new_ampere_state} A"
+                            )
+                            ha.set_value(entity_charging_ampere, new_ampere_state)
+                            if not (entity_stop_laden is None) and not (
+                                new_state_stop_laden is None
+                            ):
+                                ha.call_service(
+                                    "set_datetime",
+                                    entity_id=entity_stop_laden,
+                                    datetime=new_state_stop_laden,
+                                )
+                else:
+                    if old_switch_state == "on":
+                        if ha.debug:
+                            logging.info(f"Laden van {ev_name} zou zijn uitgezet")
+                        else:
+                            ha.set_value(entity_charging_ampere, 0)
+                            ha.turn_off(entity_charge_switch)
+                            logging.info(f"Laden van {ev_name} uitgezet")
+                            if not (entity_stop_laden is None) and not (
+                                new_state_stop_laden is None
+                            ):
+                                ha.call_service(
+                                    "set_datetime",
+                                    entity_id=entity_stop_laden,
+                                    datetime=new_state_stop_laden,
+                                )
+            else:
+                logging.info(f"{ev_name} is niet thuis of niet ingeplugd")
+            # evaluatie na het versturen van de schrijfacties
+            self.ev_evaluation.append(
+                (ev_name, entity_charge_switch, entity_charging_ampere)
+            )
+
+    def actuate_setpoint(self, ha, setpoint: dict):
+        for e, ampere in enumerate(setpoint.get("ev_ampere", [])[: len(ha.ev_options)]):
+            options = ha.ev_options[e]
+            if (
+                ha.get_state(options.entity_position).state != "home"
+                or ha.get_state(options.entity_plugged_in).state != "on"
+            ):
+                continue
+            if ha.debug:
+                logging.info(f"Laden van {options.name} zou zijn met {ampere} A")
+                continue
+            ha.set_value(options.entity_set_charging_ampere, ampere)
+            if ampere > 0:
+                ha.turn_on(options.charge_switch)
+            else:
+                ha.turn_off(options.charge_switch)
+            logging.info(f"Laden van {options.name} met {ampere} A")
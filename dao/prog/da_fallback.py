@@ -0,0 +1,106 @@
+"""
+Terugvalplan voor de optimaliseringsberekening.
+Na iedere geslaagde berekening worden de instellingen voor HA per interval
+bewaard (grid setpoint, vermogen per batterij, schakelaars van de zonnepanelen,
+boiler, warmtepomp met de stooklijn en laadstroom per auto); iedere component
+bewaart wat hij nodig heeft om het apparaat aan te sturen (zie
+Component.setpoint en Component.actuate_setpoint). Vindt de solver binnen de
+rekentijd geen oplossing, dan worden de instellingen van het bewaarde plan voor
+het actuele interval doorgezet.
+Het plan bevat ook het geplande SoC-verloop per batterij; daarmee stuurt de
+dispatcher (zie da_dispatch) tussen twee berekeningen bij, en de vingerafdruk van
+de invoer waarmee een ongewijzigde herberekening wordt overgeslagen
+(zie da_fingerprint).
+"""
+
+import datetime as dt
+import json
+import logging
+import os
+
+
+class FallbackPlan:
+    def __init__(
+        self,
+        file_name: str = "../data/fallback_plan.json",
+        max_age: dt.timedelta = dt.timedelta(hours=24),
+    ):
+        """
+        :param file_name: bestand waarin het plan wordt bewaard
+        :param max_age: een plan ouder dan max_age wordt niet meer gebruikt
+        """
+        self.file_name = file_name
+        self.max_age = max_age
+
+    def save(
+        self,
+        times: list,
+        ends: list,
+        setpoints: list[dict],
+        source: str,
+        fingerprint: dict | None = None,
+    ):
+        """
+        Bewaart het plan
+        :param times: lijst met de begintijdstippen (datetime) van de intervallen
+        :param ends: lijst met de eindtijdstippen (datetime) van de intervallen
+        :param setpoints: per interval een dict met de instellingen
+        :param source: "optimal" of "incumbent"
+        :param fingerprint: vingerafdruk van de invoer van de berekening
+        """
+        intervals = [
+            {"start": start.isoformat(), "end": end.isoformat(), **values}
+            for start, end, values in zip(times, ends, setpoints)
+        ]
+        data = {
+            "saved": dt.datetime.now().isoformat(),
+            "source": source,
+            "fingerprint": fingerprint,
+            "intervals": intervals,
+        }
+        try:
+            with open(self.file_name, "w") as f:
+                json.dump(data, f)
+        except Exception as ex:
+            logging.warning(f"Terugvalplan kan niet worden bewaard: {ex}")
+
+    def _load(self) -> dict | None:
+        if not os.path.isfile(self.file_name):
+            return None
+        try:
+            with open(self.file_name, "r") as f:
+                return json.load(f)
+        except Exception as ex:
+            logging.warning(f"Terugvalplan kan niet worden gelezen: {ex}")
+            return None
+
+    def fingerprint(self) -> dict | None:
+        """
+        :return: de vingerafdruk van de invoer van het bewaarde plan,
+            None als er geen plan of vingerafdruk is
+        """
+        data = self._load()
+        if data is None:
+            return None
+        return data.get("fingerprint")
+
+    def current(self, moment: dt.datetime) -> dict | None:
+        """
+        :param moment: tijdstip van de berekening
+        :return: de instellingen van het interval waarin moment valt,
+            None als er geen (bruikbaar) plan is
+        """
+        data = self._load()
+        if data is None:
+            return None
+        saved = dt.datetime.fromisoformat(data.get("saved", "2000-01-01T00:00:00"))
+        if moment - saved > self.max_age:
+            logging.info("Terugvalplan is te oud")
+            return None
+        for interval in data.get("intervals", []):
+            start = dt.datetime.fromisoformat(interval["start"])
+            end = dt.datetime.fromisoformat(interval["end"])
+            if start <= moment < end:
+                return {**interval, "saved": data.get("saved")}
+        logging.info(f"Terugvalplan bevat geen interval voor {moment}")
+        return None
@@ -0,0 +1,165 @@
+"""
+Vingerafdruk van de invoer van de optimaliseringsberekening.
+Bij iedere berekening wordt een vingerafdruk gemaakt van de invoer: de prijzen en
+prognoses per interval, de (afgeronde) toestand van batterijen, auto's en boiler,
+de via HA ingestelde waarden (FlexValues) en een hash van de instellingen. De
+vingerafdruk wordt met het plan bewaard (zie da_fallback).
+Is bij een volgende berekening vanuit de scheduler de invoer binnen de ingestelde
+toleranties gelijk gebleven, dan wordt het bewaarde plan voor het actuele
+interval opnieuw doorgezet en wordt de berekening overgeslagen.
+Prijzen en prognoses worden per tijdstip vergeleken: intervallen die inmiddels
+voorbij zijn tellen niet mee, een interval dat niet in het plan zat (bv. nieuwe
+prijzen voor morgen) leidt altijd tot een nieuwe berekening.
+"""
+
+import datetime as dt
+import hashlib
+import math
+from dataclasses import dataclass
+
+from pydantic import BaseModel
+
+from dao.prog.config.models.base import FlexValue
+
+
+@dataclass
+class Tolerances:
+    # prijzen in euro/kWh
+    price: float = 0.005
+    # prognoses in % van de grootste waarde van de prognose
+    prognose: float = 5.0
+    # SoC van batterijen en auto's in %
+    soc: float = 2.0
+    # temperatuur (boiler) in °C
+    temperature: float = 1.0
+    # een plan ouder dan max_age min wordt altijd opnieuw berekend
+    max_age: int = 60
+
+
+def vector(times, values, decimals: int = 4) -> dict[str, float]:
+    """
+    :param times: de tijdstippen (datetime of Timestamp)
+    :param values: de waarden, NaN wordt overgeslagen
+    :param decimals: aantal decimalen
+    :return: dict met per tijdstip (iso) de afgeronde waarde
+    """
+    result = {}
+    for time, value in zip(times, values):
+        if value is None or math.isnan(value):
+            continue
+        result[time.isoformat()] = round(float(value), decimals)
+    return result
+
+
+# verbindingen, zonder invloed op de berekening
+CONNECTION_FIELDS = {"homeassistant", "database_ha", "database_da"}
+
+
+def config_hash(config: BaseModel) -> str:
+    """
+    :return: sha256 van de instellingen, zonder de verbindingen
+    """
+    exclude = CONNECTION_FIELDS & set(type(config).model_fields)
+    dump = config.model_dump_json(exclude=exclude)
+    return hashlib.sha256(dump.encode()).hexdigest()
+
+
+def resolve_flex_values(config: BaseModel, ha_getter, path: str = "") -> dict:
+    """
+    Lost alle FlexValues in de instellingen op die naar een HA-entiteit verwijzen;
+    de vaste waarden zitten al in de hash van de instellingen
+    :param config: (deel van) de instellingen
+    :param ha_getter: functie entity_id -> state
+    :param path: pad naar config
+    :return: dict met per pad (bv. battery.0.upper_limit) de opgeloste waarde,
+        None als de entiteit niet kan worden gelezen
+    """
+    result = {}
+    if isinstance(config, FlexValue):
+        if config.is_entity_id(config.value):
+            try:
+                value = config.resolve(ha_getter)
+            except Exception:
+                value = None
+            if isinstance(value, float):
+                value = round(value, 3)
+            result[path] = value
+    elif isinstance(config, BaseModel):
+        for name in type(config).model_fields:
+            child = f"{path}.{name}" if path else name
+            result.update(resolve_flex_values(getattr(config, name), ha_getter, child))
+    elif isinstance(config, (list, tuple)):
+        for i, item in enumerate(config):
+            result.update(resolve_flex_values(item, ha_getter, f"{path}.{i}"))
+    return result
+
+
+def _compare_vectors(
+    name: str, old: dict, new: dict, tolerance: float, relative: bool = False
+) -> str | None:
+    if relative:
+        peak = max((abs(value) for value in old.values()), default=0.0)
+        tolerance = tolerance * peak / 100
+    for time, value in new.items():
+        if time not in old:
+            return f"{name} voor een nieuw interval ({time})"
+        if abs(value - old[time]) > tolerance + 1e-9:
+            return f"{name} om {time} gewijzigd ({old[time]} -> {value})"
+    return None
+
+
+def _compare_values(name: str, old: dict, new: dict, tolerance: float | None):
+    if old.keys() != new.keys():
+        return f"andere {name}"
+    for key, value in new.items():
+        previous = old[key]
+        if value == previous:
+            continue
+        if (
+            tolerance is not None
+            and isinstance(value, (int, float))
+            and isinstance(previous, (int, float))
+            and abs(value - previous) <= tolerance + 1e-9
+        ):
+            continue
+        return f"{name} {key} gewijzigd ({previous} -> {value})"
+    return None
+
+
+def compare_fingerprints(old: dict, new: dict, tolerances: Tolerances) -> str | None:
+    """
+    :param old: de vingerafdruk van het bewaarde plan
+    :param new: de vingerafdruk van de actuele invoer
+    :param tolerances: de toegestane afwijkingen
+    :return: de reden om opnieuw te rekenen, None als de invoer (binnen de
+        toleranties) niet is gewijzigd
+    """
+    age = dt.datetime.fromisoformat(new["time"]) - dt.datetime.fromisoformat(
+        old["time"]
+    )
+    if age > dt.timedelta(minutes=tolerances.max_age):
+        return f"het plan is ouder dan {tolerances.max_age} min"
+    if old["config"] != new["config"]:
+        return "instellingen gewijzigd"
+    for group, label, tolerance, relative in (
+        ("prices", "prijzen", tolerances.price, False),
+        ("prognoses", "prognoses", tolerances.prognose, True),
+    ):
+        if old[group].keys() != new[group].keys():
+            return f"andere {label}"
+        for name, values in new[group].items():
+            reason = _compare_vectors(
+                name, old[group][name], values, tolerance, relative
+            )
+            if reason is not None:
+                return reason
+    for group, name, tolerance in (
+        ("levels", "SoC", tolerances.soc),
+        ("temperatures", "temperatuur", tolerances.temperature),
+        ("states", "state", None),
+        ("flex", "instelling", None),
+    ):
+        reason = _compare_values(name, old[group], new[group], tolerance)
+        if reason is not None:
+            return reason
+    return None
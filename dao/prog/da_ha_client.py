@@ -0,0 +1,231 @@
+"""
+Client voor de REST-api van Home Assistant.
+Alle requests lopen over een blijvende (keep-alive) sessie, zodat niet voor
+iedere aanroep een nieuwe verbinding wordt opgezet.
+Bij het aansturen van HA na een berekening worden de schrijfacties (set_value,
+select_option, turn_on/off, set_datetime, set_state) verzameld in een batch en
+daarna achter elkaar verstuurd. De controle van de geschreven waarden gebeurt
+voor de hele batch met een keer /api/states ophalen, in plaats van een
+get_state na iedere set_value. Per entiteit worden rekentijd en fout bijgehouden.
+De REST-api van HA kent geen schrijfactie voor meerdere entiteiten tegelijk;
+de volgorde van de schrijfacties blijft daarom behouden.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Union
+
+import hassapi as hass
+import requests
+from hassapi.models import State, StateList
+
+
+@dataclass
+class HaWrite:
+    entity_id: str
+    # endpoint van de api, bv "services/input_number/set_value"
+    endpoint: str
+    data: dict
+    # waarde die na het schrijven wordt gecontroleerd, None: geen controle
+    expected: Union[int, float, str, None] = None
+    # rekentijd in sec, None: (nog) niet verstuurd
+    duration: float | None = None
+    error: str | None = None
+
+    @property
+    def service(self) -> str:
+        if self.endpoint.startswith("states/"):
+            return "set_state"
+        return self.endpoint.split("/")[-1]
+
+    def record(self) -> dict:
+        """
+        :return: dict voor calc_stats
+        """
+        return {
+            "entity_id": self.entity_id,
+            "service": self.service,
+            "time": self.duration,
+            "error": self.error,
+        }
+
+
+def state_matches(value: Union[int, float, str], state: str) -> bool:
+    """
+    :param value: de geschreven waarde
+    :param state: de state van de entiteit in HA
+    :return: True als de state de geschreven waarde heeft
+    """
+    if isinstance(value, (int, float)):
+        try:
+            return round(float(state), 5) == round(float(value), 5)
+        except ValueError:
+            return False
+    return state == value
+
+
+class HaClient(hass.Hass):
+    def __init__(self, hassurl: str, token: str, timeout: float = 10):
+        """
+        :param hassurl: url van HA, bv http://homeassistant:8123/
+        :param token: long lived access token
+        :param timeout: timeout van een request in sec
+        """
+        # blijvende sessie, ook voor de controle of de api draait
+        self.session = requests.Session()
+        self._batch: list[HaWrite] | None = None
+        self._batch_thread: int | None = None
+        # gedeeld met de dispatcher: schrijfacties van beide lopen niet door elkaar
+        self.write_lock = threading.Lock()
+        # de schrijfacties van de laatste batch
+        self.last_writes: list[HaWrite] = []
+        # de states na de laatste batch, per entity_id
+        self.written_states: dict[str, State] = {}
+        super().__init__(hassurl=hassurl, token=token, timeout=timeout)
+
+    def _get(self, endpoint: str, params: dict | None = None, **kwargs):
+        return self._process_response(
+            self.session.get(
+                url=self._get_url(endpoint),
+                headers=self._headers,
+                timeout=self._timeout,
+                params={**(params or {}), **kwargs} or None,
+                verify=self._verify,
+            )
+        )
+
+    def _post(self, endpoint: str, json: dict | None = None, **kwargs):
+        return self._process_response(
+            self.session.post(
+                url=self._get_url(endpoint),
+                headers=self._headers,
+                timeout=self._timeout,
+                json={**(json or {}), **kwargs} or None,
+                verify=self._verify,
+            )
+        )
+
+    def read_state(self, entity_id: str) -> State:
+        """
+        :return: de actuele state van een entiteit, altijd via de api
+        """
+        return State(**self._get(f"states/{entity_id}"))
+
+    def _batching(self) -> bool:
+        # alleen de thread die de batch begon schrijft in de batch
+        return self._batch is not None and self._batch_thread == threading.get_ident()
+
+    def state_written(self, entity_id: str, state: State):
+        """
+        Wordt aangeroepen met de teruggelezen state van een geschreven entiteit
+        """
+        pass
+
+    def call_service(self, service: str, entity_id: str, **kwargs) -> StateList:
+        if not self._batching():
+            return super().call_service(service, entity_id, **kwargs)
+        domain = entity_id.split(".")[0]
+        self._batch.append(
+            HaWrite(
+                entity_id,
+                f"services/{domain}/{service}",
+                {"entity_id": entity_id, **kwargs},
+            )
+        )
+        return StateList()
+
+    def set_state(self, entity_id: str, state, attributes: dict | None = None):
+        if not self._batching():
+            return super().set_state(entity_id, state, attributes)
+        data = {"state": state}
+        if attributes:
+            data["attributes"] = attributes
+        self._batch.append(HaWrite(entity_id, f"states/{entity_id}", data))
+        return None
+
+    def set_value(self, entity_id: str, value: Union[int, float, str]) -> StateList:
+        if self._batching():
+            domain = entity_id.split(".")[0]
+            self._batch.append(
+                HaWrite(
+                    entity_id,
+                    f"services/{domain}/set_value",
+                    {"entity_id": entity_id, "value": value},
+                    expected=value,
+                )
+            )
+            return StateList()
+        try:
+            result = super().set_value(entity_id, value)
+            # altijd actueel teruglezen
+            state_obj = self.read_state(entity_id)
+            self.state_written(entity_id, state_obj)
+            if not state_matches(value, state_obj.state):
+                raise ValueError
+        except Exception:
+            logging.error(f"Fout bij schrijven naar {entity_id}, waarde {value}")
+            raise
+        return result
+
+    def begin_batch(self):
+        """
+        Vanaf nu worden de schrijfacties naar HA verzameld tot send_batch
+        """
+        self._batch = []
+        self._batch_thread = threading.get_ident()
+
+    def send_batch(self) -> list[HaWrite]:
+        """
+        Verstuurt de verzamelde schrijfacties in volgorde en controleert ze daarna
+        met een keer /api/states ophalen. Een fout bij een entiteit wordt gelogd
+        en gaat niet ten koste van de andere schrijfacties.
+        :return: de schrijfacties met rekentijd en eventuele fout
+        """
+        writes = self._batch or []
+        self._batch = None
+        self._batch_thread = None
+        self.last_writes = writes
+        self.written_states = {}
+        if len(writes) == 0:
+            return writes
+        start = time.perf_counter()
+        with self.write_lock:
+            for write in writes:
+                write_start = time.perf_counter()
+                try:
+                    self._post(write.endpoint, json=write.data)
+                except Exception as ex:
+                    write.error = str(ex)
+                write.duration = time.perf_counter() - write_start
+        try:
+            self.written_states = {
+                s["entity_id"]: State(**s) for s in self._get("states")
+            }
+        except Exception as ex:
+            logging.warning(f"Geschreven waarden niet gecontroleerd: {ex}")
+        for write in writes:
+            state = self.written_states.get(write.entity_id)
+            if state is not None:
+                self.state_written(write.entity_id, state)
+            if write.error is None and write.expected is not None:
+                if state is not None:
+                    if not state_matches(write.expected, state.state):
+                        write.error = f"state is {state.state}"
+                elif self.written_states:
+                    write.error = "entiteit niet gevonden"
+            if write.error is not None:
+                logging.error(
+                    f"Fout bij schrijven naar {write.entity_id}, "
+                    f"waarde {write.data}: {write.error}"
+                )
+            logging.debug(
+                f"{write.service} {write.entity_id} in {write.duration:.3f} sec"
+            )
+        failed = sum(write.error is not None for write in writes)
+        logging.info(
+            f"{len(writes)} schrijfacties naar HA in "
+            f"{time.perf_counter() - start:.2f} sec, {failed} mislukt"
+        )
+        return writes
@@ -0,0 +1,794 @@
+"""
+De warmtepomp (ruimteverwarming) in de optimaliseringsberekening.
+De benodigde warmte volgt uit de gewogen graaddagen van vandaag en morgen, minus de
+al geproduceerde warmte. De warmtepomp wordt aan/uit, met een vermogensregeling of
+met een verschuiving van de stooklijn ingepland, eventueel in blokken met een
+minimale runlengte. Als de boiler via de warmtepomp wordt opgewarmd, kan de
+warmtepomp niet tegelijk ruimteverwarming leveren.
+"""
+
+import datetime as dt
+import logging
+import math
+
+import numpy as np
+import pandas as pd
+from mip import xsum, BINARY, INTEGER, CONTINUOUS
+
+from dao.prog.da_components import CalcContext, Component
+from dao.prog.da_solver import add_sos
+from dao.prog.utils import calc_adjustment_heatcurve
+
+
+class HeatingComponent(Component):
+    name = "heating"
+
+    def prepare(self, ctx: CalcContext) -> bool:
+        calc = ctx.calc
+        horizon_len = ctx.horizon_len
+        ha_getter = ctx.ha_getter
+        calc.hp_present = (
+            calc.heating_options.heater_present if calc.heating_options else False
+        )
+        if not calc.hp_present:
+            logging.info("Warmtepomp niet aanwezig - warmtepomp wordt niet ingepland")
+            calc.hp_enabled = False
+        else:
+            entity_hp_enabled = calc.heating_options.entity_hp_enabled
+            calc.hp_enabled = (entity_hp_enabled is None) or (
+                calc.get_state(entity_hp_enabled).state == "on"
+            )
+            if not calc.hp_enabled:
+                logging.info("Warmtepomp staat uit - warmtepomp wordt niet ingepland")
+        if calc.hp_enabled:
+            # degree days
+            degree_days_today = ctx.inputs.degree_days[0]
+            logging.info(f"Gewogen graaddagen vandaag: {degree_days_today:.1f} K.day")
+            if horizon_len > calc.steps_day:
+                degree_days_tomorrow = ctx.inputs.degree_days[1]
+                logging.info(
+                    f"Gewogen graaddagen morgen: {degree_days_tomorrow:.1f} K.day"
+                )
+            else:
+                degree_days_tomorrow = 0
+            degree_days = degree_days_today + degree_days_tomorrow
+            logging.info(f"Gewogen graaddagen totaal: {degree_days:.1f} K.day")
+
+            # degree days factor kWh th / K.day
+            degree_days_factor = calc.heating_options.degree_days_factor.resolve(
+                ha_getter
+            )
+            if degree_days_factor < 0.1:
+                logging.warning(
+                    f"Je graaddag factor ({degree_days_factor:.4f} kWh/K.day) "
+                    f"staat heel laag ingesteld. klopt dit wel?"
+                )
+            else:
+                logging.info(f"Degree days factor: {degree_days_factor:.1f} kWh/K.day")
+            logging.info(
+                f"Totaal benodigde warmte: {(degree_days * degree_days_factor):.1f} kWh"
+            )
+
+            # heat produced
+            entity_heat_produced = calc.heating_options.entity_heat_produced
+            if entity_heat_produced is not None:
+                heat_produced = float(calc.get_state(entity_heat_produced).state)
+            else:
+                heat_produced = 0
+            logging.info(f"Reeds geproduceerde warmte: {heat_produced:.1f} kWh")
+
+            # heat needed
+            self.heat_needed = max(
+                0.0, (degree_days * degree_days_factor) - heat_produced
+            )
+            logging.info(f"Nog benodigde warmte: {self.heat_needed:.1f} kWh")
+            if self.heat_needed <= 0:
+                logging.info(f"Geen warmte nodig: warmtepomp wordt niet ingepland")
+                calc.hp_enabled = False
+        return calc.hp_enabled
+
+    def build(self, model, ctx: CalcContext):
+        calc = ctx.calc
+        U = ctx.U
+        hour_fraction = ctx.hour_fraction
+        interval_steps = ctx.interval_steps
+        interval_start_step = ctx.interval_start_step
+        horizon_len = ctx.horizon_len
+        # de boiler kan via de warmtepomp worden opgewarmd
+        boiler = ctx.components.get("boiler")
+        boiler_heated_by_heatpump = (
+            boiler is not None and boiler.boiler_heated_by_heatpump
+        )
+        boiler_start = boiler.boiler_start if boiler else None
+        boiler_on = boiler.boiler_on if boiler else None
+        est_needed_intv = boiler.est_needed_intv if boiler else None
+        self.p_hp = None
+        # maximaal elektrisch en thermisch vermogen in kW, voor de afgeleide grenzen
+        self.hp_max_power = 0.0
+        self.hp_max_heat = 0.0
+        self.c_hp = [
+            model.add_var(var_type=CONTINUOUS, lb=0, ub=20) for _ in range(U)
+        ]  # Electricity consumption per hour
+        # "adjustment" : keuze uit "on/off" | "power" | "heating curve", default "power"
+        calc.hp_adjustment = (calc.heating_options.adjustment or "power").lower()
+        logging.info(f"Regeling warmtepomp: {calc.hp_adjustment}")
+
+        # heat demand: off, eco, max
+        entity_hp_heat_demand = calc.heating_options.entity_hp_heat_demand
+        # Is er warmte vraag - zo ja, dan inplannen vanaf interval 0
+        if entity_hp_heat_demand is None:
+            calc.hp_heat_demand = "eco"
+        else:
+            calc.hp_heat_demand = calc.get_state(entity_hp_heat_demand).state
+        if calc.hp_heat_demand == "on":
+            calc.hp_heat_demand = "max"
+        logging.info(f"Actuele warmtevraag: {calc.hp_heat_demand}")
+
+        # implement min_run_length
+        min_run_length = int(
+            calc.heating_options.min_run_length
+        )  # Minimum run lengte hp in uren - 1h als niet gedefinieerd
+        min_run_length = min(
+            max(min_run_length, 1), 5
+        )  # Alleen waarde tussen 1 en 5 uur mogelijk
+        logging.info(f"Minimale runlengte {min_run_length} uur")
+
+        # een of meer intervallen minder als boiler via wp gaat
+        if (
+            boiler_heated_by_heatpump
+            and not (boiler_start is None)
+            and boiler_start < U
+        ):
+            boiler_int = est_needed_intv[boiler_start] + 1
+        else:
+            boiler_int = 0
+
+        # geproduceerde warmte kWh per uur
+        self.h_hp = [
+            model.add_var(var_type=CONTINUOUS, lb=0, ub=10000) for _ in range(U)
+        ]
+
+        if calc.hp_adjustment == "on/off":
+            self.hp_on = [
+                model.add_var(var_type=BINARY) for _ in range(U)
+            ]  # If on the pump will run in that hour
+            hp_hours = 0
+            interval_avail = U - boiler_int - 1
+            hours_avail = math.floor(
+                interval_start_step[max(0, interval_avail)] * calc.interval_s / 3600
+            )
+            logging.info(f"Beschikbaar zijn: {hours_avail} uur")
+            if self.heat_needed > 0:
+                logging.info(f"On/off warmtepomp wordt ingepland")
+                avg_temp_today = calc.meteo.get_avg_temperature()
+                logging.info(f"Gem. buitentemperatuur vandaag: {avg_temp_today:.1f} °C")
+                if horizon_len > calc.steps_day:
+                    avg_temp_tomorrow = calc.meteo.get_avg_temperature(
+                        date=dt.datetime.combine(
+                            dt.date.today() + dt.timedelta(days=1),
+                            dt.datetime.min.time(),
+                        )
+                    )
+                    logging.info(
+                        f"Gem. buitentemperatuur morgen: {avg_temp_tomorrow:.1f} °C"
+                    )
+                    avg_temp = (avg_temp_today + avg_temp_tomorrow) / 2
+                else:
+                    avg_temp = avg_temp_today
+                entity_avg_temp = calc.heating_options.entity_avg_outside_temp
+                if entity_avg_temp is None:
+                    logging.warning(f"Geen entity om gem. temperatuur te exporteren")
+                else:
+                    calc.set_value(entity_avg_temp, round(avg_temp, 1))
+                logging.info(
+                    f"Voorspelde gemiddelde buiten temperatuur: {avg_temp:.1f} °C"
+                )
+
+                # Get COP and heatpump power from HA
+                entity_hp_cop = calc.heating_options.entity_hp_cop
+                if entity_hp_cop is not None:
+                    cop = float(calc.get_state(entity_hp_cop).state)
+                else:
+                    cop = 4
+                logging.info(f"COP: {cop:.1f}")
+                # Default COP if no entity from HA
+                entity_hp_power = calc.heating_options.entity_hp_power
+                if entity_hp_power is not None:
+                    hp_power = float(calc.get_state(entity_hp_power).state)
+                else:
+                    hp_power = 1.5  # Default power in kW if no entity from HA
+                if hp_power > 50:
+                    logging.warning(
+                        f"Het elektrisch-vermogen van de wp is te hoog: "
+                        f"{hp_power:.1f} kW-e"
+                        f"Voor de planning wordt uitgegaan van 1,5 kW-e"
+                    )
+                else:
+                    logging.info(f"Elektrisch vermogen: {hp_power:.1f} kW-e")
+                logging.info(f"Thermisch vermogen: {hp_power * cop:.1f} kW-th")
+                self.hp_max_power = hp_power
+                self.hp_max_heat = hp_power * cop
+
+                e_needed = self.heat_needed / cop
+                # Elektrical energy needed in kWh
+                hp_hours = math.ceil(e_needed / hp_power)
+                if hp_hours > hours_avail:
+                    self.heat_needed = hours_avail * hp_power * cop
+                hp_hours = min(hp_hours, hours_avail)
+
+                # Number of hours the heat pump still has to run
+                if hp_hours < min_run_length:
+                    # Ensure pump runs for at least min_run_length hours
+                    hp_hours = min(min_run_length, hours_avail)
+                hp_hours = math.ceil(hp_hours)
+                logging.info(f"Ingepland worden: {hp_hours} uur")
+
+                # constraint 6 : -> consumption
+                for u in range(U):
+                    model += self.c_hp[u] == hp_power * self.hp_on[u] * hour_fraction[u]
+                    model += self.h_hp[u] == self.c_hp[u] * cop
+                """        
+                # running block:
+                run_hours = report.get_heatpump_run_hours()
+                if run_hours < 0:
+                    logging.info(f"Kan starturen wp niet bepalen")
+                    if run_hours == -1:
+                        logging.info(f"geen wp-sensor(s) geconfigureerd bij 'report'")
+                    if run_hours == -2:
+                        logging.info(f"geen data in geconfigureerde wp-sensor(s)")
+                    first_block_len = min_run_length
+                    first_block_start = None
+                elif run_hours == 0:
+                    first_block_len = min_run_length
+                    first_block_start = None
+                elif run_hours < min_run_length:
+                    first_block_len = min_run_length - run_hours
+                    first_block_start = 0
+                else:  # run_hours >= min_run_length
+                    first_block_len = min_run_length
+                    first_block_start = None
+                if run_hours == 0:
+                    logging.info(f"Warmtepomp staat stil")
+                else:
+                    logging.info(f"Warmtepomp draait minimaal {run_hours} uur")
+                # number of bloks
+                self.blocks_num = math.ceil(hp_hours / min_run_length)
+                # length of lastblock
+                last_block_len = (hp_hours - first_block_len) % min_run_length
+                if last_block_len == 0:
+                    last_block_len = min_run_length
+
+                e_needed = hp_hours * hp_power
+                # Elektrical energy to be optimized in kWh
+                logging.info(
+                    f"Elektriciteit benodigd:{e_needed:.1f} kWh, cop: {cop:.1f}, "
+                    f"vermogen: {hp_power:.1f} kW, warmtepomp draait: {hp_hours} uur"
+                )
+                if last_block_len < min_run_length:
+                    logging.info(
+                        f"Aantal blokken: {self.blocks_num - 1} van {min_run_length} uur"
+                    )
+                    logging.info(f"Laatste blok: {last_block_len} uur")
+                    logging.info(f"Totaal aantal blokken: {self.blocks_num}")
+                else:
+                    logging.info(
+                        f"Aantal blokken: {self.blocks_num} van {min_run_length} uur"
+                    )
+
+                # alles omzetten naar het goede interval:
+                self.block_len = []
+                # eerste blok
+                self.block_len.append(first_block_len * 3600/calc.interval_s)
+                # tussenliggende blokken
+                for j in range(self.blocks_num)[1:-1]:
+                    self.block_len.append(min_run_length * 3600/calc.interval_s)
+                # laatste
+                self.block_len.append(last_block_len * 3600/calc.interval_s)
+
+                # constraint 1
+                # A−t ≤ (tmax−t)(1−Xt) for all t
+                # "vertaald": hp_start_index − u ≤ (U−u) * (1−hp_on[u]) for all u
+
+                self.hp_bl_on = [
+                    [model.add_var(var_type=BINARY) for _ in range(U)]
+                    for _ in range(self.blocks_num)
+                ]
+                self.hp_start_index = [
+                    model.add_var(var_type=INTEGER, lb=0, ub=U - 1)
+                    for _ in range(self.blocks_num)
+                ]
+                if first_block_start is not None:
+                    model += self.hp_start_index[0] == first_block_start * 3600/calc.interval_s
+                for j in range(self.blocks_num):
+                    for u in range(U):
+                        model += (self.hp_start_index[j] - u) <= (U - u) * (
+                            1 - self.hp_bl_on[j][u]
+                        )
+
+                # constraint 2
+                # t−(A+P) ≤ t(1−Xt) for all t
+                # "vertaald": u−(hp_start_index+run_length-1) ≤ u * (1−hp_bl_on[u]) for all u
+                for j in range(self.blocks_num):
+                    for u in range(U):
+                        model += (u - (self.hp_start_index[j] + self.block_len[j] - 1)) <= (
+                            u * (1 - self.hp_bl_on[j][u])
+                        )
+
+                # constraint 3
+                # ∑tXt = P+1
+                # "vertaald": xsum(hp_on[u] for all u) == min_run_length
+                for j in range(self.blocks_num):
+                    model += xsum(self.hp_bl_on[j][u] for u in range(U)) == self.block_len[j]
+
+                # aanvullend
+                # Constraint 4: blocks mogen niet overlappen
+                for j in range(self.blocks_num)[1:]:
+                    model += (
+                        self.hp_start_index[j - 1] + self.block_len[j - 1]
+                        <= self.hp_start_index[j]
+                    )
+
+                for u in range(U):
+                    # constraint 5: hp_bl_on -> hp_on
+                    model += self.hp_on[u] == xsum(
+                        self.hp_bl_on[j][u] for j in range(self.blocks_num)
+                    )
+                    # constraint 6 : -> consumption
+                    model += self.c_hp[u] == hp_power * self.hp_on[u] * hour_fraction[u]
+                    # constrant 7: ieder interval/uur of boiler of wp
+                    if boiler_heated_by_heatpump:
+                        model += self.hp_on[u] + boiler_on[u] <= 1
+                    """
+                # constraint 6 : -> consumption
+                for u in range(U):
+                    model += self.c_hp[u] == hp_power * self.hp_on[u] * hour_fraction[u]
+            else:
+                logging.info(f"Geen warmtebehoefte - warmtepomp wordt niet ingepland")
+                model += self.c_hp[0] == 0
+                model += self.hp_on[0] == 0
+            model += xsum(self.h_hp[u] for u in range(U)) >= self.heat_needed
+            # tot hier hp_adjustment == on/off
+        else:
+            # vanaf hier hp_adjustment == "power" or "heating curve"
+            logging.info(
+                f"Warmtepomp met power-regeling/stooklijnverschuiving wordt ingepland."
+            )
+            # model_dump() converts HeatingStage objects to plain dicts so that
+            # dict-subscript notation can be used throughout the MIP model build loop.
+            # Could be converted to attribute access (only ~8 downstream references),
+            # but kept consistent with the battery stage pattern above.
+            # The zero-power sentinel and sort order are guaranteed by
+            # HeatingConfig.validate_stages_sorted.
+            self.hp_stages = [s.model_dump() for s in calc.heating_options.stages]
+            S = len(self.hp_stages)
+            # p_hp[s][u]: het gevraagde vermogen in W in dat uur
+            self.p_hp = [
+                [
+                    model.add_var(
+                        var_type=CONTINUOUS, lb=0, ub=self.hp_stages[s]["max_power"]
+                    )
+                    for _ in range(U)
+                ]
+                for s in range(S)
+            ]
+
+            """
+            # schijven aan/uit, iedere schijf kan maar een keer in een interval
+            hp_s_on = [
+                [model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(S)
+            ]
+            """
+            # hp_s_w[s][u] : weegfactor per stage s per interval u
+            hp_s_w = [
+                [model.add_var(var_type=CONTINUOUS, lb=0, ub=1) for _ in range(S)]
+                for _ in range(U)
+            ]
+
+            self.hp_on = [
+                model.add_var(var_type=BINARY) for _ in range(U)
+            ]  # If on the pump will run in that hour
+
+            # verbruik per interval
+            for u in range(U):
+                # som van alle weegfactoren == 1
+                if boiler_heated_by_heatpump:
+                    model += xsum(hp_s_w[u][s] for s in range(S)) + boiler_on[u] == 1
+                else:
+                    model += xsum(hp_s_w[u][s] for s in range(S)) == 1
+                # verbruik in kWh is totaal vermogen in W/1000
+                model += (
+                    self.c_hp[u]
+                    == (xsum(self.p_hp[s][u] for s in range(S)))
+                    * hour_fraction[u]
+                    / 1000
+                )
+
+            # beschikbaar vermogen x aan/uit, want p_hpx[u] X hpx_on[u] kan niet
+            for u in range(U):
+                model += self.hp_on[u] == xsum(hp_s_w[u][s] for s in range(S)[1:])
+                for s in range(S):
+                    model += (
+                        self.p_hp[s][u] == self.hp_stages[s]["max_power"] * hp_s_w[u][s]
+                    )
+                """
+                # ieder interval/uur maar een aan
+                model += (xsum(hp_s_on[s][u] for s in range(S))) == 1
+                """
+                add_sos(
+                    model,
+                    [(hp_s_w[u][s], self.hp_stages[s]["max_power"]) for s in range(S)],
+                    2,
+                )
+
+                # geproduceerde warmte = vermogen in W * COP_schijf /1000 in kWh
+                model += (
+                    self.h_hp[u]
+                    == xsum(
+                        (self.p_hp[s][u] * self.hp_stages[s]["cop"] / 1000)
+                        for s in range(S)
+                    )
+                    * hour_fraction[u]
+                )
+
+            # max heat power in kW
+            max_heat_power = (
+                self.hp_stages[-1]["max_power"] * self.hp_stages[-1]["cop"] / 1000
+            )
+            self.hp_max_power = (
+                max(stage["max_power"] for stage in self.hp_stages) / 1000
+            )
+            self.hp_max_heat = (
+                max(stage["max_power"] * stage["cop"] for stage in self.hp_stages)
+                / 1000
+            )
+            logging.info(f"Maximaal warmteproducerend vermogen: {max_heat_power} kW")
+
+            max_heat_prod = sum(
+                max_heat_power * hour_fraction[u] for u in range(U - boiler_int)
+            )
+            # logging.info(
+            #    f"Maximaal te produceren hoeveelheid warmte: {max_heat_prod:.1f} kWh"
+            # )
+            min_heat_power = (
+                self.hp_stages[1]["max_power"] * self.hp_stages[1]["cop"] / 1000
+            )
+            logging.info(f"Minimaal warmteproducerend vermogen: {min_heat_power} kW")
+            min_heat_prod = sum(
+                min_heat_power * hour_fraction[u] for u in range(U - boiler_int)
+            )
+            hours_avail = (
+                interval_start_step[max(0, U - boiler_int)] * calc.interval_s / 3600
+            )
+            logging.info(f"Aantal beschikbare uren: {hours_avail:.2f}")
+            logging.info(
+                f"Maximaal te produceren hoeveelheid warmte: {max_heat_prod:.1f} kWh"
+            )
+            logging.info(
+                f"Minimaal te produceren hoeveelheid warmte: {min_heat_prod:.1f} kWh"
+            )
+
+            # som van alle geproduceerde warmte == benodigde warmte
+            self.heat_needed = min(self.heat_needed, max_heat_prod)
+            if self.heat_needed < min_heat_prod:
+                hp_hours = self.heat_needed / min_heat_power
+            else:
+                hp_hours = hours_avail * 0.9
+            hp_hours = math.floor(hp_hours)
+            logging.info(f"Aantal in te plannen uren: {hp_hours:.1f}")
+
+            model += xsum(self.h_hp[u] for u in range(U)) >= self.heat_needed
+
+        # tot hier alleen power en heat-curve regeling
+
+        # vanaf hier voor weer voor alle regelingen
+        # als er geen warmtevraag is eerste uur geen verbruik
+        if calc.hp_heat_demand == "off":
+            for u in range(1 if calc.interval == "1hour" else 4):
+                model += self.c_hp[u] == 0
+                model += self.hp_on[u] == 0
+        # als er dringende warmtevraag is eerste uur wel verbruik
+        elif calc.hp_heat_demand == "max":
+            for u in range(1 if calc.interval == "1hour" else 4):
+                model += self.hp_on[u] == 1
+
+        # running block:
+        run_hours = ctx.inputs.heatpump_run_hours
+        if run_hours < 0:
+            logging.info(f"Kan starturen wp niet bepalen")
+            if run_hours == -1:
+                logging.info(f"geen wp-sensor(s) geconfigureerd")
+            if run_hours == -2:
+                logging.info(f"geen data in geconfigureerde wp-sensor(s)")
+            first_block_len = min_run_length
+            first_block_start = None
+        elif run_hours == 0:
+            first_block_len = min_run_length
+            first_block_start = None
+        elif run_hours < min_run_length and calc.hp_heat_demand in ["eco", "max"]:
+            first_block_len = max(1, min_run_length - run_hours)
+            first_block_start = 0
+        else:  # run_hours >= min_run_length
+            first_block_len = min_run_length
+            first_block_start = None
+        if calc.hp_heat_demand == "max":
+            first_block_start = 0
+        if run_hours == 0:
+            logging.info(f"Warmtepomp staat stil")
+        elif run_hours > 0:
+            logging.info(f"Warmtepomp draait al minimaal {run_hours} uur")
+        # number of bloks
+        if hp_hours / hours_avail > 0.8:
+            self.blocks_num = 0  # dus geen block-optimalisering
+        else:
+            if calc.hp_adjustment == "on/off":
+                self.blocks_num = 1 + math.ceil(
+                    (hp_hours - first_block_len) / min_run_length
+                )
+            else:
+                self.blocks_num = math.ceil(
+                    min(
+                        hours_avail / (3 + min_run_length),
+                        hp_hours / min_run_length,
+                    )
+                )
+                # blocks_num = math.ceil(max(hours_avail / 4, hp_hours / min_run_length))
+        # if calc.hp_adjustment!="on/off":
+        if self.blocks_num == 0:
+            logging.info(
+                f"Omdat de wp meer dan 75% van de uren draait wordt de wp zonder "
+                f'"min_run_length"={min_run_length} ingepland.'
+            )
+        else:
+            # block-optimalisering
+            if calc.hp_adjustment == "on/off":
+                min_run_length = max(
+                    min_run_length, math.floor(hp_hours / self.blocks_num)
+                )
+            else:
+                min_run_length = max(
+                    min_run_length, math.floor(hours_avail / self.blocks_num)
+                )
+            # length of lastblock
+            last_block_len = (hp_hours - first_block_len) % min_run_length
+            if last_block_len == 0:
+                last_block_len = min_run_length
+            logging.info(f"Eerste blok van {first_block_len} uur")
+            if last_block_len < min_run_length:
+                logging.info(
+                    f"Tussenin {self.blocks_num - 2} blokken van {min_run_length} uur"
+                )
+                logging.info(f"Laatste blok van {last_block_len:.1f} uur")
+            else:
+                logging.info(
+                    f"Dan nog {self.blocks_num - 1} blokken van {min_run_length} uur"
+                )
+            logging.info(f"Totaal aantal blokken: {self.blocks_num}")
+
+            # Add the contraints
+            """ 
+            https://math.stackexchange.com/questions/4929841/consecutive-binary-block-in-mip-modeling-with-variable-length
+            constr 1
+            A−t ≤ (tmax−t)(1−Xt) for all t
+            hp_start_index − u ≤ (U−u) * (1−hp_on[u]) for all u
+            constr 2
+            t−(A+P) ≤ t(1−Xt) for all t
+            u−(hp_start_index+run_length-1) ≤ u * (1−hp_on[u]) for all u
+            constr 3
+            ∑tXt = P+1
+            xsum(hp_on[u] for u in range(U)) == run_length
+            """
+
+            # alles omzetten naar het goede interval:
+            self.block_len = []
+            # eerste blok
+            self.block_len.append(int(first_block_len * 3600 / calc.interval_s))
+            # tussenliggende blokken
+            for _ in range(self.blocks_num)[1:-1]:
+                self.block_len.append(int(min_run_length * 3600 / calc.interval_s))
+            # laatste
+            self.block_len.append(int(last_block_len * 3600 / calc.interval_s))
+
+            # constraint 1
+            # A−t ≤ (tmax−t)(1−Xt) for all t
+            # "vertaald": hp_start_index − u ≤ (U−u) * (1−hp_on[u]) for all u
+
+            self.hp_bl_on = [
+                [model.add_var(var_type=BINARY) for _ in range(U)]
+                for _ in range(self.blocks_num)
+            ]
+            # start en lengte van de blokken worden uitgedrukt in basisintervallen,
+            # t = interval_start_step[u] is het begin van interval u
+            self.hp_start_index = [
+                model.add_var(var_type=INTEGER, lb=0, ub=horizon_len - 1)
+                for _ in range(self.blocks_num)
+            ]
+            if first_block_start is not None:
+                model += (
+                    self.hp_start_index[0] == first_block_start * 3600 / calc.interval_s
+                )
+            for j in range(self.blocks_num):
+                for u in range(U):
+                    t = interval_start_step[u]
+                    model += (self.hp_start_index[j] - t) <= (horizon_len - t) * (
+                        1 - self.hp_bl_on[j][u]
+                    )
+
+            # constraint 2
+            # t−(A+P) ≤ t(1−Xt) for all t
+            # "vertaald": u−(hp_start_index+run_length-1) ≤ u * (1−hp_bl_on[u]) for all u
+            # met samengevoegde intervallen: het einde van interval u
+            for j in range(self.blocks_num):
+                for u in range(U):
+                    t_end = interval_start_step[u + 1] - 1
+                    model += (
+                        t_end - (self.hp_start_index[j] + self.block_len[j] - 1)
+                    ) <= (horizon_len * (1 - self.hp_bl_on[j][u]))
+
+            # constraint 3
+            # ∑tXt = P+1
+            # "vertaald": xsum(hp_on[u] for all u) == min_run_length
+            for j in range(self.blocks_num):
+                model += (
+                    xsum(self.hp_bl_on[j][u] * interval_steps[u] for u in range(U))
+                    == self.block_len[j]
+                )
+
+            # aanvullend
+            # Constraint 4: blocks mogen niet overlappen
+            for j in range(self.blocks_num)[1:]:
+                model += (
+                    self.hp_start_index[j - 1] + self.block_len[j - 1]
+                    <= self.hp_start_index[j]
+                )
+
+            for u in range(U):
+                # constraint 5: hp_bl_on -> hp_on
+                model += self.hp_on[u] == xsum(
+                    self.hp_bl_on[j][u] for j in range(self.blocks_num)
+                )
+
+        # constrant 7: ieder interval/uur of boiler of wp
+        for u in range(U):
+            if boiler_heated_by_heatpump:
+                model += self.hp_on[u] + boiler_on[u] <= 1
+
+        # afgeleide grenzen
+        for u in range(U):
+            ctx.bound_pass.tighten(
+                self.c_hp[u], ub=self.hp_max_power * hour_fraction[u]
+            )
+            ctx.bound_pass.tighten(self.h_hp[u], ub=self.hp_max_heat * hour_fraction[u])
+
+    def consumption(self, u: int):
+        return self.c_hp[u]
+
+    def max_consumption(self, u: int) -> float:
+        return self.c_hp[u].ub
+
+    def warm_start(self, warm_start, ctx: CalcContext):
+        warm_start.add_group("hp_on", ctx.tijd[: ctx.U], self.hp_on)
+
+    def setpoint(self, u: int, ctx: CalcContext) -> dict:
+        return {
+            "hp_on": round(self.hp_on[u].x) == 1,
+            "hp_power": self.c_hp[u].x / ctx.hour_fraction[u],
+            "hp_adjustment": ctx.calc.hp_adjustment,
+            # prijzen voor de aanpassing van de stooklijn
+            "price": ctx.pl[u],
+            "price_avg": ctx.p_avg,
+        }
+
+    def extract(self, solution, ctx: CalcContext):
+        calc = ctx.calc
+        U = ctx.U
+        uur = ctx.uur
+        pl = ctx.pl
+        self.c_hp_x = solution.get(self.c_hp)
+        c_hp_x = self.c_hp_x
+        logging.info("Inzet warmtepomp")
+        if self.blocks_num > 0:
+            logging.info("Blokken:")
+        for j in range(self.blocks_num):
+            logging.info(
+                f"Bloknr {j} start {int(self.hp_start_index[j].x)} "
+                f"lengte {self.block_len[j]}"
+                f" laatste {int(self.hp_start_index[j].x) + self.block_len[j] - 1}"
+            )
+        logging.info(f"u   uur   tar    hp_s_on hp_on heat cons")
+        for u in range(U):
+            sum_hp_bl_on = 0
+            for j in range(self.blocks_num):
+                sum_hp_bl_on += self.hp_bl_on[j][u].x
+            logging.info(
+                f"{u}   {uur[u]} {pl[u]:6.4f}  {sum_hp_bl_on:6.2f} {int(self.hp_on[u].x)}"
+                f"   {self.h_hp[u].x:6.2f}  {self.c_hp[u].x:6.2f}"
+            )
+        if calc.hp_adjustment != "on/off":
+            df_hp = pd.DataFrame(columns=["uur", "tar"])
+            df_hp["uur"] = uur
+            df_hp["tar"] = pl
+            p_hp_x = solution.get(self.p_hp, (len(self.hp_stages), U))
+            for s in range(len(self.hp_stages)):
+                df_hp["p" + str(s)] = p_hp_x[s].astype(np.int32)
+            df_hp["heat"] = solution.get(self.h_hp)
+            df_hp["cons"] = c_hp_x
+            pd.options.display.float_format = "{:7.3f}".format
+            logging.info(f"\n{df_hp.to_string(index=False)}\n")
+
+            """
+            logging.info(
+                f"u     tar     p0     p1     p2     p3     p4     p5     p6     p7   "
+                f"heat   cons"
+            )
+            for u in range(U):
+                logging.info(
+                    f"{uur[u]} {pl[u]:6.4f} {self.p_hp[0][u].x:6.0f} {self.p_hp[1][u].x:6.0f} "
+                    f"{self.p_hp[2][u].x:6.0f} {self.p_hp[3][u].x:6.0f} {self.p_hp[4][u].x:6.0f} "
+                    f"{self.p_hp[5][u].x:6.0f} {self.p_hp[6][u].x:6.0f} {self.p_hp[7][u].x:6.0f} "
+                    f"{self.h_hp[u].x:6.2f} {self.c_hp[u].x:6.2f}"
+                 )
+            """
+
+    def actuate(self, ha, ctx: CalcContext):
+        self.actuate_setpoint(ha, self.setpoint(0, ctx))
+
+    def actuate_setpoint(self, ha, setpoint: dict):
+        if "hp_on" not in setpoint:
+            return
+        hp_adjustment = setpoint.get("hp_adjustment", "power")
+        # als aan/uit entity er is altijd schakelen
+        entity_hp_switch = ha.heating_options.entity_hp_switch
+        if entity_hp_switch is None:
+            if hp_adjustment == "on/off":
+                logging.warning(f"Geen entity om warmtepomp in/uit te schakelen")
+        else:
+            logging.debug(f"Warmtepomp entity: {entity_hp_switch}")
+            switch_state = ha.get_state(entity_hp_switch).state
+            if setpoint["hp_on"]:
+                if switch_state == "off":
+                    if ha.debug:
+                        logging.info(f"Warmtepomp zou zijn ingeschakeld")
+                    else:
+                        logging.info(f"Warmtepomp ingeschakeld")
+                        ha.turn_on(entity_hp_switch)
+            else:
+                if switch_state == "on":
+                    if ha.debug:
+                        logging.info(f"Warmtepomp zou zijn uitgeschakeld")
+                    else:
+                        logging.info(f"Warmtepomp uitgeschakeld")
+                        ha.turn_off(entity_hp_switch)
+        #  power, als entity er is altijd doorzetten
+        entity_hp_power = ha.heating_options.entity_hp_power
+        if entity_hp_power is not None and hp_adjustment != "on/off":
+            #  elektrisch vermogen in kW
+            hp_power = setpoint["hp_power"]
+            if ha.debug:
+                logging.info(
+                    f"Elektrisch vermogen warmtepomp zou zijn ingesteld "
+                    f"op {hp_power:<0.0f} kW"
+                )
+            else:
+                ha.set_value(entity_hp_power, hp_power)
+                logging.info(
+                    f"Elektrisch vermogen warmtepomp ingesteld "
+                    f"op {hp_power:<0.3f} kW"
+                )
+
+        #  curve adjustment
+        entity_curve_adjustment = ha.heating_options.entity_adjust_heating_curve
+        if entity_curve_adjustment is not None and "price" in setpoint:
+            old_adjustment = float(ha.get_state(entity_curve_adjustment).state)
+            #  adjustment factor (K/%) bijv 0.4 K/10% = 0.04
+            adjustment_factor = ha.heating_options.adjustment_factor or 0.0
+            adjustment = calc_adjustment_heatcurve(
+                setpoint["price"],
+                setpoint["price_avg"],
+                adjustment_factor,
+                old_adjustment,
+            )
+            if ha.debug:
+                logging.info(f"Aanpassing stooklijn zou zijn: {adjustment:<0.2f}")
+            else:
+                logging.info(f"Aanpassing stooklijn: {adjustment:<0.2f}")
+                ha.set_value(entity_curve_adjustment, adjustment)
@@ -0,0 +1,166 @@
+"""
+Planningshorizon met variabele resolutie.
+De eerste uren van de horizon worden met de volledige resolutie (interval) berekend,
+daarna worden de basisintervallen samengevoegd tot blokken van bijv. een uur.
+De beslissingen voor nu veranderen daar nauwelijks door, het model wordt wel veel kleiner.
+Alle functies werken met "steps": het aantal basisintervallen per interval van het model.
+"""
+
+import bisect
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+COARSE_INTERVAL_S = {"1hour": 3600, "2hour": 7200, "3hour": 10800}
+
+
+def horizon_steps(
+    tijd: list,
+    interval_s: int,
+    fine_hours: int | None,
+    coarse_s: int,
+) -> list[int]:
+    """
+    Bepaalt per interval van het model het aantal basisintervallen
+    :param tijd: begintijdstippen van de basisintervallen
+    :param interval_s: lengte van een basisinterval in seconden
+    :param fine_hours: aantal uren met volledige resolutie, None: hele horizon
+    :param coarse_s: lengte van een blok na de fijne horizon in seconden,
+        blokken worden uitgelijnd op hele blokken vanaf middernacht
+    :return: lijst met het aantal basisintervallen per interval
+    """
+    if fine_hours is None or coarse_s <= interval_s or len(tijd) == 0:
+        return [1] * len(tijd)
+    fine_end = tijd[0] + dt.timedelta(hours=fine_hours)
+    steps = []
+    block = None
+    for moment in tijd:
+        if moment < fine_end:
+            steps.append(1)
+            block = None
+            continue
+        key = (
+            moment.date(),
+            (moment.hour * 3600 + moment.minute * 60) // coarse_s,
+        )
+        if key == block:
+            steps[-1] += 1
+        else:
+            steps.append(1)
+            block = key
+    return steps
+
+
+def step_starts(steps: list[int]) -> list[int]:
+    """
+    :return: per interval het volgnummer van het eerste basisinterval,
+        met als laatste element het totaal aantal basisintervallen
+    """
+    return [0] + np.cumsum(steps).tolist()
+
+
+def step_to_interval(starts: list[int], step: int) -> int:
+    """
+    :param starts: resultaat van step_starts
+    :param step: volgnummer van een basisinterval
+    :return: index van het interval waar het basisinterval in valt
+    """
+    u = bisect.bisect_right(starts, step) - 1
+    return max(0, min(u, len(starts) - 2))
+
+
+def intervals_for_steps(steps: list[int], u: int, num_steps: int) -> int:
+    """
+    :return: het aantal intervallen vanaf u dat nodig is om num_steps
+        basisintervallen te dekken
+    """
+    covered = 0
+    count = 0
+    while covered < num_steps and u + count < len(steps):
+        covered += steps[u + count]
+        count += 1
+    if covered < num_steps:
+        count += num_steps - covered
+    return count
+
+
+def merge_rows(df: pd.DataFrame, steps: list[int], sum_columns: list) -> pd.DataFrame:
+    """
+    Voegt de rijen van een dataframe met basisintervallen samen
+    :param df: dataframe met een rij per basisinterval
+    :param steps: het aantal rijen per samengevoegde rij
+    :param sum_columns: kolommen met hoeveelheden (kWh, J/cm2) die worden opgeteld,
+        de overige numerieke kolommen (prijzen, temperatuur) worden gemiddeld
+        en de niet-numerieke en de kolom "time" nemen de eerste waarde
+    :return: dataframe met een rij per interval
+    """
+    if all(step == 1 for step in steps):
+        return df.reset_index(drop=True)
+    df = df.iloc[: sum(steps)].reset_index(drop=True)
+    key = np.repeat(np.arange(len(steps)), steps)
+    agg = {}
+    for column in df.columns:
+        if column in sum_columns:
+            agg[column] = "sum"
+        elif column == "time" or not pd.api.types.is_numeric_dtype(df[column]):
+            agg[column] = "first"
+        else:
+            agg[column] = "mean"
+    return df.groupby(key, sort=True).agg(agg).reset_index(drop=True)
+
+
+def merge_values(values: list, steps: list[int]) -> list:
+    """
+    Telt de waarden (hoeveelheden) per samengevoegd interval op
+    """
+    if all(step == 1 for step in steps):
+        return list(values)
+    starts = step_starts(steps)
+    return [sum(values[starts[u] : starts[u + 1]]) for u in range(len(steps))]
+
+
+def expand_rows(
+    tijd: list,
+    df: pd.DataFrame,
+    steps: list[int],
+    interval_s: int,
+    levels: bool = False,
+) -> tuple[list, pd.DataFrame]:
+    """
+    Splitst samengevoegde intervallen weer op in basisintervallen, zodat de
+    prognoses in de database altijd de resolutie van "interval" hebben
+    :param tijd: begintijdstippen van de rijen in df
+    :param df: dataframe met in de eerste kolom de tijd of het uur
+    :param steps: aantal basisintervallen per interval; rijen van df
+        zonder step (bijv. de eind-SoC) tellen als een basisinterval
+    :param interval_s: lengte van een basisinterval in seconden
+    :param levels: True: de kolommen zijn standen (SoC) en worden lineair
+        geinterpoleerd, anders hoeveelheden die evenredig worden verdeeld
+    :return: de tijdstippen en het dataframe per basisinterval
+    """
+    counts = list(steps[: len(df)]) + [1] * max(0, len(df) - len(steps))
+    if all(count == 1 for count in counts):
+        return tijd, df
+    df = df.reset_index(drop=True)
+    new_tijd = [
+        tijd[u] + dt.timedelta(seconds=k * interval_s)
+        for u in range(len(df))
+        for k in range(counts[u])
+    ]
+    index = np.repeat(np.arange(len(df)), counts)
+    result = df.iloc[index].reset_index(drop=True)
+    columns = df.columns[1:]
+    if levels:
+        ts_old = np.array([pd.Timestamp(t).timestamp() for t in tijd[: len(df)]])
+        ts_new = np.array([pd.Timestamp(t).timestamp() for t in new_tijd])
+        for column in columns:
+            values = df[column].to_numpy(dtype=float)
+            result[column] = np.interp(ts_new, ts_old, values)
+    else:
+        divisor = np.repeat(np.array(counts, dtype=float), counts)
+        for column in columns:
+            result[column] = df[column].to_numpy(dtype=float)[index] / divisor
+    if pd.api.types.is_datetime64_any_dtype(df[df.columns[0]]):
+        result[df.columns[0]] = new_tijd
+    return new_tijd, result
@@ -0,0 +1,215 @@
+"""
+Verzamelen van de invoer voor de optimaliseringsberekening.
+De onafhankelijke gegevens (prijzen, prognoses, baseload, solar-voorspellingen,
+graaddagen en draaiuren van de warmtepomp) worden gelijktijdig in een thread-pool
+opgehaald en als een onveranderlijk CalcInputs-object aan de modelbouw doorgegeven.
+"""
+
+import datetime as dt
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Mapping
+
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class CalcInputs:
+    """
+    Alle opgehaalde invoer van een berekening
+    price_data: day-ahead prijzen vanaf start_hour
+    prog_data: meteo-prognoses vanaf start_hour
+    base_cons: (baseload vandaag, baseload morgen), None als de baseload uit de instellingen komt
+    solar_prog: per solar-device (naam met "_") de voorspelde productie
+    degree_days: (gewogen graaddagen vandaag, morgen), None zonder warmtepomp
+    heatpump_run_hours: aantal uren dat de warmtepomp al draait, -1 als onbekend
+    timings: per invoer de ophaaltijd in sec
+    """
+
+    price_data: pd.DataFrame
+    prog_data: pd.DataFrame
+    base_cons: tuple[list, list] | None = None
+    solar_prog: Mapping[str, pd.DataFrame] = field(
+        default_factory=lambda: MappingProxyType({})
+    )
+    degree_days: tuple[float, float] | None = None
+    heatpump_run_hours: int = -1
+    timings: Mapping[str, float] = field(default_factory=lambda: MappingProxyType({}))
+
+
+def _timed(func: Callable, *args, **kwargs) -> tuple[Any, float]:
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _solar_name(solar_option) -> str:
+    return solar_option.name.replace(" ", "_").replace("-", "_")
+
+
+def _run_concurrent(
+    tasks: dict[str, tuple], timings: dict[str, float], max_workers: int
+) -> dict[str, Any]:
+    """
+    Voert de taken gelijktijdig uit
+    :param tasks: per naam een tuple (functie, argumenten...)
+    :param timings: hierin wordt per taak de rekentijd bijgehouden
+    :param max_workers: maximaal aantal threads
+    :return: per naam het resultaat
+    """
+    if len(tasks) == 0:
+        return {}
+    results = {}
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(tasks)), thread_name_prefix="dao_input"
+    ) as executor:
+        futures = {
+            name: executor.submit(_timed, *task) for name, task in tasks.items()
+        }
+        for name, future in futures.items():
+            results[name], timings[name] = future.result()
+    return results
+
+
+def gather_calc_inputs(
+    dacalc,
+    report,
+    start_hour: int,
+    start_interval_dt: dt.datetime,
+    max_workers: int = 8,
+) -> CalcInputs:
+    """
+    Haalt alle invoer voor DaCalc.calc_optimum gelijktijdig op
+    :param dacalc: het DaCalc-object
+    :param report: Report-object voor prijzen en draaiuren warmtepomp
+    :param start_hour: utc-timestamp van het begin van het eerste uur
+    :param start_interval_dt: begin van het eerste interval
+    :param max_workers: maximaal aantal threads
+    :return: CalcInputs
+    """
+    start_gather = time.perf_counter()
+    interval = dacalc.interval
+    # tabellen vooraf inlezen, reflectie in dezelfde MetaData is niet thread-safe
+    dacalc.db_da.reflect_tables(["variabel", "values", "prognoses"])
+    timings = {}
+
+    # ronde 1: onafhankelijke invoer
+    tasks = {
+        "prijzen": (
+            report.get_price_data,
+            dt.datetime.fromtimestamp(start_hour),
+            None,
+            interval,
+        ),
+        "prognoses": (
+            dacalc.db_da.get_prognose_data,
+            start_hour,
+            None,
+            interval,
+        ),
+    }
+    if dacalc.use_calc_baseload:
+        weekday = dt.datetime.weekday(dt.datetime.now())
+        tasks["baseload vandaag"] = (dacalc.get_calculated_baseload, weekday)
+        tasks["baseload morgen"] = (
+            dacalc.get_calculated_baseload,
+            (weekday + 1) % 7,
+        )
+    heating = dacalc.heating_options
+    hp_present = heating.heater_present if heating else False
+    if hp_present:
+        tasks["graaddagen vandaag"] = (
+            dacalc.meteo.calc_graaddagen,
+            None,
+            None,
+            True,
+        )
+        tasks["graaddagen morgen"] = (
+            dacalc.meteo.calc_graaddagen,
+            dt.datetime.combine(
+                dt.date.today() + dt.timedelta(days=1), dt.datetime.min.time()
+            ),
+            None,
+            True,
+        )
+        if heating.entity_heat_produced is not None:
+            tasks["draaiuren wp"] = (
+                report.get_heatpump_run_hours,
+                heating.entity_heat_produced,
+            )
+    results = _run_concurrent(tasks, timings, max_workers)
+    prog_data = results["prognoses"]
+
+    # ronde 2: solar-voorspellingen, tot het einde van de prognoses
+    solar_prog = {}
+    if prog_data is not None and len(prog_data) > 0:
+        end = prog_data["tijd"].iloc[-1] + dt.timedelta(seconds=dacalc.interval_s)
+        solar_options = list(dacalc.solar)
+        for battery_option in dacalc.battery_options:
+            solar_options += list(battery_option.solar)
+        # ml-devices en overige devices elk in een keer
+        dao_options = [opt for opt in solar_options if not opt.ml_prediction]
+        ml_options = [opt for opt in solar_options if opt.ml_prediction]
+        tasks = {}
+        if len(dao_options) > 0:
+            tasks["solar dao"] = (
+                dacalc.calc_solar_predictions_dao,
+                dao_options,
+                start_interval_dt,
+                end,
+                interval,
+            )
+        if len(ml_options) > 0:
+            tasks["solar ml"] = (
+                dacalc.calc_solar_predictions_ml,
+                ml_options,
+                start_interval_dt,
+                end,
+                interval,
+            )
+        solar_results = _run_concurrent(tasks, timings, max_workers)
+        ml_progs = solar_results.get("solar ml", {})
+        # ml-devices zonder model met de DAO-predictor
+        missing = [opt for opt in ml_options if _solar_name(opt) not in ml_progs]
+        dao_progs = [solar_results.get("solar dao")]
+        if len(missing) > 0:
+            dao_progs.append(
+                dacalc.calc_solar_predictions_dao(
+                    missing, start_interval_dt, end, interval
+                )
+            )
+        for solar_option in solar_options:
+            solar_name = _solar_name(solar_option)
+            if solar_name in ml_progs:
+                solar_prog[solar_name] = ml_progs[solar_name]
+                continue
+            for dao_prog in dao_progs:
+                if dao_prog is not None and solar_name in dao_prog.columns:
+                    solar_prog[solar_name] = dao_prog[["tijd", solar_name]].rename(
+                        columns={solar_name: "prediction"}
+                    )
+
+    logging.info(
+        f"Invoer verzameld in {time.perf_counter() - start_gather:.2f} sec:\n"
+        + "\n".join(f"- {name:<20}: {t:5.2f} sec" for name, t in timings.items())
+    )
+    return CalcInputs(
+        price_data=results["prijzen"],
+        prog_data=prog_data,
+        base_cons=(
+            (results["baseload vandaag"], results["baseload morgen"])
+            if dacalc.use_calc_baseload
+            else None
+        ),
+        solar_prog=MappingProxyType(solar_prog),
+        degree_days=(
+            (results["graaddagen vandaag"], results["graaddagen morgen"])
+            if hp_present
+            else None
+        ),
+        heatpump_run_hours=results.get("draaiuren wp", -1),
+        timings=MappingProxyType(timings),
+    )
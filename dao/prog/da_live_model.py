@@ -0,0 +1,292 @@
+"""
+Blijvend MIP-model voor het herhaald doorrekenen binnen hetzelfde interval.
+In de scheduler wordt het model van de solver niet na iedere berekening
+weggegooid. Bij een volgende berekening met dezelfde modelstructuur (lengtes van
+de intervallen, apparaten en strategie, niet de tijdstippen) wordt de modelbouw
+in Python opnieuw doorlopen en vergeleken met de vorige opbouw: de variabelen en
+constraints van het bestaande model worden hergebruikt en alleen wat veranderd
+is (grenzen zoals start-SoC, EV-niveau en boilertemperatuur, de ub van pv_ac,
+prijzen en andere coefficienten) wordt in het model bijgewerkt. De vorige
+oplossing is alleen startoplossing als ook de tijdstippen gelijk zijn; bij
+verschoven tijdstippen zorgt da_warmstart voor de (verschoven) startoplossing.
+Het model schuift niet mee met de horizon: variabelen en constraints liggen vast
+op hun positie in de opbouw, niet op hun tijdstip. Het opschuiven van het eerste
+interval verandert bij een vast einde van de horizon het aantal intervallen:
+dan wordt het model opnieuw opgebouwd.
+Wijkt de opbouw van de variabelen af (ander aantal, ander type, andere SOS-sets)
+dan volgt LiveModelMismatch en wordt het model opnieuw opgebouwd.
+"""
+
+import logging
+import numbers
+
+from mip import LinExpr, Var, Constr, INF, CONTINUOUS, BINARY
+
+from dao.prog.da_solver import make_model
+
+
+class LiveModelMismatch(Exception):
+    """De opbouw van het model wijkt af van het bewaarde model"""
+
+
+class LiveModel:
+    """
+    Wordt in de berekening gebruikt in plaats van mip.Model:
+    add_var, add_constr, add_sos en "model += ..." worden vergeleken met de
+    vorige opbouw, alle andere attributen gaan naar het onderliggende mip.Model
+    """
+
+    def __init__(self):
+        d = self.__dict__
+        d["model"] = None
+        d["key"] = None
+        d["times"] = None
+        # per variabele: [var_type, lb, ub]
+        d["var_specs"] = []
+        # per constraint: [Constr, indices, coefficienten, sense, rhs]
+        d["constr_specs"] = []
+        # per sos: (indices, gewichten, type)
+        d["sos_specs"] = []
+        d["reuse"] = False
+        d["var_pos"] = 0
+        d["sos_pos"] = 0
+        # constraints van de vorige opbouw, de positie van de eerste
+        # nog niet vergeleken constraint en per (indices, sense) de posities
+        d["old_specs"] = []
+        d["cursor"] = 0
+        d["old_index"] = {}
+        # vervallen constraints en te vervangen rijen: (spec, expressie)
+        d["remove"] = []
+        d["replace"] = []
+        d["previous_start"] = []
+        d["stats"] = {}
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__["model"], name)
+
+    def __setattr__(self, name, value):
+        setattr(self.__dict__["model"], name, value)
+
+    def reset(self):
+        """
+        Gooit het bewaarde model weg
+        """
+        self.__init__()
+
+    def start_build(self, key, solver: str = "cbc", times=None) -> "LiveModel":
+        """
+        Begint een (her)opbouw van het model
+        :param key: kenmerk van de modelstructuur (o.a. de lengtes van de
+            intervallen), bij een ander kenmerk wordt een nieuw model gemaakt
+        :param solver: "cbc" of "highs"
+        :param times: de tijdstippen van de intervallen, de vorige oplossing wordt
+            alleen bij dezelfde tijdstippen als startoplossing gebruikt
+        :return: self, te gebruiken als "model"
+        """
+        d = self.__dict__
+        key = (key, solver)
+        reuse = d["model"] is not None and key == d["key"]
+        d["previous_start"] = []
+        d["old_specs"] = []
+        d["old_index"] = {}
+        if reuse:
+            # vorige oplossing als startoplossing (zelfde tijdstippen)
+            if d["model"].num_solutions > 0 and times == d["times"]:
+                for var, spec in zip(d["model"].vars, d["var_specs"]):
+                    if spec[0] != CONTINUOUS and var.x is not None:
+                        d["previous_start"].append((var, round(var.x)))
+            d["old_specs"] = d["constr_specs"]
+            for pos, spec in enumerate(d["old_specs"]):
+                d["old_index"].setdefault((spec[1], spec[3]), []).append(pos)
+        else:
+            d["model"] = make_model(solver)
+            d["key"] = key
+            d["var_specs"] = []
+            d["sos_specs"] = []
+        d["times"] = times
+        d["constr_specs"] = []
+        d["reuse"] = reuse
+        d["var_pos"] = 0
+        d["sos_pos"] = 0
+        d["cursor"] = 0
+        d["remove"] = []
+        d["replace"] = []
+        d["stats"] = {
+            "reused": reuse,
+            "bounds_updated": 0,
+            "rhs_updated": 0,
+            "rows_replaced": 0,
+            "rows_added": 0,
+            "rows_removed": 0,
+        }
+        return self
+
+    def add_var(
+        self,
+        name: str = "",
+        lb: numbers.Real = 0.0,
+        ub: numbers.Real = INF,
+        obj: numbers.Real = 0.0,
+        var_type: str = CONTINUOUS,
+        column=None,
+    ) -> Var:
+        d = self.__dict__
+        model = d["model"]
+        pos = d["var_pos"]
+        d["var_pos"] = pos + 1
+        if var_type == BINARY and ub == INF:
+            ub = 1.0
+        if not d["reuse"]:
+            var = model.add_var(
+                name=name, lb=lb, ub=ub, obj=obj, var_type=var_type, column=column
+            )
+            d["var_specs"].append([var_type, lb, ub])
+            return var
+        if pos >= len(d["var_specs"]):
+            raise LiveModelMismatch(f"extra variabele {pos}")
+        spec = d["var_specs"][pos]
+        if spec[0] != var_type or obj != 0.0 or column is not None:
+            raise LiveModelMismatch(f"variabele {pos} is gewijzigd")
+        var = model.vars[pos]
+        if spec[1] != lb:
+            var.lb = lb
+            spec[1] = lb
+            d["stats"]["bounds_updated"] += 1
+        if spec[2] != ub:
+            var.ub = ub
+            spec[2] = ub
+            d["stats"]["bounds_updated"] += 1
+        return var
+
+    def set_bounds(self, var: Var, lb: numbers.Real, ub: numbers.Real):
+        """
+        Wijzigt de grenzen van een variabele na add_var (afgeleide grenzen),
+        de bewaarde opbouw wordt bijgewerkt
+        """
+        var.lb = lb
+        var.ub = ub
+        spec = self.__dict__["var_specs"][var.idx]
+        spec[1] = lb
+        spec[2] = ub
+
+    def build_size(self) -> tuple[int, int]:
+        """
+        :return: (aantal variabelen, aantal constraints) tot nu toe in de (her)opbouw
+        """
+        d = self.__dict__
+        return d["var_pos"], len(d["constr_specs"])
+
+    def _find_old(self, key: tuple) -> int | None:
+        """
+        :return: de eerste positie vanaf cursor van een vorige constraint
+            met dezelfde variabelen en sense
+        """
+        d = self.__dict__
+        positions = d["old_index"].get(key)
+        while positions and positions[0] < d["cursor"]:
+            positions.pop(0)
+        if not positions:
+            return None
+        return positions.pop(0)
+
+    def add_constr(self, lin_expr: LinExpr, name: str = "", priority=None) -> Constr:
+        d = self.__dict__
+        if isinstance(lin_expr, bool):
+            # zelfde foutmelding als mip.Model
+            return d["model"].add_constr(lin_expr, name, priority)
+        expr = lin_expr.expr
+        spec = [
+            None,
+            tuple(var.idx for var in expr),
+            tuple(expr.values()),
+            lin_expr.sense,
+            -lin_expr.const,
+        ]
+        old_pos = None
+        if d["reuse"]:
+            old_pos = self._find_old((spec[1], spec[3]))
+        if old_pos is None:
+            # nieuwe constraint
+            spec[0] = d["model"].add_constr(lin_expr, name, priority)
+            d["constr_specs"].append(spec)
+            if d["reuse"]:
+                d["stats"]["rows_added"] += 1
+            return spec[0]
+        # tussenliggende constraints van de vorige opbouw zijn vervallen
+        d["remove"] += d["old_specs"][d["cursor"] : old_pos]
+        d["cursor"] = old_pos + 1
+        old = d["old_specs"][old_pos]
+        spec[0] = old[0]
+        d["constr_specs"].append(spec)
+        if old[2] != spec[2]:
+            # cbc kan de coefficienten van een rij niet wijzigen:
+            # de rij wordt in finish_build vervangen
+            d["replace"].append((spec, lin_expr, name, priority))
+        elif old[4] != spec[4]:
+            spec[0].rhs = spec[4]
+            d["stats"]["rhs_updated"] += 1
+        return spec[0]
+
+    def add_sos(self, sos: list, sos_type: int):
+        d = self.__dict__
+        pos = d["sos_pos"]
+        spec = (tuple(var.idx for var, _ in sos), tuple(w for _, w in sos), sos_type)
+        d["sos_pos"] = pos + 1
+        if not d["reuse"]:
+            d["model"].add_sos(sos, sos_type)
+            d["sos_specs"].append(spec)
+            return
+        if pos >= len(d["sos_specs"]) or d["sos_specs"][pos] != spec:
+            raise LiveModelMismatch(f"sos {pos} is gewijzigd")
+
+    def __iadd__(self, other) -> "LiveModel":
+        if isinstance(other, LinExpr) and len(other.sense) > 0:
+            self.add_constr(other)
+        elif (
+            isinstance(other, tuple)
+            and len(other) == 2
+            and isinstance(other[0], LinExpr)
+            and len(other[0].sense) > 0
+        ):
+            self.add_constr(other[0], other[1])
+        else:
+            model = self.__dict__["model"]
+            model += other
+        return self
+
+    def finish_build(self) -> dict:
+        """
+        Sluit de (her)opbouw af: vervallen constraints worden verwijderd,
+        gewijzigde rijen vervangen en de vorige oplossing wordt startoplossing
+        :return: statistiek van de bijwerking
+        """
+        d = self.__dict__
+        model = d["model"]
+        stats = d["stats"]
+        if not d["reuse"]:
+            return stats
+        d["reuse"] = False
+        if d["var_pos"] != len(d["var_specs"]) or d["sos_pos"] != len(d["sos_specs"]):
+            raise LiveModelMismatch("minder variabelen of sos-sets dan het vorige model")
+        remove = [spec[0] for spec in d["remove"] + d["old_specs"][d["cursor"] :]]
+        stats["rows_removed"] = len(remove)
+        remove += [spec[0] for spec, _, _, _ in d["replace"]]
+        if len(remove) > 0:
+            model.remove(remove)
+        for spec, lin_expr, name, priority in d["replace"]:
+            spec[0] = model.add_constr(lin_expr, name, priority)
+        stats["rows_replaced"] = len(d["replace"])
+        d["old_specs"] = []
+        d["old_index"] = {}
+        d["remove"] = []
+        d["replace"] = []
+        if len(d["previous_start"]) > 0:
+            model.start = d["previous_start"]
+        logging.info(
+            f"Model hergebruikt: {stats['bounds_updated']} grenzen, "
+            f"{stats['rhs_updated']} rechterleden en "
+            f"{stats['rows_replaced']} rijen bijgewerkt, "
+            f"{stats['rows_added']} rijen toegevoegd en "
+            f"{stats['rows_removed']} verwijderd"
+        )
+        return stats
@@ -0,0 +1,660 @@
+"""
+Startmomenten van apparaten (machines) voor de optimalisering.
+Per mogelijk startmoment wordt vooraf met numpy het verbruik per interval berekend:
+het vermogensprofiel van het programma (per kwartier) gevouwen met de intervallen
+van het model. In het model wordt dan een van de startmomenten (binair, som 1)
+gekozen. Startmomenten die op prijs altijd duurder zijn dan een ander startmoment
+worden vooraf weggelaten, behalve waar de netaansluiting kan begrenzen. Dat gaat
+alleen over de prijs: de overlap met de opwekking van de zonnepanelen wordt niet
+vooraf beoordeeld, die volgt uit de optimalisering.
+MachinesComponent plant de apparaten in, de voorberekening staat in de functies.
+"""
+
+import datetime as dt
+import logging
+import math
+
+import numpy as np
+from mip import xsum, BINARY, CONTINUOUS
+
+from dao.prog.da_components import CalcContext, Component
+from dao.prog.utils import convert_timestr, calc_uur_index
+
+
+def start_energy(
+    power: list[float], quarter_interval: list[int], num_intervals: int
+) -> np.ndarray:
+    """
+    Verbruik per interval voor ieder mogelijk startmoment
+    :param power: vermogensprofiel van het programma in W, per kwartier
+    :param quarter_interval: per kwartier van het planningswindow de index van het
+        interval van het model (num_intervals: buiten de horizon)
+    :param num_intervals: aantal intervallen van het model
+    :return: array (startmomenten x intervallen) met het verbruik in kWh,
+        startmoment r begint in kwartier r van het planningswindow
+    """
+    run_length = len(power)
+    num_starts = len(quarter_interval) - run_length + 1
+    if run_length == 0 or num_starts <= 0:
+        return np.zeros((0, num_intervals))
+    # 4000 = omrekenen van kwartier vermogen in W naar verbruik in kWh
+    profile = np.asarray(power, dtype=float) / 4000
+    quarter_interval = np.asarray(quarter_interval)
+    # per startmoment en stap van het programma het interval
+    quarters = np.arange(num_starts)[:, None] + np.arange(run_length)[None, :]
+    intervals = quarter_interval[quarters]
+    # een extra kolom voor kwartieren buiten de horizon
+    energy = np.zeros((num_starts, num_intervals + 1))
+    rows = np.broadcast_to(np.arange(num_starts)[:, None], intervals.shape)
+    np.add.at(
+        energy,
+        (rows, np.minimum(intervals, num_intervals)),
+        np.broadcast_to(profile, intervals.shape),
+    )
+    return energy[:, :num_intervals]
+
+
+def prune_dominated_starts(
+    energy: np.ndarray,
+    pl: list[float],
+    pt: list[float],
+    export_capped: list[bool] | None = None,
+    import_capped: list[bool] | None = None,
+) -> np.ndarray:
+    """
+    Laat startmomenten weg die altijd duurder zijn dan een ander startmoment.
+    Het verbruik van de machine kost per interval minstens min(pl, pt) (minder
+    terugleveren of minder inkopen) en hoogstens max(pl, pt). Is de ondergrens van
+    een startmoment hoger dan de bovengrens van het beste startmoment, dan kan het
+    nooit optimaal zijn.
+    Dat geldt alleen zolang de netaansluiting niet begrenst:
+    - kan de zon meer opwekken dan er kan worden teruggeleverd, dan kan verbruik
+      in dat interval gratis zijn (anders wordt er afgeschakeld): ondergrens
+      min(pl, pt, 0);
+    - kan het verbruik de netaansluiting bereiken, dan heeft verbruik in dat
+      interval geen bovengrens: een startmoment met verbruik in zo'n interval
+      telt niet als goedkoopste.
+    :param energy: verbruik per startmoment per interval (start_energy)
+    :param pl: leveringstarief per interval
+    :param pt: teruglevertarief per interval
+    :param export_capped: per interval True als de teruglevering kan worden begrensd
+    :param import_capped: per interval True als de levering kan worden begrensd
+    :return: indices van de startmomenten die overblijven
+    """
+    if len(energy) == 0:
+        return np.arange(0)
+    num_intervals = energy.shape[1]
+    pl = np.asarray(pl[:num_intervals], dtype=float)
+    pt = np.asarray(pt[:num_intervals], dtype=float)
+    low_price = np.minimum(pl, pt)
+    high_price = np.maximum(pl, pt)
+    if export_capped is not None:
+        capped = np.asarray(export_capped[:num_intervals], dtype=bool)
+        low_price = np.where(capped, np.minimum(low_price, 0.0), low_price)
+    if import_capped is not None:
+        capped = np.asarray(import_capped[:num_intervals], dtype=bool)
+        high_price = np.where(capped, np.inf, high_price)
+    lower = energy @ low_price
+    # 0 * inf: geen verbruik in een begrensd interval
+    with np.errstate(invalid="ignore"):
+        upper = np.where(energy > 0, energy * high_price, 0.0).sum(axis=1)
+    best = upper.min()
+    if not np.isfinite(best):
+        return np.arange(len(energy))
+    return np.flatnonzero(lower <= best + 1e-9)
+
+
+class MachinesComponent(Component):
+    """
+    Apparaten (machines) met een programma dat binnen een planningswindow moet
+    draaien; per apparaat wordt een van de startmomenten gekozen
+    """
+
+    name = "machines"
+
+    def prepare(self, ctx: CalcContext) -> bool:
+        calc = ctx.calc
+        if len(calc.machines) == 0:
+            return False
+        U = ctx.U
+        tijd = ctx.tijd
+        interval_end = ctx.interval_end
+        start_dt = ctx.start_dt
+        self.program_selected = []  # naam geselecteerd programma
+        M = len(calc.machines)  # aantal geconfigureerde machines
+        self.RL = []  # lengte van een run = aantal stappen van een kwartier
+        self.KW = []  # aantal kwartieren in een planningswindow
+        self.ma_uur_kw = []  # per machine een list met beschikbare kwartieren
+        self.ma_kw_dt = []  # per machine een list op welk tijdstip een kwartier begint
+        self.program_index = (
+            []
+        )  # nummer in de lijst welk programma van een machine gaat draaien
+        self.ma_name = []  # naam van de machine
+        # entity voor opvragen vorig en teruggeven berekend nieuw start-tijdstip
+        self.ma_entity_plan_start = []
+        # entity voor opvragen vorig en teruggeven berekend nieuw eind-tijdstip
+        self.ma_entity_plan_end = []
+        self.ma_planned_start_dt = []  # start tijdstip planning window
+        self.ma_planned_end_dt = []  # eind tijdstip planning window
+        self.ma_instant_start = []  # direct starten
+        for m in range(M):
+            error = False
+            self.ma_name.append(calc.machines[m].name)
+            # entities ophalen
+            start_window_entity = calc.machines[m].entity_start_window
+            end_window_entity = calc.machines[m].entity_end_window
+            self.ma_entity_plan_start.append(calc.machines[m].entity_calculated_start)
+            self.ma_entity_plan_end.append(calc.machines[m].entity_calculated_end)
+            entity_machine_program = calc.machines[m].entity_selected_program
+            if entity_machine_program:
+                try:
+                    self.program_selected.append(
+                        calc.get_state(entity_machine_program).state
+                    )
+                except Exception as ex:
+                    logging.error(f"Machines: entity_machine_program: {ex}")
+            p = next(
+                (
+                    i
+                    for i, item in enumerate(calc.machines[m].programs)
+                    if item.name == self.program_selected[m]
+                ),
+                0,
+            )
+            self.program_index.append(p)
+            self.RL.append(len(calc.machines[m].programs[p].power))  # aantal stappen
+            entity_machine_instant_start = calc.machines[m].entity_instant_start
+            if entity_machine_instant_start is None:
+                machine_instant_start = False
+            else:
+                machine_instant_start = (
+                    calc.get_state(entity_machine_instant_start).state == "on"
+                )
+            self.ma_instant_start.append(machine_instant_start)
+            logging.info(
+                f"Apparaat {calc.machines[m].name} direct starten staat "
+                f"{'aan' if machine_instant_start else 'uit'}"
+            )
+
+            # initialize yesterday
+            planned_start_dt = dt.datetime(
+                start_dt.year, start_dt.month, start_dt.day
+            ) - dt.timedelta(days=1)
+            planned_end_dt = planned_start_dt
+            if self.ma_entity_plan_start[m] is None:
+                if self.ma_entity_plan_end[m] is None:
+                    error = True
+                    logging.error(
+                        f"Er zijn geen entities voor doorgeven van de planning gedefinieerd "
+                        f"bij de instellingen van {self.ma_name[m]}."
+                    )
+                else:
+                    planned_end_str = calc.get_state(self.ma_entity_plan_end[m]).state
+                    planned_end_dt = dt.datetime.strptime(
+                        planned_end_str, "%Y-%m-%d %H:%M:%S"
+                    )
+                    planned_start_dt = planned_end_dt - dt.timedelta(
+                        minutes=self.RL[m] * 15
+                    )
+            else:
+                planned_start_str = calc.get_state(self.ma_entity_plan_start[m]).state
+                planned_start_dt = dt.datetime.strptime(
+                    planned_start_str, "%Y-%m-%d %H:%M:%S"
+                )
+                if self.ma_entity_plan_end[m] is not None:
+                    planned_end_str = calc.get_state(self.ma_entity_plan_end[m]).state
+                    planned_end_dt = dt.datetime.strptime(
+                        planned_end_str, "%Y-%m-%d %H:%M:%S"
+                    )
+                else:
+                    planned_end_dt = planned_start_dt + dt.timedelta(
+                        minutes=self.RL[m] * 15
+                    )
+            self.ma_planned_start_dt.append(
+                planned_start_dt
+            )  # de planning van de vorige geslaagde run
+            self.ma_planned_end_dt.append(planned_end_dt)
+            start_opt = start_dt  # now
+            # ready_ma_dt = uur[U - 1] # het laatste moment van planningshorizon
+            if machine_instant_start:
+                start_window_dt = start_dt
+                end_window_dt = start_dt + dt.timedelta(minutes=self.RL[m] * 15)
+            else:
+                if start_window_entity is None:
+                    logging.error(
+                        f"De 'entity start window' is niet gedefinieerd bij de instellingen "
+                        f"van {self.ma_name[m]}."
+                    )
+                    logging.error(f"Apparaat {self.ma_name[m]} wordt niet ingepland.")
+                    error = True
+                else:
+                    start_window_hm = calc.get_state(start_window_entity).state
+                    start_window_dt = convert_timestr(start_window_hm, start_dt)
+                if end_window_entity is None:
+                    logging.error(
+                        f"De 'entity end window' is niet gedefinieerd bij de instellingen "
+                        f"van {self.ma_name[m]}."
+                    )
+                    if not error:
+                        logging.error(
+                            f"Apparaat {self.ma_name[m]} wordt niet ingepland."
+                        )
+                        error = True
+                else:
+                    end_window_hm = calc.get_state(end_window_entity).state
+                    end_window_dt = convert_timestr(end_window_hm, start_dt)
+            if end_window_dt < start_window_dt:
+                start_window_dt -= dt.timedelta(days=1)
+            if end_window_dt < start_opt:
+                start_window_dt += dt.timedelta(days=1)
+                end_window_dt += dt.timedelta(days=1)
+            if end_window_dt > tijd[U - 1]:
+                error = True
+                logging.info(
+                    f"Machine {self.ma_name[m]} wordt niet ingepland, want "
+                    f"het planning-window ligt voorbij einde optimalisering"
+                )
+
+            # ready_ma_dt += dt.timedelta(days=1)
+            """
+            vandaag			
+            if end_gepland_dt.day != start_opt and end_pland_dt < start_opt: gisteren
+               inplannen
+            start_opt < start_gepland		opnieuw inplannen	
+            start_opt > start_gepland			
+                start_opt < end_gepland		niet inplannen
+                start_opt >= end_gepland		morgen inplannen
+
+
+            morgen inplannen			
+            start_window + 1dag			
+            end_window + 1 dag			
+            inplannen	
+            """
+            if not error:
+                inplannen = False
+                # planning is voor vandaag
+                if (
+                    (planned_end_dt.day != start_opt.day and planned_end_dt < start_opt)
+                    or
+                    # begin planning is na start_opt
+                    (
+                        (planned_end_dt < start_opt)
+                        and (start_window_dt >= planned_end_dt)
+                    )
+                    or (start_opt < planned_start_dt)
+                ):
+                    inplannen = True
+                else:  # start_opt >= planned_start_dt:
+                    if start_opt <= planned_end_dt:
+                        error = True
+                        logging.info(
+                            f"Machine {self.ma_name[m]} wordt niet ingepland, want "
+                            f"de berekende planning wordt nu uitgevoerd"
+                        )
+                    elif start_opt <= end_window_dt:  # dus start_opt > plannend_end
+                        error = True
+                        logging.info(
+                            f"Machine {self.ma_name[m]} wordt niet ingepland, want "
+                            f"in deze planning-window heeft de machine al gedraaid"
+                        )
+                    elif (max(start_opt, start_window_dt) < end_window_dt) and (
+                        (max(start_opt, start_window_dt) - end_window_dt)
+                        < dt.timedelta(minutes=(self.RL[m] * 15))
+                    ):
+                        error = True
+                        logging.info(
+                            f"Machine {self.ma_name[m]} wordt niet ingepland, want "
+                            f"er is te weinig tijd tussen nu en einde planning-window "
+                            f"({end_window_dt}) "
+                        )
+                    else:
+                        if end_window_dt + dt.timedelta(days=1) > tijd[U - 1]:
+                            error = True
+                            logging.info(
+                                f"Machine {self.ma_name[m]} wordt niet ingepland, want "
+                                f"einde planning-window ({end_window_dt + dt.timedelta(days=1)})"
+                                f"ligt voorbij de planningshorizon ({tijd[U - 1]})"
+                            )
+                        elif not inplannen:
+                            start_window_dt += dt.timedelta(days=1)
+                            end_window_dt += dt.timedelta(days=1)
+
+                """    
+                if inplannen:
+                if (start_opt > planned_end_dt) or (
+                    start_dt + dt.timedelta(minutes=self.RL[m] * 15) > planned_end_dt
+                ):
+                    start_ma_dt += dt.timedelta(days=1)
+                    planned_end_dt += dt.timedelta(days=1)
+                if start_ma_dt < start_dt:
+                    start_ma_dt = start_dt
+                if not error and start_ma_dt > ready_ma_dt:
+                    if ready_ma_dt > start_ma_dt:
+                        logging.info(f"Apparaat {self.ma_name[m]} wordt nog niet ingepland: de "
+                                     f"planningsperiode is begonnen")
+                        error = True
+                    else:
+                        ready_ma_dt = ready_ma_dt + dt.timedelta(days=1)
+                if end > tijd[U - 1]:
+                    logging.info(
+                        f"Machine {self.ma_name[m]} wordt niet ingepland, want {ready_ma_dt} "
+                        f"ligt voorbij de planningshorizon {uur[U-1]}"
+                    )
+                    error = True
+                elif start_dt >= ready_ma_dt:
+                    logging.info(
+                        f"Machine {self.ma_name[m]} wordt niet ingepland, want {start_dt} "
+                        f"ligt voorbij de einde planningswindow {ready_ma_dt}"
+                    )
+                    error = True
+                elif planned_start_dt <= start_ma_dt <= planned_end_dt:
+                    logging.info(
+                        f"Machine {self.ma_name[m]} wordt niet ingepland, want {start_dt} "
+                        f"ligt binnen de vorige planning(1): {planned_start_dt}"
+                    )
+                    error = True
+                elif ready_ma_dt + dt.timedelta(days=1) <= tijd[U - 1]:
+                    start_ma_dt += dt.timedelta(days=1)
+                    ready_ma_dt += dt.timedelta(days=1)
+                else:
+                    logging.info(
+                        f"Machine {self.ma_name[m]} wordt niet ingepland, want {start_dt} "
+                        f"ligt voorbij begin vorige planning(2): {planned_start_dt}"
+                    )
+                    error = True
+                """
+
+            # het begin van de reeks startmomenten; bij een blijvend model vanaf
+            # het begin van het eerste interval, zodat de opbouw binnen het
+            # interval gelijk blijft (voorbije kwartieren krijgen bovengrens 0)
+            first_ma_dt = max(start_opt, start_window_dt)
+            if calc.live_model is not None:
+                first_ma_dt = max(
+                    min(start_opt, tijd[0].to_pydatetime()), start_window_dt
+                )
+            if error:
+                kw_num = 0
+            else:
+                delta = end_window_dt - first_ma_dt
+                # aantal kwartieren in planningsperiode
+                kw_num = math.ceil(delta.seconds / 900)
+            self.KW.append(kw_num)
+            if self.RL[m] == 0:
+                logging.info(
+                    f"Machine {self.ma_name[m]} wordt niet ingepland, "
+                    f"want er is gekozen voor {self.program_selected[m]}"
+                )
+            else:
+                if kw_num > 0:
+                    logging.info(
+                        f"Apparaat {self.ma_name[m]} met programma '{self.program_selected[m]}' "
+                        f"wordt ingepland tussen "
+                        f"{max(start_opt, start_window_dt).strftime('%Y-%m-%d %H:%M')} "
+                        f"en {end_window_dt.strftime('%Y-%m-%d %H:%M')}."
+                    )
+            # het eerste tijdstip waarop de run kan beginnen
+            start_ma_dt = dt.datetime.fromtimestamp(
+                900 * math.floor(first_ma_dt.timestamp() / 900)
+            )
+
+            # ma_uur_kw: per machine per uur een lijst van kwartiernummers in het betreffende uur
+            uur_kw = []
+            # ma_kw_dt: per machine een lijst van kwartiertijdstippen
+            kw_dt = []
+            kwartier_dt = start_ma_dt
+            for u in range(U):
+                uur_kw.append([])
+            for kw in range(kw_num):
+                # index in uur-lijst
+                uur_index = calc_uur_index(
+                    kwartier_dt, tijd, calc.interval, interval_end
+                )
+                if uur_index < U:
+                    uur_kw[uur_index].append(kw)
+                kw_dt.append(kwartier_dt)
+                kwartier_dt = kwartier_dt + dt.timedelta(seconds=900)
+            self.ma_uur_kw.append(uur_kw)
+            self.ma_kw_dt.append(kw_dt)
+        return True
+
+    def build(self, model, ctx: CalcContext):
+        calc = ctx.calc
+        U = ctx.U
+        tijd = ctx.tijd
+        interval_end = ctx.interval_end
+        start_dt = ctx.start_dt
+        pl = ctx.pl
+        pt = ctx.pt
+        b_l = ctx.b_l
+        interval_fraction = ctx.interval_fraction
+        interval_steps = ctx.interval_steps
+        hour_fraction = ctx.hour_fraction
+        M = len(calc.machines)
+        # per machine de mogelijke startmomenten (kwartiernummers in het window)
+        # met per startmoment het verbruik per interval in kWh
+        self.ma_starts = []
+        self.ma_start_ub = []
+        self.ma_energy = []
+        self.ma_candidates = 0
+        self.ma_pruned = 0
+        # waar de netaansluiting kan begrenzen geldt de prijsgrens niet
+        ma_max_power = sum(
+            max(calc.machines[m].programs[self.program_index[m]].power, default=0)
+            for m in range(M)
+        )
+        export_capped = ctx.export_capped
+        import_capped = []
+        for u in range(U):
+            max_grid = calc.grid_max_power * hour_fraction[u]
+            max_cons = (
+                b_l[u] * interval_fraction[u]
+                + sum(
+                    component.max_consumption(u)
+                    for component in ctx.components
+                    if component is not self
+                )
+                # een start in het lopende kwartier telt het hele kwartier
+                + ma_max_power * interval_steps[u] * calc.interval_s / 3600 / 1000
+            )
+            import_capped.append(max_cons >= max_grid)
+        for m in range(M):
+            ma_power = calc.machines[m].programs[self.program_index[m]].power
+            quarter_interval = [
+                calc_uur_index(kw_dt, tijd, calc.interval, interval_end)
+                for kw_dt in self.ma_kw_dt[m]
+            ]
+            energy = start_energy(ma_power, quarter_interval, U)
+            starts = np.arange(len(energy))
+            # startmomenten in voorbije kwartieren vallen af
+            keep = np.flatnonzero(
+                [
+                    kw_dt + dt.timedelta(seconds=900) > start_dt
+                    for kw_dt in self.ma_kw_dt[m][: len(energy)]
+                ]
+            )
+            if calc.strategy == "minimize cost" and len(keep) > 1:
+                # startmomenten die altijd duurder zijn vallen af
+                keep = keep[
+                    prune_dominated_starts(
+                        energy[keep], pl, pt, export_capped, import_capped
+                    )
+                ]
+            if calc.live_model is None:
+                starts = keep
+            # bij een blijvend model blijft de opbouw gelijk:
+            # afgevallen startmomenten krijgen bovengrens 0
+            self.ma_candidates += len(energy)
+            self.ma_pruned += len(energy) - len(keep)
+            self.ma_starts.append([int(r) for r in starts])
+            self.ma_start_ub.append([1 if r in keep else 0 for r in starts])
+            self.ma_energy.append(energy[starts])
+        logging.info(
+            f"Startmomenten apparaten: {self.ma_candidates} mogelijk, "
+            f"{self.ma_pruned} vooraf afgevallen"
+        )
+
+        # ma_start : per mogelijk startmoment 1 als de machine dan start anders 0
+        self.ma_start = [
+            [model.add_var(var_type=BINARY, ub=ub) for ub in self.ma_start_ub[m]]
+            for m in range(M)
+        ]
+
+        # consumption per uur
+        self.c_ma_u = [
+            [model.add_var(var_type=CONTINUOUS, lb=0) for _ in range(U)]
+            for _ in range(M)
+        ]
+        # verbruik per uur uit een eerdere planning (buiten het window)
+        self.ma_planned = [[0.0] * U for _ in range(M)]
+
+        #  constraints
+        for m in range(M):
+            # maar 1 start, geen start als de run niet in het window past
+            if sum(self.ma_start_ub[m]) == 0:
+                model += xsum(self.ma_start[m]) == 0
+            else:
+                model += xsum(self.ma_start[m]) == 1
+
+            if calc.log_level == logging.DEBUG:
+                logging.debug(f"Per startmoment het verbruik per interval")
+                for i, r in enumerate(self.ma_starts[m]):
+                    line = f"start: {self.ma_kw_dt[m][r].strftime('%H:%M')} kWh:"
+                    for u in np.flatnonzero(self.ma_energy[m][i]):
+                        line += f" {tijd[u].strftime('%H:%M')} {self.ma_energy[m][i][u]:.3f}"
+                    logging.debug(line)
+
+            for u in range(U):
+                c_ma_sum = 0
+                if len(self.ma_uur_kw[m][u]) == 0 and (
+                    # er zijn geen "window" kwartieren in dit uur:
+                    # het verbruik uit een eerdere planning berekenen en meenemen
+                    self.ma_planned_start_dt[m] < interval_end[u]
+                    and self.ma_planned_end_dt[m] > tijd[u]
+                ):
+                    start_interval_dt = max(tijd[u], start_dt)
+                    end_interval_dt = interval_end[u]
+                    for kw in range(self.RL[m]):
+                        start_kw_dt = self.ma_planned_start_dt[m] + dt.timedelta(
+                            minutes=kw * 15
+                        )
+                        end_kw_dt = start_kw_dt + dt.timedelta(minutes=15)
+                        start_overlap_dt = max(start_interval_dt, start_kw_dt)
+                        end_overlap_dt = min(end_interval_dt, end_kw_dt)
+                        if start_overlap_dt < end_overlap_dt:
+                            verschil = end_overlap_dt - start_overlap_dt
+                            fraction = verschil.seconds / 900
+                            c_ma_sum += (
+                                calc.machines[m]
+                                .programs[self.program_index[m]]
+                                .power[kw]
+                                * fraction
+                                / 4000
+                            )
+                self.ma_planned[m][u] = c_ma_sum
+                model += self.c_ma_u[m][u] == c_ma_sum + xsum(
+                    self.ma_energy[m][i][u] * self.ma_start[m][i]
+                    for i in range(len(self.ma_starts[m]))
+                    if self.ma_energy[m][i][u] != 0
+                )
+
+        # afgeleide grenzen: het grootste verbruik van een startmoment in dit
+        # interval, een run in het lopende kwartier telt het hele kwartier, ook
+        # als het eerste interval korter is
+        for m in range(M):
+            for u in range(U):
+                ma_max_start = max(
+                    (float(energy[u]) for energy in self.ma_energy[m]), default=0.0
+                )
+                ctx.bound_pass.tighten(
+                    self.c_ma_u[m][u], ub=self.ma_planned[m][u] + ma_max_start
+                )
+
+    def consumption(self, u: int):
+        return xsum(c_ma[u] for c_ma in self.c_ma_u)
+
+    def max_consumption(self, u: int) -> float:
+        return sum(c_ma[u].ub for c_ma in self.c_ma_u)
+
+    def warm_start(self, warm_start, ctx: CalcContext):
+        for m in range(len(self.ma_start)):
+            warm_start.add_group(
+                f"ma_start_{m}",
+                [self.ma_kw_dt[m][r] for r in self.ma_starts[m]],
+                self.ma_start[m],
+            )
+
+    def extract(self, solution, ctx: CalcContext):
+        # verbruik van alle apparaten per interval
+        self.c_ma_x = solution.get(self.c_ma_u, (len(self.c_ma_u), ctx.U)).sum(axis=0)
+
+    def actuate(self, ha, ctx: CalcContext):
+        U = ctx.U
+        tijd = ctx.tijd
+        start_dt = ctx.start_dt
+        pl = ctx.pl
+        M = len(self.c_ma_u)
+        for m in range(M):
+            logging.info(f"Apparaat: {self.ma_name[m]}")
+            logging.info(f"Programma: {self.program_selected[m]}")
+            ma_run_start = None
+            if self.RL[m] > 0:
+                start_machine_str = ""
+                for i, r in enumerate(self.ma_starts[m]):
+                    if self.ma_start[m][i].x > 0.5:
+                        ma_run_start = r
+                        if self.ma_kw_dt[m][r] == start_dt:
+                            ma_start_time = dt.datetime.now() + dt.timedelta(seconds=5)
+                        else:
+                            ma_start_time = self.ma_kw_dt[m][r]
+                        start_machine_str = ma_start_time.strftime("%Y-%m-%d %H:%M")
+                        if not (self.ma_entity_plan_start[m] is None):
+                            if ha.debug:
+                                logging.info(f"Zou zijn gestart op {start_machine_str}")
+                            else:
+                                ha.call_service(
+                                    "set_datetime",
+                                    entity_id=self.ma_entity_plan_start[m],
+                                    datetime=start_machine_str,
+                                )
+                                logging.info(f"Start op {start_machine_str}")
+                        end_machine_str = (
+                            self.ma_kw_dt[m][r + self.RL[m] - 1]
+                            + dt.timedelta(seconds=900)
+                        ).strftime("%Y-%m-%d %H:%M")
+                        if not (self.ma_entity_plan_end[m] is None):
+                            if ha.debug:
+                                logging.info(f"Zou klaar zijn op {end_machine_str}")
+                            else:
+                                ha.call_service(
+                                    "set_datetime",
+                                    entity_id=self.ma_entity_plan_end[m],
+                                    datetime=end_machine_str,
+                                )
+                                logging.info(f"Is klaar op {end_machine_str}")
+                if start_machine_str == "":
+                    logging.info(f"Niet ingepland")
+
+            if ha.log_level == logging.DEBUG:
+                logging.debug(
+                    f"Per kwartier het berekende verbruik en het bijbehorende tarief"
+                )
+                ma_power = ha.machines[m].programs[self.program_index[m]].power
+                for kw in range(self.KW[m]):
+                    consumption = 0
+                    if ma_run_start is not None and 0 <= kw - ma_run_start < self.RL[m]:
+                        consumption = ma_power[kw - ma_run_start] / 4000
+                    logging.debug(
+                        f"kwartier {kw:>2} tijd: {self.ma_kw_dt[m][kw].strftime('%H:%M')} "
+                        f"consumption: {consumption:>7.3f} "
+                        f"uur: {math.floor(kw / 4)} tarief: {pl[math.floor(kw / 4)]:.4f}"
+                    )
+                logging.debug(
+                    f"Per uur het berekende verbruik, "
+                    f"het bijbehorende tarief en de kosten"
+                )
+                for u in range(U):
+                    logging.debug(
+                        f"uur {u:>2} tijdstip {tijd[u].strftime('%H:%M')} "
+                        f"consumption: {self.c_ma_u[m][u].x:>7.3f} tarief: {pl[u]:.4f}"
+                    )
@@ -0,0 +1,484 @@
+"""
+Vastleggen en naspelen van een optimaliseringsberekening.
+capture_calculation bewaart alle invoer van een berekening (prijzen, prognoses,
+baseload, solar-voorspellingen, HA-states en instellingen) als een zelfstandige
+fixture in ../data/replay.
+replay_calculation speelt een fixture na met DaCalc.calc_optimum tegen een lokale
+vervanger van Home Assistant (ReplayHomeAssistant) en sqlite-databases in een
+tijdelijke map; run_benchmarks doet dat voor een reeks fixtures en rapporteert per
+fixture de bouw- en rekentijd, de omvang van het model en de doelfunctie.
+Gebruik: python3 da_replay.py [--solvers=cbc,highs] <fixture> [<fixture> ...]
+"""
+
+import copy
+import datetime
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import MappingProxyType
+
+import pandas as pd
+from hassapi.const import DATE_FORMAT
+from hassapi.models import State
+
+from dao.prog.da_inputs import CalcInputs
+
+FIXTURE_VERSION = 1
+REPLAY_TOKEN = "replay"
+# sleutels in de instellingen waarvan de waarde niet in een fixture mag komen
+SECRET_KEY_SUFFIXES = ("token", "password", "_key")
+
+
+def state_to_dict(state: State) -> dict:
+    """
+    Zet een hassapi-State terug naar het json-formaat van de HA-api
+    :param state: State-object
+    :return: dict zoals /api/states die oplevert
+    """
+    result = {
+        "entity_id": state.entity_id,
+        "state": state.state,
+        "attributes": state.attributes,
+        "context": asdict(state.context),
+    }
+    for field_name in ["last_changed", "last_updated", "last_reported"]:
+        value = getattr(state, field_name, None)
+        if isinstance(value, datetime.datetime):
+            value = value.strftime(DATE_FORMAT)
+        if value is not None:
+            result[field_name] = value
+    return result
+
+
+def make_state(entity_id: str, state, attributes: dict | None = None) -> dict:
+    """
+    Maakt een HA-state in het json-formaat van de api
+    :param entity_id: de entiteit
+    :param state: de waarde, wordt als string opgeslagen
+    :param attributes: optionele attributen
+    :return: dict zoals /api/states die oplevert
+    """
+    now = datetime.datetime.now(datetime.timezone.utc).strftime(DATE_FORMAT)
+    return {
+        "entity_id": entity_id,
+        "state": str(state),
+        "attributes": attributes or {},
+        "context": {"id": "replay", "parent_id": None, "user_id": None},
+        "last_changed": now,
+        "last_updated": now,
+    }
+
+
+def _redact(options):
+    """
+    Vervangt wachtwoorden, tokens en api-keys door een verwijzing naar secrets.json
+    """
+    if isinstance(options, dict):
+        result = {}
+        for key, value in options.items():
+            if (
+                isinstance(value, str)
+                and key.lower().endswith(SECRET_KEY_SUFFIXES)
+                and not value.startswith("!secret")
+            ):
+                result[key] = "!secret " + key
+            else:
+                result[key] = _redact(value)
+        return result
+    if isinstance(options, list):
+        return [_redact(item) for item in options]
+    return options
+
+
+def _secret_names(options) -> set:
+    if isinstance(options, dict):
+        return set().union(*[_secret_names(value) for value in options.values()])
+    if isinstance(options, list):
+        return set().union(*[_secret_names(item) for item in options])
+    if isinstance(options, str) and options.startswith("!secret"):
+        return {options[len("!secret") :].strip()}
+    return set()
+
+
+def capture_calculation(
+    dacalc,
+    inputs: CalcInputs,
+    start_dt: datetime.datetime,
+    start_soc: float | None = None,
+    start_ev_soc: float | None = None,
+    file_name: str | None = None,
+) -> str | None:
+    """
+    Bewaart alle invoer van een berekening als fixture
+    :param dacalc: het DaCalc-object
+    :param inputs: de opgehaalde invoer
+    :param start_dt: begin van de berekening
+    :param start_soc: eventueel opgegeven start-SoC van de batterij(en)
+    :param start_ev_soc: eventueel opgegeven start-SoC van de auto('s)
+    :param file_name: bestandsnaam, default ../data/replay/calc_<datum>__<tijd>.pkl.gz
+    :return: de bestandsnaam, None als het bewaren mislukt
+    """
+    if file_name is None:
+        file_name = (
+            "../data/replay/calc_"
+            + start_dt.strftime("%Y-%m-%d__%H-%M")
+            + ".pkl.gz"
+        )
+    try:
+        with open(dacalc.loader.config_path, "r") as f:
+            options = json.load(f)
+        states = dacalc.state_snapshot
+        if states is None:
+            states = {
+                s["entity_id"]: State(**s) for s in dacalc._get("states")
+            }
+        fixture = {
+            "version": FIXTURE_VERSION,
+            "created": datetime.datetime.now(),
+            "start_dt": start_dt,
+            "start_soc": start_soc,
+            "start_ev_soc": start_ev_soc,
+            "options": _redact(options),
+            "ha_config": asdict(dacalc.ha_context),
+            "ha_states": [state_to_dict(state) for state in states.values()],
+            "inputs": {
+                f.name: (
+                    dict(getattr(inputs, f.name))
+                    if isinstance(getattr(inputs, f.name), MappingProxyType)
+                    else getattr(inputs, f.name)
+                )
+                for f in fields(CalcInputs)
+            },
+        }
+        os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+        pd.to_pickle(fixture, file_name)
+    except Exception as ex:
+        logging.warning(f"Invoer van de berekening kan niet worden bewaard: {ex}")
+        return None
+    logging.info(f"Invoer van de berekening bewaard in {file_name}")
+    return file_name
+
+
+def load_fixture(file_name: str) -> dict:
+    """
+    Laadt een fixture van capture_calculation
+    :param file_name: het bestand
+    :return: de fixture als dict
+    """
+    fixture = pd.read_pickle(file_name)
+    if fixture.get("version") != FIXTURE_VERSION:
+        raise ValueError(
+            f"Fixture {file_name} heeft versie {fixture.get('version')}, "
+            f"verwacht {FIXTURE_VERSION}"
+        )
+    return fixture
+
+
+class ReplayHomeAssistant:
+    """
+    Lokale vervanger van de REST-api van Home Assistant.
+    Serveert /api/, /api/config en /api/states vanuit geheugen, verwerkt
+    service-aanroepen (set_value, select_option, turn_on/off, set_datetime) op de
+    states en houdt alle aanroepen bij in service_calls.
+    """
+
+    def __init__(self, states: list[dict], config: dict):
+        self.states = {state["entity_id"]: copy.deepcopy(state) for state in states}
+        self.config = dict(config)
+        self.service_calls = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def _set_state(self, entity_id: str, value, attributes: dict | None = None):
+        with self._lock:
+            state = self.states.get(entity_id)
+            if state is None:
+                state = make_state(entity_id, value, attributes)
+                self.states[entity_id] = state
+            state["state"] = str(value)
+            if attributes is not None:
+                state["attributes"] = attributes
+            state["last_updated"] = datetime.datetime.now(
+                datetime.timezone.utc
+            ).strftime(DATE_FORMAT)
+            return copy.deepcopy(state)
+
+    def call_service(self, domain: str, service: str, data: dict) -> list:
+        with self._lock:
+            self.service_calls.append((domain, service, data))
+        entity_id = data.get("entity_id")
+        if entity_id is None:
+            return []
+        if service == "set_value":
+            new_state = self._set_state(entity_id, data.get("value"))
+        elif service == "select_option":
+            new_state = self._set_state(entity_id, data.get("option"))
+        elif service in ["turn_on", "turn_off"]:
+            new_state = self._set_state(entity_id, service[len("turn_") :])
+        elif service == "set_datetime":
+            value = data.get("datetime", data.get("time", data.get("date")))
+            new_state = self._set_state(entity_id, value)
+        else:
+            return []
+        return [new_state]
+
+    def _make_handler(self):
+        ha = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _path(self) -> list[str]:
+                return [p for p in self.path.split("?")[0].split("/") if p]
+
+            def do_GET(self):
+                path = self._path()
+                if path == ["api"]:
+                    self._send(200, {"message": "API running."})
+                elif path == ["api", "config"]:
+                    self._send(200, ha.config)
+                elif path == ["api", "states"]:
+                    with ha._lock:
+                        self._send(200, list(ha.states.values()))
+                elif len(path) == 3 and path[:2] == ["api", "states"]:
+                    with ha._lock:
+                        state = ha.states.get(path[2])
+                    if state is None:
+                        self._send(404, {"message": "Entity not found."})
+                    else:
+                        self._send(200, state)
+                else:
+                    self._send(404, {"message": "Not found."})
+
+            def do_POST(self):
+                path = self._path()
+                length = int(self.headers.get("Content-Length") or 0)
+                data = json.loads(self.rfile.read(length) or b"{}") if length else {}
+                if len(path) == 3 and path[:2] == ["api", "states"]:
+                    self._send(
+                        200,
+                        ha._set_state(path[2], data.get("state"), data.get("attributes")),
+                    )
+                elif len(path) == 4 and path[:2] == ["api", "services"]:
+                    self._send(200, ha.call_service(path[2], path[3], data))
+                else:
+                    self._send(404, {"message": "Not found."})
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="dao_replay_ha", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def reset_singletons():
+    """
+    Vergeet de in dit proces geladen instellingen en database-verbindingen
+    """
+    from dao.lib.db_connections import reset_db_connections
+    from dao.prog.da_base import DaBase
+
+    with DaBase._init_lock:
+        DaBase._config = None
+        DaBase._loader = None
+    reset_db_connections()
+
+
+@contextmanager
+def _working_dir(path: str):
+    old_dir = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(old_dir)
+
+
+def _prepare_work_dir(work_dir: str, options: dict, port: int):
+    """
+    Maakt de mappen, instellingen, secrets en databases voor het naspelen
+    """
+    data_dir = os.path.join(work_dir, "data")
+    for sub_dir in ["log", "images", "replay", os.path.join("prediction", "models")]:
+        os.makedirs(os.path.join(data_dir, sub_dir), exist_ok=True)
+    os.makedirs(os.path.join(work_dir, "prog"), exist_ok=True)
+    options = copy.deepcopy(options)
+    options["homeassistant"] = {
+        "protocol_api": "http",
+        "ip_address": "127.0.0.1",
+        "ip_port": port,
+        "hasstoken": REPLAY_TOKEN,
+    }
+    options["database_da"] = {
+        "engine": "sqlite",
+        "db_path": "../data",
+        "database": "day_ahead.db",
+    }
+    options["database_ha"] = {
+        "engine": "sqlite",
+        "db_path": "../data",
+        "database": "home-assistant_v2.db",
+    }
+    options.setdefault("graphics", {})["show"] = "False"
+    with open(os.path.join(data_dir, "options.json"), "w") as f:
+        json.dump(options, f, indent=2, ensure_ascii=False)
+    secrets = {name: REPLAY_TOKEN for name in _secret_names(options)}
+    with open(os.path.join(data_dir, "secrets.json"), "w") as f:
+        json.dump(secrets, f)
+    # lege HA-database, de invoer komt uit de fixture
+    with sqlite3.connect(os.path.join(data_dir, "home-assistant_v2.db")) as conn:
+        conn.execute("PRAGMA user_version = 1")
+
+
+def replay_calculation(
+    fixture: dict | str,
+    work_dir: str | None = None,
+    keep_work_dir: bool = False,
+    live_model=None,
+    measure_relaxation: bool = False,
+) -> dict:
+    """
+    Speelt een vastgelegde berekening na
+    :param fixture: de fixture of de bestandsnaam ervan
+    :param work_dir: werkmap, default een tijdelijke map
+    :param keep_work_dir: werkmap na afloop laten staan (o.a. log en grafieken)
+    :param live_model: blijvend model (LiveModel) om hergebruik na te spelen
+    :param measure_relaxation: LP-relaxatie met en zonder afgeleide grenzen berekenen
+    :return: de kengetallen van de berekening (DaCalc.calc_stats) aangevuld met
+        de totale tijd en het aantal service-aanroepen naar HA
+    """
+    from dao.prog.check_db import CheckDB
+    from dao.prog.day_ahead import DaCalc
+
+    if isinstance(fixture, str):
+        fixture = load_fixture(fixture)
+    if work_dir is None:
+        work_dir = tempfile.mkdtemp(prefix="dao_replay_")
+    ha = ReplayHomeAssistant(fixture["ha_states"], fixture["ha_config"])
+    ha.start()
+    reset_singletons()
+    try:
+        _prepare_work_dir(work_dir, fixture["options"], ha.port)
+        with _working_dir(os.path.join(work_dir, "prog")):
+            CheckDB("../data/options.json").update_db_da()
+            start = time.perf_counter()
+            dacalc = DaCalc("../data/options.json")
+            dacalc.replay_inputs = CalcInputs(**fixture["inputs"])
+            dacalc.live_model = live_model
+            dacalc.measure_relaxation = measure_relaxation
+            dacalc.calc_optimum(
+                _start_dt=fixture["start_dt"],
+                _start_soc=fixture["start_soc"],
+                _start_ev_soc=fixture["start_ev_soc"],
+            )
+            dacalc.results_stage.wait()
+            result = dict(dacalc.calc_stats)
+            result["total_time"] = time.perf_counter() - start
+            result["service_calls"] = len(ha.service_calls)
+    finally:
+        ha.stop()
+        reset_singletons()
+        if not keep_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return result
+
+
+def run_benchmarks(
+    fixtures: dict, repeat: int = 1, solvers: list[str] | None = None
+) -> pd.DataFrame:
+    """
+    Speelt een reeks fixtures na
+    :param fixtures: per naam een fixture of bestandsnaam
+    :param repeat: aantal keren per fixture, de snelste run telt
+    :param solvers: iedere fixture met deze solvers ("cbc", "highs") naspelen,
+        default de solver uit de fixture
+    :return: dataframe met per fixture (en solver) de kengetallen
+    """
+    rows = []
+    for name, fixture in fixtures.items():
+        if isinstance(fixture, str):
+            fixture = load_fixture(fixture)
+        for solver in solvers or [None]:
+            if solver is not None:
+                fixture = copy.deepcopy(fixture)
+                fixture["options"]["solver"] = solver
+            runs = [replay_calculation(fixture) for _ in range(repeat)]
+            best = min(runs, key=lambda run: run.get("total_time", float("inf")))
+            rows.append({"fixture": name, **best})
+    columns = [
+        "fixture",
+        "solver",
+        "interval",
+        "intervals",
+        "variables",
+        "integer_variables",
+        "constraints",
+        "build_time",
+        "solve_time",
+        "total_time",
+        "objective",
+        "gap",
+        "nodes",
+        "status",
+    ]
+    result = pd.DataFrame(rows)
+    return result[[col for col in columns if col in result.columns]]
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return
+    solvers = None
+    names = []
+    for arg in sys.argv[1:]:
+        if arg.startswith("--solvers="):
+            solvers = arg[len("--solvers=") :].split(",")
+        else:
+            names.append(arg)
+    fixtures = {os.path.basename(name): name for name in names}
+    result = run_benchmarks(fixtures, solvers=solvers)
+    print(result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -17,7 +17,6 @@ import json
 import itertools
 import logging
 from sqlalchemy import (
-    Table,
     select,
     func,
     literal,
@@ -863,12 +862,8 @@ class Report(DaBase):
         :return: datum en tijd van het laatst aanwezige record
         """
 
-        statistics = Table(
-            "statistics", self.db_ha.metadata, autoload_with=self.db_ha.engine
-        )
-        statistics_meta = Table(
-            "statistics_meta", self.db_ha.metadata, autoload_with=self.db_ha.engine
-        )
+        statistics = self.db_ha.get_table("statistics")
+        statistics_meta = self.db_ha.get_table("statistics_meta")
         # Define aliases for the tables
         t1 = statistics.alias("t1")
         v1 = statistics_meta.alias("v1")
@@ -959,12 +954,8 @@ class Report(DaBase):
         # print(df_sensor)
         return df
         """
-        statistics = Table(
-            "statistics", self.db_ha.metadata, autoload_with=self.db_ha.engine
-        )
-        statistics_meta = Table(
-            "statistics_meta", self.db_ha.metadata, autoload_with=self.db_ha.engine
-        )
+        statistics = self.db_ha.get_table("statistics")
+        statistics_meta = self.db_ha.get_table("statistics_meta")
 
         # Define aliases for the tables
         t1 = statistics.alias("t1")
@@ -1270,23 +1261,15 @@ class Report(DaBase):
                 LIMIT 1;"
         data = self.db_da.run_select_query(sql)
         """
-        values_table = Table(
-            "values", self.db_da.metadata, autoload_with=self.db_da.engine
-        )
+        values_table = self.db_da.get_table("values")
         # Aliases for the values table
         t1 = values_table.alias("t1")
-        variabel_table = Table(
-            "variabel", self.db_da.metadata, autoload_with=self.db_da.engine
-        )
-        # Aliases for the variabel table
-        v1 = variabel_table.alias("v1")
 
         query = (
-            select(t1.c.time, v1.c.id, t1.c.value)
+            select(t1.c.time, t1.c.variabel, t1.c.value)
             .where(
                 and_(
-                    v1.c.code == code,
-                    t1.c.variabel == v1.c.id,
+                    t1.c.variabel == self.db_da.get_variabel_id(code),
                 )
             )
             .order_by(t1.c.time)
@@ -1613,16 +1596,9 @@ class Report(DaBase):
         )
         result = self.generate_df(vanaf, tot, periode_d["interval"], interval)
 
-        values_table = Table(
-            "values", self.db_da.metadata, autoload_with=self.db_da.engine
-        )
+        values_table = self.db_da.get_table("values")
         # Aliases for the values table
         t1 = values_table.alias("t1")
-        variabel_table = Table(
-            "variabel", self.db_da.metadata, autoload_with=self.db_da.engine
-        )
-        # Aliases for the variabel table
-        v1 = variabel_table.alias("v1")
         groupby_str = interval
         if interval == "maand":
             column = self.db_da.month(t1.c.time).label("maand")
@@ -1685,8 +1661,7 @@ class Report(DaBase):
                 )
                 .where(
                     and_(
-                        v1.c.code == key,
-                        t1.c.variabel == v1.c.id,
+                        t1.c.variabel == self.db_da.get_variabel_id(key),
                         t1.c.time
                         >= self.db_da.unix_timestamp(
                             vanaf.strftime("%Y-%m-%d %H:%M:%S")
@@ -1796,9 +1771,7 @@ class Report(DaBase):
                           "AND t1.`time` < UNIX_TIMESTAMP('" + str(tot) + "');"
                 prog_result = self.db_da.run_select_query(sql)
                 """
-                prog_table = Table(
-                    "prognoses", self.db_da.metadata, autoload_with=self.db_da.engine
-                )
+                prog_table = self.db_da.get_table("prognoses")
                 p1 = prog_table.alias("p1")
                 # Build the SQLAlchemy query
                 """
@@ -1811,8 +1784,7 @@ class Report(DaBase):
                 )
                 .where(
                     and_(
-                        v1.c.code == key,
-                        t1.c.variabel == v1.c.id,
+                        t1.c.variabel == self.db_da.get_variabel_id(key),
                         t1.c.time
                         >= self.db_da.unix_timestamp(
                             vanaf.strftime("%Y-%m-%d %H:%M:%S")
@@ -1832,8 +1804,7 @@ class Report(DaBase):
                     )
                     .where(
                         and_(
-                            v1.c.code == key,
-                            p1.c.variabel == v1.c.id,
+                            p1.c.variabel == self.db_da.get_variabel_id(key),
                             p1.c.time
                             >= self.db_da.unix_timestamp(
                                 last_moment.strftime("%Y-%m-%d %H:%M:%S")
@@ -1886,16 +1857,9 @@ class Report(DaBase):
         :param table: str name of database table: values (default) or prognoses
         :return:  resulting dataframe
         """
-        values_table = Table(
-            table, self.db_da.metadata, autoload_with=self.db_da.engine
-        )
+        values_table = self.db_da.get_table(table)
         # Aliases for the values table
         t1 = values_table.alias("t1")
-        variabel_table = Table(
-            "variabel", self.db_da.metadata, autoload_with=self.db_da.engine
-        )
-        # Aliases for the variabel table
-        v1 = variabel_table.alias("v1")
         column = self.db_da.hour(t1.c.time).label("uur")
         column2 = func.min(self.db_da.from_unixtime(t1.c.time)).label("tijd")
         if rep_interval == "maand":
@@ -1924,8 +1888,7 @@ class Report(DaBase):
             )
             .where(
                 and_(
-                    v1.c.code == key,
-                    t1.c.variabel == v1.c.id,
+                    t1.c.variabel == self.db_da.get_variabel_id(key),
                     t1.c.time
                     >= self.db_da.unix_timestamp(vanaf.strftime("%Y-%m-%d %H:%M:%S")),
                     t1.c.time
@@ -2048,17 +2011,9 @@ class Report(DaBase):
         :return: een dataframe met de gevraagde griddata
         """
 
-        values_table = Table(
-            "values", self.db_da.metadata, autoload_with=self.db_da.engine
-        )
+        values_table = self.db_da.get_table("values")
         # Aliases for the values table
         t1 = values_table.alias("t1")
-        variabel_table = Table(
-            "variabel", self.db_da.metadata, autoload_with=self.db_da.engine
-        )
-        # Aliases for the variabel table
-        v1 = variabel_table.alias("v1")
-        v2 = variabel_table.alias("v2")
 
         if periode == "":
             vanaf = _vanaf
@@ -2094,8 +2049,7 @@ class Report(DaBase):
                     )
                     .where(
                         and_(
-                            t1.c.variabel == v1.c.id,
-                            v1.c.code == cat,
+                            t1.c.variabel == self.db_da.get_variabel_id(cat),
                             t1.c.time
                             >= self.db_da.unix_timestamp(
                                 vanaf.strftime("%Y-%m-%d %H:%M:%S")
@@ -2153,8 +2107,7 @@ class Report(DaBase):
                 )
                 .where(
                     and_(
-                        v1.c.code == "da",
-                        t1.c.variabel == v1.c.id,
+                        t1.c.variabel == self.db_da.get_variabel_id("da"),
                         t1.c.time
                         >= self.db_da.unix_timestamp(
                             last_moment.strftime("%Y-%m-%d %H:%M:%S")
@@ -2216,11 +2169,7 @@ class Report(DaBase):
             if source == "all" or source == "da":
                 if last_moment < tot:
                     # get prognose consumption and production:
-                    prog_table = Table(
-                        "prognoses",
-                        self.db_da.metadata,
-                        autoload_with=self.db_da.engine,
-                    )
+                    prog_table = self.db_da.get_table("prognoses")
                     p1 = prog_table.alias("p1")
                     p2 = prog_table.alias("p2")
                     # Build the SQLAlchemy query
@@ -2232,10 +2181,8 @@ class Report(DaBase):
                     ).where(
                         and_(
                             p1.c.time == p2.c.time,
-                            p1.c.variabel == v1.c.id,
-                            v1.c.code == "cons",
-                            p2.c.variabel == v2.c.id,
-                            v2.c.code == "prod",
+                            p1.c.variabel == self.db_da.get_variabel_id("cons"),
+                            p2.c.variabel == self.db_da.get_variabel_id("prod"),
                             p1.c.time
                             >= self.db_da.unix_timestamp(
                                 last_moment.strftime("%Y-%m-%d %H:%M:%S")
@@ -2744,12 +2691,8 @@ class Report(DaBase):
             ORDER BY t1.`start_ts`;"
         df = self.db_ha.run_select_query(sql)
         """
-        statistics = Table(
-            "statistics", self.db_ha.metadata, autoload_with=self.db_ha.engine
-        )
-        statistics_meta = Table(
-            "statistics_meta", self.db_ha.metadata, autoload_with=self.db_ha.engine
-        )
+        statistics = self.db_ha.get_table("statistics")
+        statistics_meta = self.db_ha.get_table("statistics_meta")
 
         # Define aliases for the tables
         t1 = statistics.alias("t1")
@@ -3131,22 +3074,15 @@ class Report(DaBase):
         self.add_col_df(df_solar, result, "gemeten", "gemeten_prod")
 
         # voorspelling DAO
-        pred_dao = []
-        for row in result.itertuples():
-            if pd.notna(row.tijd):
-                straling = row.gemeten_straling
-                if pd.isna(straling):
-                    straling = row.prognose_straling
-                if pd.notna(straling):
-                    prod = self.calc_prod_solar(
-                        device, row.tijd.timestamp(), straling, 1
-                    )
-                else:
-                    prod = pd.NA
-            else:
-                prod = pd.NA
-            pred_dao.append(prod)
-        result["prognose_dao"] = pred_dao
+        straling = result["gemeten_straling"].fillna(result["prognose_straling"])
+        valid = result["tijd"].notna() & straling.notna()
+        result["prognose_dao"] = pd.NA
+        if valid.any():
+            utc_time = [dati.timestamp() for dati in result.loc[valid, "tijd"]]
+            prod = self.calc_prod_solar_array(
+                [device], utc_time, straling[valid].to_numpy(dtype=float), 1
+            )[0]
+            result.loc[valid, "prognose_dao"] = prod
 
         # voorspelling ML
 
@@ -3238,45 +3174,17 @@ class Report(DaBase):
     def get_pv_prognose(
             self, field: str, vanaf: datetime.datetime, tot: datetime.datetime
     ) -> pd.DataFrame:
-        df_result = pd.DataFrame()
         if field == "pv_ac":
-            solar_num = len(self.solar)
-            for s in range(solar_num):
-                solar_option = self.solar[s]
-                df_data = self.calc_solar_predictions(
-                    solar_option, vanaf, tot, interval="1hour"
-                )
-                if s == 0:
-                    df_result = df_data
-                else:
-                    df_result["prediction"] = (
-                            df_result["prediction"] + df_data["prediction"]
-                    )
-            df_result = df_result.rename(
-                columns={"prediction": field, "date_time": "time"}
-            )
+            solar_options = list(self.solar)
         else:  # pv_dc
-            battery_options = self.config.battery
-            B = len(battery_options)
-            count = 0
-            for b in range(B):
-                solar_options = battery_options[b].solar
-                solar_num = len(solar_options)
-                for s in range(solar_num):
-                    solar_option = solar_options[s]
-                    df_data = self.calc_solar_predictions(
-                        solar_option, vanaf, tot, interval="1hour"
-                    )
-                    if count == 0:
-                        df_result = df_data
-                    else:
-                        df_result["prediction"] = (
-                                df_result["prediction"] + df_data["prediction"]
-                        )
-                    count += 1
-            df_result = df_result.rename(
-                columns={"prediction": field, "date_time": "time"}
-            )
+            solar_options = []
+            for battery_option in self.config.battery:
+                solar_options += list(battery_option.solar)
+        df_data = self.calc_solar_predictions_all(
+            solar_options, vanaf, tot, interval="1hour"
+        )
+        df_result = df_data[["tijd"]].copy()
+        df_result[field] = df_data.drop(columns=["tijd"]).sum(axis=1, skipna=False)
         df_result["time"] = df_result["tijd"]
         df_result["datasoort"] = "expected"
         # df_result["time_ts"] = df_result["time"].apply(lambda x: int(x.timestamp()))
@@ -3429,11 +3337,9 @@ class Report(DaBase):
         return report_data
 
     def get_vars(self):
-        metadata = self.db_da.metadata
-        engine = self.db_da.engine
-        variabel = Table("variabel", metadata, autoload_with=engine)
-        prognoses = Table("prognoses", metadata, autoload_with=engine)
-        values = Table("values", metadata, autoload_with=engine)
+        variabel = self.db_da.get_table("variabel")
+        prognoses = self.db_da.get_table("prognoses")
+        values = self.db_da.get_table("values")
 
         gebruikte_variabelen = union(
             select(prognoses.c.variabel),
@@ -3537,12 +3443,8 @@ class Report(DaBase):
             step: datetime.timedelta,
             var_codes: list = None
     ):
-        statistics = Table(
-            "statistics", self.db_ha.metadata, autoload_with=self.db_ha.engine
-        )
-        statistics_meta = Table(
-            "statistics_meta", self.db_ha.metadata, autoload_with=self.db_ha.engine
-        )
+        statistics = self.db_ha.get_table("statistics")
+        statistics_meta = self.db_ha.get_table("statistics_meta")
 
         intervals_cte = self.create_interval_cte(
             start=start,
@@ -3617,12 +3519,10 @@ class Report(DaBase):
             step: datetime.timedelta,
             var_codes: list = None
     ):
-        metadata = self.db_da.metadata
-        engine = self.db_da.engine
 
-        variabel = Table("variabel", metadata, autoload_with=engine)
-        values_table = Table("values", metadata, autoload_with=engine)
-        prognoses = Table("prognoses", metadata, autoload_with=engine)
+        variabel = self.db_da.get_table("variabel")
+        values_table = self.db_da.get_table("values")
+        prognoses = self.db_da.get_table("prognoses")
 
         intervals_cte = self.create_interval_cte(
             start=start,
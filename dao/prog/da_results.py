@@ -0,0 +1,46 @@
+"""
+Uitlezen van de oplossing van de optimalisering.
+De waarden van alle variabelen worden in een keer uit het model gelezen; daarna
+wordt per familie variabelen (bv. ac_to_dc[b][u]) een numpy-array gemaakt, zodat de
+resultaten (overzichten, prognoses en grafieken) kolomsgewijs en zonder lussen
+over de intervallen kunnen worden opgebouwd.
+"""
+
+import numbers
+
+import numpy as np
+from mip import Var
+
+
+class Solution:
+    def __init__(self, model):
+        """
+        :param model: het opgeloste model (mip.Model of LiveModel)
+        """
+        variables = model.vars
+        self.values = np.fromiter(
+            (var.x for var in variables), dtype=float, count=len(variables)
+        )
+
+    def get(self, variables, shape: int | tuple | None = None) -> np.ndarray:
+        """
+        :param variables: (geneste) lijst of array met variabelen, een getal in
+            plaats van een variabele wordt ongewijzigd overgenomen
+        :param shape: vorm van het resultaat, bv (B, U); nodig als een dimensie
+            leeg kan zijn
+        :return: array met de waarden van de variabelen in de oplossing
+        """
+        items = np.empty(0, dtype=object)
+        if len(variables) > 0:
+            items = np.asarray(variables, dtype=object).ravel()
+        result = np.empty(len(items), dtype=float)
+        for i, item in enumerate(items.tolist()):
+            if isinstance(item, Var):
+                result[i] = self.values[item.idx]
+            elif isinstance(item, numbers.Real):
+                result[i] = item
+            else:
+                raise TypeError(f"Geen variabele of getal: {item!r}")
+        if shape is not None:
+            result = result.reshape(shape)
+        return result
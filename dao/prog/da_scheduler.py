@@ -2,6 +2,8 @@ import datetime
 import sys
 import time
 from da_base import DaBase
+from dao.prog.da_live_model import LiveModel
+from dao.prog.da_dispatch import Dispatcher
 
 
 class DaScheduler(DaBase):
@@ -11,12 +13,23 @@ class DaScheduler(DaBase):
         self.scheduler_tasks = {
             entry.time: entry.action for entry in self.config.scheduler.schedule
         }
+        if self.config.scheduler.live_model:
+            # het model van de optimalisering blijft tussen de berekeningen bestaan
+            self.live_model = LiveModel()
+        # een berekening met ongewijzigde invoer overslaan
+        self.skip_unchanged = self.config.scheduler.skip_unchanged
+        self.dispatcher = None
+        if self.config.scheduler.dispatch_interval > 0:
+            # bijsturen tussen de berekeningen, in een eigen thread
+            self.dispatcher = Dispatcher(self, self.config.scheduler.dispatch_interval)
 
     def scheduler(self):
         # if not (self.notification_entity is None) and self.notification_opstarten:
         #     self.set_value(self.notification_entity, "DAO scheduler gestart " +
         #                    datetime.datetime.now().strftime('%d-%m-%Y %H:%M:%S'))
 
+        if self.dispatcher is not None:
+            self.dispatcher.start()
         while True:
             t = datetime.datetime.now()
             next_min = t - datetime.timedelta(
@@ -0,0 +1,121 @@
+"""
+De zonnepanelen aan de ac-kant in de optimaliseringsberekening.
+De opwekking van een installatie volgt de prognose. Een installatie met een
+schakelaar (entity pv switch) kan per interval worden uitgezet, bijvoorbeeld bij
+een negatieve prijs voor teruglevering; zonder schakelaar staat ze altijd aan.
+"""
+
+import logging
+
+import numpy as np
+from mip import xsum, BINARY, CONTINUOUS
+
+from dao.prog.da_components import CalcContext, Component
+
+
+def switch_pv(ha, entity_pv_switch: str, pv_on: bool, pv_name: str):
+    """
+    Zet de schakelaar van een installatie aan of uit als die anders staat
+    :param ha: de berekening (DaBase)
+    :param entity_pv_switch: entity van de schakelaar
+    :param pv_on: True als de installatie aan moet
+    :param pv_name: naam van de installatie, voor het log
+    """
+    switch_state = ha.get_state(entity_pv_switch).state
+    if pv_on:
+        if switch_state == "off":
+            if ha.debug:
+                logging.info(f"PV {pv_name} zou zijn aangezet")
+            else:
+                ha.turn_on(entity_pv_switch)
+                logging.info(f"PV {pv_name} aangezet")
+    else:
+        if switch_state == "on":
+            if ha.debug:
+                logging.info(f"PV {pv_name} zou zijn uitgezet")
+            else:
+                ha.turn_off(entity_pv_switch)
+                logging.info(f"PV {pv_name} uitgezet")
+
+
+class SolarComponent(Component):
+    name = "solar"
+
+    def prepare(self, ctx: CalcContext) -> bool:
+        calc = ctx.calc
+        self.solar_num = len(calc.solar)
+        if self.solar_num == 0:
+            return False
+        self.solar_prod = ctx.solar_prod
+        self.entity_pv_ac_switch = []
+        for s in range(self.solar_num):
+            entity = calc.solar[s].entity_pv_switch
+            if entity == "":
+                entity = None
+            self.entity_pv_ac_switch.append(entity)
+        return True
+
+    def build(self, model, ctx: CalcContext):
+        U = ctx.U
+        solar_prod = self.solar_prod
+        # introduce maximum power for inverter
+        self.pv_ac = [
+            [
+                model.add_var(
+                    var_type=CONTINUOUS,
+                    lb=0,
+                    ub=solar_prod[s][u],
+                )
+                for u in range(U)
+            ]
+            for s in range(self.solar_num)
+        ]
+        self.pv_ac_on_off = [
+            [model.add_var(var_type=BINARY) for _ in range(U)]
+            for _ in range(self.solar_num)
+        ]
+
+        # constraints
+        for s in range(self.solar_num):
+            for u in range(U):
+                model += self.pv_ac[s][u] == solar_prod[s][u] * self.pv_ac_on_off[s][u]
+        for s in range(self.solar_num):
+            if self.entity_pv_ac_switch[s] is None:
+                for u in range(U):
+                    model += self.pv_ac_on_off[s][u] == 1
+
+    def consumption(self, u: int):
+        return -xsum(self.pv_ac[s][u] for s in range(self.solar_num))
+
+    def max_production(self, u: int) -> float:
+        return sum(self.pv_ac[s][u].ub for s in range(self.solar_num))
+
+    def extract(self, solution, ctx: CalcContext):
+        U = ctx.U
+        # totale netto pv_ac productie origineel
+        self.pv_org_x = (
+            np.array(
+                [self.solar_prod[s][:U] for s in range(self.solar_num)], dtype=float
+            )
+            .reshape(-1, U)
+            .sum(axis=0)
+        )
+        # totale netto pv_ac productie na optimalisatie
+        self.pv_opt_x = solution.get(self.pv_ac, (self.solar_num, U)).sum(axis=0)
+
+    def setpoint(self, u: int, ctx: CalcContext) -> dict:
+        # zonder opwekking staat de schakelaar aan
+        return {
+            "pv_ac_on": [
+                bool(self.pv_ac_on_off[s][u].x == 1.0 or self.solar_prod[s][u] == 0.0)
+                for s in range(self.solar_num)
+            ]
+        }
+
+    def actuate(self, ha, ctx: CalcContext):
+        self.actuate_setpoint(ha, self.setpoint(0, ctx))
+
+    def actuate_setpoint(self, ha, setpoint: dict):
+        for solar, pv_on in zip(ha.solar, setpoint.get("pv_ac_on", [])):
+            if solar.entity_pv_switch:
+                switch_pv(ha, solar.entity_pv_switch, pv_on, solar.name)
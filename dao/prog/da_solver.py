@@ -0,0 +1,183 @@
+"""
+Solver voor de optimaliseringsberekening: CBC of HiGHS (via python-mip).
+Het model wordt voor beide solvers op dezelfde manier opgebouwd;
+HiGHS kent geen SOS-constraints, die worden daarom met binaire variabelen
+geformuleerd. Na het rekenen levert solve_stats voor beide solvers dezelfde
+kengetallen (status, doelfunctie, ondergrens, gap en aantal nodes).
+"""
+
+import logging
+import numbers
+
+from mip import Model, Var, xsum, BINARY, CBC, INF, OptimizationStatus
+
+SOLVER_NAMES = {"cbc": CBC, "highs": "HiGHS"}
+
+
+def highs_available() -> bool:
+    """
+    :return: True als python-mip de HiGHS-bibliotheek (highspy) kan laden
+    """
+    try:
+        import mip.highs
+
+        return mip.highs.has_highs
+    except Exception:
+        return False
+
+
+def make_model(solver: str = "cbc") -> Model:
+    """
+    Maakt een leeg model voor de gekozen solver,
+    als HiGHS niet beschikbaar is wordt CBC gebruikt
+    :param solver: "cbc" of "highs"
+    """
+    if solver == "highs" and not highs_available():
+        logging.warning("HiGHS (highspy) is niet beschikbaar, er wordt met CBC gerekend")
+        solver = "cbc"
+    return Model(solver_name=SOLVER_NAMES[solver])
+
+
+def is_highs(model) -> bool:
+    return model.solver_name.upper() == "HIGHS"
+
+
+def add_sos(model, sos: list[tuple[Var, numbers.Real]], sos_type: int):
+    """
+    Voegt een SOS-constraint (type 1 of 2) toe.
+    Bij HiGHS wordt de SOS met binaire variabelen geformuleerd:
+    type 1: hoogstens een variabele ongelijk aan 0
+    type 2: hoogstens twee naast elkaar liggende variabelen (volgorde van de gewichten)
+    :param model: mip.Model of LiveModel
+    :param sos: lijst met (variabele, gewicht)
+    :param sos_type: 1 of 2
+    """
+    if not is_highs(model):
+        model.add_sos(sos, sos_type)
+    else:
+        add_sos_binary(model, sos, sos_type)
+
+
+def add_sos_binary(model, sos: list[tuple[Var, numbers.Real]], sos_type: int):
+    """
+    SOS-constraint met binaire variabelen, voor solvers zonder SOS (HiGHS)
+    :param model: mip.Model of LiveModel
+    :param sos: lijst met (variabele, gewicht), de variabelen hebben een bovengrens
+    :param sos_type: 1 of 2
+    """
+    variables = [var for var, _ in sorted(sos, key=lambda item: item[1])]
+    n = len(variables)
+    if n <= sos_type:
+        return
+    ub = [var.ub for var in variables]
+    if any(bound >= INF for bound in ub):
+        raise ValueError("SOS-variabelen zonder bovengrens kunnen niet worden omgezet")
+    if sos_type == 1:
+        select = [model.add_var(var_type=BINARY) for _ in range(n)]
+        for i in range(n):
+            model += variables[i] <= ub[i] * select[i]
+    else:
+        # select[j]: segment tussen variabele j en j + 1
+        select = [model.add_var(var_type=BINARY) for _ in range(n - 1)]
+        for i in range(n):
+            segments = [select[j] for j in (i - 1, i) if 0 <= j < n - 1]
+            model += variables[i] <= ub[i] * xsum(segments)
+    model += xsum(select) <= 1
+
+
+def configure(model, max_gap: float, max_nodes: int = 1500, verbose: bool = False):
+    """
+    Zet de instellingen van de solver
+    :param model: mip.Model of LiveModel
+    :param max_gap: maximale absolute gap in euro
+    :param max_nodes: maximaal aantal nodes in de branch and bound
+    :param verbose: uitvoer van de solver tonen
+    """
+    model.max_mip_gap_abs = max_gap
+    model.max_nodes = max_nodes
+    if verbose:
+        model.verbose = 1
+    if not is_highs(model):
+        model.threads = -1  # use all available cores
+
+
+def optimize(model, max_seconds: float | None = None) -> str | None:
+    """
+    Rekent het model door met een maximale rekentijd. Is de rekentijd om,
+    dan wordt de beste tot dan toe gevonden oplossing (incumbent) gebruikt.
+    :param model: mip.Model of LiveModel
+    :param max_seconds: maximale rekentijd in seconden, None: onbeperkt
+    :return: "optimal", "incumbent" of None als er geen oplossing is
+    """
+    if max_seconds is None:
+        status = model.optimize()
+    else:
+        status = model.optimize(max_seconds=max_seconds)
+    if model.num_solutions == 0:
+        return None
+    if status == OptimizationStatus.OPTIMAL:
+        return "optimal"
+    logging.warning(
+        f"Geen optimale oplossing binnen de rekentijd (status {status.name}), "
+        f"de beste gevonden oplossing wordt gebruikt"
+    )
+    return "incumbent"
+
+
+def no_solution_reason(model) -> str:
+    """
+    :param model: mip.Model of LiveModel, na optimize zonder oplossing
+    :return: "infeasible" als het model geen oplossing heeft, anders "timeout"
+        (geen oplossing gevonden binnen de rekentijd)
+    """
+    if model.status in (
+        OptimizationStatus.INFEASIBLE,
+        OptimizationStatus.INT_INFEASIBLE,
+    ):
+        return "infeasible"
+    return "timeout"
+
+
+def _node_count(model) -> int | None:
+    try:
+        if is_highs(model):
+            import mip.highs
+
+            # privé-attributen van mip.highs.SolverHighs (zo in mip 1.17.6 en 2.0.0),
+            # ontbreken ze in een andere versie dan geen aantal nodes
+            solver = model.solver
+            lib = getattr(solver, "_lib", None)
+            highs = getattr(solver, "_model", None)
+            if lib is None or highs is None:
+                return None
+            value = mip.highs.ffi.new("int64_t*")
+            lib.Highs_getInt64InfoValue(highs, "mip_node_count".encode("UTF-8"), value)
+            return int(value[0])
+    except Exception:
+        return None
+    # de C-interface van CBC geeft het aantal nodes niet door
+    return None
+
+
+def solve_stats(model) -> dict:
+    """
+    Kengetallen van de laatste berekening, voor CBC en HiGHS gelijk
+    :return: dict met solver, status, objective, bound, gap en nodes
+    """
+    stats = {
+        "solver": "highs" if is_highs(model) else "cbc",
+        "status": model.status.name,
+        "objective": None,
+        "bound": None,
+        "gap": None,
+        "nodes": _node_count(model),
+    }
+    if model.num_solutions > 0:
+        stats["objective"] = model.objective_value
+        try:
+            stats["bound"] = model.objective_bound
+        except Exception:
+            stats["bound"] = None
+        if stats["bound"] is not None:
+            stats["gap"] = abs(stats["objective"] - stats["bound"])
+    return stats
@@ -0,0 +1,132 @@
+"""
+Telemetrie van de optimaliseringsberekening.
+Na iedere berekening worden de kengetallen van de solver (DaCalc.calc_stats) als
+record in tabel "telemetry" van de DAO-database opgeslagen: omvang van het model,
+ophaal-, bouw- en rekentijd, nodes, gap, doelfunctie en status. In het dashboard
+(v2/telemetry) en via /v2/api/telemetry/ zijn deze in de tijd te volgen, zodat
+zichtbaar wordt wanneer de rekentijd richting de periode van de scheduler loopt.
+"""
+
+import logging
+
+from sqlalchemy import (
+    Table,
+    Column,
+    Integer,
+    BigInteger,
+    Float,
+    String,
+    MetaData,
+    select,
+    insert,
+)
+
+TELEMETRY_TABLE = "telemetry"
+
+# velden uit calc_stats die ongewijzigd worden opgeslagen
+TELEMETRY_FIELDS = (
+    "interval",
+    "intervals",
+    "variables",
+    "integer_variables",
+    "constraints",
+    "input_time",
+    "build_time",
+    "solve_time",
+    "nodes",
+    "gap",
+    "objective",
+    "status",
+    "solver",
+    "plan_source",
+)
+
+
+def telemetry_table(metadata: MetaData) -> Table:
+    """
+    :param metadata: MetaData van de database
+    :return: de definitie van tabel "telemetry"
+    """
+    return Table(
+        TELEMETRY_TABLE,
+        metadata,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("time", BigInteger, nullable=False, index=True),
+        Column("interval", String(10)),
+        Column("intervals", Integer),
+        Column("variables", Integer),
+        Column("integer_variables", Integer),
+        Column("constraints", Integer),
+        Column("input_time", Float),
+        Column("build_time", Float),
+        Column("solve_time", Float),
+        # rekentijd per stap van de strategie, gescheiden door komma's
+        Column("stage_times", String(100)),
+        Column("nodes", Integer),
+        Column("gap", Float),
+        Column("objective", Float),
+        Column("status", String(20)),
+        Column("solver", String(10)),
+        Column("plan_source", String(20)),
+        sqlite_autoincrement=True,  # Ensure SQLite uses AUTOINCREMENT
+    )
+
+
+def telemetry_record(calc_stats: dict, moment: int) -> dict:
+    """
+    :param calc_stats: kengetallen van de berekening (DaCalc.calc_stats)
+    :param moment: utc-timestamp van de berekening
+    :return: record voor tabel "telemetry"
+    """
+    record = {"time": int(moment)}
+    for name in TELEMETRY_FIELDS:
+        record[name] = calc_stats.get(name)
+    stage_times = calc_stats.get("stage_times")
+    if stage_times:
+        record["stage_times"] = ",".join(f"{t:.3f}" for t in stage_times)
+    else:
+        record["stage_times"] = None
+    return record
+
+
+def save_telemetry(db_da, record: dict) -> bool:
+    """
+    Slaat een record op in tabel "telemetry", een fout wordt alleen gelogd:
+    de berekening zelf mag er niet op stuk gaan
+    :param db_da: DBmanagerObj van de DAO-database
+    :param record: zie telemetry_record
+    :return: True als het record is opgeslagen
+    """
+    try:
+        table = db_da.get_table(TELEMETRY_TABLE)
+        with db_da.engine.begin() as connection:
+            connection.execute(insert(table).values(**record))
+    except Exception as ex:
+        logging.warning(f"Telemetrie van de berekening niet opgeslagen: {ex}")
+        return False
+    return True
+
+
+def get_telemetry(db_da, start: int, end: int | None = None) -> list[dict]:
+    """
+    :param db_da: DBmanagerObj van de DAO-database
+    :param start: utc-timestamp, vanaf
+    :param end: utc-timestamp, tot (niet inbegrepen), None: tot nu
+    :return: de records in volgorde van tijd, stage_times als lijst met floats
+    """
+    table = db_da.get_table(TELEMETRY_TABLE)
+    query = select(table).where(table.c.time >= start)
+    if end is not None:
+        query = query.where(table.c.time < end)
+    query = query.order_by(table.c.time)
+    with db_da.engine.connect() as connection:
+        rows = connection.execute(query).mappings().all()
+    result = []
+    for row in rows:
+        record = dict(row)
+        stage_times = record["stage_times"]
+        record["stage_times"] = (
+            [] if not stage_times else [float(t) for t in stage_times.split(",")]
+        )
+        result.append(record)
+    return result
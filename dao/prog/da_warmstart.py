@@ -0,0 +1,102 @@
+"""
+Warme start van het MIP-model.
+De binaire beslissingen (aan/uit) van de vorige berekening worden bewaard per tijdstip.
+Bij een volgende berekening worden ze, verschoven naar het nieuwe tijdvenster,
+als startoplossing (model.start) aan de solver meegegeven.
+"""
+
+import datetime as dt
+import json
+import logging
+import os
+
+from mip import Model, Var
+
+
+class MipWarmStart:
+    def __init__(
+        self,
+        file_name: str = "../data/mip_start.json",
+        max_age: dt.timedelta = dt.timedelta(hours=24),
+    ):
+        """
+        :param file_name: bestand waarin de vorige oplossing wordt bewaard
+        :param max_age: een oplossing ouder dan max_age wordt niet meer gebruikt
+        """
+        self.file_name = file_name
+        self.max_age = max_age
+        # per groep: lijst van (tijdstip, variabele)
+        self.groups: dict[str, list[tuple[dt.datetime, Var]]] = {}
+
+    def add_group(self, name: str, times: list, variables: list[Var]):
+        """
+        Registreert een groep binaire variabelen
+        :param name: unieke naam van de groep, bv "ac_to_dc_on_0"
+        :param times: lijst met tijdstippen (datetime), een per variabele
+        :param variables: lijst met variabelen, None: geen variabele op dat tijdstip
+        """
+        self.groups[name] = [
+            (moment, var) for moment, var in zip(times, variables) if var is not None
+        ]
+
+    def _read(self) -> dict:
+        if not os.path.isfile(self.file_name):
+            return {}
+        try:
+            with open(self.file_name, "r") as f:
+                data = json.load(f)
+        except Exception as ex:
+            logging.warning(f"Vorige oplossing kan niet worden gelezen: {ex}")
+            return {}
+        saved = dt.datetime.fromisoformat(data.get("saved", "2000-01-01T00:00:00"))
+        if dt.datetime.now() - saved > self.max_age:
+            logging.info("Vorige oplossing is te oud voor een warme start")
+            return {}
+        return data.get("groups", {})
+
+    def apply(self, model: Model) -> int:
+        """
+        Zet de vorige oplossing, verschoven naar de tijdstippen van het nieuwe model,
+        als startoplossing van het model
+        :param model: het mip-model
+        :return: aantal variabelen met een startwaarde
+        """
+        stored = self._read()
+        if len(stored) == 0:
+            return 0
+        start = []
+        total = 0
+        for name, group in self.groups.items():
+            total += len(group)
+            values = stored.get(name)
+            if values is None:
+                continue
+            for moment, var in group:
+                value = values.get(moment.isoformat())
+                if value is not None:
+                    start.append((var, float(value)))
+        if len(start) > 0:
+            model.start = start
+        logging.info(
+            f"Warme start: {len(start)} van {total} binaire variabelen "
+            f"uit de vorige berekening"
+        )
+        return len(start)
+
+    def save(self):
+        """
+        Bewaart de gevonden oplossing van alle geregistreerde groepen
+        """
+        groups = {}
+        for name, group in self.groups.items():
+            values = {}
+            for moment, var in group:
+                if var.x is not None:
+                    values[moment.isoformat()] = int(round(var.x))
+            groups[name] = values
+        data = {"saved": dt.datetime.now().isoformat(), "groups": groups}
+        try:
+            with open(self.file_name, "w") as f:
+                json.dump(data, f)
+        except Exception as ex:
+            logging.warning(f"Oplossing kan niet worden bewaard: {ex}")
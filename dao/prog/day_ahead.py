@@ -9,21 +9,69 @@ import datetime as dt
 import time
 import sys
 import math
+import numpy as np
 import pandas as pd
-from mip import Model, xsum, minimize, BINARY, CONTINUOUS, INTEGER
-from pandas.core.dtypes.inference import is_number
+from mip import xsum, minimize, BINARY, CONTINUOUS
 from dao.prog.da_report import Report
+from dao.prog.da_warmstart import MipWarmStart
+from dao.prog.da_inputs import gather_calc_inputs
+from dao.prog.da_replay import capture_calculation
+from dao.prog.da_live_model import LiveModelMismatch
+from dao.prog.da_solver import (
+    make_model,
+    configure,
+    optimize,
+    no_solution_reason,
+    solve_stats,
+)
+from dao.prog.da_fallback import FallbackPlan
+from dao.prog.da_fingerprint import (
+    Tolerances,
+    compare_fingerprints,
+    config_hash,
+    resolve_flex_values,
+    vector,
+)
+from dao.prog.da_bounds import BoundPass, log_relaxation_gap
+from dao.prog.da_solar import SolarComponent
+from dao.prog.da_battery import BatteryComponent
+from dao.prog.da_boiler import BoilerComponent
+from dao.prog.da_ev import EvComponent
+from dao.prog.da_heating import HeatingComponent
+from dao.prog.da_machines import MachinesComponent
+from dao.prog.da_components import CalcContext, ComponentPipeline
+from dao.prog.da_telemetry import telemetry_record, save_telemetry
+from dao.prog.da_results import Solution
+from dao.prog.da_horizon import (
+    COARSE_INTERVAL_S,
+    horizon_steps,
+    step_starts,
+    merge_rows,
+    merge_values,
+    expand_rows,
+)
 from utils import (
     interpolate,
-    convert_timestr,
-    calc_uur_index,
     error_handling,
-    calc_adjustment_heatcurve,
 )
 import logging
 from dao.prog.da_base import DaBase
 
 
+def device_components() -> list:
+    """
+    :return: de componenten van de apparaten in de volgorde van de berekening
+    """
+    return [
+        SolarComponent(),
+        BatteryComponent(),
+        BoilerComponent(),
+        EvComponent(),
+        HeatingComponent(),
+        MachinesComponent(),
+    ]
+
+
 class DaCalc(DaBase):
     def __init__(self, file_name=None):
         super().__init__(file_name=file_name)
@@ -47,6 +95,23 @@ class DaCalc(DaBase):
         self.grid_max_power = self.config.grid.max_power
         self.grid = self.config.grid
         self.machines = self.config.machines
+        # variabele resolutie: aantal uren met volledige resolutie en daarna blokken
+        self.fine_horizon = self.config.fine_horizon
+        # solver van de optimalisering: cbc of highs
+        self.solver = self.config.solver
+        self.coarse_interval_s = COARSE_INTERVAL_S[self.config.coarse_interval]
+        # bewaar de invoer van de berekening als fixture (zie da_replay)
+        self.capture = False
+        # bij naspelen: de vastgelegde invoer in plaats van gather_calc_inputs
+        self.replay_inputs = None
+        # kengetallen van de laatste berekening (modelbouw, rekentijd, omvang)
+        self.calc_stats = {}
+        # invoer van de laatste berekening, voor een herberekening
+        # als het blijvende model niet kan worden hergebruikt
+        self.calc_inputs = None
+        # LP-relaxatie met en zonder afgeleide grenzen berekenen en loggen
+        # (ook bij logging level debug)
+        self.measure_relaxation = False
         # self.start_logging()
 
     def calc_optimum(
@@ -54,6 +119,59 @@ class DaCalc(DaBase):
         _start_dt: dt.datetime | None = None,
         _start_soc: float | None = None,
         _start_ev_soc: float | None = None,
+    ) -> str | None:
+        """
+        De optimaliseringsberekening, met het doorzetten van de instellingen naar HA
+        :return: de herkomst van de instellingen: "optimal", "incumbent" (beste
+            oplossing binnen de rekentijd), "fallback" (bewaard plan), "none" (geen
+            oplossing en geen plan) of "unchanged" (invoer ongewijzigd), None als
+            er niet kon worden gerekend
+        """
+        # de nabewerking van de vorige berekening gebruikt mogelijk hetzelfde model
+        self.results_stage.wait()
+        # alle HA-states in een keer ophalen, de hele berekening gebruikt deze snapshot
+        if self.state_snapshot is None:
+            self.take_state_snapshot()
+        try:
+            try:
+                return self._calc_optimum(
+                    _start_dt=_start_dt,
+                    _start_soc=_start_soc,
+                    _start_ev_soc=_start_ev_soc,
+                )
+            except LiveModelMismatch as ex:
+                logging.info(
+                    f"Model kan niet worden hergebruikt ({ex}), "
+                    f"het model wordt opnieuw opgebouwd"
+                )
+                self.live_model.reset()
+                return self._calc_optimum(
+                    _start_dt=_start_dt,
+                    _start_soc=_start_soc,
+                    _start_ev_soc=_start_ev_soc,
+                    _inputs=self.calc_inputs,
+                )
+        finally:
+            self.release_state_snapshot()
+            if not self.debug:
+                self.store_telemetry()
+
+    def store_telemetry(self):
+        """
+        Slaat de kengetallen van de laatste berekening op in tabel "telemetry"
+        """
+        if "solve_time" not in self.calc_stats:
+            # geen model doorgerekend
+            return
+        record = telemetry_record(self.calc_stats, self.calc_stats["time"])
+        save_telemetry(self.db_da, record)
+
+    def _calc_optimum(
+        self,
+        _start_dt: dt.datetime | None = None,
+        _start_soc: float | None = None,
+        _start_ev_soc: float | None = None,
+        _inputs=None,
     ):
         # _start_dt = datetime.datetime(year=2026, month=5, day=24, hour=11, minute=0)
         # _start_soc = 78.0
@@ -96,9 +214,20 @@ class DaCalc(DaBase):
 
         report = Report(self.file_name)
         start = dt.datetime.fromtimestamp(start_hour)
-        price_data = report.get_price_data(
-            dt.datetime.fromtimestamp(start_hour), end=None, interval=self.interval
-        )
+        # alle invoer gelijktijdig ophalen
+        self.calc_stats = {"time": start_ts}
+        if _inputs is not None:
+            inputs = _inputs
+        elif self.replay_inputs is not None:
+            inputs = self.replay_inputs
+        else:
+            start_inputs = time.perf_counter()
+            inputs = gather_calc_inputs(self, report, start_hour, start_interval_dt)
+            self.calc_stats["input_time"] = time.perf_counter() - start_inputs
+        self.calc_inputs = inputs
+        if self.capture:
+            capture_calculation(self, inputs, start_dt, _start_soc, _start_ev_soc)
+        price_data = inputs.price_data.copy()
 
         if len(price_data) <= 5:
             logging.error(
@@ -120,12 +249,11 @@ class DaCalc(DaBase):
         while price_data.iloc[0]["time"] < start_interval_dt:
             price_data = price_data.iloc[1:]
         price_data.index = pd.to_datetime(price_data["time"])
-        prog_data = self.db_da.get_prognose_data(
-            start=start_hour, end=None, interval=self.interval
-        )
+        prog_data = inputs.prog_data
         if prog_data is None or len(prog_data) == 0:
             logging.error(f"Er ontbreken meteo waarden, de berekening wordt afgebroken")
             return None
+        prog_data = prog_data.copy()
 
         prog_data.index = pd.to_datetime(prog_data["tijd"])
         while len(prog_data) > 0 and prog_data.iloc[0]["tijd"] < start_interval_dt:
@@ -152,6 +280,22 @@ class DaCalc(DaBase):
             )
             self.notify("Er ontbreken voor een aantal uur gegevens")
 
+        try:
+            fingerprint = self.input_fingerprint(
+                start_dt, price_data, prog_data, inputs, ha_getter
+            )
+        except Exception as ex:
+            logging.warning(f"Vingerafdruk van de invoer niet gemaakt: {ex}")
+            fingerprint = None
+        if (
+            self.skip_unchanged
+            and _inputs is None
+            and not self.debug
+            and fingerprint is not None
+            and self.apply_unchanged_plan(fingerprint, start_dt)
+        ):
+            return "unchanged"
+
         self.notify("DAO calc gestart")
 
         prog_data = prog_data.reset_index(drop=True)
@@ -187,13 +331,10 @@ class DaCalc(DaBase):
         # base load
         if self.use_calc_baseload:
             logging.info(f"Zelf berekende baseload")
-            weekday = dt.datetime.weekday(dt.datetime.now())
-            base_cons = self.get_calculated_baseload(weekday)
+            base_cons = list(inputs.base_cons[0])
             if U > self.steps_day:
-                # volgende dag ophalen
-                weekday += 1
-                weekday = weekday % 7
-                base_cons = base_cons + self.get_calculated_baseload(weekday)
+                # volgende dag erbij
+                base_cons = base_cons + list(inputs.base_cons[1])
         else:
             logging.info(f"Baseload uit instellingen")
             base_cons = self.config.baseload
@@ -212,7 +353,6 @@ class DaCalc(DaBase):
 
         # 0.015 kWh/J/cm² productie van mijn panelen per J/cm²
         solar_prod = []
-        entity_pv_ac_switch = []
         max_solar_power = []
         pv_ac_varcode = []
         solar_ml_prediction = []
@@ -221,10 +361,6 @@ class DaCalc(DaBase):
             if s <= 9:
                 pv_ac_varcode.append("pv_ac_" + str(s))
             solar_prod.append([])
-            entity = self.solar[s].entity_pv_switch
-            if entity == "":
-                entity = None
-            entity_pv_ac_switch.append(entity)
             max_solar_power.append(self.solar[s].max_power)
             prediction = self.solar[s].ml_prediction
             solar_ml_prediction.append(prediction)
@@ -288,25 +424,45 @@ class DaCalc(DaBase):
         """
 
         # nieuwe universele methode
-        end = prog_data["tijd"].iloc[-1]
-        if self.interval == "1hour":
-            end += datetime.timedelta(hours=1)
-        else:
-            end += datetime.timedelta(minutes=15)
-        for s in range(solar_num):
-            solar_prog = self.calc_solar_predictions(
-                self.solar[s], start_interval_dt, end, self.interval
-            )
-            solar_name = self.solar[s].name.replace(" ", "_").replace("-", "_")
+        # de voorspellingen zijn al opgehaald in gather_calc_inputs
+        for solar_name, solar_prog in inputs.solar_prog.items():
             prog_data[solar_name] = solar_prog["prediction"]
-        for b in range(B):
-            for s in range(len(self.battery_options[b].solar)):
-                solar_option = self.battery_options[b].solar[s]
-                solar_prog = self.calc_solar_predictions(
-                    solar_option, start_interval_dt, end, self.interval
-                )
-                solar_name = solar_option.name.replace(" ", "_").replace("-", "_")
-                prog_data[solar_name] = solar_prog["prediction"]
+
+        # variabele resolutie: na "fine horizon" uur worden de intervallen
+        # samengevoegd tot blokken van "coarse interval"
+        prog_data = prog_data.iloc[:U]
+        b_l = b_l[:U]
+        while len(b_l) < U:
+            b_l.append(b_l[-1])
+        coarse_s = self.coarse_interval_s
+        if self.heating_options and self.heating_options.heater_present:
+            # de blokken van de warmtepomp zijn hele uren
+            coarse_s = min(coarse_s, 3600)
+        interval_steps = horizon_steps(
+            list(prog_data["tijd"]), self.interval_s, self.fine_horizon, coarse_s
+        )
+        # totaal aantal basisintervallen in de horizon
+        horizon_len = U
+        if len(interval_steps) < U:
+            sum_columns = ["glob_rad"] + [
+                solar_name
+                for solar_name in inputs.solar_prog.keys()
+                if solar_name in prog_data.columns
+            ]
+            prog_data = merge_rows(prog_data, interval_steps, sum_columns)
+            b_l = merge_values(b_l, interval_steps)
+            pl = list(prog_data["da_cons"])
+            pt = list(prog_data["da_prod"])
+            p_spot = list(prog_data["da_ex"])
+            U = len(pl)
+            pl_avg = [p_avg for _ in range(U)]
+            logging.info(
+                f"Planningshorizon: {self.fine_horizon} uur per {self.interval_name}, "
+                f"daarna in blokken van {coarse_s // 60} minuten: "
+                f"{U} in plaats van {horizon_len} intervallen"
+            )
+        # per interval het volgnummer van het eerste basisinterval
+        interval_start_step = step_starts(interval_steps)
 
         # prog_data = prog_data.reset_index()
         # make sure indexes pair with number of rows
@@ -326,7 +482,9 @@ class DaCalc(DaBase):
                 interval_fraction.append(interval_fraction_first_interval)
             else:
                 ts.append(row.time)
-                hour_fraction.append(self.interval_s / 3600)
+                hour_fraction.append(
+                    interval_steps[len(tijd) - 1] * self.interval_s / 3600
+                )
                 interval_fraction.append(1)
             for s in range(solar_num):
                 solar_name = self.solar[s].name.replace(" ", "_").replace("-", "_")
@@ -349,6 +507,11 @@ class DaCalc(DaBase):
                     pv_total += prod
             pv_org_dc.append(pv_total)
             first_interval = False
+        # einde van ieder interval
+        interval_end = [
+            tijd[u] + dt.timedelta(seconds=interval_steps[u] * self.interval_s)
+            for u in range(len(tijd))
+        ]
 
         while len(b_l) > len(uur):
             b_l = b_l[:-1]
@@ -381,4578 +544,1401 @@ class DaCalc(DaBase):
             logging.info(f"pv_ac: {len(pv_org_ac)}")
             logging.info(f"pv_dc: {len(pv_org_dc)}")
 
-        model = Model()
-
-        ##############################################################
-        #                          pv ac
-        ##############################################################
-        # introduce maximum power for inverter
-        pv_ac = [
-            [
-                model.add_var(
-                    var_type=CONTINUOUS,
-                    lb=0,
-                    ub=solar_prod[s][u],
-                )
-                for u in range(U)
-            ]
-            for s in range(solar_num)
-        ]
-        pv_ac_on_off = [
-            [model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(solar_num)
-        ]
-
-        # constraints
-        for s in range(solar_num):
-            for u in range(U):
-                model += pv_ac[s][u] == solar_prod[s][u] * pv_ac_on_off[s][u]
-        for s in range(solar_num):
-            if entity_pv_ac_switch[s] is None:
-                for u in range(U):
-                    model += pv_ac_on_off[s][u] == 1
+        start_build = time.perf_counter()
+        # de invoer die de componenten (apparaten) delen
+        ctx = CalcContext(
+            calc=self,
+            inputs=inputs,
+            start_dt=start_dt,
+            start_soc=_start_soc,
+            start_ev_soc=_start_ev_soc,
+            tijd=tijd,
+            interval_end=interval_end,
+            uur=uur,
+            pl=pl,
+            pt=pt,
+            p_avg=p_avg,
+            b_l=b_l,
+            hour_fraction=hour_fraction,
+            interval_fraction=interval_fraction,
+            interval_steps=interval_steps,
+            interval_start_step=interval_start_step,
+            horizon_len=horizon_len,
+            prog_data=prog_data,
+            pv_org_ac=pv_org_ac,
+            pv_org_dc=pv_org_dc,
+            solar_prod=solar_prod,
+            ha_getter=ha_getter,
+        )
+        # per component (apparaat) rekentijd, variabelen en constraints;
+        # alleen de apparaten die meedoen worden geregistreerd
+        components = ComponentPipeline()
+        ctx.components = components
+        try:
+            for component in device_components():
+                components.register(component, ctx)
+        except ValueError as ex:
+            logging.error(ex)
+            return None
+        if self.live_model is not None:
+            # bij dezelfde structuur (lengtes van de intervallen, apparaten en
+            # strategie) wordt het vorige model bijgewerkt
+            structure = (
+                tuple(interval_steps),
+                components.names(),
+                B,
+                len(self.ev_options),
+                len(self.machines),
+                self.strategy,
+            )
+            model = self.live_model.start_build(structure, self.solver, tuple(tijd))
+        else:
+            model = make_model(self.solver)
+        # ruim gedeclareerde variabelen krijgen grenzen uit instellingen en invoer
+        bound_pass = BoundPass(model)
+        ctx.bound_pass = bound_pass
 
-        ##############################################################
-        #                          accu / batterij
-        ##############################################################
-        # accu capaciteit
-        # 2 batterijen 50V 280Ah
-        one_soc = []
-        kwh_cycle_cost = []
-        start_soc = []
-        lower_limit = []
-        upper_limit = []
-        opt_low_level = []
-        penalty_low_soc = []
-        # pv_dc = []  # pv bruto productie per batterij per uur
-        # pv_dc_hour_sum = []
-        # pv_from_dc_hour_sum = []
-        #   de som van pv_dc productie geleverd aan ac per uur
-        # eff_ac_to_dc = []
-        # eff_dc_to_ac = []
-        eff_dc_to_bat = []
-        eff_bat_to_dc = []
-        # max_ac_to_dc = []
-        # max_dc_to_ac = []
+        components.build(model, ctx)
 
-        CS = []
-        DS = []
-        # in kW
-        max_charge_power = []
-        max_discharge_power = []
-        reduce_power_high_soc = []
-        reduce_power_low_soc = []
-        reduce_power_hours = []
-        max_dc_from_bat_power = []
-        max_dc_to_bat_power = []
-        avg_eff_dc_to_ac = []
-        pv_dc_num = []
-        pv_prod_dc = []
-        pv_prod_ac = []
-        charge_stages = []
-        discharge_stages = []
-        for b in range(B):
-            pv_prod_ac.append([])
-            pv_prod_dc.append([])
-            # model_dump() converts BatteryStage objects to plain dicts so that
-            # dict-subscript notation can be used throughout the MIP model build loop.
-            # Converting to attribute access would require changing hundreds of
-            # downstream ["power"] / ["efficiency"] references.
-            # The zero-power sentinel is guaranteed by BatteryConfig.validate_stages_sorted.
-            charge_stages.append(
-                [s.model_dump() for s in self.battery_options[b].charge_stages]
+        #####################################################
+        # afgeleide grenzen
+        #####################################################
+        components.begin("bounds")
+        # net: maximaal verbruik en maximale productie per interval
+        max_grid = [self.grid_max_power * hour_fraction[u] for u in range(U)]
+        max_delivery = []
+        max_production = []
+        for u in range(U):
+            max_cons = (
+                b_l[u] * interval_fraction[u]
+                + sum(component.max_consumption(u) for component in components)
             )
-            discharge_stages.append(
-                [s.model_dump() for s in self.battery_options[b].discharge_stages]
+            max_prod = (
+                sum(component.max_production(u) for component in components)
+                - b_l[u] * interval_fraction[u]
             )
+            max_delivery.append(max(0.0, max_cons))
+            max_production.append(max(0.0, max_prod))
 
-            # noinspection PyTypeChecker
-            max_charge_power.append(int(charge_stages[b][-1]["power"]) / 1000)
-            # CS is aantal charge stages
-            CS.append(len(charge_stages[b]))
-            max_discharge_power.append(discharge_stages[b][-1]["power"] / 1000)
-
-            # reduced power
-            red_hours = self.battery_options[b].reduced_hours or {}
-            red_power = []
-            reduced = False
-            for u in range(U):
-                red_power.append(max(max_charge_power[b], max_discharge_power[b]))
-            for key, value in red_hours.items():
-                reduced = True
-                hour = int(key)
-                power = value / 1000
-                for u in range(U):
-                    int_uur = int(uur[u][0:2])
-                    if int_uur == hour:
-                        red_power[u] = power
-            reduce_power_hours.append(red_power)
-            if reduced:
-                if self.log_level == logging.DEBUG:
-                    logging.debug(f"Reduced hours for {self.battery_options[b].name}")
-                    logging.info(f"hour max-power(kW)")
-                    for u in range(U):
-                        logging.info(f"{uur[u]} {red_power[u]:6.3f}")
-                else:
-                    logging.info(
-                        f"Reduced hours applied for {self.battery_options[b].name}"
-                    )
-            else:
-                logging.info(
-                    f"No reduced hours applied for {self.battery_options[b].name}"
-                )
+        ##################################################################
+        #            salderen                                            #
+        ##################################################################
+        components.begin("grid")
+        # total consumption per hour: base_load plus accuload
+        # inkoop + pv + accu_out = teruglevering + base_cons + accu_in + boiler+ev+ruimteverwarming
+        # in code:  c_l + pv + accu_out = c_t + b_l + accu_in + hw + ev + rv
+        # c_l : verbruik levering
+        # c_t : verbruik teruglevering met saldering
+        # c_t_notax : verbruik teruglevering zonder saldering
+        # pv : opwekking zonnepanelen
 
-            _bat_to_dc_max = self.battery_options[b].bat_to_dc_max_power
-            max_dc_from_bat_power.append(
-                max_discharge_power[b] * 2
-                if _bat_to_dc_max is None
-                else _bat_to_dc_max.resolve(ha_getter) / 1000
+        # anders geschreven c_l = c_t + ct_notax + b_l + accu_in + hw + rv - pv - accu_out
+        # continue variabele c consumption in kWh/h
+        # minimaal 20 kW terugleveren max 20 kW leveren (3 x 25A = 17,5 kW)
+        # instelbaar maken?
+        # levering, bovengrens: netaansluiting en maximaal verbruik in het interval
+        c_l = [
+            model.add_var(
+                var_type=CONTINUOUS, lb=0, ub=min(max_delivery[u], max_grid[u])
             )
-            _dc_to_bat_max = self.battery_options[b].dc_to_bat_max_power
-            max_dc_to_bat_power.append(
-                max_charge_power[b] * 2
-                if _dc_to_bat_max is None
-                else _dc_to_bat_max.resolve(ha_getter) / 1000
+            for u in range(U)
+        ]
+        # teruglevering
+        c_t = [
+            model.add_var(
+                var_type=CONTINUOUS, lb=0, ub=min(max_production[u], max_grid[u])
             )
+            for u in range(U)
+        ]
+        # netto per uur alleen leveren of terugleveren niet tegelijk?
+        # als het leveringstarief minstens het teruglevertarief is, is tegelijk
+        # leveren en terugleveren nooit voordelig en zijn de binaire variabelen
+        # overbodig (niet bij een blijvend model: de opbouw blijft dan gelijk)
+        grid_exclusive = [
+            self.live_model is not None or pl[u] < pt[u] for u in range(U)
+        ]
+        c_l_on = [
+            model.add_var(var_type=BINARY) if grid_exclusive[u] else None
+            for u in range(U)
+        ]
+        c_t_on = [
+            model.add_var(var_type=BINARY) if grid_exclusive[u] else None
+            for u in range(U)
+        ]
+        for u in range(U):
+            if grid_exclusive[u]:
+                model += c_l[u] <= c_l_on[u] * min(max_delivery[u], max_grid[u])
+                model += c_t[u] <= c_t_on[u] * min(max_production[u], max_grid[u])
+                model += c_l_on[u] + c_t_on[u] <= 1
+        battery = components.get("battery")
+        binaries_dropped = 2 * (U - sum(grid_exclusive))
+        if battery:
+            binaries_dropped += 2 * B * (U - sum(battery.bat_exclusive))
+        logging.info(
+            f"Overbodige aan/uit-variabelen net en batterijen: {binaries_dropped} "
+            f"van {2 * U * (B + 1)} vervallen"
+        )
 
-            # reduce power low soc
-            red_power_low_soc = sorted(
-                self.battery_options[b].reduce_power_low_soc or [],
-                key=lambda x: x.soc,
+        #####################################################
+        # alle verbruiken in de totaal balans in kWh
+        #####################################################
+        for u in range(U):
+            model += (
+                c_l[u]
+                == c_t[u]
+                + b_l[u] * interval_fraction[u]
+                + xsum(component.consumption(u) for component in components)
             )
-            if len(red_power_low_soc) == 1:
-                logging.warning(
-                    f"For reduced power at low soc there must be two entries, "
-                    f"one found."
-                )
-                red_power_low_soc = []
-            for rpl in range(len(red_power_low_soc) - 1):
-                helling = (
-                    red_power_low_soc[rpl + 1].power - red_power_low_soc[rpl].power
-                ) / (red_power_low_soc[rpl + 1].soc - red_power_low_soc[rpl].soc)
-                red_power_low_soc[rpl]._helling = helling
-                logging.info(
-                    f"Reduced power applied during discharging at low soc, between "
-                    f"{red_power_low_soc[rpl].soc}% and "
-                    f"{red_power_low_soc[rpl + 1].soc}% power is reduced from "
-                    f"{red_power_low_soc[rpl].power}W until "
-                    f"{red_power_low_soc[rpl + 1].power}W"
-                )
-            if not red_power_low_soc:
-                logging.info(f"No reduced power applied during discharging at low soc")
-            reduce_power_low_soc.append(red_power_low_soc)
 
-            # reduce power high soc
-            red_power_high_soc = sorted(
-                self.battery_options[b].reduce_power_high_soc or [],
-                key=lambda x: x.soc,
-            )
-            if len(red_power_high_soc) == 1:
-                logging.warning(
-                    f"For reduced power at high soc there must be two entries, "
-                    f"one found"
-                )
-                red_power_high_soc = []
-            for rph in range(len(red_power_high_soc) - 1):
-                helling = (
-                    red_power_high_soc[rph + 1].power - red_power_high_soc[rph].power
-                ) / (red_power_high_soc[rph + 1].soc - red_power_high_soc[rph].soc)
-                red_power_high_soc[rph]._helling = helling
-                logging.info(
-                    f"Reduced power applied during charging at high soc, between "
-                    f"{red_power_high_soc[rph].soc}% and "
-                    f"{red_power_high_soc[rph + 1].soc}% power is reduced from "
-                    f"{red_power_high_soc[rph].power}W until "
-                    f"{red_power_high_soc[rph + 1].power}W"
-                )
-            if not red_power_high_soc:
-                logging.info(f"No reduced power applied during charging at high soc")
-            reduce_power_high_soc.append(red_power_high_soc)
+        # cost variabele
+        cost = model.add_var(var_type=CONTINUOUS, lb=-1000, ub=1000)
+        delivery = model.add_var(var_type=CONTINUOUS, lb=0, ub=1000)
+        production = model.add_var(var_type=CONTINUOUS, lb=0, ub=1000)
+        bound_pass.tighten(delivery, ub=sum(c_l[u].ub for u in range(U)))
+        bound_pass.tighten(production, ub=sum(c_t[u].ub for u in range(U)))
+        model += delivery == xsum(c_l[u] for u in range(U))
+        model += production == xsum(c_t[u] for u in range(U))
 
-            # DS is aantal discharge stages
-            DS.append(len(discharge_stages[b]))
-            sum_eff = 0
-            for ds in range(DS[b])[1:]:
-                sum_eff += discharge_stages[b][ds]["efficiency"]
-            avg_eff_dc_to_ac.append(sum_eff / (DS[b] - 1))
+        # kosten van de apparaten (cycluskosten, schakelkosten, opslag)
+        component_costs = components.costs(model, ctx)
+        components.begin("grid")
+        # alles in kWh * prijs = kosten in euro
+        model += cost == (
+            xsum(c_l[u] * pl[u] - c_t[u] * pt[u] for u in range(U)) + component_costs
+        )
 
-            ac = float(self.battery_options[b].capacity)
-            one_soc.append(ac / 100)  # 1% van 28 kWh = 0,28 kWh
-            kwh_cycle_cost.append(self.battery_options[b].cycle_cost)
-            logging.debug(f"cycle cost: {kwh_cycle_cost[b]} eur/kWh")
+        #####################################################
+        #        strategy optimization
+        #####################################################
+        components.end()
+        # settings
+        max_gap = abs(self.config.max_gap.resolve(ha_getter))
+        max_gap = max(0.00001, min(max_gap, 1.0))  # clamp to [0.00001, 1.0]
 
-            eff_dc_to_bat.append(float(self.battery_options[b].dc_to_bat_efficiency))
-            # fractie van 1
-            eff_bat_to_dc.append(float(self.battery_options[b].bat_to_dc_efficiency))
-            # fractie van 1
+        configure(model, max_gap, verbose=self.log_level > logging.DEBUG)
+        # model.max_seconds = 20
+        # model.check_optimization_results()
 
-            lower_limit.append(self.battery_options[b].lower_limit.resolve(ha_getter))
-            upper_limit.append(self.battery_options[b].upper_limit.resolve(ha_getter))
-            _opt_lvl_field = self.battery_options[b].optimal_lower_level
-            opt_low_lvl = float(
-                _opt_lvl_field.resolve(ha_getter)
-                if _opt_lvl_field is not None
-                else lower_limit[b]
+        # warme start met de (verschoven) oplossing van de vorige berekening
+        warm_start = MipWarmStart()
+        for component in components:
+            component.warm_start(warm_start, ctx)
+        warm_start.apply(model)
+        machines = components.get("machines")
+        if self.live_model is not None:
+            self.calc_stats.update(self.live_model.finish_build())
+        self.calc_stats.update(
+            {
+                "interval": self.interval,
+                "intervals": U,
+                "build_time": time.perf_counter() - start_build,
+                "variables": model.num_cols,
+                "integer_variables": model.num_int,
+                "constraints": model.num_rows,
+                "bounds_tightened": len(bound_pass.changes),
+                "binaries_dropped": binaries_dropped,
+                "machine_starts": machines.ma_candidates if machines else 0,
+                "machine_starts_pruned": machines.ma_pruned if machines else 0,
+            }
+        )
+        self.calc_stats["components"] = {"build": components.report("build")}
+        # LP-relaxatie met de oorspronkelijke en de afgeleide grenzen
+        relaxation = None
+        if self.log_level == logging.DEBUG or self.measure_relaxation:
+            model.objective = minimize(cost)
+            relaxation = bound_pass.relaxation_bounds()
+        start_solve = time.perf_counter()
+        # rekentijd per stap van de strategie
+        stage_times = []
+
+        def solve_stage() -> str | None:
+            start_stage = time.perf_counter()
+            stage_source = optimize(model, max_solve_time)
+            stage_times.append(time.perf_counter() - start_stage)
+            return stage_source
+
+        def record_solve_stats():
+            self.calc_stats["solve_time"] = time.perf_counter() - start_solve
+            self.calc_stats["stage_times"] = stage_times
+            self.calc_stats.update(solve_stats(model))
+            logging.info(
+                f"Modelbouw: {self.calc_stats['build_time']:<5.2f} sec, "
+                f"oplossen: {self.calc_stats['solve_time']:<5.2f} sec"
             )
-            if opt_low_lvl < lower_limit[b]:
-                logging.warning(
-                    f"'optimal lower level' is lower defined as 'lower limit'."
-                    f" 'Optimal lower level' is adjusted to "
-                    f"'lower limit' ({lower_limit[b]})"
-                )
-                opt_low_lvl = lower_limit[b]
 
-            opt_low_level.append(opt_low_lvl)
-
-            # penalty in euro/%.hour
-            penalty_low_soc.append(self.battery_options[b].penalty_low_soc)
-
-            if _start_soc is None:
-                try:
-                    start_soc_str = ""
-                    start_soc_str = self.get_state(
-                        self.battery_options[b].entity_actual_level
-                    ).state
-                    start_soc_num = float(start_soc_str)
-                    start_soc.append(start_soc_num)
-                except Exception as ex:
+        # kosten optimalisering, per stap met een maximale rekentijd
+        max_solve_time = self.config.max_solve_time
+        if max_solve_time is not None:
+            logging.info(f"Maximale rekentijd per stap: {max_solve_time} sec")
+        plan_sources = []
+        if self.strategy == "minimize cost":
+            strategie = "minimale kosten"
+            logging.info(f"Strategie: {strategie}")
+            logging.info(f"Maximale fout (maximal gap): {max_gap:<8.6f} euro")
+            model.objective = minimize(cost)
+            start_calc = time.perf_counter()
+            plan_sources.append(solve_stage())
+            end_calc = time.perf_counter()
+            logging.info(f"Rekentijd: {end_calc - start_calc:<5.2f} sec")
+            if plan_sources[-1] is None:
+                logging.warning(f"Geen oplossing voor: {self.strategy}")
+                record_solve_stats()
+                return self.apply_fallback_plan(start_dt, no_solution_reason(model))
+        elif self.strategy == "minimize consumption":
+            strategie = "minimale levering"
+            logging.info(f"Strategie: {strategie}")
+            model.objective = minimize(delivery)
+            plan_sources.append(solve_stage())
+            if plan_sources[-1] is None:
+                logging.warning(f"Geen oplossing voor: {self.strategy}")
+                record_solve_stats()
+                return self.apply_fallback_plan(start_dt, no_solution_reason(model))
+            min_delivery = max(0.0, delivery.x)
+            logging.info("Eerste berekening")
+            logging.info(f"Kosten (euro): {cost.x:<6.2f}")
+            logging.info(f"Levering (kWh): {delivery.x:<6.2f}")
+            model += delivery <= min_delivery
+            model.objective = minimize(cost)
+            plan_sources.append(solve_stage())
+            if plan_sources[-1] is None:
+                model.objective = minimize(delivery)
+                plan_sources[-1] = solve_stage()
+                if plan_sources[-1] is None:
                     logging.warning(
-                        f"{ex} :"
-                        f"No actual level info recieved from "
-                        f"{self.battery_options[b].entity_actual_level}, "
-                        f"but recieved '{start_soc_str}', "
-                        f"assumed 50%"
+                        f"Geen oplossing in na herberekening voor: {self.strategy}"
                     )
-                    start_soc.append(50)
-            else:
-                start_soc.append(_start_soc)
-            logging.info(
-                f"Startwaarde SoC {self.battery_options[b].name}: {start_soc[b]}%\n"
-            )
+                    record_solve_stats()
+                    return self.apply_fallback_plan(
+                        start_dt, no_solution_reason(model)
+                    )
+            logging.info("Herberekening")
+            logging.info(f"Kosten (euro): {cost.x:<6.2f}")
+            logging.info(f"Levering (kWh): {delivery.x:<6.2f}")
+        else:
+            logging.error("Kies een strategie in options")
+            # strategie = 'niet gekozen'
+            return None
 
-            # pv dc mppt
-            pv_dc_num.append(len(self.battery_options[b].solar))
-            # pv_dc_bat = []
-            for s in range(pv_dc_num[b]):
-                pv_prod_dc[b].append([])
-                pv_prod_ac[b].append([])
-                solar_name = self.battery_options[b].solar[s].name.replace(" ", "_")
-                solar_series = prog_data[solar_name]
-                for u in range(U):
-                    # pv_prod productie van batterij b van solar s in uur u, in kWh
-                    prod_dc = max(0.0, solar_series[u]) * interval_fraction[u]
-                    eff = 1
-                    for ds in range(DS[b]):
-                        if discharge_stages[b][ds]["power"] / 1000 > prod_dc:
-                            eff = discharge_stages[b][ds]["efficiency"]
-                            break
-                    prod_ac = prod_dc * eff
-                    pv_prod_dc[b][s].append(prod_dc)
-                    pv_prod_ac[b][s].append(prod_ac)
+        # Suppress FutureWarning messages
+        # import warnings
 
-        # energie per uur, vanuit dc gezien
-        # ac_to_dc = [[model.add_var(var_type=CONTINUOUS, lb=0, ub=hour_fraction[u] * \
-        #                max_ac_to_dc[b]) for u in range(U)] for b in range(B) ]
-        # hernoemd naar dc_from_ac
-        # totaal elektra van ac naar de busbar, ieder uur
+        # warnings.simplefilter(action="ignore", category=FutureWarning)
 
-        # alle variabelen definieren alles in W tenzij aangegeven
-        # mppt aan/uit eventueel bij netto prijzen onder nul
-        pv_dc_on_off = [
-            [
-                [model.add_var(var_type=BINARY) for _ in range(U)]
-                for _ in range(pv_dc_num[b])
-            ]
-            for b in range(B)
-        ]
-        pv_prod_dc_sum = [
-            [
-                model.add_var(var_type=CONTINUOUS, lb=0, ub=2 * max_discharge_power[b])
-                for _ in range(U)
-            ]
-            for b in range(B)
-        ]
+        record_solve_stats()
+        if model.num_solutions == 0:
+            logging.error(
+                f"Er is helaas geen oplossing gevonden, kijk naar je instellingen."
+            )
+            return self.apply_fallback_plan(start_dt, "infeasible")
 
-        """
-        # declaraties laden ac_to_dc met aan uit zonder sos #######################################
-        #ac_to_dc: wat er gaat er vanuit ac naar de omvormer
-        ac_to_dc = [[model.add_var(var_type=CONTINUOUS, lb=0, ub=max_charge_power[b])
-                     for u in range(U)] for b in range(B)]
-        ac_to_dc_on = [[model.add_var(var_type=BINARY) for u in range(U)] for b in range(B)]
+        # er is een oplossing
+        plan_source = "optimal" if "incumbent" not in plan_sources else "incumbent"
+        self.calc_stats["plan_source"] = plan_source
+        if relaxation is not None:
+            objective = cost.x if self.strategy == "minimize cost" else None
+            self.calc_stats.update(log_relaxation_gap(*relaxation, objective))
+        if not self.debug:
+            warm_start.save()
+            # instellingen per interval bewaren voor een berekening zonder oplossing
+            setpoints = []
+            for u in range(U):
+                setpoint = {
+                    "grid": round(1000 * (c_l[u].x - c_t[u].x) / hour_fraction[u]),
+                    "grid_balance": abs(c_l[u].x - c_t[u].x) <= 0.01,
+                    "battery": [],
+                    "soc_start": [],
+                    "soc_end": [],
+                }
+                for component in components:
+                    setpoint.update(component.setpoint(u, ctx))
+                setpoints.append(setpoint)
+            FallbackPlan().save(
+                tijd[:U], interval_end[:U], setpoints, plan_source, fingerprint
+            )
+        # doorzetten van alle settings naar HA
+        # vanaf hier actuele states van HA gebruiken
+        self.release_state_snapshot()
+        if not self.debug:
+            logging.info("Doorzetten van alle settings naar HA")
+        else:
+            logging.info(
+                "Onderstaande settings worden NIET doorgezet naar HA (debug-run)"
+            )
 
-        # elektra per vermogensklasse van ac naar de busbar, ieder uur
-        ac_to_dc_st = [[[model.add_var(var_type=CONTINUOUS, lb=0,
-                        ub=charge_stages[b][cs]["power"]/1000)
-                        for u in range(U)] for cs in range(CS[b])] for b in range(B)]
-        # vermogens klasse aan/uit
-        ac_to_dc_st_on = [[[model.add_var(var_type=BINARY)
-            for u in range(U)] for cs in range(CS[b])] for b in range(B)]
-        # tot hier declaraties laden zonder sos ##################################################
         """
-        # declaraties laden met sos ###############################################################
-        ac_to_dc_samples = [
-            [charge_stages[b][cs]["power"] / 1000 for cs in range(CS[b])]
-            for b in range(B)
-        ]
-        dc_from_ac_samples = [
-            [
-                (
-                    charge_stages[b][cs]["efficiency"]
-                    * charge_stages[b][cs]["power"]
-                    / 1000
-                )
-                for cs in range(CS[b])
-            ]
-            for b in range(B)
-        ]
-        ac_to_dc = [
-            [
-                model.add_var(
-                    var_type=CONTINUOUS,
-                    lb=0,
-                    ub=min(reduce_power_hours[b][u], max_charge_power[b]),
-                )
-                for u in range(U)
-            ]
-            for b in range(B)
-        ]
-        ac_to_dc_on = [
-            [model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(B)
-        ]
-        ac_to_dc_w = [
-            [
-                [model.add_var(var_type=CONTINUOUS, lb=0, ub=1) for _ in range(CS[b])]
-                for _ in range(U)
-            ]
-            for b in range(B)
-        ]
-        # declaraties laden tot hier met sos ####################################################
-
+        set helpers output home assistant
+        boiler c_b[0].x >0 trigger boiler
+        ev     c_ev[0].x > 0 start laden auto, ==0 stop laden auto
+        battery multiplus feedin from grid = accu_in[0].x - accu_out[0].x
         """
-        # vanaf hier decalaties ontladen zonder sos #############################################
-        ac_from_dc = [
-            [
-                model.add_var(
-                    var_type=CONTINUOUS,
-                    lb=0,
-                    ub=min(reduce_power[b][u], max_discharge_power[b]),
+
+        # alle schrijfacties naar HA verzamelen en na het aansturen in een keer
+        # versturen en controleren
+        self.begin_batch()
+        try:
+            ###########################################
+            # grid
+            ###########################################
+            components.begin("grid", "actuate")
+            grid_balance = abs(c_l[0].x - c_t[0].x) <= 0.01
+            ctx.grid_balance = grid_balance
+            balance_state = "on" if grid_balance else "off"
+            if self.debug:
+                logging.info(f"Grid balanceren zou zijn: {balance_state}")
+            else:
+                self.set_entity_state("entity balance switch", self.grid, balance_state)
+                logging.info(f"Grid balanceren: {balance_state}")
+            grid_set_point = round(1000 * (c_l[0].x - c_t[0].x) / hour_fraction[0], 0)
+            logging.info(f"Grid set point: {grid_set_point} W")
+            if not self.debug:
+                # export the ess grid setpoint in W
+                self.set_entity_value(
+                    "entity_grid_setpoint",
+                    self.grid,
+                    grid_set_point,
                 )
-                for u in range(U)
-            ]
-            for b in range(B)
-        ]
-        ac_from_dc_on = [
-            [model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(B)
-        ]
+            #####################################
 
-        # elektra per vermogensklasse van busbar naar ac, ieder uur
-        ac_from_dc_st = [
-            [
-                [
-                    model.add_var(
-                        var_type=CONTINUOUS,
-                        lb=0,
-                        ub=discharge_stages[b][ds]["power"] / 1000,
-                    )
-                    for _ in range(U)
-                ]
-                for ds in range(DS[b])
-            ]
-            for b in range(B)
-        ]
-        ac_from_dc_st_on = [
-            [[model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(DS[b])]
-            for b in range(B)
-        ]
-        # tot hier declaraties ontladen zonder sos ###############################################
-        """
+            components.actuate(self, ctx)
 
-        # vanaf hier declaraties ontladen met sos  ###############################################
-        ac_from_dc_samples = [
-            [(discharge_stages[b][ds]["power"] / 1000) for ds in range(DS[b])]
-            for b in range(B)
-        ]
-        dc_to_ac_samples = [
-            [
-                (
-                    discharge_stages[b][ds]["power"]
-                    / (discharge_stages[b][ds]["efficiency"] * 1000)
-                )
-                for ds in range(DS[b])
-            ]
-            for b in range(B)
-        ]
-        ac_from_dc = [
-            [
-                model.add_var(
-                    var_type=CONTINUOUS,
-                    lb=0,
-                    ub=min(reduce_power_hours[b][u], max_discharge_power[b]),
+        except Exception as ex:
+            error_handling(ex)
+            logging.error(f"Onverwachte fout: {ex}")
+        components.end()
+        writes = self.send_batch()
+        self.calc_stats["ha_writes"] = [write.record() for write in writes]
+        self.calc_stats["components"]["actuate"] = components.report("actuate")
+        ev = components.get("ev")
+        ev_evaluation = ev.ev_evaluation if ev else []
+        try:
+            for ev_name, entity_charge_switch, entity_charging_ampere in ev_evaluation:
+                logging.info(
+                    f"Evaluatie status laden {ev_name} op "
+                    f"{dt.datetime.now().strftime('%Y-%m-%d %H:%M')}"
                 )
-                for u in range(U)
-            ]
-            for b in range(B)
-        ]
-        ac_from_dc_on = [
-            [model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(B)
-        ]
-        ac_from_dc_w = [
-            [
-                [model.add_var(var_type=CONTINUOUS, lb=0, ub=1) for _ in range(DS[b])]
-                for _ in range(U)
-            ]
-            for b in range(B)
-        ]
-        # tot hier declaraties ontladen met sos ###############################################
-
-        # energiebalans dc
-        dc_from_ac = [
-            [
-                model.add_var(var_type=CONTINUOUS, lb=0, ub=max_charge_power[b])
-                for _ in range(U)
-            ]
-            for b in range(B)
-        ]
-        dc_to_ac = [
-            [
-                model.add_var(var_type=CONTINUOUS, lb=0, ub=max(dc_to_ac_samples[b]) if dc_to_ac_samples[b] else 0)
-                for _ in range(U)
-            ]
-            for b in range(B)
-        ]
-        dc_from_bat = [
-            [
-                model.add_var(var_type=CONTINUOUS, lb=0, ub=max_dc_from_bat_power[b])
-                for _ in range(U)
-            ]
-            for b in range(B)
-        ]
-        dc_to_bat = [
-            [
-                model.add_var(var_type=CONTINUOUS, lb=0, ub=max_dc_to_bat_power[b])
-                for _ in range(U)
-            ]
-            for b in range(B)
-        ]
-
-        # SoC
-        soc = [
-            [
-                model.add_var(
-                    var_type=CONTINUOUS,
-                    lb=min(start_soc[b], lower_limit[b]),
-                    ub=max(start_soc[b], upper_limit[b]),
-                )
-                for _ in range(U + 1)
-            ]
-            for b in range(B)
-        ]
-
-        soc_low = [
-            [
-                model.add_var(
-                    var_type=CONTINUOUS,
-                    lb=min(start_soc[b], lower_limit[b]),
-                    ub=opt_low_level[b],
-                )
-                for _ in range(U + 1)
-            ]
-            for b in range(B)
-        ]
-        soc_mid = [
-            [
-                model.add_var(
-                    var_type=CONTINUOUS,
-                    lb=0,
-                    ub=-opt_low_level[b] + max(start_soc[b], upper_limit[b]),
-                )
-                for _ in range(U + 1)
-            ]
-            for b in range(B)
-        ]
-
-        # alle constraints
-        for b in range(B):
-            for u in range(U):
-                # laden, alles uitgedrukt in vermogen kW
-                # vanaf hier laden met aan/uit zonder sos
-                """
-                for cs in range(CS[b]):
-                    model += (ac_to_dc_st[b][cs][u] <=
-                        charge_stages[b][cs]["power"] * 
-                        ac_to_dc_st_on[b][cs][u]/1000)
-                for cs in range(CS[b])[1:]:
-                    model += (ac_to_dc_st[b][cs][u] >=
-                        charge_stages[b][cs - 1]["power"] * 
-                        ac_to_dc_st_on[b][cs][u]/1000)
-
-                model += ac_to_dc[b][u] == xsum(ac_to_dc_st[b][cs][u] for cs in range(CS[b]))
-                model += (xsum(ac_to_dc_st_on[b][cs][u] for cs in range(CS[b]))) <= 1
-                model += dc_from_ac[b][u] == xsum(ac_to_dc_st[b][cs][u] * \
-                                    charge_stages[b][cs]["efficiency"] 
-                                    for cs in range(CS[b]))
-                # tot hier laden met aan/uit zonder sos #######################################
-                """
-                # vanaf hier laden met sos ######################################################
-                model += xsum(ac_to_dc_w[b][u][cs] for cs in range(CS[b])) == 1
-                model += (
-                    xsum(
-                        ac_to_dc_w[b][u][cs] * ac_to_dc_samples[b][cs]
-                        for cs in range(CS[b])
-                    )
-                    == ac_to_dc[b][u]
-                )
-                model += (
-                    xsum(
-                        ac_to_dc_w[b][u][cs] * dc_from_ac_samples[b][cs]
-                        for cs in range(CS[b])
-                    )
-                    == dc_from_ac[b][u]
-                )
-                model.add_sos(
-                    [
-                        (ac_to_dc_w[b][u][cs], ac_to_dc_samples[b][cs])
-                        for cs in range(CS[b])
-                    ],
-                    2,
-                )
-                # tot hier constraints laden met sos
-
-                """
-                # vanaf hier ontladen met aan/uit
-                for ds in range(DS[b]):
-                    model += (
-                        ac_from_dc_st[b][ds][u]
-                        <= discharge_stages[b][ds]["power"]
-                        * ac_from_dc_st_on[b][ds][u]
-                        / 1000
-                    )
-                for ds in range(DS[b])[1:]:
-                    model += (
-                        ac_from_dc_st[b][ds][u]
-                        >= discharge_stages[b][ds - 1]["power"]
-                        * ac_from_dc_st_on[b][ds][u]
-                        / 1000
-                    )
-
-                model += ac_from_dc[b][u] == xsum(
-                    ac_from_dc_st[b][ds][u] for ds in range(DS[b])
-                )
-                model += (xsum(ac_from_dc_st_on[b][ds][u] for ds in range(DS[b]))) <= 1
-                model += dc_to_ac[b][u] == xsum(
-                    ac_from_dc_st[b][ds][u] / discharge_stages[b][ds]["efficiency"]
-                    for ds in range(DS[b])
-                )
-                #tot hier ontladen met aan/uit
-                """
-
-                # vanaf hier ontladen met sos ######################################################
-                model += xsum(ac_from_dc_w[b][u][ds] for ds in range(DS[b])) <= 1
-                model += (
-                    xsum(
-                        ac_from_dc_w[b][u][ds] * ac_from_dc_samples[b][ds]
-                        for ds in range(DS[b])
-                    )
-                    == ac_from_dc[b][u]
-                )
-                model += (
-                    xsum(
-                        ac_from_dc_w[b][u][ds] * dc_to_ac_samples[b][ds]
-                        for ds in range(DS[b])
-                    )
-                    == dc_to_ac[b][u]
-                )
-                model.add_sos(
-                    [
-                        (ac_from_dc_w[b][u][ds], ac_from_dc_samples[b][ds])
-                        for ds in range(DS[b])
-                    ],
-                    2,
-                )
-                # tot hier constraints ontladen met sos
-
-        """
-        constraints reduced charging power at low or high soc
-        max_power[u] x 1000 <= max_power_0 + helling x (soc[u] – soc_0)
-        max_power[u] x 1000 <= max_power_0 + helling x soc[u] – helling x soc_0
-        max_power[u] x 1000 - helling x soc[u] <= max_power_0 - helling x soc_0
-        
-        """
-        # low soc
-        for b in range(B):
-            red_power = reduce_power_low_soc[b]
-            for rpl in range(len(red_power) - 1):
-                helling = int(red_power[rpl]._helling / 2)
-                for u in range(U):
-                    model += (
-                        dc_from_bat[b][u] * 1000
-                        - helling * soc[b][u]
-                        - helling * soc[b][u + 1]
-                        <= red_power[rpl].power - 2 * helling * red_power[rpl].soc
-                    )
-        # high soc
-        for b in range(B):
-            red_power = reduce_power_high_soc[b]
-            for rph in range(len(red_power) - 1):
-                helling = int(red_power[rph]._helling / 2)
-                for u in range(U):
-                    model += (
-                        dc_to_bat[b][u] * 1000
-                        - helling * soc[b][u]
-                        - helling * soc[b][u + 1]
-                        <= red_power[rph].power - 2 * helling * red_power[rph].soc
-                    )
-
-        for b in range(B):
-            for u in range(U + 1):
-                model += soc[b][u] == soc_low[b][u] + soc_mid[b][u]
-            model += soc[b][0] == start_soc[b]
-
-            entity_min_soc_end = self.battery_options[b].entity_min_soc_end_opt
-            if entity_min_soc_end is None:
-                min_soc_end_opt = 0
-            else:
-                min_soc_end_opt = float(self.get_state(entity_min_soc_end).state)
-
-            entity_max_soc_end = self.battery_options[b].entity_max_soc_end_opt
-            if entity_max_soc_end is None:
-                max_soc_end_opt = 100
-            else:
-                max_soc_end_opt = float(self.get_state(entity_max_soc_end).state)
-            if max_soc_end_opt <= min_soc_end_opt:
-                logging.error(
-                    f"'max soc end opt' ({max_soc_end_opt}) moet groter zijn dan "
-                    f"'min soc end opt' ({min_soc_end_opt}); "
-                    f"het programma kan nu geen optimale oplossing berekenem"
-                )
-                return None
-
-            model += soc[b][U] >= max(opt_low_level[b] / 2, min_soc_end_opt)
-            model += soc[b][U] <= max_soc_end_opt
-            for u in range(U):
-                model += soc[b][u + 1] == soc[b][u] + (
-                    dc_to_bat[b][u] * eff_dc_to_bat[b] * hour_fraction[u] / one_soc[b]
-                ) - (
-                    (dc_from_bat[b][u] * hour_fraction[u] / eff_bat_to_dc[b])
-                    / one_soc[b]
-                )
-                # pv_prod_dc is in kWh, pv_prod_dc_sum in kW
-                model += pv_prod_dc_sum[b][u] == xsum(
-                    pv_prod_dc[b][s][u] * pv_dc_on_off[b][s][u] / hour_fraction[u]
-                    for s in range(pv_dc_num[b])
-                )
-
-                model += (
-                    dc_from_ac[b][u] + dc_from_bat[b][u] + pv_prod_dc_sum[b][u]
-                    == dc_to_ac[b][u] + dc_to_bat[b][u]
-                )
-                model += dc_from_ac[b][u] <= ac_to_dc_on[b][u] * max_charge_power[b]
-                model += (
-                    ac_from_dc[b][u] <= ac_from_dc_on[b][u] * max_discharge_power[b]
-                )
-                model += (ac_to_dc_on[b][u] + ac_from_dc_on[b][u]) <= 1
-            for s in range(pv_dc_num[b]):
-                entity_pv_switch = self.battery_options[b].solar[s].entity_pv_switch
-                if entity_pv_switch == "":
-                    entity_pv_switch = None
-                if entity_pv_switch is None:
-                    for u in range(U):
-                        model += pv_dc_on_off[b][s][u] == 1
-
-        #####################################
-        #             boiler                #
-        #####################################
-        # aantal opwarm-intervallen
-        est_needed_intv = [0 for _ in range(U)]
-        # boiler is aan het verwarmen
-        boiler_on = [model.add_var(var_type=BINARY) for _ in range(U)]
-        # boiler begint met verwarmen
-        boiler_st = [model.add_var(var_type=BINARY) for _ in range(U)]
-        self.boiler_present = (
-            self.boiler_options.boiler_present if self.boiler_options else False
-        )
-        boiler_start = None
-        boiler_heated_by_heatpump = False
-        if self.boiler_present:
-            entity_boiler_enabled = self.boiler_options.entity_enabled
-            if entity_boiler_enabled is None:
-                self.boiler_enabled = True
-            else:
-                self.boiler_enabled = (
-                    self.get_state(entity_boiler_enabled).state == "on"
-                )
-        else:
-            self.boiler_enabled = False
-
-        if not self.boiler_present or not self.boiler_enabled:
-            # default values
-            boiler_instant_start = False
-            boiler_setpoint = 50
-            boiler_hysterese = 10
-            boiler_ondergrens = 40
-            spec_heat_boiler = 200 * 4.2 + 100 * 0.5  # kJ/K
-            cop_boiler = 3
-            # end temp boiler
-            boiler_temp = [
-                model.add_var(var_type=CONTINUOUS, lb=20, ub=20) for _ in range(U + 1)
-            ]
-            # consumption boiler
-            c_b = [model.add_var(var_type=CONTINUOUS, lb=0, ub=0) for _ in range(U)]
-            model += xsum(boiler_on[j] for j in range(U)) == 0
-            model += xsum(boiler_st[j] for j in range(U)) == 0
-            logging.info(
-                f"Boiler niet aanwezig of staat uit, boiler wordt niet ingepland"
-            )
-            boiler_start_index = None
-            boiler_end_index = None
-        else:
-            entity_boiler_instant_start = self.boiler_options.entity_instant_start
-            if entity_boiler_instant_start is None:
-                boiler_instant_start = False
-            else:
-                boiler_instant_start = (
-                    self.get_state(entity_boiler_instant_start).state == "on"
-                )
-            logging.info(
-                f"Boiler direct opwarmen staat {'aan' if boiler_instant_start else 'uit'}"
-            )
-            # 50 huidige boilertemperatuur ophalen uit ha
-            boiler_act_temp = float(
-                self.get_state(self.boiler_options.entity_actual_temp).state
-            )
-            boiler_setpoint = float(
-                self.get_state(self.boiler_options.entity_setpoint).state
-            )
-            if boiler_act_temp > boiler_setpoint + 1:
-                logging.warning(
-                    f"Je setpoint ({boiler_setpoint}) is lager de actuele "
-                    f"temperatuur ({boiler_act_temp}). Het verdient aanbeveling je "
-                    f"setpoint hoger in te stellen"
-                )
-            boiler_setpoint = max(boiler_setpoint, boiler_act_temp)
-            logging.info(f"Boiler setpoint {boiler_setpoint} °C")
-            boiler_hysterese = float(
-                self.get_state(self.boiler_options.entity_hysterese).state
-            )
-            # 0.5 K/uur afkoeling per uur, omrekenen naar afkoeling per interval
-            logging.info(f"Boiler hysterese {boiler_hysterese} K")
-
-            cooling_rate = self.boiler_options.cooling_rate.resolve(
-                ha_getter
-            )  # FlexFloat
-            logging.info(f"Boiler cooling rate {cooling_rate} K/uur")
-            boiler_cooling = cooling_rate * self.interval_s / 3600
-
-            # 45 °C grens daaronder kan worden verwarmd
-            boiler_bovengrens = self.boiler_options.heating_allowed_below.resolve(
-                ha_getter
-            )  # FlexFloat
-            logging.info(f"Boiler heating allowed below {boiler_bovengrens} °C")
-
-            # maximeren op setpoint
-            boiler_bovengrens = min(boiler_bovengrens, boiler_setpoint)
-            # 37 °C als boiler onder ondergrens komt moet er worden verwarmd
-            boiler_ondergrens = boiler_setpoint - boiler_hysterese
-            if boiler_bovengrens <= boiler_ondergrens:
-                logging.warning(f"Het programma heeft geen speelruimte tussen "
-                                f"heating allowed below {boiler_bovengrens} en de boiler ondergrens"
-                                f" {boiler_ondergrens}"
-                                f"(= setpoint {boiler_setpoint} - hysterese {boiler_hysterese}")
-                boiler_bovengrens = boiler_ondergrens + 1
-                logging.info(f"De waarde voor heating_allowed_below is verhoogd naar "
-                             f"{boiler_bovengrens}")
-            # volume in  liter
-            vol = self.boiler_options.volume
-            # spec heat in kJ/K = vol in liter * 4,2 kJ/k.liter + 100 kg boiler * 0,5 kJ/k.kg
-            spec_heat_boiler = 1.1 * (vol * 4.2 + 100 * 0.5)  # kJ/K
-            # cop flexfloat
-            cop_boiler = self.boiler_options.cop.resolve(ha_getter)
-            # kWh elektriciteit / K
-            # spec_elec_boiler = spec_heat_boiler / 3600 * cop_boiler
-            # elektrisch vermogen in W
-            power_boiler = float(  # W
-                self.boiler_options.elec_power
-            )
-            boiler_heated_by_heatpump = self.boiler_options.boiler_heated_by_heatpump
-            # delta t in een step
-            # heat rate = power * cop * sec.p.interval /spec vermogen in K/step
-            heat_rate = (
-                power_boiler * cop_boiler * self.interval_s / (spec_heat_boiler * 1000)
-            )
-            boiler_end_temp = max(
-                boiler_ondergrens, boiler_act_temp - U * boiler_cooling
-            )
-            max_steps = math.ceil((boiler_setpoint - boiler_end_temp) / heat_rate)
-            # interval-index waarop boiler kan worden verwarmd
-            if boiler_instant_start or (boiler_act_temp <= boiler_ondergrens):
-                boiler_start_index = 0
-                boiler_start = 0
-            else:
-                boiler_start_index = int(
-                    max(
-                        0,
-                        min(
-                            U - 1 - max_steps,
-                            math.floor(
-                                (boiler_act_temp - boiler_bovengrens) / boiler_cooling
-                            ),
-                        ),
-                    )
-                )
-
-            # interval-index waarop boiler nog aan kan
-            # (41-40)/0.4=2.5
-            boiler_end_temp = boiler_act_temp - U * boiler_cooling
-            if boiler_instant_start or (boiler_act_temp <= boiler_ondergrens):
-                boiler_end_index = 1
-            else:
-                boiler_end_index = int(
-                    min(
-                        U - max_steps,
-                        max(
-                            boiler_start_index + 1,
-                            math.floor(
-                                (boiler_act_temp - boiler_ondergrens) / boiler_cooling
-                            ),
-                        ),
-                    )
-                )
-            boiler_temp = [
-                model.add_var(
-                    var_type=CONTINUOUS,
-                    lb=min(boiler_act_temp, boiler_setpoint - boiler_hysterese - 10),
-                    ub=boiler_setpoint + 10,
-                )
-                for _ in range(U + 1)
-            ]  # end temp boiler
-
-            if (boiler_start_index > boiler_end_index) or (
-                boiler_end_temp >= boiler_bovengrens
-            ):  # geen boiler opwarming in deze periode
-                logging.info(
-                    f"Boiler wordt niet ingepland, omdat de verwachte "
-                    f"eindtemperatuur {boiler_end_temp} °C hoger is dan de "
-                    f"opwarmgrens {boiler_bovengrens} °C."
-                )
-                c_b = [
-                    model.add_var(var_type=CONTINUOUS, lb=0, ub=0) for _ in range(U)
-                ]  # consumption boiler
-                model += xsum(boiler_on[j] for j in range(U)) == 0
-                model += xsum(boiler_st[j] for j in range(U)) == 0
-                logging.debug(f"Boiler: er  wordt geen opwarming inpland")
-                boiler_end_temp = boiler_act_temp - boiler_cooling * U
-                logging.debug(
-                    f"Boiler eind temperatuur zonder opwarmen: {boiler_end_temp:.2f}"
-                )
-                model += boiler_temp[0] == boiler_act_temp
-                for u in range(U):
-                    # opwarming in K = kWh opwarming * 3600 = kJ / spec heat boiler - 3
-                    model += boiler_temp[u + 1] == boiler_temp[u] - boiler_cooling
-            else:
-                logging.info(
-                    f"Boiler opwarmen wordt ingepland tussen: "
-                    f"{tijd[boiler_start_index].strftime('%Y-%m-%d %H:%M')} en "
-                    f"{tijd[min(boiler_end_index, U - 1)].strftime('%Y-%m-%d %H:%M')}"
-                )
-                est_boiler_temp = [
-                    (boiler_act_temp - boiler_cooling * u) for u in range(U)
-                ]
-                est_needed_heat = [0.0 for _ in range(U)]
-                est_needed_elec = [0.0 for _ in range(U)]
-                est_needed_elec_st = []
-                # cb_hr_run = []
-                est_elec_cost = [0.0 for _ in range(U)]
-                est_boiler_endtemp = [0.0 for _ in range(U)]
-                est_boiler_endvalue = [0.0 for _ in range(U)]
-                est_netto_cost = [0.0 for _ in range(U)]
-                # needed_time = [0 for _ in range(U)]
-                # needed_heat = sp * (setpoint - act_temp - 4 - cooling*plan_periode)/3600 in kWh
-
-                # consumption in one interval = kWh per uur of per 15min
-                cons_interval = power_boiler * self.interval_s / 3600000
-                # tempverlies door menging bij starten opwarmen in K
-                # mix_los = 1.2
-                logging.info(
-                    f"Boiler verbruik in 1 {self.interval_name}: {cons_interval} kWh"
-                )
-                boiler_netto_cost = None
-                for u in range(U):
-                    # benodigde warmte voor opwarmen vanaf interval u in kWh
-                    est_needed_heat[u] = max(
-                        0.0,
-                        float(
-                            spec_heat_boiler
-                            * (boiler_setpoint - est_boiler_temp[u])
-                            / 3600
-                        ),
-                    )
-                    # opstart elektra in kWh
-                    start_needed_elec = 0.1
-                    # benogde elektra bij opwarmen vanaf interval u in kWh
-                    est_needed_elec[u] = (
-                        start_needed_elec + est_needed_heat[u] / cop_boiler
-                    )
-                    # benodigde aantallen intervallen
-                    num_intervals = math.ceil(
-                        (est_needed_elec[u] * 1000 / power_boiler)
-                        * 3600
-                        / self.interval_s
-                    )
-                    # verdelen van benodigde elektra over de intervallen
-                    est_needed_intv[u] = num_intervals
-                    est_needed_elec_st.append([])
-                    # cb_hr_run.append([])
-                    # for _ in range(U):
-                    #     cb_hr_run[u].append(0.0)
-                    used = 0.0
-                    for j in range(num_intervals + 1):
-                        use = min(
-                            max(0, est_needed_elec[u] - used),
-                            cons_interval * interval_fraction[min(u + j, U - 1)],
-                        )
-                        est_elec_cost[u] += use * pl[min(u + j, U - 1)]
-                        est_needed_elec_st[u].append(use)
-                        # if u + j < U:
-                        #    cb_hr_run[u][u + j] = use
-                        used += use
-                        if used >= est_needed_elec[u]:
-                            break
-                    est_boiler_endtemp[u] = boiler_setpoint - boiler_cooling * (
-                        U - u - est_needed_intv[u]
-                    )
-                    est_boiler_endvalue[u] = (
-                        (est_boiler_endtemp[u] - boiler_act_temp)  # boiler_ondergrens)
-                        * (spec_heat_boiler / (3600 * cop_boiler))
-                        * p_avg
-                    )
-                    est_netto_cost[u] = est_elec_cost[u] - est_boiler_endvalue[u]
-                    if u + num_intervals >= U:
-                        boiler_end_index = min(boiler_end_index, u)
-                        break
-                    if (
-                        (u >= boiler_start_index)
-                        and (u <= boiler_end_index)
-                        and (
-                            (boiler_netto_cost is None)
-                            or (est_netto_cost[u] < boiler_netto_cost)
-                        )
-                    ):
-                        boiler_netto_cost = est_netto_cost[u]
-                        boiler_start = u
-
-                # if self.debug:
-                #     df_interval = pd.DataFrame(cb_hr_run)
-                #     logging.debug(f"Interval boiler:\n{df_interval.to_string()}\n")
-
-                if self.log_level == logging.INFO:
-                    df_boiler = pd.DataFrame(
-                        {
-                            "tijd": tijd,
-                            "act_temp": est_boiler_temp,
-                            "heat": est_needed_heat,
-                            "elec": est_needed_elec,
-                            "interval": est_needed_intv,
-                            "cost": est_elec_cost,
-                            "end_temp": est_boiler_endtemp,
-                            "end_value": est_boiler_endvalue,
-                            "netto_cost": est_netto_cost,
-                        }
-                    )
-                    logging.info(f"Prognose boiler:\n{df_boiler.to_string()}\n")
-
-                # c_b = consumption boiler in kWh per interval
-                c_b = [
-                    model.add_var(var_type=CONTINUOUS, lb=0, ub=cons_interval)
-                    for _ in range(U)
-                ]
-                model += xsum(boiler_st[u] for u in range(U)) == 1
-
-                # korte bocht oplossing
-                """
-                if boiler_start is None:
-                    for u in range(U):
-                        model += c_b[u] == 0.0
-                        model += boiler_on[u] == 1
-                else:
-                    logging.info(
-                        f"Boiler start wordt ingezet op {tijd[boiler_start]} met "
-                        f"{est_needed_intv[boiler_start]} intervallen"
-                    )
-                    for u in range(U):
-                        if u == boiler_start:
-                            model += boiler_st[u] == 1
-                        else:
-                            model += boiler_st[u] == 0
-                        if (
-                            boiler_start
-                            <= u
-                            < boiler_start + est_needed_intv[boiler_start]
-                        ):
-                            model += (
-                                c_b[u]
-                                == est_needed_elec_st[boiler_start][u - boiler_start]
-                            )
-                            model += boiler_on[u] == 1
-                        else:
-                            model += c_b[u] == 0.0
-                            model += boiler_on[u] == 0
-                """
-                # beste oplossing
-
-                for u in range(U)[0:boiler_start_index]:
-                    model += c_b[u] == 0
-                    model += boiler_on[u] == 0
-                    model += boiler_st[u] == 0
-
-                for u in range(U)[boiler_end_index + 1 :]:
-                    logging.debug(f"u {u}, {uur[u]}")
-                    model += boiler_st[u] == 0
-                    if u > boiler_end_index + est_needed_intv[boiler_end_index] - 1:
-                        model += boiler_on[u] == 0
-                        model += c_b[u] == 0
-                model += (
-                    xsum(
-                        boiler_st[u]
-                        for u in range(U)[boiler_start_index:boiler_end_index]
-                    )
-                    == 1
-                )
-                for u in range(U)[
-                    boiler_start_index : boiler_end_index
-                    + est_needed_intv[boiler_end_index]
-                ]:
-                    model += c_b[u] == xsum(
-                        boiler_st[j] * est_needed_elec_st[j][u - j]
-                        for j in range(U)[max(0, u - est_needed_intv[u] + 1) : u + 1]
-                        if u - j < len(est_needed_elec_st[j])
-                    )
-                    """
-                    logging.debug(f"uur {u}: {uur[u]} est_needed_intv[u]:{est_needed_intv[u]}")
-                    for j in range(U)[max(0, u - est_needed_intv[u]+1): u + 1]:
-                        logging.debug(f"len(est_needed_elec_st[j]): {len(est_needed_elec_st[j])}")
-                        if est_needed_intv[u]>0 and u - j < len(est_needed_elec_st[j]):
-                            logging.debug(f"j: {j}, est_needed_elec_st[j][u - j]: "
-                                  f"{est_needed_elec_st[j][u - j]}")
-                    """
-                    model += boiler_on[u] == xsum(
-                        boiler_st[j]
-                        for j in range(U)[
-                            max(boiler_start_index, u - est_needed_intv[u] + 1) : u + 1
-                        ]
-                        if u - j < len(est_needed_elec_st[j])
-                    )
-
-                """
-                    j_vanaf = u - est_needed_intv[u]
-                    j_tot = min(u + 1, len(cb_hr_run))
-                    logging.debug(u, j_vanaf, j_tot)
-                    model += c_b[u] == xsum(
-                        boiler_st[j] * cb_hr_run[j][u]
-                        for j in range(U)[j_vanaf: j_tot]
-                    )
-                    model += boiler_on[u] == 0 #xsum(
-                        # boiler_st[j]
-                        # for j in range(U)[u - est_needed_intv[u]: u + 1]
-                        # for j in range(U)[
-                        #    max(boiler_start_index, u - est_needed_intv[u] + 1): u + 1]
-                        # if u - j < len(est_needed_elec_st[j])
-                    # )
-
-            
-                for u in range(U)[
-                    boiler_start_index : min(
-                        boiler_end_index, U - est_needed_intv[U - 1]
-                    )
-                    + 1
-                ]:
-                    model += boiler_st[u] * est_needed_intv[u] <= xsum(
-                        boiler_on[u + j] for j in range(est_needed_intv[u])
-                    )
-
-                for u in range(U)[
-                    boiler_start_index : boiler_end_index
-                    + est_needed_intv[boiler_end_index-1]-1
+                for label, entity_id in [
+                    ("schakelaar laden", entity_charge_switch),
+                    ("aantal ampere", entity_charging_ampere),
                 ]:
-                    u_str = f"{u} {uur[u]}: "
-                    for u1 in range(U)[u - est_needed_intv[u] + 1 : u + 1]:
-                        if (u1 + est_needed_intv[u1] - 1) >= u >= u1:
-                            u_str += f"{u1}, "
-                    logging.info(u_str)
-                    model += boiler_on[u] == xsum(
-                        boiler_st[u1] * ((u1 + est_needed_intv[u1] - 1) >= u >= u1)
-                        for u1 in range(U)[u - est_needed_intv[u] + 1 : u+1]
-                    )
-                """
-                model += boiler_temp[0] == boiler_act_temp
-                for u in range(U):
-                    # opwarming in K = kWh opwarming * 3600 = kJ / spec heat boiler - 3
-                    model += (
-                        boiler_temp[u + 1]
-                        == boiler_temp[u]
-                        # - mix_los * boiler_st[u]
-                        - boiler_cooling
-                        + c_b[u] * cop_boiler * 3600 / spec_heat_boiler
-                    )
-
-        ################################################
-        #             electric vehicles
-        ################################################
-        EV = len(self.ev_options)
-        actual_soc = []
-        wished_level = []
-        level_margin = []
-        ready_u = []
-        ev_ready_dt = []
-        intervals_needed = []
-        max_power = []
-        energy_needed = []
-        ev_plugged_in = []
-        ev_position = []
-        #  now_dt = dt.datetime.now()
-        ev_charge_stages = []
-        ampere_factor = []
-        ev_instant_charge = []
-        ev_switch_cost = []
-        ev_low_soc_cost = []
-        ev_capacity = []
-        ECS = []
-        for e in range(EV):
-            ev_capacity.append(self.ev_options[e].capacity)
-            # plugged = self.get_state(self.ev_options["entity plugged in"]).state
-            try:
-                plugged_in = (
-                    self.get_state(self.ev_options[e].entity_plugged_in).state == "on"
-                )
-            except Exception as ex:
-                logging.error(f"EV: entity plugged in: {ex}")
-                plugged_in = False
-            ev_plugged_in.append(plugged_in)
-            try:
-                position = self.get_state(self.ev_options[e].entity_position).state
-            except Exception as ex:
-                logging.error(f"EV: entity position: {ex}")
-                position = "away"
-            ev_position.append(position)
-            try:
-                soc_state = float(
-                    self.get_state(self.ev_options[e].entity_actual_level).state
-                )
-            except Exception as ex:
-                logging.error(f"EV: entity actual level: {ex}")
-                soc_state = 100.0
-            if _start_ev_soc is not None:
-                soc_state = _start_ev_soc
-
-            # onderstaande regel eventueel voor testen
-            # soc_state = min(soc_state, 90.0)
-
-            actual_soc.append(soc_state)
-            entity_ev_instant_start = self.ev_options[e].entity_instant_start
-            if entity_ev_instant_start is None:
-                instant_charge = False
-            else:
-                instant_charge = self.get_state(entity_ev_instant_start).state == "on"
-            ev_instant_charge.append(instant_charge)
-            if instant_charge:
-                entity_ev_instant_level = self.ev_options[e].entity_instant_level
-                if entity_ev_instant_level is None:
-                    wished_lvl = 100.0
-                else:
-                    wished_lvl = float(self.get_state(entity_ev_instant_level).state)
-            else:
-                wished_lvl = float(
-                    self.get_state(
-                        self.ev_options[e].charge_scheduler.entity_set_level
-                    ).state
-                )
-            wished_level.append(wished_lvl)
-            ev_switch_cost.append(self.ev_options[e].switch_cost)
-            ev_low_soc_cost.append(self.ev_options[e].low_soc_cost)
-            level_margin.append(
-                self.ev_options[e].charge_scheduler.level_margin
-                if self.ev_options[e].charge_scheduler
-                else 0
-            )
-            ready_str = self.get_state(
-                self.ev_options[e].charge_scheduler.entity_ready_datetime
-            ).state
-            if len(ready_str) > 9:
-                # dus met datum en tijd
-                ready = dt.datetime.strptime(ready_str, "%Y-%m-%d %H:%M:%S")
-            else:
-                ready = dt.datetime.strptime(ready_str, "%H:%M:%S")
-                ready = dt.datetime(
-                    start_dt.year,
-                    start_dt.month,
-                    start_dt.day,
-                    ready.hour,
-                    ready.minute,
-                )
-                if (ready.hour == start_dt.hour and ready.minute < start_dt.minute) or (
-                    ready.hour < start_dt.hour
-                ):
-                    ready = ready + dt.timedelta(days=1)
-            hours_avail = max(0, (ready - start_dt).total_seconds() / 3600)
-            if instant_charge:
-                # instant charge has no real deadline, so bound hours_avail by the
-                # planning horizon instead of the (possibly stale) configured ready time
-                horizon_end = tijd[U - 1] + dt.timedelta(seconds=self.interval_s)
-                hours_avail = max(0, (horizon_end - start_dt).total_seconds() / 3600)
-            # model_dump() is required here: after building the list, two computed
-            # keys ("power" and "accu_power") are injected into each dict at runtime
-            # based on ampere × voltage and efficiency.  These derived values don't
-            # exist on EVChargeStage, so plain mutable dicts are necessary.
-            ev_stages = [s.model_dump() for s in self.ev_options[e].charge_stages]
-            if ev_stages[0]["ampere"] != 0.0:
-                ev_stages = [{"ampere": 0.0, "efficiency": 1}] + ev_stages
-            if instant_charge:
-                ev_stages = [ev_stages[0], ev_stages[-1]]
-            ev_charge_stages.append(ev_stages)
-            ECS.append(len(ev_charge_stages[e]))
-            max_ampere = ev_charge_stages[e][-1]["ampere"]
-            try:
-                max_ampere = float(max_ampere)
-            except ValueError:
-                max_ampere = 10
-            charge_three_phase = self.ev_options[e].charge_three_phase.resolve(
-                ha_getter
-            )
-            if charge_three_phase:
-                ampere_f = 3
-            else:
-                ampere_f = 1
-            ampere_factor.append(ampere_f)
-            max_power.append(max_ampere * ampere_f * 230 / 1000)  # vermogen in kW
-            logging.info(f"Instellingen voor laden van EV: {self.ev_options[e].name}")
-            logging.info(f"Direct laden is {'aan' if instant_charge else 'uit'}")
-            logging.info(f" Ampere  Effic. Grid kW Accu kW")
-            for cs in range(ECS[e]):
-                if not ("efficiency" in ev_charge_stages[e][cs]):
-                    ev_charge_stages[e][cs]["efficiency"] = 1
-                ev_charge_stages[e][cs]["power"] = (
-                    ev_charge_stages[e][cs]["ampere"] * 230 * ampere_factor[e] / 1000
-                )
-                ev_charge_stages[e][cs]["accu_power"] = (
-                    ev_charge_stages[e][cs]["power"]
-                    * ev_charge_stages[e][cs]["efficiency"]
-                )
-                logging.info(
-                    f"{ev_charge_stages[e][cs]['ampere']:>7.2f} "
-                    f"{ev_charge_stages[e][cs]['efficiency']:>7.2f} "
-                    f"{ev_charge_stages[e][cs]['power']:>7.2f} "
-                    f"{ev_charge_stages[e][cs]['accu_power']:>7.2f}"
-                )
-
-            """
-            #test voor bug
-            ev_plugged_in.append(True)
-            wished_level.append(float(
-                self.get_state(self.ev_options[e]["charge scheduler"]["entity set level"]).state))
-            ev_position.append("home")
-            actual_soc.append(40)
-            max_power.append(10 * 230 / 1000)
-            #tot hier
-            """
-            logging.info(f"Capaciteit accu: {ev_capacity[e]} kWh")
-            logging.info(f"Maximaal laadvermogen: {max_power[e]} kW")
-            logging.info(f"Klaar met laden op: {ready.strftime('%d-%m-%Y %H:%M:%S')}")
-            logging.info(f"Huidig laadniveau: {actual_soc[e]} %")
-            logging.info(f"Gewenst laadniveau:{wished_level[e]} %")
-            logging.info(f"Marge voor het laden: {level_margin[e]} %")
-            logging.info(f"Locatie: {ev_position[e]}")
-            logging.info(f"Ingeplugged:{ev_plugged_in[e]}")
-            e_needed = ev_capacity[e] * (wished_level[e] - actual_soc[e]) / 100
-            max_possible = (
-                max_power[e] * hours_avail * ev_charge_stages[e][-1]["efficiency"]
-            )
-            if (
-                (e_needed > max_possible)
-                and ev_plugged_in[e]
-                and (ev_position[e] == "home")
-            ):
-                logging.warning(
-                    f"Er is te weinig tijd om tot {wished_level[e]}% te laden"
-                )
-                wished_level[e] = actual_soc[e] + max_possible * 100 / ev_capacity[e]
-                logging.info(f"Bijgesteld gewenst laadniveau:{wished_level[e]:.1f} %")
-                e_needed = max_possible  # ev_capacity[e] * (wished_level[e] - actual_soc[e]) / 100
-            e_needed = max(0, e_needed)  # nooit minder dan 0
-            energy_needed.append(e_needed)  # in kWh
-            logging.info(f"Benodigde netto energie: {energy_needed[e]:.3f} kWh")
-            # uitgedrukt in aantal uren; bijvoorbeeld 1,5
-            time_needed = energy_needed[e] / (
-                max_power[e] * ev_charge_stages[e][-1]["efficiency"]
-            )
-            hrs_needed = math.floor(time_needed)
-            min_needed = math.ceil((time_needed - hrs_needed) * 60)
-            logging.info(f"Tijd nodig om te laden: {hrs_needed}:{min_needed} uur")
-            if instant_charge:
-                ready = start_dt + datetime.timedelta(
-                    hours=hrs_needed, minutes=min_needed
-                )
-            old_switch_state = self.get_state(self.ev_options[e].charge_switch).state
-            old_ampere_state = self.get_state(
-                self.ev_options[e].entity_set_charging_ampere
-            ).state
-            # afgerond naar boven in hele uren
-            int_needed = math.ceil(
-                time_needed if self.interval == "1hour" else time_needed * 4
-            )
-            intervals_needed.append(int_needed)
-            logging.info(
-                f"Afgerond naar hele intervallen: {intervals_needed[e]} "
-                f"{self.interval_name}"
-            )
-            logging.info(f"Stand laden schakelaar: {old_switch_state}")
-            logging.info(f"Stand aantal ampere laden: {old_ampere_state} A")
-            ready_index = U
-            reden = ""
-            if (wished_level[e] - level_margin[e]) <= actual_soc[e]:
-                reden = (
-                    f" werkelijk niveau ({actual_soc[e]:.1f}%) hoger is of gelijk aan "
-                    f"gewenst niveau ({wished_level[e]:.1f}% minus de marge "
-                    f"{level_margin[e]}%),"
-                )
-            if not (ev_position[e] == "home"):
-                reden = reden + " auto is niet huis,"
-            if not ev_plugged_in[e]:
-                reden = reden + " auto is niet ingeplugd,"
-            if not (tijd[0] < ready):
-                reden = reden + f" opgegeven tijdstip ({str(ready)}) is verouderd,"
-            if tijd[U - 1] < ready:
-                reden = reden + (
-                    f" opgegeven tijdstip ({str(ready)}) ligt voorbij de "
-                    f"planningshorizon ({tijd[U - 1]}),"
-                )
-            if (
-                ev_plugged_in[e]
-                and (ev_position[e] == "home")
-                and (wished_level[e] - level_margin[e] > actual_soc[e])
-                and (tijd[0] < ready)
-            ):
-                if instant_charge:
-                    ready_index = max(0, intervals_needed[e] - 1)
-                else:
-                    for u in range(U):
-                        if (tijd[u] + dt.timedelta(seconds=self.interval_s)) >= ready:
-                            ready_index = u
-                            break
-            if ready_index == U:
-                if len(reden) > 0:
-                    reden = reden[:-1] + "."
-                logging.info(f"Opladen wordt niet ingepland, omdat{reden}")
-            else:
-                logging.info(f"Opladen wordt ingepland.")
-            ready_u.append(ready_index)
-            ev_ready_dt.append(ready)
-
-        # charger_on = [[model.add_var(var_type=BINARY) for u in range(U)] for e in range(EV)]
-        # charger_ampere = [[model.add_var(var_type=CONTINUOUS, lb=0,
-        #                     ub= charge_stages[e][-1]["ampere"])
-        #                     for cs in range(ECS[e])] for e in range(EV)]
-        stage_consumption = [
-            [
-                [
-                    model.add_var(var_type=CONTINUOUS, lb=0, ub=max_power[e])
-                    for _ in range(U)
-                ]
-                for _ in range(ECS[e])
-            ]
-            for e in range(EV)
-        ]
-        stage_factor = [
-            [
-                [model.add_var(var_type=CONTINUOUS, lb=0, ub=1) for _ in range(U)]
-                for _ in range(ECS[e])
-            ]
-            for e in range(EV)
-        ]
-        stage_on = [
-            [[model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(ECS[e])]
-            for e in range(EV)
-        ]
-
-        c_ev = [
-            [
-                model.add_var(var_type=CONTINUOUS, lb=0, ub=max_power[e])
-                for _ in range(U)
-            ]
-            for e in range(EV)
-        ]  # consumption charger
-
-        p_ev = [
-            [
-                model.add_var(var_type=CONTINUOUS, lb=0)  # , ub=max_power[e])
-                for _ in range(U)
-            ]
-            for _ in range(EV)
-        ]  # consumption vermogen in kW
-
-        ev_accu_in = [
-            [
-                model.add_var(var_type=CONTINUOUS, lb=0, ub=max_power[e])
-                for _ in range(U)
-            ]
-            for e in range(EV)
-        ]  # load battery in kWh
-
-
-        ev_soc_kwh = [
-            [
-                model.add_var(var_type=CONTINUOUS, lb=0)
-                for _ in range(U)
-            ]
-            for e in range(EV)
-        ]  # soc in kWh na ieder interval
-
-
-        ev_is_on = [
-            [model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(EV)
-        ]
-
-        ev_is_off = [
-            [model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(EV)
-        ]
-
-        ev_is_partial = [
-            [model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(EV)
-        ]
-
-        ev_boundary_stop = [
-            [model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(EV)
-        ]
-
-        ev_partial_sum = [
-            model.add_var(var_type=INTEGER, lb=0) for e in range(EV)
-        ]  # sum is_partial
-
-        ev_boundary_sum = [
-            model.add_var(var_type=INTEGER, lb=0) for e in range(EV)
-        ]  # sum is_boundaru
-
-        ev_start_stops_sum = [
-            model.add_var(var_type=INTEGER, lb=0) for e in range(EV)
-        ]  # sum of ev starts
-
-        ev_delta_soc =[
-            [model.add_var(var_type=CONTINUOUS, lb=0) for _ in range(U)]
-            for _ in range(EV)
-        ] # delta soc in kWh between wished and actual
-
-        low_soc_penalty_int = [
-            [model.add_var(var_type=CONTINUOUS, lb=0) for _ in range(U)]
-            for _ in range(EV)
-        ]  # penalty per interval in eur
-
-        ev_energy_slack = 0.001  # kWh
-        # minimale schakelduur voor de laadpaal (seconden). Korter is niet
-        # uitvoerbaar: een relais dat een paar seconden dichtvalt levert niets
-        # nuttigs op, en de stoptijd wordt afgerond op hele minuten.
-        ev_min_duty_s = 300.0
-
-        for e in range(EV):
-            if (energy_needed[e] > 0) and (ready_u[e] < U):
-                # kleinste hoeveelheid energie die met deze minimumduur nog
-                # geleverd kan worden (kWh). Is er minder nodig, dan zou de eis
-                # het model onoplosbaar maken en slaan we hem over.
-                min_stage_accu = min(
-                    ev_charge_stages[e][cs]["accu_power"]
-                    for cs in range(1, ECS[e])
-                    if ev_charge_stages[e][cs]["accu_power"] > 0
-                )
-                min_deliverable = min_stage_accu * ev_min_duty_s / 3600
-                apply_min_duty = energy_needed[e] >= min_deliverable + ev_energy_slack
-                if not apply_min_duty:
-                    logging.info(
-                        f"EV {self.ev_options[e].name}: minimale schakelduur van "
-                        f"{ev_min_duty_s:.0f} s wordt niet toegepast; er is maar "
-                        f"{energy_needed[e]:.3f} kWh nodig en de kortste "
-                        f"schakelactie levert al {min_deliverable:.3f} kWh."
-                    )
-
-                for u in range(ready_u[e] + 1):
-                    # laden, alles uitgedrukt in vermogen kW
-                    # uur-fractie van dit interval: het laatste interval loopt
-                    # maar tot de deadline, de rest is een heel interval
-                    if u == ready_u[e]:
-                        hr_fraction = (ev_ready_dt[e] - tijd[u]).total_seconds() / 3600
-                    else:
-                        hr_fraction = hour_fraction[u]
-
-                    # stage_factor is een fractie van hr_fraction, niet van een
-                    # heel uur. De minimale duty verschilt dus per interval. Is
-                    # het interval zelf korter dan de minimumduur, dan wordt
-                    # min_duty 1: helemaal aan of helemaal uit.
-                    if apply_min_duty and hr_fraction > 0:
-                        min_duty = min(1.0, ev_min_duty_s / (hr_fraction * 3600))
-                    else:
-                        min_duty = 0.0
-
-                    for cs in range(ECS[e]):
-                        model += stage_on[e][cs][u] - stage_factor[e][cs][u] <= 0.9999
-                        model += stage_on[e][cs][u] - stage_factor[e][cs][u] >= 0
-                        # een echte stap staat uit, of draait minstens
-                        # ev_min_duty_s seconden
-                        if cs >= 1 and min_duty > 0:
-                            model += (
-                                stage_factor[e][cs][u] >= min_duty * stage_on[e][cs][u]
-                            )
-
-                    for cs in range(ECS[e]):
-                        # daadwerkelijk ac verbruik (kWh) per stage =
-                        # vermogen van de stap x oplaadfactor (0..1) x uur-fractie
-                        model += (
-                            stage_consumption[e][cs][u]
-                            == ev_charge_stages[e][cs]["power"]
-                            * stage_factor[e][cs][u]
-                            * hr_fraction
-                        )
-                        """
-                        # idem met schakelaar
-                        model += (
-                            stage_consumption[e][cs][u]
-                            <= max_power[e] * stage_on[e][cs][u]
-                        )
-                        """
-                    # som van alle oplaadfactoren is 1
-                    model += (xsum(stage_factor[e][cs][u] for cs in range(ECS[e]))) == 1
-
-                    # per interval mag maar een echte laadstap aan staan.
-                    # een lader kan niet tegelijk op 6 A en op 10 A staan.
-                    # stap 0 (0 A) doet hier niet mee: die vangt het deel van
-                    # het interval op waarin niet geladen wordt. zo blijft
-                    # deellading binnen een interval mogelijk.
-                    model += (
-                        xsum(stage_on[e][cs][u] for cs in range(ECS[e])[1:])
-                    ) <= 1
-                    model += c_ev[e][u] == xsum(
-                        stage_consumption[e][cs][u] for cs in range(ECS[e])
-                    )
-
-                    # het vermogen per ev per uur
-                    model += p_ev[e][u] == xsum(
-                        ev_charge_stages[e][cs]["power"] * stage_on[e][cs][u]
-                        for cs in range(ECS[e])[1:]
-                    )
-
-                    model += ev_accu_in[e][u] == xsum(
-                        ev_charge_stages[e][cs]["accu_power"]
-                        * hr_fraction
-                        * stage_factor[e][cs][u]
-                        for cs in range(ECS[e])
-                    )
-
-
-                    if u == 0:
-                        model += (
-                            ev_soc_kwh[e][u]
-                            == actual_soc[e] * ev_capacity[e] / 100 + ev_accu_in[e][u]
-                        )
-                    else:
-                        model += (
-                            ev_soc_kwh[e][u] == ev_soc_kwh[e][u - 1] + ev_accu_in[e][u]
-                        )
-                    model += ev_delta_soc[e][u] == wished_level[e] * ev_capacity[e] / 100 - \
-                             ev_soc_kwh[e][u]
-                    model += low_soc_penalty_int[e][u] == ev_delta_soc[e][u] * ev_low_soc_cost[e] * \
-                                 hour_fraction[u]
-
-                eps = 0.0001
-                for u in range(U)[: ready_u[e] + 1]:
-                    # ev_is_off
-                    # model += sf >= ev_is_off[e][u]
-                    model += stage_factor[e][0][u] >= ev_is_off[e][u]
-                    model += stage_factor[e][0][u] <= 1 - eps + eps * ev_is_off[e][u]
-
-                    # ev_is_on
-                    # model += sf <= 1 - ev_is_on[e][u]
-                    model += stage_factor[e][0][u] <= (1 - ev_is_on[e][u])
-
-                    # ev_is_partial
-                    # model += sf >= eps * ev_is_partial[e][u]
-                    model += stage_factor[e][0][u] >= eps * ev_is_partial[e][u]
-
-                    # model += sf <= (1 - eps) * ev_is_partial[e][u] + ev_is_off[e][u]
-                    model += (
-                        stage_factor[e][0][u]
-                        <= (1 - eps) * ev_is_partial[e][u] + ev_is_off[e][u]
-                    )
-
-                    # precies één toestand
-                    model += (
-                        ev_is_on[e][u] + ev_is_off[e][u] + ev_is_partial[e][u]
-                    ) == 1
-
-                    if u == ready_u[e]:
-                        model += ev_boundary_stop[e][u] == ev_is_on[e][u]
-                    else:
-                        model += ev_boundary_stop[e][u] <= ev_is_on[e][u]
-                        model += ev_boundary_stop[e][u] <= ev_is_off[e][u + 1]
-                        model += ev_boundary_stop[e][u] >= (
-                            ev_is_on[e][u] + ev_is_off[e][u + 1] - 1
-                        )
-
-                # zonder stop-entiteit kan de lader niet halverwege een
-                # interval stoppen. interval 0 moet dan helemaal aan of
-                # helemaal uit zijn. alleen interval 0 telt, want alleen dat
-                # interval wordt echt naar de lader gestuurd; de rest van het
-                # plan wordt later opnieuw berekend.
-                can_stop = (not ev_instant_charge[e]) and (
-                    self.ev_options[e].entity_stop_charging is not None
-                )
-                if (not can_stop) and (ready_u[e] > 0):
-                    model += ev_is_partial[e][0] == 0
-
-                model += ev_partial_sum[e] == xsum(
-                    ev_is_partial[e][u] for u in range(ready_u[e] + 1)
-                )
-                model += ev_boundary_sum[e] == xsum(
-                    ev_boundary_stop[e][u] for u in range(ready_u[e] + 1)
-                )
-
-                model += (
-                    ev_start_stops_sum[e]
-                    == (ev_partial_sum[e] + ev_boundary_sum[e]) * 2 - 2
-                )
-
-                # equality relaxed to a small epsilon band: energy_needed[e]
-                # is computed outside the model via `hours_avail` (raw
-                # timestamp subtraction), while the sum below is realized
-                # inside the model via the independently-derived
-                # hour_fraction[u] / hr_fraction chain. These normally agree
-                # to many decimal places but are not guaranteed bit-
-                # identical; pinning to an exact equality at the computed
-                # ceiling (max_possible, see energy_needed[e] derivation
-                # above) can turn a trivially-achievable target into a hard
-                # infeasibility from float noise alone. 1 Wh (0.001 kWh) is
-                # far below anything physically meaningful here.
-                model += (
-                    xsum(ev_accu_in[e][u] for u in range(ready_u[e] + 1))
-                    <= energy_needed[e] + ev_energy_slack
-                )
-                model += (
-                    xsum(ev_accu_in[e][u] for u in range(ready_u[e] + 1))
-                    >= energy_needed[e] - ev_energy_slack
-                )
-                for u in range(U)[ready_u[e] + 1 :]:
-                    model += c_ev[e][u] == 0
-                    model += p_ev[e][u] == 0
-                    model += ev_accu_in[e][u] == 0
-                    model += ev_is_partial[e][u] == 0
-                    model += ev_boundary_stop[e][u] == 0
-                    model += ev_delta_soc[e][u] == 0
-                    model += low_soc_penalty_int[e][u] == 0
-
-                """
-                max_beschikbaar = 0
-                for u in range(ready_u[e] + 1):
-                    model += c_ev[e][u] <= charger_on[e][u] * hour_fraction[u] * max_power[e]
-                    max_beschikbaar += hour_fraction[u] * max_power[e]
-                for u in range(ready_u[e] + 1, U):
-                    model += charger_on[e][u] == 0
-                    model += c_ev[e][u] == 0
-                model += xsum(charger_on[e][j] for j in range(ready_u[e] + 1)) == hours_needed[e]
-                model += xsum(c_ev[e][u] for u in range(ready_u[e] + 1)) == 
-                            min(max_beschikbaar, energy_needed[e])
-                """
-            else:
-                model += xsum(c_ev[e][u] for u in range(U)) == 0
-                for u in range(U):
-                    model += c_ev[e][u] == 0
-                    model += p_ev[e][u] == 0
-                    model += ev_accu_in[e][u] == 0
-                    model += ev_is_partial[e][u] == 0
-                    model += ev_boundary_stop[e][u] == 0
-                model += ev_start_stops_sum[e] == 0
-
-        ##################################################################
-        #            salderen                                            #
-        ##################################################################
-        # total consumption per hour: base_load plus accuload
-        # inkoop + pv + accu_out = teruglevering + base_cons + accu_in + boiler+ev+ruimteverwarming
-        # in code:  c_l + pv + accu_out = c_t + b_l + accu_in + hw + ev + rv
-        # c_l : verbruik levering
-        # c_t : verbruik teruglevering met saldering
-        # c_t_notax : verbruik teruglevering zonder saldering
-        # pv : opwekking zonnepanelen
-
-        # anders geschreven c_l = c_t + ct_notax + b_l + accu_in + hw + rv - pv - accu_out
-        # continue variabele c consumption in kWh/h
-        # minimaal 20 kW terugleveren max 20 kW leveren (3 x 25A = 17,5 kW)
-        # instelbaar maken?
-        # levering
-        c_l = [
-            model.add_var(
-                var_type=CONTINUOUS, lb=0, ub=self.grid_max_power * hour_fraction[u]
-            )
-            for u in range(U)
-        ]
-        # teruglevering
-        c_t = [
-            model.add_var(
-                var_type=CONTINUOUS, lb=0, ub=self.grid_max_power * hour_fraction[u]
-            )
-            for u in range(U)
-        ]
-        c_l_on = [model.add_var(var_type=BINARY) for _ in range(U)]
-        c_t_on = [model.add_var(var_type=BINARY) for _ in range(U)]
-
-        # netto per uur alleen leveren of terugleveren niet tegelijk?
-        for u in range(U):
-            model += c_l[u] <= c_l_on[u] * self.grid_max_power * hour_fraction[u]
-            model += c_t[u] <= c_t_on[u] * self.grid_max_power * hour_fraction[u]
-            model += c_l_on[u] + c_t_on[u] <= 1
-
-        #####################################
-        #              heatpump             #
-        #####################################
-        p_hp = None
-        h_hp = None
-        c_hp = [
-            model.add_var(var_type=CONTINUOUS, lb=0, ub=20) for _ in range(U)
-        ]  # Electricity consumption per hour
-        hp_on = [
-            model.add_var(var_type=BINARY) for _ in range(U)
-        ]  # If on the pump will run in that hour
-        self.hp_present = (
-            self.heating_options.heater_present if self.heating_options else False
-        )
-        if not self.hp_present:
-            logging.info("Warmtepomp niet aanwezig - warmtepomp wordt niet ingepland")
-            self.hp_enabled = False
-        else:
-            entity_hp_enabled = self.heating_options.entity_hp_enabled
-            self.hp_enabled = (entity_hp_enabled is None) or (
-                self.get_state(entity_hp_enabled).state == "on"
-            )
-            if not self.hp_enabled:
-                logging.info("Warmtepomp staat uit - warmtepomp wordt niet ingepland")
-        if self.hp_enabled:
-            # degree days
-            degree_days_today = self.meteo.calc_graaddagen(weighted=True)
-            logging.info(f"Gewogen graaddagen vandaag: {degree_days_today:.1f} K.day")
-            if U > self.steps_day:
-                degree_days_tomorrow = self.meteo.calc_graaddagen(
-                    date=dt.datetime.combine(
-                        dt.date.today() + dt.timedelta(days=1), dt.datetime.min.time()
-                    ),
-                    weighted=True,
-                )
-                logging.info(
-                    f"Gewogen graaddagen morgen: {degree_days_tomorrow:.1f} K.day"
-                )
-            else:
-                degree_days_tomorrow = 0
-            degree_days = degree_days_today + degree_days_tomorrow
-            logging.info(f"Gewogen graaddagen totaal: {degree_days:.1f} K.day")
-
-            # degree days factor kWh th / K.day
-            degree_days_factor = self.heating_options.degree_days_factor.resolve(
-                ha_getter
-            )
-            if degree_days_factor < 0.1:
-                logging.warning(
-                    f"Je graaddag factor ({degree_days_factor:.4f} kWh/K.day) "
-                    f"staat heel laag ingesteld. klopt dit wel?"
-                )
-            else:
-                logging.info(f"Degree days factor: {degree_days_factor:.1f} kWh/K.day")
-            logging.info(
-                f"Totaal benodigde warmte: {(degree_days * degree_days_factor):.1f} kWh"
-            )
-
-            # heat produced
-            entity_heat_produced = self.heating_options.entity_heat_produced
-            if entity_heat_produced is not None:
-                heat_produced = float(self.get_state(entity_heat_produced).state)
-            else:
-                heat_produced = 0
-            logging.info(f"Reeds geproduceerde warmte: {heat_produced:.1f} kWh")
-
-            # heat needed
-            heat_needed = max(0.0, (degree_days * degree_days_factor) - heat_produced)
-            logging.info(f"Nog benodigde warmte: {heat_needed:.1f} kWh")
-            if heat_needed <= 0:
-                logging.info(f"Geen warmte nodig: warmtepomp wordt niet ingepland")
-                self.hp_enabled = False
-
-        if not self.hp_enabled:
-            for u in range(U):
-                model += c_hp[u] == 0
-                model += hp_on[u] == 0
-        else:
-            # self.hp_enabled == True
-            # "adjustment" : keuze uit "on/off" | "power" | "heating curve", default "power"
-            self.hp_adjustment = (self.heating_options.adjustment or "power").lower()
-            logging.info(f"Regeling warmtepomp: {self.hp_adjustment}")
-
-            # heat demand: off, eco, max
-            entity_hp_heat_demand = self.heating_options.entity_hp_heat_demand
-            # Is er warmte vraag - zo ja, dan inplannen vanaf interval 0
-            if entity_hp_heat_demand is None:
-                self.hp_heat_demand = "eco"
-            else:
-                self.hp_heat_demand = self.get_state(entity_hp_heat_demand).state
-            if self.hp_heat_demand == "on":
-                self.hp_heat_demand = "max"
-            logging.info(f"Actuele warmtevraag: {self.hp_heat_demand}")
-
-            # implement min_run_length
-            min_run_length = int(
-                self.heating_options.min_run_length
-            )  # Minimum run lengte hp in uren - 1h als niet gedefinieerd
-            min_run_length = min(
-                max(min_run_length, 1), 5
-            )  # Alleen waarde tussen 1 en 5 uur mogelijk
-            logging.info(f"Minimale runlengte {min_run_length} uur")
-
-            # een of meer intervallen minder als boiler via wp gaat
-            if (
-                boiler_heated_by_heatpump
-                and not (boiler_start is None)
-                and boiler_start < U
-            ):
-                boiler_int = est_needed_intv[boiler_start] + 1
-            else:
-                boiler_int = 0
-
-            # geproduceerde warmte kWh per uur
-            h_hp = [
-                model.add_var(var_type=CONTINUOUS, lb=0, ub=10000) for _ in range(U)
-            ]
-
-            if self.hp_adjustment == "on/off":
-                hp_hours = 0
-                interval_avail = U - boiler_int - 1
-                hours_avail = math.floor(interval_avail * self.interval_s / 3600)
-                logging.info(f"Beschikbaar zijn: {hours_avail} uur")
-                if heat_needed > 0:
-                    logging.info(f"On/off warmtepomp wordt ingepland")
-                    avg_temp_today = self.meteo.get_avg_temperature()
-                    logging.info(
-                        f"Gem. buitentemperatuur vandaag: {avg_temp_today:.1f} °C"
-                    )
-                    if U > self.steps_day:
-                        avg_temp_tomorrow = self.meteo.get_avg_temperature(
-                            date=dt.datetime.combine(
-                                dt.date.today() + dt.timedelta(days=1),
-                                dt.datetime.min.time(),
-                            )
-                        )
-                        logging.info(
-                            f"Gem. buitentemperatuur morgen: {avg_temp_tomorrow:.1f} °C"
-                        )
-                        avg_temp = (avg_temp_today + avg_temp_tomorrow) / 2
-                    else:
-                        avg_temp = avg_temp_today
-                    entity_avg_temp = self.heating_options.entity_avg_outside_temp
-                    if entity_avg_temp is None:
-                        logging.warning(
-                            f"Geen entity om gem. temperatuur te exporteren"
-                        )
-                    else:
-                        self.set_value(entity_avg_temp, round(avg_temp, 1))
-                    logging.info(
-                        f"Voorspelde gemiddelde buiten temperatuur: {avg_temp:.1f} °C"
-                    )
-
-                    # Get COP and heatpump power from HA
-                    entity_hp_cop = self.heating_options.entity_hp_cop
-                    if entity_hp_cop is not None:
-                        cop = float(self.get_state(entity_hp_cop).state)
-                    else:
-                        cop = 4
-                    logging.info(f"COP: {cop:.1f}")
-                    # Default COP if no entity from HA
-                    entity_hp_power = self.heating_options.entity_hp_power
-                    if entity_hp_power is not None:
-                        hp_power = float(self.get_state(entity_hp_power).state)
-                    else:
-                        hp_power = 1.5  # Default power in kW if no entity from HA
-                    if hp_power > 50:
-                        logging.warning(
-                            f"Het elektrisch-vermogen van de wp is te hoog: "
-                            f"{hp_power:.1f} kW-e"
-                            f"Voor de planning wordt uitgegaan van 1,5 kW-e"
-                        )
-                    else:
-                        logging.info(f"Elektrisch vermogen: {hp_power:.1f} kW-e")
-                    logging.info(f"Thermisch vermogen: {hp_power * cop:.1f} kW-th")
-
-                    e_needed = heat_needed / cop
-                    # Elektrical energy needed in kWh
-                    hp_hours = math.ceil(e_needed / hp_power)
-                    if hp_hours > hours_avail:
-                        heat_needed = hours_avail * hp_power * cop
-                    hp_hours = min(hp_hours, hours_avail)
-
-                    # Number of hours the heat pump still has to run
-                    if hp_hours < min_run_length:
-                        # Ensure pump runs for at least min_run_length hours
-                        hp_hours = min(min_run_length, hours_avail)
-                    hp_hours = math.ceil(hp_hours)
-                    logging.info(f"Ingepland worden: {hp_hours} uur")
-
-                    # constraint 6 : -> consumption
-                    for u in range(U):
-                        model += c_hp[u] == hp_power * hp_on[u] * hour_fraction[u]
-                        model += h_hp[u] == c_hp[u] * cop
-                    """        
-                    # running block:
-                    run_hours = report.get_heatpump_run_hours()
-                    if run_hours < 0:
-                        logging.info(f"Kan starturen wp niet bepalen")
-                        if run_hours == -1:
-                            logging.info(f"geen wp-sensor(s) geconfigureerd bij 'report'")
-                        if run_hours == -2:
-                            logging.info(f"geen data in geconfigureerde wp-sensor(s)")
-                        first_block_len = min_run_length
-                        first_block_start = None
-                    elif run_hours == 0:
-                        first_block_len = min_run_length
-                        first_block_start = None
-                    elif run_hours < min_run_length:
-                        first_block_len = min_run_length - run_hours
-                        first_block_start = 0
-                    else:  # run_hours >= min_run_length
-                        first_block_len = min_run_length
-                        first_block_start = None
-                    if run_hours == 0:
-                        logging.info(f"Warmtepomp staat stil")
-                    else:
-                        logging.info(f"Warmtepomp draait minimaal {run_hours} uur")
-                    # number of bloks
-                    blocks_num = math.ceil(hp_hours / min_run_length)
-                    # length of lastblock
-                    last_block_len = (hp_hours - first_block_len) % min_run_length
-                    if last_block_len == 0:
-                        last_block_len = min_run_length
-
-                    e_needed = hp_hours * hp_power
-                    # Elektrical energy to be optimized in kWh
-                    logging.info(
-                        f"Elektriciteit benodigd:{e_needed:.1f} kWh, cop: {cop:.1f}, "
-                        f"vermogen: {hp_power:.1f} kW, warmtepomp draait: {hp_hours} uur"
-                    )
-                    if last_block_len < min_run_length:
-                        logging.info(
-                            f"Aantal blokken: {blocks_num - 1} van {min_run_length} uur"
-                        )
-                        logging.info(f"Laatste blok: {last_block_len} uur")
-                        logging.info(f"Totaal aantal blokken: {blocks_num}")
-                    else:
-                        logging.info(
-                            f"Aantal blokken: {blocks_num} van {min_run_length} uur"
-                        )
-
-                    # alles omzetten naar het goede interval:
-                    block_len = []
-                    # eerste blok
-                    block_len.append(first_block_len * 3600/self.interval_s)
-                    # tussenliggende blokken
-                    for j in range(blocks_num)[1:-1]:
-                        block_len.append(min_run_length * 3600/self.interval_s)
-                    # laatste
-                    block_len.append(last_block_len * 3600/self.interval_s)
-
-                    # constraint 1
-                    # A−t ≤ (tmax−t)(1−Xt) for all t
-                    # "vertaald": hp_start_index − u ≤ (U−u) * (1−hp_on[u]) for all u
-
-                    hp_bl_on = [
-                        [model.add_var(var_type=BINARY) for _ in range(U)]
-                        for _ in range(blocks_num)
-                    ]
-                    hp_start_index = [
-                        model.add_var(var_type=INTEGER, lb=0, ub=U - 1)
-                        for _ in range(blocks_num)
-                    ]
-                    if first_block_start is not None:
-                        model += hp_start_index[0] == first_block_start * 3600/self.interval_s
-                    for j in range(blocks_num):
-                        for u in range(U):
-                            model += (hp_start_index[j] - u) <= (U - u) * (
-                                1 - hp_bl_on[j][u]
-                            )
-
-                    # constraint 2
-                    # t−(A+P) ≤ t(1−Xt) for all t
-                    # "vertaald": u−(hp_start_index+run_length-1) ≤ u * (1−hp_bl_on[u]) for all u
-                    for j in range(blocks_num):
-                        for u in range(U):
-                            model += (u - (hp_start_index[j] + block_len[j] - 1)) <= (
-                                u * (1 - hp_bl_on[j][u])
-                            )
-
-                    # constraint 3
-                    # ∑tXt = P+1
-                    # "vertaald": xsum(hp_on[u] for all u) == min_run_length
-                    for j in range(blocks_num):
-                        model += xsum(hp_bl_on[j][u] for u in range(U)) == block_len[j]
-
-                    # aanvullend
-                    # Constraint 4: blocks mogen niet overlappen
-                    for j in range(blocks_num)[1:]:
-                        model += (
-                            hp_start_index[j - 1] + block_len[j - 1]
-                            <= hp_start_index[j]
-                        )
-
-                    for u in range(U):
-                        # constraint 5: hp_bl_on -> hp_on
-                        model += hp_on[u] == xsum(
-                            hp_bl_on[j][u] for j in range(blocks_num)
-                        )
-                        # constraint 6 : -> consumption
-                        model += c_hp[u] == hp_power * hp_on[u] * hour_fraction[u]
-                        # constrant 7: ieder interval/uur of boiler of wp
-                        if boiler_heated_by_heatpump:
-                            model += hp_on[u] + boiler_on[u] <= 1
-                        """
-                    # constraint 6 : -> consumption
-                    for u in range(U):
-                        model += c_hp[u] == hp_power * hp_on[u] * hour_fraction[u]
-                else:
-                    logging.info(
-                        f"Geen warmtebehoefte - warmtepomp wordt niet ingepland"
-                    )
-                    model += c_hp[0] == 0
-                    model += hp_on[0] == 0
-                model += xsum(h_hp[u] for u in range(U)) >= heat_needed
-                # tot hier hp_adjustment == on/off
-            else:
-                # vanaf hier hp_adjustment == "power" or "heating curve"
-                logging.info(
-                    f"Warmtepomp met power-regeling/stooklijnverschuiving wordt ingepland."
-                )
-                # model_dump() converts HeatingStage objects to plain dicts so that
-                # dict-subscript notation can be used throughout the MIP model build loop.
-                # Could be converted to attribute access (only ~8 downstream references),
-                # but kept consistent with the battery stage pattern above.
-                # The zero-power sentinel and sort order are guaranteed by
-                # HeatingConfig.validate_stages_sorted.
-                hp_stages = [s.model_dump() for s in self.heating_options.stages]
-                S = len(hp_stages)
-                # p_hp[s][u]: het gevraagde vermogen in W in dat uur
-                p_hp = [
-                    [
-                        model.add_var(
-                            var_type=CONTINUOUS, lb=0, ub=hp_stages[s]["max_power"]
-                        )
-                        for _ in range(U)
-                    ]
-                    for s in range(S)
-                ]
-
-                """
-                # schijven aan/uit, iedere schijf kan maar een keer in een interval
-                hp_s_on = [
-                    [model.add_var(var_type=BINARY) for _ in range(U)] for _ in range(S)
-                ]
-                """
-                # hp_s_w[s][u] : weegfactor per stage s per interval u
-                hp_s_w = [
-                    [model.add_var(var_type=CONTINUOUS, lb=0, ub=1) for _ in range(S)]
-                    for _ in range(U)
-                ]
-
-                hp_on = [
-                    model.add_var(var_type=BINARY) for _ in range(U)
-                ]  # If on the pump will run in that hour
-
-                # verbruik per interval
-                for u in range(U):
-                    # som van alle weegfactoren == 1
-                    if boiler_heated_by_heatpump:
-                        model += (
-                            xsum(hp_s_w[u][s] for s in range(S)) + boiler_on[u] == 1
-                        )
-                    else:
-                        model += xsum(hp_s_w[u][s] for s in range(S)) == 1
-                    # verbruik in kWh is totaal vermogen in W/1000
-                    model += (
-                        c_hp[u]
-                        == (xsum(p_hp[s][u] for s in range(S)))
-                        * hour_fraction[u]
-                        / 1000
-                    )
-
-                # beschikbaar vermogen x aan/uit, want p_hpx[u] X hpx_on[u] kan niet
-                for u in range(U):
-                    model += hp_on[u] == xsum(hp_s_w[u][s] for s in range(S)[1:])
-                    for s in range(S):
-                        model += p_hp[s][u] == hp_stages[s]["max_power"] * hp_s_w[u][s]
-                    """
-                    # ieder interval/uur maar een aan
-                    model += (xsum(hp_s_on[s][u] for s in range(S))) == 1
-                    """
-                    model.add_sos(
-                        [(hp_s_w[u][s], hp_stages[s]["max_power"]) for s in range(S)],
-                        2,
-                    )
-
-                    # geproduceerde warmte = vermogen in W * COP_schijf /1000 in kWh
-                    model += (
-                        h_hp[u]
-                        == xsum(
-                            (p_hp[s][u] * hp_stages[s]["cop"] / 1000) for s in range(S)
-                        )
-                        * hour_fraction[u]
-                    )
-
-                # max heat power in kW
-                max_heat_power = (
-                    hp_stages[-1]["max_power"] * hp_stages[-1]["cop"] / 1000
-                )
-                logging.info(
-                    f"Maximaal warmteproducerend vermogen: {max_heat_power} kW"
-                )
-
-                max_heat_prod = sum(
-                    max_heat_power * hour_fraction[u] for u in range(U - boiler_int)
-                )
-                # logging.info(
-                #    f"Maximaal te produceren hoeveelheid warmte: {max_heat_prod:.1f} kWh"
-                # )
-                min_heat_power = hp_stages[1]["max_power"] * hp_stages[1]["cop"] / 1000
-                logging.info(
-                    f"Minimaal warmteproducerend vermogen: {min_heat_power} kW"
-                )
-                min_heat_prod = sum(
-                    min_heat_power * hour_fraction[u] for u in range(U - boiler_int)
-                )
-                hours_avail = (U - boiler_int) * self.interval_s / 3600
-                logging.info(f"Aantal beschikbare uren: {hours_avail:.2f}")
-                logging.info(
-                    f"Maximaal te produceren hoeveelheid warmte: {max_heat_prod:.1f} kWh"
-                )
-                logging.info(
-                    f"Minimaal te produceren hoeveelheid warmte: {min_heat_prod:.1f} kWh"
-                )
-
-                # som van alle geproduceerde warmte == benodigde warmte
-                heat_needed = min(heat_needed, max_heat_prod)
-                if heat_needed < min_heat_prod:
-                    hp_hours = heat_needed / min_heat_power
-                else:
-                    hp_hours = hours_avail * 0.9
-                hp_hours = math.floor(hp_hours)
-                logging.info(f"Aantal in te plannen uren: {hp_hours:.1f}")
-
-                model += xsum(h_hp[u] for u in range(U)) >= heat_needed
-
-            # tot hier alleen power en heat-curve regeling
-
-            # vanaf hier voor weer voor alle regelingen
-            # als er geen warmtevraag is eerste uur geen verbruik
-            if self.hp_heat_demand == "off":
-                for u in range(1 if self.interval == "1hour" else 4):
-                    model += c_hp[u] == 0
-                    model += hp_on[u] == 0
-            # als er dringende warmtevraag is eerste uur wel verbruik
-            elif self.hp_heat_demand == "max":
-                for u in range(1 if self.interval == "1hour" else 4):
-                    model += hp_on[u] == 1
-
-            # running block:
-            run_hours = (
-                -1
-                if entity_heat_produced is None
-                else report.get_heatpump_run_hours(entity_heat_produced)
-            )
-            if run_hours < 0:
-                logging.info(f"Kan starturen wp niet bepalen")
-                if run_hours == -1:
-                    logging.info(f"geen wp-sensor(s) geconfigureerd")
-                if run_hours == -2:
-                    logging.info(f"geen data in geconfigureerde wp-sensor(s)")
-                first_block_len = min_run_length
-                first_block_start = None
-            elif run_hours == 0:
-                first_block_len = min_run_length
-                first_block_start = None
-            elif run_hours < min_run_length and self.hp_heat_demand in ["eco", "max"]:
-                first_block_len = max(1, min_run_length - run_hours)
-                first_block_start = 0
-            else:  # run_hours >= min_run_length
-                first_block_len = min_run_length
-                first_block_start = None
-            if self.hp_heat_demand == "max":
-                first_block_start = 0
-            if run_hours == 0:
-                logging.info(f"Warmtepomp staat stil")
-            elif run_hours > 0:
-                logging.info(f"Warmtepomp draait al minimaal {run_hours} uur")
-            # number of bloks
-            if hp_hours / hours_avail > 0.8:
-                blocks_num = 0  # dus geen block-optimalisering
-            else:
-                if self.hp_adjustment == "on/off":
-                    blocks_num = 1 + math.ceil(
-                        (hp_hours - first_block_len) / min_run_length
-                    )
-                else:
-                    blocks_num = math.ceil(
-                        min(
-                            hours_avail / (3 + min_run_length),
-                            hp_hours / min_run_length,
-                        )
-                    )
-                    # blocks_num = math.ceil(max(hours_avail / 4, hp_hours / min_run_length))
-            # if self.hp_adjustment!="on/off":
-            if blocks_num == 0:
-                logging.info(
-                    f"Omdat de wp meer dan 75% van de uren draait wordt de wp zonder "
-                    f'"min_run_length"={min_run_length} ingepland.'
-                )
-            else:
-                # block-optimalisering
-                if self.hp_adjustment == "on/off":
-                    min_run_length = max(
-                        min_run_length, math.floor(hp_hours / blocks_num)
-                    )
-                else:
-                    min_run_length = max(
-                        min_run_length, math.floor(hours_avail / blocks_num)
-                    )
-                # length of lastblock
-                last_block_len = (hp_hours - first_block_len) % min_run_length
-                if last_block_len == 0:
-                    last_block_len = min_run_length
-                logging.info(f"Eerste blok van {first_block_len} uur")
-                if last_block_len < min_run_length:
-                    logging.info(
-                        f"Tussenin {blocks_num - 2} blokken van {min_run_length} uur"
-                    )
-                    logging.info(f"Laatste blok van {last_block_len:.1f} uur")
-                else:
-                    logging.info(
-                        f"Dan nog {blocks_num - 1} blokken van {min_run_length} uur"
-                    )
-                logging.info(f"Totaal aantal blokken: {blocks_num}")
-
-                # Add the contraints
-                """ 
-                https://math.stackexchange.com/questions/4929841/consecutive-binary-block-in-mip-modeling-with-variable-length
-                constr 1
-                A−t ≤ (tmax−t)(1−Xt) for all t
-                hp_start_index − u ≤ (U−u) * (1−hp_on[u]) for all u
-                constr 2
-                t−(A+P) ≤ t(1−Xt) for all t
-                u−(hp_start_index+run_length-1) ≤ u * (1−hp_on[u]) for all u
-                constr 3
-                ∑tXt = P+1
-                xsum(hp_on[u] for u in range(U)) == run_length
-                """
-
-                # alles omzetten naar het goede interval:
-                block_len = []
-                # eerste blok
-                block_len.append(int(first_block_len * 3600 / self.interval_s))
-                # tussenliggende blokken
-                for _ in range(blocks_num)[1:-1]:
-                    block_len.append(int(min_run_length * 3600 / self.interval_s))
-                # laatste
-                block_len.append(int(last_block_len * 3600 / self.interval_s))
-
-                # constraint 1
-                # A−t ≤ (tmax−t)(1−Xt) for all t
-                # "vertaald": hp_start_index − u ≤ (U−u) * (1−hp_on[u]) for all u
-
-                hp_bl_on = [
-                    [model.add_var(var_type=BINARY) for _ in range(U)]
-                    for _ in range(blocks_num)
-                ]
-                hp_start_index = [
-                    model.add_var(var_type=INTEGER, lb=0, ub=U - 1)
-                    for _ in range(blocks_num)
-                ]
-                if first_block_start is not None:
-                    model += (
-                        hp_start_index[0] == first_block_start * 3600 / self.interval_s
-                    )
-                for j in range(blocks_num):
-                    for u in range(U):
-                        model += (hp_start_index[j] - u) <= (U - u) * (
-                            1 - hp_bl_on[j][u]
-                        )
-
-                # constraint 2
-                # t−(A+P) ≤ t(1−Xt) for all t
-                # "vertaald": u−(hp_start_index+run_length-1) ≤ u * (1−hp_bl_on[u]) for all u
-                for j in range(blocks_num):
-                    for u in range(U):
-                        model += (u - (hp_start_index[j] + block_len[j] - 1)) <= (
-                            U * (1 - hp_bl_on[j][u])
-                        )
-
-                # constraint 3
-                # ∑tXt = P+1
-                # "vertaald": xsum(hp_on[u] for all u) == min_run_length
-                for j in range(blocks_num):
-                    model += xsum(hp_bl_on[j][u] for u in range(U)) == block_len[j]
-
-                # aanvullend
-                # Constraint 4: blocks mogen niet overlappen
-                for j in range(blocks_num)[1:]:
-                    model += (
-                        hp_start_index[j - 1] + block_len[j - 1] <= hp_start_index[j]
-                    )
-
-                for u in range(U):
-                    # constraint 5: hp_bl_on -> hp_on
-                    model += hp_on[u] == xsum(hp_bl_on[j][u] for j in range(blocks_num))
-
-            # constrant 7: ieder interval/uur of boiler of wp
-            for u in range(U):
-                if boiler_heated_by_heatpump:
-                    model += hp_on[u] + boiler_on[u] <= 1
-
-        ########################################################################
-        # apparaten /machines
-        ########################################################################
-        program_selected = []  # naam geselecteerd programma
-        M = len(self.machines)  # aantal geconfigureerde machines
-        R = []  # aantal mogelijke runs
-        RL = []  # lengte van een run = aantal stappen van een kwartier
-        KW = []  # aantal kwartieren in een planningswindow
-        ma_uur_kw = []  # per machine een list met beschikbare kwartieren
-        ma_kw_dt = []  # per machine een list op welk tijdstip een kwartier begint
-        program_index = []  # nummer in de lijst welk programma van een machine gaat draaien
-        ma_name = []  # naam van de machine
-        # entity voor opvragen vorig en teruggeven berekend nieuw start-tijdstip
-        ma_entity_plan_start = []
-        # entity voor opvragen vorig en teruggeven berekend nieuw eind-tijdstip
-        ma_entity_plan_end = []
-        ma_planned_start_dt = []  # start tijdstip planning window
-        ma_planned_end_dt = []  # eind tijdstip planning window
-        ma_instant_start = []  # direct starten
-        for m in range(M):
-            error = False
-            ma_name.append(self.machines[m].name)
-            # entities ophalen
-            start_window_entity = self.machines[m].entity_start_window
-            end_window_entity = self.machines[m].entity_end_window
-            ma_entity_plan_start.append(self.machines[m].entity_calculated_start)
-            ma_entity_plan_end.append(self.machines[m].entity_calculated_end)
-            entity_machine_program = self.machines[m].entity_selected_program
-            if entity_machine_program:
-                try:
-                    program_selected.append(
-                        self.get_state(entity_machine_program).state
-                    )
-                except Exception as ex:
-                    logging.error(f"Machines: entity_machine_program: {ex}")
-            p = next(
-                (
-                    i
-                    for i, item in enumerate(self.machines[m].programs)
-                    if item.name == program_selected[m]
-                ),
-                0,
-            )
-            program_index.append(p)
-            RL.append(len(self.machines[m].programs[p].power))  # aantal stappen
-            entity_machine_instant_start = self.machines[m].entity_instant_start
-            if entity_machine_instant_start is None:
-                machine_instant_start = False
-            else:
-                machine_instant_start = (
-                    self.get_state(entity_machine_instant_start).state == "on"
-                )
-            ma_instant_start.append(machine_instant_start)
-            logging.info(
-                f"Apparaat {self.machines[m].name} direct starten staat "
-                f"{'aan' if machine_instant_start else 'uit'}"
-            )
-
-            # initialize yesterday
-            planned_start_dt = dt.datetime(
-                start_dt.year, start_dt.month, start_dt.day
-            ) - dt.timedelta(days=1)
-            planned_end_dt = planned_start_dt
-            if ma_entity_plan_start[m] is None:
-                if ma_entity_plan_end[m] is None:
-                    error = True
-                    logging.error(
-                        f"Er zijn geen entities voor doorgeven van de planning gedefinieerd "
-                        f"bij de instellingen van {ma_name[m]}."
-                    )
-                else:
-                    planned_end_str = self.get_state(ma_entity_plan_end[m]).state
-                    planned_end_dt = dt.datetime.strptime(
-                        planned_end_str, "%Y-%m-%d %H:%M:%S"
-                    )
-                    planned_start_dt = planned_end_dt - dt.timedelta(minutes=RL[m] * 15)
-            else:
-                planned_start_str = self.get_state(ma_entity_plan_start[m]).state
-                planned_start_dt = dt.datetime.strptime(
-                    planned_start_str, "%Y-%m-%d %H:%M:%S"
-                )
-                if ma_entity_plan_end[m] is not None:
-                    planned_end_str = self.get_state(ma_entity_plan_end[m]).state
-                    planned_end_dt = dt.datetime.strptime(
-                        planned_end_str, "%Y-%m-%d %H:%M:%S"
-                    )
-                else:
-                    planned_end_dt = planned_start_dt + dt.timedelta(minutes=RL[m] * 15)
-            ma_planned_start_dt.append(
-                planned_start_dt
-            )  # de planning van de vorige geslaagde run
-            ma_planned_end_dt.append(planned_end_dt)
-            start_opt = start_dt  # now
-            # ready_ma_dt = uur[U - 1] # het laatste moment van planningshorizon
-            if machine_instant_start:
-                start_window_dt = start_dt
-                end_window_dt = start_dt + dt.timedelta(minutes=RL[m] * 15)
-            else:
-                if start_window_entity is None:
-                    logging.error(
-                        f"De 'entity start window' is niet gedefinieerd bij de instellingen "
-                        f"van {ma_name[m]}."
-                    )
-                    logging.error(f"Apparaat {ma_name[m]} wordt niet ingepland.")
-                    error = True
-                else:
-                    start_window_hm = self.get_state(start_window_entity).state
-                    start_window_dt = convert_timestr(start_window_hm, start_dt)
-                if end_window_entity is None:
-                    logging.error(
-                        f"De 'entity end window' is niet gedefinieerd bij de instellingen "
-                        f"van {ma_name[m]}."
-                    )
-                    if not error:
-                        logging.error(f"Apparaat {ma_name[m]} wordt niet ingepland.")
-                        error = True
-                else:
-                    end_window_hm = self.get_state(end_window_entity).state
-                    end_window_dt = convert_timestr(end_window_hm, start_dt)
-            if end_window_dt < start_window_dt:
-                start_window_dt -= dt.timedelta(days=1)
-            if end_window_dt < start_opt:
-                start_window_dt += dt.timedelta(days=1)
-                end_window_dt += dt.timedelta(days=1)
-            if end_window_dt > tijd[U - 1]:
-                error = True
-                logging.info(
-                    f"Machine {ma_name[m]} wordt niet ingepland, want "
-                    f"het planning-window ligt voorbij einde optimalisering"
-                )
-
-            # ready_ma_dt += dt.timedelta(days=1)
-            """
-            vandaag			
-            if end_gepland_dt.day != start_opt and end_pland_dt < start_opt: gisteren
-               inplannen
-            start_opt < start_gepland		opnieuw inplannen	
-            start_opt > start_gepland			
-                start_opt < end_gepland		niet inplannen
-                start_opt >= end_gepland		morgen inplannen
-
-
-            morgen inplannen			
-            start_window + 1dag			
-            end_window + 1 dag			
-            inplannen	
-            """
-            if not error:
-                inplannen = False
-                # planning is voor vandaag
-                if (
-                    (planned_end_dt.day != start_opt.day and planned_end_dt < start_opt)
-                    or
-                    # begin planning is na start_opt
-                    (
-                        (planned_end_dt < start_opt)
-                        and (start_window_dt >= planned_end_dt)
-                    )
-                    or (start_opt < planned_start_dt)
-                ):
-                    inplannen = True
-                else:  # start_opt >= planned_start_dt:
-                    if start_opt <= planned_end_dt:
-                        error = True
-                        logging.info(
-                            f"Machine {ma_name[m]} wordt niet ingepland, want "
-                            f"de berekende planning wordt nu uitgevoerd"
-                        )
-                    elif start_opt <= end_window_dt:  # dus start_opt > plannend_end
-                        error = True
-                        logging.info(
-                            f"Machine {ma_name[m]} wordt niet ingepland, want "
-                            f"in deze planning-window heeft de machine al gedraaid"
-                        )
-                    elif (max(start_opt, start_window_dt) < end_window_dt) and (
-                        (max(start_opt, start_window_dt) - end_window_dt)
-                        < dt.timedelta(minutes=(RL[m] * 15))
-                    ):
-                        error = True
-                        logging.info(
-                            f"Machine {ma_name[m]} wordt niet ingepland, want "
-                            f"er is te weinig tijd tussen nu en einde planning-window "
-                            f"({end_window_dt}) "
-                        )
-                    else:
-                        if end_window_dt + dt.timedelta(days=1) > tijd[U - 1]:
-                            error = True
-                            logging.info(
-                                f"Machine {ma_name[m]} wordt niet ingepland, want "
-                                f"einde planning-window ({end_window_dt + dt.timedelta(days=1)})"
-                                f"ligt voorbij de planningshorizon ({tijd[U - 1]})"
-                            )
-                        elif not inplannen:
-                            start_window_dt += dt.timedelta(days=1)
-                            end_window_dt += dt.timedelta(days=1)
-
-                """    
-                if inplannen:
-                if (start_opt > planned_end_dt) or (
-                    start_dt + dt.timedelta(minutes=RL[m] * 15) > planned_end_dt
-                ):
-                    start_ma_dt += dt.timedelta(days=1)
-                    planned_end_dt += dt.timedelta(days=1)
-                if start_ma_dt < start_dt:
-                    start_ma_dt = start_dt
-                if not error and start_ma_dt > ready_ma_dt:
-                    if ready_ma_dt > start_ma_dt:
-                        logging.info(f"Apparaat {ma_name[m]} wordt nog niet ingepland: de "
-                                     f"planningsperiode is begonnen")
-                        error = True
-                    else:
-                        ready_ma_dt = ready_ma_dt + dt.timedelta(days=1)
-                if end > tijd[U - 1]:
-                    logging.info(
-                        f"Machine {ma_name[m]} wordt niet ingepland, want {ready_ma_dt} "
-                        f"ligt voorbij de planningshorizon {uur[U-1]}"
-                    )
-                    error = True
-                elif start_dt >= ready_ma_dt:
-                    logging.info(
-                        f"Machine {ma_name[m]} wordt niet ingepland, want {start_dt} "
-                        f"ligt voorbij de einde planningswindow {ready_ma_dt}"
-                    )
-                    error = True
-                elif planned_start_dt <= start_ma_dt <= planned_end_dt:
-                    logging.info(
-                        f"Machine {ma_name[m]} wordt niet ingepland, want {start_dt} "
-                        f"ligt binnen de vorige planning(1): {planned_start_dt}"
-                    )
-                    error = True
-                elif ready_ma_dt + dt.timedelta(days=1) <= tijd[U - 1]:
-                    start_ma_dt += dt.timedelta(days=1)
-                    ready_ma_dt += dt.timedelta(days=1)
-                else:
-                    logging.info(
-                        f"Machine {ma_name[m]} wordt niet ingepland, want {start_dt} "
-                        f"ligt voorbij begin vorige planning(2): {planned_start_dt}"
-                    )
-                    error = True
-                """
-
-            if error:
-                kw_num = 0
-            else:
-                delta = end_window_dt - max(start_opt, start_window_dt)
-                # aantal kwartieren in planningsperiode
-                kw_num = math.ceil(delta.seconds / 900)
-            KW.append(kw_num)
-            if RL[m] == 0:
-                logging.info(
-                    f"Machine {ma_name[m]} wordt niet ingepland, "
-                    f"want er is gekozen voor {program_selected[m]}"
-                )
-            else:
-                if kw_num > 0:
-                    logging.info(
-                        f"Apparaat {ma_name[m]} met programma '{program_selected[m]}' "
-                        f"wordt ingepland tussen "
-                        f"{max(start_opt, start_window_dt).strftime('%Y-%m-%d %H:%M')} "
-                        f"en {end_window_dt.strftime('%Y-%m-%d %H:%M')}."
-                    )
-            # het eerste tijdstip waarop de run kan beginnen
-            start_ma_dt = dt.datetime.fromtimestamp(
-                900 * math.floor(max(start_window_dt, start_opt).timestamp() / 900)
-            )
-
-            # ma_uur_kw: per machine per uur een lijst van kwartiernummers in het betreffende uur
-            uur_kw = []
-            # ma_kw_dt: per machine een lijst van kwartiertijdstippen
-            kw_dt = []
-            kwartier_dt = start_ma_dt
-            for u in range(U):
-                uur_kw.append([])
-            for kw in range(kw_num):
-                # index in uur-lijst
-                uur_index = calc_uur_index(kwartier_dt, tijd, self.interval)
-                if uur_index < U:
-                    uur_kw[uur_index].append(kw)
-                kw_dt.append(kwartier_dt)
-                kwartier_dt = kwartier_dt + dt.timedelta(seconds=900)
-            ma_uur_kw.append(uur_kw)
-            ma_kw_dt.append(kw_dt)
-            # R = aantal mogelijke runs = aantal kwartieren - aantal stages + 1
-            R.append(min(KW[m], KW[m] - RL[m] + 1))
-
-        # ma_start : wanneer machine start = 1 anders = 0
-        ma_start = [
-            [model.add_var(var_type=BINARY) for _ in range(KW[m])] for m in range(M)
-        ]
-
-        # machine aan per kwartier per run
-        # ma_on = [[[model.add_var(var_type=BINARY) for kw in range(KW[m])]
-        #           for r in range(R[m])] for m in range(M)]
-
-        # consumption per machine per kwartier
-        c_ma_kw = [
-            [
-                model.add_var(
-                    var_type=CONTINUOUS,
-                    lb=0,
-                    ub=math.ceil(
-                        max(
-                            self.machines[m].programs[program_index[m]].power,
-                            default=0,
-                        )
-                    ),
-                )
-                for _ in range(KW[m])
-            ]
-            for m in range(M)
-        ]
-
-        # consumption per uur
-        c_ma_u = [
-            [model.add_var(var_type=CONTINUOUS, lb=0) for _ in range(U)]
-            for _ in range(M)
-        ]
-
-        # kosten per uur
-        # k_ma = [[model.add_var(var_type=CONTINUOUS) for _ in range(U)] for _ in range(M)]
-        # total_cost_ma = [model.add_var(var_type=CONTINUOUS) for _ in range(M)]
-        # total_cost = model.add_var(var_type=CONTINUOUS)
-
-        #  constraints
-        for m in range(M):
-            # maar 1 start
-            if KW[m] == 0:
-                # als er geen kwartieren zijn dan geen start
-                model += xsum(ma_start[m][kw] for kw in range(KW[m])) == 0
-            else:
-                # machine kan maar op een kwartier starten
-                model += xsum(ma_start[m][kw] for kw in range(KW[m])) == 1
-
-            # kan niet starten als je de run niet kan afmaken
-            for kw in range(KW[m])[KW[m] - (RL[m] - 1) :]:
-                model += ma_start[m][kw] == 0
-
-            if self.log_level == logging.DEBUG:
-                logging.debug(f"Per kwartier welke run en met welk vermogen")
-                for kw in range(KW[m]):
-                    line = (
-                        f"kw: {kw} tijd: {ma_kw_dt[m][kw].strftime('%H:%M')} "
-                        f"range r: {max(0, kw - RL[m] + 1)} <-> {min(kw, R[m]) + 1} r: "
-                    )
-                    for r in range(R[m])[max(0, kw - RL[m] + 1) : min(kw, R[m]) + 1]:
-                        line += (
-                            f"{r} power: "
-                            f"{self.machines[m].programs[program_index[m]].power[kw - r]}"
-                        )
-                    logging.debug(line)
-
-            for kw in range(KW[m]):
-                model += (
-                    c_ma_kw[m][kw]
-                    == xsum(
-                        self.machines[m].programs[program_index[m]].power[kw - r]
-                        * ma_start[m][r]
-                        # 4000 = omrekenen van kwartier vermogen in W naar verbruik in kWh
-                        / 4000
-                        # van alle mogelijke runs de kwartieren
-                        for r in range(R[m])[max(0, kw - RL[m] + 1) : min(kw, R[m]) + 1]
-                    )
-                )
-            for u in range(U):
-                if len(ma_uur_kw[m][u]) == 0:
-                    # er zijn geen "window" kwartieren in dit uur
-                    if (
-                        # het verbruik uit een eerdere planning berekenen en meenemen
-                        ma_planned_start_dt[m]
-                        < (tijd[u] + dt.timedelta(minutes=int(self.interval_s / 60)))
-                        and ma_planned_end_dt[m] > tijd[u]
-                    ):
-                        c_ma_sum = 0
-                        start_interval_dt = max(tijd[u], start_dt)
-                        end_interval_dt = tijd[u] + dt.timedelta(
-                            minutes=int(self.interval_s / 60)
-                        )
-                        for kw in range(RL[m]):
-                            start_kw_dt = ma_planned_start_dt[m] + dt.timedelta(
-                                minutes=kw * 15
-                            )
-                            end_kw_dt = start_kw_dt + dt.timedelta(minutes=15)
-                            start_overlap_dt = max(start_interval_dt, start_kw_dt)
-                            end_overlap_dt = min(end_interval_dt, end_kw_dt)
-                            if start_overlap_dt < end_overlap_dt:
-                                verschil = end_overlap_dt - start_overlap_dt
-                                fraction = verschil.seconds / 900
-                                c_ma_sum += (
-                                    self.machines[m]
-                                    .programs[program_index[m]]
-                                    .power[kw]
-                                    * fraction
-                                    / 4000
-                                )
-                        model += c_ma_u[m][u] == c_ma_sum
-                    else:
-                        model += c_ma_u[m][u] == 0
-                else:
-                    model += c_ma_u[m][u] == xsum(
-                        c_ma_kw[m][kw] for kw in ma_uur_kw[m][u]
-                    )
-        """
-        # vermogen levering niet groter dan grid_max_power
-        p_l = [model.add_var(var_type=CONTINUOUS, lb=0, ub=self.grid_max_power) for _ in range(U)]
-        for u in range(U):
-            model += p_l[u] == (
-                    (c_l[u] - xsum(c_ev[e][u] for e in range(EV))) / hour_fraction[u]
-                    + xsum(p_ev[e][u] for e in range(EV))
-            )
-        """
-        #####################################################
-        # alle verbruiken in de totaal balans in kWh
-        #####################################################
-        for u in range(U):
-            model += (
-                c_l[u]
-                == c_t[u]
-                + b_l[u] * interval_fraction[u]
-                + xsum(ac_to_dc[b][u] - ac_from_dc[b][u] for b in range(B))
-                * hour_fraction[u]
-                +
-                # xsum(ac_to_dc[b][u] - ac_from_dc[b][u] for b in range(B)) +
-                c_b[u]
-                + xsum(c_ev[e][u] for e in range(EV))
-                + c_hp[u]
-                + xsum(c_ma_u[m][u] for m in range(M))
-                - xsum(pv_ac[s][u] for s in range(solar_num))
-            )
-
-        # cost variabele
-        cost = model.add_var(var_type=CONTINUOUS, lb=-1000, ub=1000)
-        delivery = model.add_var(var_type=CONTINUOUS, lb=0, ub=1000)
-        production = model.add_var(var_type=CONTINUOUS, lb=0, ub=1000)
-        model += delivery == xsum(c_l[u] for u in range(U))
-        model += production == xsum(c_t[u] for u in range(U))
-
-        #  cycle cost per batterij
-        cycle_cost = [model.add_var(var_type=CONTINUOUS, lb=0) for _ in range(B)]
-        for b in range(B):
-            model += cycle_cost[b] == xsum(
-                (dc_to_bat[b][u] + dc_from_bat[b][u])
-                * kwh_cycle_cost[b]
-                * hour_fraction[u]
-                for u in range(U)
-            )
-
-        #  penalty cost per batterij
-        penalty_cost = [model.add_var(var_type=CONTINUOUS) for _ in range(B)]
-        for b in range(B):
-            model += penalty_cost[b] == xsum(
-                (opt_low_level[b] - soc_low[b][u])
-                * penalty_low_soc[b]
-                * hour_fraction[u]
-                for u in range(U)
-            )
-
-        # switch cost per ev
-        switch_cost = [model.add_var(var_type=CONTINUOUS, lb=0) for _ in range(EV)]
-        for e in range(EV):
-            model += switch_cost[e] == ev_switch_cost[e] * ev_start_stops_sum[e]
-
-        low_soc_penalty = [model.add_var(var_type=CONTINUOUS, lb=0) for _ in range(EV)]
-        # sum of all penalty's
-
-        for e in range(EV):
-            model += low_soc_penalty[e] == xsum(low_soc_penalty_int[e][u] for u in range(U))
-
-        if self.salderen:
-            p_bat = p_avg
-        else:
-            p_bat = sum(pt) / U
-
-        # alles in kWh * prijs = kosten in euro
-        model += cost == (
-            xsum(c_l[u] * pl[u] - c_t[u] * pt[u] for u in range(U))
-            + xsum(cycle_cost[b] + penalty_cost[b] for b in range(B))
-            + xsum(switch_cost[e] + low_soc_penalty[e] for e in range(EV))
-            + xsum(
-                (soc_mid[b][0] - soc_mid[b][U])
-                * one_soc[b]
-                * eff_bat_to_dc[b]
-                * avg_eff_dc_to_ac[b]
-                * p_bat
-                for b in range(B)
-            )
-            # waarde energie boiler
-            - (boiler_temp[U] - boiler_temp[0])
-            * (spec_heat_boiler / (3600 * cop_boiler))
-            * p_avg
-        )
-
-        #####################################################
-        #        strategy optimization
-        #####################################################
-        # settings
-        max_gap = abs(self.config.max_gap.resolve(ha_getter))
-        max_gap = max(0.00001, min(max_gap, 1.0))  # clamp to [0.00001, 1.0]
-
-        model.max_mip_gap_abs = max_gap
-        model.max_nodes = 1500
-        # model.max_seconds = 20
-        if self.log_level > logging.DEBUG:
-            model.verbose = 1
-        model.threads = -1 #use all available cores
-        # model.check_optimization_results()
-
-        # kosten optimalisering
-        if self.strategy == "minimize cost":
-            strategie = "minimale kosten"
-            logging.info(f"Strategie: {strategie}")
-            logging.info(f"Maximale fout (maximal gap): {max_gap:<8.6f} euro")
-            model.objective = minimize(cost)
-            start_calc = time.perf_counter()
-            model.optimize()
-            end_calc = time.perf_counter()
-            logging.info(f"Rekentijd: {end_calc - start_calc:<5.2f} sec")
-            if model.num_solutions == 0:
-                logging.warning(f"Geen oplossing voor: {self.strategy}")
-                return None
-        elif self.strategy == "minimize consumption":
-            strategie = "minimale levering"
-            logging.info(f"Strategie: {strategie}")
-            model.objective = minimize(delivery)
-            model.optimize()
-            if model.num_solutions == 0:
-                logging.warning(f"Geen oplossing voor: {self.strategy}")
-                return None
-            min_delivery = max(0.0, delivery.x)
-            logging.info("Eerste berekening")
-            logging.info(f"Kosten (euro): {cost.x:<6.2f}")
-            logging.info(f"Levering (kWh): {delivery.x:<6.2f}")
-            model += delivery <= min_delivery
-            model.objective = minimize(cost)
-            model.optimize()
-            if model.num_solutions == 0:
-                model.objective = minimize(delivery)
-                model.optimize()
-                if model.num_solutions == 0:
-                    logging.warning(
-                        f"Geen oplossing in na herberekening voor: {self.strategy}"
-                    )
-                    return None
-            logging.info("Herberekening")
-            logging.info(f"Kosten (euro): {cost.x:<6.2f}")
-            logging.info(f"Levering (kWh): {delivery.x:<6.2f}")
-        else:
-            logging.error("Kies een strategie in options")
-            # strategie = 'niet gekozen'
-            return None
-
-        # Suppress FutureWarning messages
-        # import warnings
-
-        # warnings.simplefilter(action="ignore", category=FutureWarning)
-
-        if model.num_solutions == 0:
-            logging.error(
-                f"Er is helaas geen oplossing gevonden, kijk naar je instellingen."
-            )
-            return None
-
-        # er is een oplossing
-        # afdrukken van de resultaten
-        logging.info("Het programma heeft een optimale oplossing gevonden.")
-        old_cost_da = 0
-        sum_old_cons = 0
-        org_l = []
-        org_t = []
-        c_ev_sum = []
-        c_ma_sum = []
-        accu_in_sum = []
-        accu_out_sum = []
-        for u in range(U):
-            ac_to_dc_sum = 0
-            dc_to_ac_sum = 0
-            for b in range(B):
-                ac_to_dc_sum += ac_to_dc[b][u].x * hour_fraction[u]
-                dc_to_ac_sum += ac_from_dc[b][u].x * hour_fraction[u]
-            accu_in_sum.append(ac_to_dc_sum)
-            accu_out_sum.append(dc_to_ac_sum)
-        for u in range(U):
-            ev_sum = 0
-            for e in range(EV):
-                ev_sum += c_ev[e][u].x
-            c_ev_sum.append(ev_sum)
-            ma_sum = 0
-            for m in range(M):
-                ma_sum += c_ma_u[m][u].x
-            c_ma_sum.append(ma_sum)
-        pv_ac_hour_sum = []  # totale bruto pv_dc->ac productie
-        solar_hour_sum_org = []  # totale netto pv_ac productie origineel
-        solar_hour_sum_opt = []  # totale netto pv_ac productie na optimalisatie
-        for u in range(U):
-            pv_ac_hour_sum.append(0)
-            solar_hour_sum_org.append(0)
-            solar_hour_sum_opt.append(0)
-            for b in range(B):
-                for s in range(pv_dc_num[b]):
-                    pv_ac_hour_sum[u] += pv_prod_ac[b][s][u]
-            for s in range(solar_num):
-                solar_hour_sum_org[u] += solar_prod[s][u]  # pv_ac[s][u].x
-                solar_hour_sum_opt[u] += pv_ac[s][u].x
-            netto = (
-                b_l[u]
-                + c_b[u].x
-                + c_hp[u].x
-                + c_ev_sum[u]
-                + c_ma_sum[u]
-                - solar_hour_sum_org[u]
-                - pv_ac_hour_sum[u]
-            )
-            sum_old_cons += netto
-            if netto >= 0:
-                old_cost_da += netto * pl[u]
-                org_l.append(netto)
-                org_t.append(0)
-            else:
-                old_cost_da += netto * pt[u]
-                org_l.append(0)
-                org_t.append(netto)
-        if self.boiler_present:
-            boiler_at_23 = (boiler_temp[U].x - (boiler_setpoint - boiler_hysterese)) * (
-                spec_heat_boiler / (3600 * cop_boiler)
-            )
-            logging.info(f"Waarde boiler om 23 uur: {boiler_at_23:<0.2f} kWh")
-        import numpy as np
-
-        if self.hp_present and self.hp_enabled:
-            logging.info("Inzet warmtepomp")
-            if blocks_num > 0:
-                logging.info("Blokken:")
-            for j in range(blocks_num):
-                logging.info(
-                    f"Bloknr {j} start {int(hp_start_index[j].x)} "
-                    f"lengte {block_len[j]}"
-                    f" laatste {int(hp_start_index[j].x) + block_len[j] - 1}"
-                )
-            logging.info(f"u   uur   tar    hp_s_on hp_on heat cons")
-            for u in range(U):
-                sum_hp_bl_on = 0
-                for j in range(blocks_num):
-                    sum_hp_bl_on += hp_bl_on[j][u].x
-                logging.info(
-                    f"{u}   {uur[u]} {pl[u]:6.4f}  {sum_hp_bl_on:6.2f} {int(hp_on[u].x)}"
-                    f"   {h_hp[u].x:6.2f}  {c_hp[u].x:6.2f}"
-                )
-            if self.hp_adjustment != "on/off":
-                df_hp = pd.DataFrame(columns=["uur", "tar"])
-                df_hp["uur"] = uur
-                df_hp["tar"] = pl
-                for s in range(len(hp_stages)):
-                    values = []
-                    for u in range(U):
-                        values.append(p_hp[s][u].x)
-                    df_hp["p" + str(s)] = np.array(values, dtype=np.int32)
-                heat = []
-                cons = []
-                for u in range(U):
-                    heat.append(h_hp[u].x)
-                    cons.append(c_hp[u].x)
-                df_hp["heat"] = heat
-                df_hp["cons"] = cons
-                pd.options.display.float_format = "{:7.3f}".format
-                logging.info(f"\n{df_hp.to_string(index=False)}\n")
-
-                """
-                logging.info(
-                    f"u     tar     p0     p1     p2     p3     p4     p5     p6     p7   "
-                    f"heat   cons"
-                )
-                for u in range(U):
-                    logging.info(
-                        f"{uur[u]} {pl[u]:6.4f} {p_hp[0][u].x:6.0f} {p_hp[1][u].x:6.0f} "
-                        f"{p_hp[2][u].x:6.0f} {p_hp[3][u].x:6.0f} {p_hp[4][u].x:6.0f} "
-                        f"{p_hp[5][u].x:6.0f} {p_hp[6][u].x:6.0f} {p_hp[7][u].x:6.0f} "
-                        f"{h_hp[u].x:6.2f} {c_hp[u].x:6.2f}"
-                     )
-                """
-
-        # overzicht per ac-accu:
-        pd.options.display.float_format = "{:6.2f}".format
-        df_accu = []
-        for b in range(B):
-            cols = [
-                [
-                    "uur",
-                    "ac->",
-                    "eff",
-                    "->dc",
-                    "pv->dc",
-                    "dc->",
-                    "eff",
-                    "->bat",
-                    "o_eff",
-                    "SoC",
-                ],
-                ["", "kWh", "%", "kWh", "kWh", "kWh", "%", "kWh", "%", "%"],
-            ]
-            df_accu.append(pd.DataFrame(columns=cols))
-            for u in range(U):
-                """
-                for cs in range(CS[b]):
-                    if ac_to_dc_st_on[b][cs][u].x == 1:
-                        c_stage = cs
-                        ac_to_dc_eff =
-                            ev_charge_stages[cs]["efficiency"] * 100.0
-                """
-                ac_to_dc_netto = (
-                    ac_to_dc[b][u].x - ac_from_dc[b][u].x
-                ) * hour_fraction[u]
-                dc_from_ac_netto = (
-                    dc_from_ac[b][u].x - dc_to_ac[b][u].x
-                ) * hour_fraction[u]
-                if ac_to_dc_netto > 0:
-                    ac_to_dc_eff = dc_from_ac_netto * 100.0 / ac_to_dc_netto
-                elif dc_from_ac_netto < 0:
-                    ac_to_dc_eff = ac_to_dc_netto * 100.0 / dc_from_ac_netto
-                else:
-                    ac_to_dc_eff = "--"
-
-                dc_to_bat_netto = (
-                    dc_to_bat[b][u].x - dc_from_bat[b][u].x
-                ) * hour_fraction[u]
-                bat_from_dc_netto = (
-                    dc_to_bat[b][u].x * eff_dc_to_bat[b]
-                    - dc_from_bat[b][u].x / eff_bat_to_dc[b]
-                ) * hour_fraction[u]
-                if dc_to_bat_netto > 0:
-                    dc_to_bat_eff = bat_from_dc_netto * 100.0 / dc_to_bat_netto
-                elif bat_from_dc_netto < 0:
-                    dc_to_bat_eff = dc_to_bat_netto * 100.0 / bat_from_dc_netto
-                else:
-                    dc_to_bat_eff = "--"
-
-                pv_prod = 0
-                for s in range(pv_dc_num[b]):
-                    pv_prod += pv_dc_on_off[b][s][u].x * pv_prod_dc[b][s][u]
-
-                if pv_prod > 0:
-                    overall_eff = "--"
-                elif (
-                    ac_to_dc_netto != 0
-                    and is_number(ac_to_dc_eff)
-                    and is_number(dc_to_bat_eff)
-                ):
-                    overall_eff = ac_to_dc_eff * dc_to_bat_eff / 100
-                else:
-                    overall_eff = "--"
-
-                """
-                for ds in range(DS[b]):
-                    if ac_from_dc_st_on[b][ds][u].x == 1:
-                        d_stage = ds
-                        dc_to_ac_eff = 
-                            discharge_stages[ds]["efficiency"] * 100.0
-                """
-                if self.log_level == logging.INFO:
-                    # debug laden
-                    if ac_to_dc[b][u].x > 0.0:
-                        logging.info(
-                            f"Laad volume in uur {u} {uur[u]} "
-                            f"{ac_from_dc[b][u].x * hour_fraction[u]} kWh"
-                        )
-                        for cs in range(CS[b]):
-                            if ac_to_dc_w[b][u][cs].x > 0:
-                                logging.info(
-                                    f"{cs} {ac_to_dc_w[b][u][cs].x} "
-                                    f"{ac_to_dc_samples[b][cs]}"
-                                )
-
-                    # debug ontladen
-                    if ac_from_dc[b][u].x > 0.0:
-                        logging.info(
-                            f"Ontlaad volume in uur {u} {uur[u]} "
-                            f"{ac_from_dc[b][u].x * hour_fraction[u]} kWh"
-                        )
-                        for ds in range(DS[b]):
-                            if ac_from_dc_w[b][u][ds].x > 0:
-                                logging.info(
-                                    f"{ds} {ac_from_dc_w[b][u][ds].x} "
-                                    f"{ac_from_dc_samples[b][ds]}"
-                                )
-
-                row = [
-                    str(uur[u]),
-                    ac_to_dc_netto,
-                    ac_to_dc_eff,
-                    dc_from_ac_netto,
-                    pv_prod,
-                    dc_to_bat_netto,
-                    dc_to_bat_eff,
-                    bat_from_dc_netto,
-                    overall_eff,
-                    soc[b][u + 1].x,
-                ]
-                df_accu[b].loc[df_accu[b].shape[0]] = row
-
-            # df_accu[b].loc['total'] = df_accu[b].select_dtypes(numpy.number).sum()
-            # df_accu[b] = df_accu[b].astype({"uur": int})
-            # df_accu[b].set_index(["uur"])
-            # df_accu[b][~df_accu[b].index.duplicated()]
-            try:
-                df_accu[b].loc["Total"] = df_accu[b].sum(axis=0, numeric_only=True)
-                totals = True
-            except Exception as ex:
-                logging.info(ex)
-                logging.info(
-                    f"Totals of accu {self.battery_options[b].name} "
-                    f"cannot be calculated"
-                )
-                totals = False
-
-            if totals:
-                # Kolom "uur" kan string "Totaal" krijgen door eerst naar object te casten
-                df_accu[b].iloc[:, 0] = df_accu[b].iloc[:, 0].astype(object)
-                df_accu[b].iloc[:, 0] = df_accu[b].iloc[:, 0].astype(object)
-                df_accu[b].iloc[-1, 0] = "Totaal"
-                df_accu[b].iloc[-1, 2] = np.nan  # eff (ac->dc)
-                df_accu[b].iloc[-1, 6] = np.nan  # eff (dc->bat)
-                df_accu[b].iloc[-1, 8] = np.nan  # o_eff
-                df_accu[b].iloc[-1, 9] = np.nan  # SoC
-                df_accu[b] = df_accu[b].fillna("")
-            logging.info(
-                f"In- en uitgaande energie per {self.interval_name} batterij "
-                f"{self.battery_options[b].name}"
-                f"\n{df_accu[b].to_string(index=False)}"
-            )
-
-        # soc dataframe maken
-        df_soc = pd.DataFrame(columns=["tijd", "soc"])
-        df_soc.index = pd.to_datetime(df_soc["tijd"])
-        tijd_soc = tijd.copy()
-        tijd_soc.append(tijd_soc[U - 1] + datetime.timedelta(hours=1))
-        if B > 0:
-            for b in range(B):
-                df_soc["soc_" + str(b)] = None
-            for u in range(U + 1):
-                row_soc = []
-                for b in range(B):
-                    soc_value = soc[b][u].x
-                    if b == 0:
-                        row_soc = [tijd_soc[u], soc_value, soc_value]
-                    else:
-                        row_soc += [soc_value]
-                df_soc.loc[df_soc.shape[0]] = row_soc
-
-            df_soc.index = pd.to_datetime(df_soc["tijd"])
-            sum_cap = 0
-            for b in range(B):
-                sum_cap += one_soc[b] * 100
-            for row in df_soc.itertuples():
-                sum_soc = 0
-                for b in range(B):
-                    sum_soc += one_soc[b] * row[b + 3]
-                df_soc.at[row[0], "soc"] = round(100 * sum_soc / sum_cap, 1)
-
-            if not self.debug:
-                self.save_df(tablename="prognoses", tijd=tijd_soc, df=df_soc)
-
-        # voorspelling pv_dc opslaan.
-        if B > 0:
-            df_pv_dc = pd.DataFrame(columns=["tijd", "pv_dc"])
-            df_pv_dc.index = pd.to_datetime(df_pv_dc["tijd"])
-            tijd_pv = tijd.copy()
-            for u in range(U):
-                prod_pc_sum = 0
-                for b in range(B):
-                    prod_pc_sum += pv_prod_dc_sum[b][u].x * hour_fraction[u]
-                row_pv_dc = [tijd_pv[u], prod_pc_sum]
-                df_pv_dc.loc[df_pv_dc.shape[0]] = row_pv_dc
-            if not self.debug:
-                self.save_df(tablename="prognoses", tijd=tijd_pv, df=df_pv_dc)
-
-        """
-        # voorspellingen van pv opslaan
-        df_pv_prog = pd.DataFrame(columns=["time"]+pv_ac_varcode+pv_dc_varcode)
-        for u in range(U):
-            if hour_fraction[u] >= 1:
-                row_pv = [tijd[u]]
-                for s in range(solar_num):
-                    row_pv.append(pv_ac[s][u].x)
-                for b in range(B):
-                    for s in range(pv_dc_num[b]):
-                        row_pv.append(pv_prod_dc[b][s][u].x * hour_fraction[u])
-                df_pv_prog.loc[df_pv_prog.shape[0]] = row_pv_dc
-        tijd_pv = tijd[:len(df_pv_prog)]
-        if not self.debug:
-            self.save_df(tablename="prognoses", tijd=tijd_pv, df=df_pv_prog)
-        """
-
-        # totaal overzicht
-        # pd.options.display.float_format = '{:,.3f}'.format
-        cols = ["uur", "bat_in", "bat_out"]
-        cols = cols + [
-            "cons",
-            "prod",
-            "base",
-            "boil",
-            "wp",
-            "ev",
-            "pv_ac",
-            "cost",
-            "profit",
-            "b_tem",
-        ]
-        if M > 0:
-            cols = cols + ["mach"]
-        d_f = pd.DataFrame(columns=cols)
-        for u in range(U):
-            row = [uur[u], accu_in_sum[u], accu_out_sum[u]]
-            row = row + [
-                c_l[u].x,
-                c_t[u].x,
-                b_l[u],
-                c_b[u].x,
-                c_hp[u].x,
-                c_ev_sum[u],
-                solar_hour_sum_opt[u],
-                c_l[u].x * pl[u],
-                -c_t[u].x * pt[u],
-                boiler_temp[u + 1].x,
-            ]
-            if M > 0:
-                row = row + [c_ma_sum[u]]
-            d_f.loc[d_f.shape[0]] = row
-        if not self.debug:
-            d_f_save = d_f.drop(["b_tem"], axis=1)
-            save_tijd = tijd.copy()
-            if interval_fraction_first_interval < 0.99:  # drop first row
-                d_f_save = d_f_save.iloc[1:]
-                save_tijd = save_tijd[1:]
-            self.save_df(tablename="prognoses", tijd=save_tijd, df=d_f_save)
-        else:
-            logging.info("Berekende prognoses zijn niet opgeslagen.")
-
-        d_f = d_f.astype({"uur": str})
-        d_f.loc["total"] = d_f.iloc[:, 1:].sum()
-        cost_consumption = d_f.loc["total"]["cost"]
-        tariff_consumption = cost_consumption / delivery.x if delivery.x != 0 else 0.0
-        profit_production = d_f.loc["total"]["profit"]
-        tariff_production = (
-            abs(profit_production) / production.x if production.x != 0 else 0.0
-        )
-        # d_f.loc['total'] = d_f.loc['total'].astype(object)
-
-        d_f.at[d_f.index[-1], "uur"] = "Totaal"
-        d_f.at[d_f.index[-1], "b_tem"] = pd.NA
-
-        logging.info(f"Berekende prognoses: \n{d_f.to_string(index=False)}\n")
-        # , formatters={'uur':'{:03d}'.format}))
-
-        logging.info(f"Consumption            {delivery.x: 7.2f} (kWh)")
-        logging.info(f"Cost consumption       {cost_consumption: 7.2f} (€)")
-        logging.info(f"Tariff consumption     {tariff_consumption: 8.3f} (€/kWh)")
-        logging.info(f"Production             {production.x: 7.2f} (kWh)")
-        logging.info(f"Profit production      {profit_production: 7.2f} (€)")
-        logging.info(f"Tariff production      {tariff_production: 8.3f} (€/kWh)\n")
-        battery_storage = 0
-        total_cycle_cost = 0
-        total_penalty_cost = 0
-        for b in range(B):
-            battery_storage += (
-                (soc_mid[b][0].x - soc_mid[b][U].x)
-                * one_soc[b]
-                * eff_bat_to_dc[b]
-                * avg_eff_dc_to_ac[b]
-                * p_bat
-            )
-            total_cycle_cost += cycle_cost[b].x
-            total_penalty_cost += penalty_cost[b].x
-        total_switch_cost = 0
-        total_low_soc_cost =0
-        for e in range(EV):
-            total_switch_cost += switch_cost[e].x
-            total_low_soc_cost += low_soc_penalty[e].x
-        boiler_storage = (
-            (boiler_temp[0].x - boiler_temp[U].x)
-            * (spec_heat_boiler / (3600 * cop_boiler))
-            * p_avg
-        )
-        total_cost = (
-            cost_consumption
-            + profit_production
-            + total_cycle_cost
-            + total_penalty_cost
-            + total_switch_cost
-            + total_low_soc_cost
-            + battery_storage
-            + boiler_storage
-        )
-
-        logging.info(
-            "\nCalculation profit after optimize in €\n"
-            f"Cost before optimize           {old_cost_da: 7.2f}\n"
-            f"Cost consumption   {cost_consumption: 7.2f}\n"
-            f"Bat cycle cost     {total_cycle_cost: 7.2f}\n"
-            f"Bat penalty cost   {total_penalty_cost: 7.2f}\n"
-            f"EV switch costs    {total_switch_cost: 7.2f}\n"
-            f"EV low soc costs   {total_low_soc_cost: 7.2f}\n"
-            f"Battery storage    {battery_storage: 7.2f}\n"
-            f"Boiler storage     {boiler_storage: 7.2f}\n"
-            f"Profit production  {profit_production: 7.2f}\n"
-            f"Total              {total_cost: 7.2f}\n"
-            f"Cost after optimize            {cost.x: 7.2f}\n"
-            f"Profit:                        {old_cost_da - cost.x: 7.2f}"
-        )
-
-        # doorzetten van alle settings naar HA
-        if not self.debug:
-            logging.info("Doorzetten van alle settings naar HA")
-        else:
-            logging.info(
-                "Onderstaande settings worden NIET doorgezet naar HA (debug-run)"
-            )
-
-        """
-        set helpers output home assistant
-        boiler c_b[0].x >0 trigger boiler
-        ev     c_ev[0].x > 0 start laden auto, ==0 stop laden auto
-        battery multiplus feedin from grid = accu_in[0].x - accu_out[0].x
-        """
-
-        #############################################
-        # boiler
-        ############################################
-        # debug logging boiler results
-        logging.debug("\nBOILER")
-        logging.debug("nr  uur st on  cons   temp")
-        for u in range(U):
-            logging.debug(
-                f"{u:.0f} {uur[u]}  {boiler_st[u].x:.0f}  {boiler_on[u].x:.0f}  {c_b[u].x:.2f}  "
-                f"{boiler_temp[u].x:.2f}"
-            )
-        logging.debug("\n")
-
-        try:
-            if self.boiler_present:
-                if float(c_b[0].x) > 0.0:
-                    if self.debug:
-                        logging.info("Boiler opwarmen zou zijn geactiveerd")
-                    else:
-                        boiler_activate_entity = self.boiler_options.activate_entity
-                        boiler_switch_entity = self.boiler_options.switch_entity
-                        if (
-                            boiler_activate_entity is None
-                            and boiler_switch_entity is None
-                        ):
-                            logging.warning(
-                                "Er zijn geen entities gedefinieerd voor het opwarmen van de boiler"
-                            )
-                        if boiler_activate_entity:
-                            self.call_service(
-                                self.boiler_options.activate_service,
-                                boiler_activate_entity,
-                            )
-                        if boiler_switch_entity:
-                            self.turn_on(boiler_switch_entity)
-                        # "input_button.hw_trigger")
-                        logging.info("Boiler opwarmen geactiveerd")
-                else:
-                    logging.info(f"Boiler opwarmen niet geactiveerd")
-                boiler_st_index = -1
-                for u in range(U):
-                    if boiler_st[u].x == 1:
-                        boiler_st_index = u
-                        break
-                if boiler_st_index >= 0:
-                    boiler_start_opwarmen = tijd[boiler_st_index]
-                    logging.info(
-                        f"Boiler opwarmen ingepland vanaf: {boiler_start_opwarmen} "
-                        f"met {est_needed_intv[boiler_st_index]} interval(len)"
-                    )
-
-                # waarde energie boiler
-                boiler_waarde_el = (boiler_temp[U].x - boiler_ondergrens) * (
-                    spec_heat_boiler / (3600 * cop_boiler)
-                )
-                boiler_waarde_fin = boiler_waarde_el * p_avg
-                logging.info(
-                    f"Boiler temperatuur {boiler_temp[U].x:.1f} °C, "
-                    f" waardering: {boiler_waarde_el:.3f} kWh = {boiler_waarde_fin:.2f} euro"
-                )
-            ###########################################
-            # grid
-            ###########################################
-            grid_balance = abs(c_l[0].x - c_t[0].x) <= 0.01
-            balance_state = "on" if grid_balance else "off"
-            if self.debug:
-                logging.info(f"Grid balanceren zou zijn: {balance_state}")
-            else:
-                self.set_entity_state("entity balance switch", self.grid, balance_state)
-                logging.info(f"Grid balanceren: {balance_state}")
-            grid_set_point = round(1000 * (c_l[0].x - c_t[0].x) / hour_fraction[0], 0)
-            logging.info(f"Grid set point: {grid_set_point} W")
-            if not self.debug:
-                # export the ess grid setpoint in W
-                self.set_entity_value(
-                    "entity_grid_setpoint",
-                    self.grid,
-                    grid_set_point,
-                )
-            #####################################
-
-            ###########################################
-            # ev
-            ##########################################
-            """
-            # build the first line (hour + amps)
-            amps = "    ".join(f"{ev_charge_stages[e][cs]['ampere']:4.1f}A" for cs in range(ECS[e]))
-            line1 = f"uur   {amps}"
-            logging.info(line1)
-            
-            # build the second header line
-            line2 = "    cons   power    on    off   part  bound"
-            logging.info(line2)
-            
-            # if you had subsequent columns per stop, build them the same way:
-            # cols = "    ".join(str(value) for value in some_list)
-            # logging.info(f"{some_label}   {cols}")            
-            """
-            for e in range(EV):
-                if ready_u[e] < U:
-                    if self.log_level <= logging.INFO:
-                        logging.info(
-                            f"Inzet-factor laden {self.ev_options[e].name} per stop"
-                        )
-                        amps = "         ".join(
-                            f"{ev_charge_stages[e][cs]['ampere']:4.1f}A"
-                            for cs in range(ECS[e])
-                        )
-                        line1 = f"  uur        {amps}   cons   power     on   off  part bound    soc   delta    cost"
-                        logging.info(line1)
-
-                        for u in range(ready_u[e] + 1):
-                            line2 = f"{uur[u]}  "
-                            stages = "   ".join(
-                                f"{stage_factor[e][cs][u].x:.4f}({stage_on[e][cs][u].x})"
-                                for cs in range(ECS[e])
-                            )
-                            line2 += stages + (
-                                f"  {c_ev[e][u].x:.3f}  {p_ev[e][u].x:.3f} "
-                                f"   {ev_is_on[e][u].x}"
-                                f"   {ev_is_off[e][u].x}"
-                                f"   {ev_is_partial[e][u].x}"
-                                f"   {ev_boundary_stop[e][u].x}"
-                                f"   {ev_soc_kwh[e][u].x:.3f}"
-                                f"   {ev_delta_soc[e][u].x:.3f}"
-                                f"   {low_soc_penalty_int[e][u].x:.3f}"
-                            )
-                            logging.info(line2)
-
-                start_ev_laden = stop_ev_laden = None
-                for u in range(U):
-                    if c_ev[e][u].x > 0:
-                        if start_ev_laden is None:
-                            start_ev_laden = tijd[u]
-                    else:
-                        if start_ev_laden is not None and c_ev[e][u - 1].x > 0:
-                            stop_ev_laden = tijd[u]
-                if start_ev_laden is not None:
-                    if stop_ev_laden is None:
-                        stop_ev_laden = tijd[U - 1] + dt.timedelta(
-                            seconds=self.interval_s
-                        )
-                    logging.info(
-                        f"{self.ev_options[e].name} wordt geladen tussen "
-                        f"{start_ev_laden} en {stop_ev_laden}"
-                    )
-                else:
-                    logging.info(
-                        f"Laden van {self.ev_options[e].name} is niet ingepland"
-                    )
-                logging.info(f"Aantal partial stops: {ev_partial_sum[e].x:2.0f}")
-                logging.info(f"Aantal boundary stops: {ev_boundary_sum[e].x:2.0f}")
-                logging.info(f"Aantal start/stops: {ev_start_stops_sum[e].x:2.0f}")
-                logging.info(f"Penalty per start/stop: {ev_switch_cost[e]:4.3f}")
-                logging.info(f"Totale switch kosten: {switch_cost[e].x:4.2f}")
-                entity_charge_switch = self.ev_options[e].charge_switch
-                entity_charging_ampere = self.ev_options[e].entity_set_charging_ampere
-                if ev_instant_charge[e]:
-                    entity_stop_laden = None
-                else:
-                    entity_stop_laden = self.ev_options[e].entity_stop_charging
-                old_switch_state = self.get_state(entity_charge_switch).state
-                old_ampere_state = self.get_state(entity_charging_ampere).state
-                new_ampere_state = 0
-                new_switch_state = "off"
-                new_state_stop_laden = None  # "2000-01-01 00:00:00"
-
-                line = "  ".join(
-                    f"{stage_factor[e][cs][0].x:.2f}" for cs in range(ECS[e])[1:]
-                )
-                logging.debug(line)
-                # na de exclusiviteits-constraint hoort er maar een laadstap
-                # actief te zijn. we nemen de stap met het grootste aandeel,
-                # niet de eerste. hele kleine waarden zijn rekenruis van de
-                # solver en negeren we.
-                stage_tol = 1e-4
-                active_stages = [
-                    cs
-                    for cs in range(ECS[e])[1:]
-                    if stage_factor[e][cs][0].x > stage_tol
-                ]
-                if len(active_stages) > 1:
-                    logging.warning(
-                        f"Meer dan een laadstap actief voor "
-                        f"{self.ev_options[e].name}: {active_stages}. "
-                        f"De stap met het grootste aandeel wordt gebruikt."
-                    )
-                if len(active_stages) > 0:
-                    cs = max(
-                        active_stages, key=lambda k: stage_factor[e][k][0].x
-                    )
-                    stage_fraction = stage_factor[e][cs][0].x
-                    new_ampere_state = ev_charge_stages[e][cs]["ampere"]
-                    if new_ampere_state > 0:
-                        new_switch_state = "on"
-                    if (stage_fraction < 1) and (
-                        energy_needed[e] > (ev_accu_in[e][0].x + 0.01)
-                    ):
-                        # stage_fraction is een deel van dit interval, niet van
-                        # een heel uur. daarom maal hour_fraction[0].
-                        new_ts = (
-                            start_dt.timestamp()
-                            + stage_fraction * hour_fraction[0] * 3600
-                        )
-                        stop_laden = dt.datetime.fromtimestamp(int(new_ts))
-                        new_state_stop_laden = stop_laden.strftime("%Y-%m-%d %H:%M")
-                ev_name = self.ev_options[e].name
-                logging.info(f"Berekeningsuitkomst voor opladen van {ev_name}:")
-                logging.info(
-                    f"- aantal ampere {new_ampere_state}A (was {old_ampere_state}A)"
-                )
-                logging.info(
-                    f"- stand schakelaar '{new_switch_state}' (was '{old_switch_state}')"
-                )
-                if not (entity_stop_laden is None) and not (
-                    new_state_stop_laden is None
-                ):
-                    logging.info(f"- stop laden op {new_state_stop_laden}")
-                logging.info(f"- positie: {ev_position[e]}")
-                logging.info(f"- ingeplugd: {ev_plugged_in[e]}")
-
-                if ev_position[e] == "home" and ev_plugged_in[e]:
-                    if float(new_ampere_state) > 0.0:
-                        if old_switch_state == "off":
-                            if self.debug:
-                                logging.info(
-                                    f"Laden van {ev_name} zou zijn aangezet "
-                                    f"met {new_ampere_state} ampere"
-                                )
-                            else:
-                                logging.info(
-                                    f"Laden van {ev_name} aangezet "
-                                    f"met {new_ampere_state} ampere via "
-                                    f"'{entity_charging_ampere}'"
-                                )
-                                self.set_value(entity_charging_ampere, new_ampere_state)
-                                self.turn_on(entity_charge_switch)
-                                if not (entity_stop_laden is None) and not (
-                                    new_state_stop_laden is None
-                                ):
-                                    self.call_service(
-                                        "set_datetime",
-                                        entity_id=entity_stop_laden,
-                                        datetime=new_state_stop_laden,
-                                    )
-                        if old_switch_state == "on":
-                            if self.debug:
-                                logging.info(
-                                    f"Laden van {ev_name} zou zijn doorgegaan "
-                                    f"met {new_ampere_state} A"
-                                )
-                            else:
-                                logging.info(
-                                    f"Laden van {ev_name} is doorgegaan "
-                                    f"met {new_ampere_state} A"
-                                )
-                                self.set_value(entity_charging_ampere, new_ampere_state)
-                                if not (entity_stop_laden is None) and not (
-                                    new_state_stop_laden is None
-                                ):
-                                    self.call_service(
-                                        "set_datetime",
-                                        entity_id=entity_stop_laden,
-                                        datetime=new_state_stop_laden,
-                                    )
-                    else:
-                        if old_switch_state == "on":
-                            if self.debug:
-                                logging.info(f"Laden van {ev_name} zou zijn uitgezet")
-                            else:
-                                self.set_value(entity_charging_ampere, 0)
-                                self.turn_off(entity_charge_switch)
-                                logging.info(f"Laden van {ev_name} uitgezet")
-                                if not (entity_stop_laden is None) and not (
-                                    new_state_stop_laden is None
-                                ):
-                                    self.call_service(
-                                        "set_datetime",
-                                        entity_id=entity_stop_laden,
-                                        datetime=new_state_stop_laden,
-                                    )
-                else:
-                    logging.info(f"{ev_name} is niet thuis of niet ingeplugd")
-                logging.info(
-                    f"Evaluatie status laden {ev_name} op "
-                    f""
-                    f"{dt.datetime.now().strftime('%Y-%m-%d %H:%M')}"
-                )
-                logging.info(
-                    f"- schakelaar laden: {self.get_state(entity_charge_switch).state}"
-                )
+                    state = self.written_states.get(entity_id)
+                    if state is None:
+                        state = self.get_state(entity_id)
+                    logging.info(f"- {label}: {state.state}")
+        except Exception as ex:
+            logging.error(f"Status laden niet opgehaald: {ex}")
+
+        def report_results():
+            # nabewerking: resultaten afdrukken en opslaan, grafiek maken
+            # afdrukken van de resultaten
+            components.begin("grid", "extract")
+            if plan_source == "optimal":
+                logging.info("Het programma heeft een optimale oplossing gevonden.")
+            else:
                 logging.info(
-                    f"- aantal ampere: {self.get_state(entity_charging_ampere).state}"
-                )
-
-            #######################################
-            # solar
-            ######################################
-            for s in range(solar_num):
-                if entity_pv_ac_switch[s] is not None:
-                    entity_pv_switch = entity_pv_ac_switch[s]
-                    switch_state = self.get_state(entity_pv_switch).state
-                    pv_name = self.solar[s].name
-                    if (pv_ac_on_off[s][0].x == 1.0) or (solar_prod[s][0] == 0.0):
-                        if switch_state == "off":
-                            if self.debug:
-                                logging.info(f"PV {pv_name} zou zijn aangezet")
-                            else:
-                                self.turn_on(entity_pv_switch)
-                                logging.info(f"PV {pv_name} aangezet")
-                    else:
-                        if switch_state == "on":
-                            if self.debug:
-                                logging.info(f"PV {pv_name} zou zijn uitgezet")
-                            else:
-                                self.turn_off(entity_pv_switch)
-                                logging.info(f"PV {pv_name} uitgezet")
-
-            ############################################
-            # battery
-            ############################################
-            for b in range(B):
-                # vermogen aan ac kant
-                netto_vermogen_bat = int(1000 * (ac_to_dc[b][0].x - ac_from_dc[b][0].x))
-                minimum_power = int(self.battery_options[b].minimum_power)
-                battery_state_on_value = self.battery_options[
-                    b
-                ].entity_set_operating_mode_on
-                battery_state_off_value = self.battery_options[
-                    b
-                ].entity_set_operating_mode_off
-                bat_name = self.battery_options[b].name
-                stop_inverter_id = self.battery_options[b].entity_stop_inverter
-                if abs(netto_vermogen_bat) <= 20:
-                    netto_vermogen_bat = 0
-                    new_state = battery_state_off_value
-                    stop_omvormer = None
-                elif grid_balance:
-                    new_state = battery_state_on_value
-                    stop_omvormer = None
-                elif (
-                    minimum_power > 0
-                    and abs(netto_vermogen_bat) < minimum_power
-                    and stop_inverter_id is not None
-                    and (
-                        len(reduce_power_low_soc[b]) == 0
-                        or start_soc[b]
-                        > reduce_power_low_soc[b][len(reduce_power_low_soc[b]) - 1].soc
-                    )
-                    and (
-                        len(reduce_power_high_soc[b]) == 0
-                        or start_soc[b] < reduce_power_high_soc[b][0].soc
-                    )
-                ):
-                    new_state = battery_state_on_value
-                    new_ts = (
-                        start_dt.timestamp()
-                        + (abs(netto_vermogen_bat) / minimum_power) * self.interval_s
-                    )
-                    stop_omvormer = dt.datetime.fromtimestamp(int(new_ts))
-                    if netto_vermogen_bat > 0:
-                        netto_vermogen_bat = minimum_power
-                    else:
-                        netto_vermogen_bat = -minimum_power
-                elif ac_to_dc[b][0].x > 0.0:  # laden met optimaal vermogen
-                    sum_weight_factor = 0
-                    sum_power = 0  # in W
-                    for cs in range(CS[b]):
-                        wf = ac_to_dc_w[b][0][cs].x
-                        if wf > 0:
-                            sum_weight_factor += wf
-                            sum_power += wf * charge_stages[b][cs]["power"]
-                    if sum_power > 0:
-                        new_state = battery_state_on_value
-                        netto_vermogen_bat = round(sum_power)
-                    stop_omvormer = None
-                elif ac_from_dc[b][0].x > 0.0:  # ontladen met optimaal vermogen
-                    sum_weight_factor = 0
-                    sum_power = 0  # in W
-                    for ds in range(DS[b]):
-                        wf = ac_from_dc_w[b][0][ds].x
-                        if wf > 0:
-                            sum_weight_factor += wf
-                            sum_power += wf * discharge_stages[b][ds]["power"]
-                    if sum_power > 0:
-                        new_state = battery_state_on_value
-                        netto_vermogen_bat = -round(sum_power)
-                    stop_omvormer = None
-                else:
-                    new_state = battery_state_on_value
-                    stop_omvormer = None
-                if stop_omvormer is not None and stop_inverter_id is None:
-                    stop_omvormer = None
-                if stop_omvormer is None:
-                    stop_str = "2000-01-01 00:00:00"
-                else:
-                    stop_str = stop_omvormer.strftime("%Y-%m-%d %H:%M")
-                df_accu[b].rename(
-                    columns={
-                        "dc->": "to_battery",
-                        "pv->dc": "from_pv",
-                        "->dc": "from_ac",
-                    },
-                    inplace=True,
-                )
-                first_row = df_accu[b].iloc[0]
-                from_battery = int(
-                    -first_row.to_battery.kWh * 1000 / hour_fraction_first_interval
-                )
-                from_pv = int(
-                    first_row.from_pv.kWh * 1000 / hour_fraction_first_interval
-                )
-                from_ac = int(
-                    first_row.from_ac.kWh * 1000 / hour_fraction_first_interval
-                )
-                calculated_soc = round(soc[b][1].x, 1)
-                logging.info(f"Cycle cost {bat_name}: {cycle_cost[b].x:<0.2f} euro")
-                if self.debug:
-                    logging.info(
-                        f"Netto vermogen naar(+)/uit(-) batterij {bat_name} "
-                        f"zou zijn: {netto_vermogen_bat} W"
-                    )
-                    if stop_omvormer:
-                        logging.info(f"tot: {stop_str}")
-                else:
-                    self.set_entity_value(
-                        "entity set power feedin",
-                        self.battery_options[b],
-                        netto_vermogen_bat,
-                    )
-                    self.set_entity_option(
-                        "entity set operating mode", self.battery_options[b], new_state
-                    )
-                    tot_str = f" tot: {stop_str}" if stop_omvormer else ""
-                    logging.info(
-                        f"Netto vermogen naar(+)/uit(-) omvormer {bat_name}: "
-                        f"{netto_vermogen_bat} W {tot_str}"
-                    )
-                    if stop_inverter_id is not None:
-                        self.call_service(
-                            "set_datetime",
-                            entity_id=stop_inverter_id,
-                            datetime=stop_str,
-                        )
-                    self.set_entity_value(
-                        "entity from battery", self.battery_options[b], from_battery
-                    )
-                    logging.info(f"Vermogen uit batterij: {from_battery}W")
-                    self.set_entity_value(
-                        "entity from pv", self.battery_options[b], from_pv
-                    )
-                    logging.info(f"Vermogen dat binnenkomt van pv: {from_pv}W")
-                    self.set_entity_value(
-                        "entity from ac", self.battery_options[b], from_ac
-                    )
-                    logging.info(f"Vermogen dat binnenkomt van ac: {from_ac}W")
-                    self.set_entity_value(
-                        "entity calculated soc", self.battery_options[b], calculated_soc
-                    )
-                    logging.info(f"Waarde SoC na eerste uur: {calculated_soc}%")
-
-                for s in range(pv_dc_num[b]):
-                    entity_pv_switch = self.battery_options[b].solar[s].entity_pv_switch
-                    if entity_pv_switch == "":
-                        entity_pv_switch = None
-                    if entity_pv_switch is not None:
-                        switch_state = self.get_state(entity_pv_switch).state
-                        pv_name = self.battery_options[b].solar[s].name
-                        if pv_dc_on_off[b][s][0].x == 1 or pv_prod_dc[b][s][0] == 0.0:
-                            if switch_state == "off":
-                                if self.debug:
-                                    logging.info(f"PV {pv_name} zou zijn aangezet")
-                                else:
-                                    self.turn_on(entity_pv_switch)
-                                    logging.info(f"PV {pv_name} aangezet")
-                        else:
-                            if switch_state == "on":
-                                if self.debug:
-                                    logging.info(f"PV {pv_name} zou zijn uitgezet")
-                                else:
-                                    self.turn_off(entity_pv_switch)
-                                    logging.info(f"PV {pv_name} uitgezet")
-
-            ##################################################
-            # heatpump
-            ##################################################
-            if self.hp_present and self.hp_enabled:
-                # als aan/uit entity er is altijd schakelen
-                entity_hp_switch = self.heating_options.entity_hp_switch
-                if entity_hp_switch is None:
-                    if self.hp_adjustment == "on/off":
-                        logging.warning(
-                            f"Geen entity om warmtepomp in/uit te schakelen"
-                        )
-                else:
-                    logging.debug(f"Warmtepomp entity: {entity_hp_switch}")
-                    switch_state = self.get_state(entity_hp_switch).state
-                    if hp_on[0].x == 1:
-                        if switch_state == "off":
-                            if self.debug:
-                                logging.info(f"Warmtepomp zou zijn ingeschakeld")
-                            else:
-                                logging.info(f"Warmtepomp ingeschakeld")
-                                self.turn_on(entity_hp_switch)
-                    else:
-                        if switch_state == "on":
-                            if self.debug:
-                                logging.info(f"Warmtepomp zou zijn uitgeschakeld")
-                            else:
-                                logging.info(f"Warmtepomp uitgeschakeld")
-                                self.turn_off(entity_hp_switch)
-                #  power, als entity er is altijd doorzetten
-                entity_hp_power = self.heating_options.entity_hp_power
-                if entity_hp_power is not None and self.hp_adjustment != "on/off":
-                    #  elektrisch vermogen in kW
-                    hp_power = c_hp[0].x / hour_fraction[0]
-                    if self.debug:
-                        logging.info(
-                            f"Elektrisch vermogen warmtepomp zou zijn ingesteld "
-                            f"op {hp_power:<0.0f} kW"
-                        )
-                    else:
-                        self.set_value(entity_hp_power, hp_power)
-                        logging.info(
-                            f"Elektrisch vermogen warmtepomp ingesteld "
-                            f"op {hp_power:<0.3f} kW"
-                        )
-
-                #  curve adjustment
-                entity_curve_adjustment = (
-                    self.heating_options.entity_adjust_heating_curve
+                    "Het programma heeft binnen de rekentijd een oplossing gevonden."
+                )
+            # alle waarden in een keer uit het model, daarna per familie een array
+            sol = Solution(model)
+            components.extract(sol, ctx)
+            components.begin("grid", "extract")
+            battery = components.get("battery")
+            boiler = components.get("boiler")
+            ev = components.get("ev")
+            heating = components.get("heating")
+            machines = components.get("machines")
+            solar = components.get("solar")
+            self.calc_stats["battery_sink_intervals"] = (
+                battery.sink_intervals_x if battery else 0
+            )
+            hf = np.asarray(hour_fraction[:U], dtype=float)
+            c_l_x = sol.get(c_l)
+            c_t_x = sol.get(c_t)
+            c_b_x = boiler.c_b_x if boiler else np.zeros(U)
+            c_hp_x = heating.c_hp_x if heating else np.zeros(U)
+            # zonder boiler geen boilertemperatuur
+            boiler_temp_x = (
+                boiler.boiler_temp_x if boiler else np.full(U + 1, np.nan)
+            )
+            b_l_x = np.asarray(b_l[:U], dtype=float)
+            pl_x = np.asarray(pl[:U], dtype=float)
+            pt_x = np.asarray(pt[:U], dtype=float)
+
+            accu_in_sum = battery.accu_in_x if battery else np.zeros(U)
+            accu_out_sum = battery.accu_out_x if battery else np.zeros(U)
+            c_ev_sum = ev.c_ev_x if ev else np.zeros(U)
+            c_ma_sum = machines.c_ma_x if machines else np.zeros(U)
+            # totale bruto pv_dc->ac productie
+            pv_ac_hour_sum = battery.pv_ac_x if battery else np.zeros(U)
+            # totale netto pv_ac productie origineel
+            solar_hour_sum_org = solar.pv_org_x if solar else np.zeros(U)
+            # totale netto pv_ac productie na optimalisatie
+            solar_hour_sum_opt = solar.pv_opt_x if solar else np.zeros(U)
+            netto = (
+                b_l_x
+                + c_b_x
+                + c_hp_x
+                + c_ev_sum
+                + c_ma_sum
+                - solar_hour_sum_org
+                - pv_ac_hour_sum
+            )
+            levering = netto >= 0
+            old_cost_da = float(np.sum(netto * np.where(levering, pl_x, pt_x)))
+            org_l = np.where(levering, netto, 0.0)
+            org_t = np.where(levering, 0.0, netto)
+            pd.options.display.float_format = "{:6.2f}".format
+
+            # voorspelling pv_dc opslaan.
+            components.begin("solar", "extract")
+            if battery:
+                tijd_pv = tijd.copy()
+                df_pv_dc = pd.DataFrame(
+                    {
+                        "tijd": tijd_pv[:U],
+                        "pv_dc": (battery.pv_prod_dc_sum_x * hf).sum(axis=0),
+                    }
                 )
-                if entity_curve_adjustment is not None:
-                    old_adjustment = float(
-                        self.get_state(entity_curve_adjustment).state
-                    )
-                    #  adjustment factor (K/%) bijv 0.4 K/10% = 0.04
-                    adjustment_factor = self.heating_options.adjustment_factor or 0.0
-                    adjustment = calc_adjustment_heatcurve(
-                        pl[0], p_avg, adjustment_factor, old_adjustment
+                if not self.debug:
+                    tijd_pv, df_pv_dc = expand_rows(
+                        tijd_pv, df_pv_dc, interval_steps, self.interval_s
                     )
-                    if self.debug:
-                        logging.info(
-                            f"Aanpassing stooklijn zou zijn: {adjustment:<0.2f}"
-                        )
-                    else:
-                        logging.info(f"Aanpassing stooklijn: {adjustment:<0.2f}")
-                        self.set_value(entity_curve_adjustment, adjustment)
+                    self.save_df(tablename="prognoses", tijd=tijd_pv, df=df_pv_dc)
 
-            ########################################################################
-            # apparaten /machines
-            ########################################################################
-            for m in range(M):
-                logging.info(f"Apparaat: {ma_name[m]}")
-                logging.info(f"Programma: {program_selected[m]}")
-                if RL[m] > 0:
-                    start_machine_str = ""
-                    for r in range(R[m]):
-                        if ma_start[m][r].x == 1:
-                            if ma_kw_dt[m][r] == start_dt:
-                                ma_start_time = (
-                                    datetime.datetime.now()
-                                    + datetime.timedelta(seconds=5)
-                                )
-                            else:
-                                ma_start_time = ma_kw_dt[m][r]
-                            start_machine_str = ma_start_time.strftime("%Y-%m-%d %H:%M")
-                            if not (ma_entity_plan_start[m] is None):
-                                if self.debug:
-                                    logging.info(
-                                        f"Zou zijn gestart op {start_machine_str}"
-                                    )
-                                else:
-                                    self.call_service(
-                                        "set_datetime",
-                                        entity_id=ma_entity_plan_start[m],
-                                        datetime=start_machine_str,
-                                    )
-                                    logging.info(f"Start op {start_machine_str}")
-                            end_machine_str = (
-                                ma_kw_dt[m][r + RL[m] - 1] + dt.timedelta(seconds=900)
-                            ).strftime("%Y-%m-%d %H:%M")
-                            if not (ma_entity_plan_end[m] is None):
-                                if self.debug:
-                                    logging.info(f"Zou klaar zijn op {end_machine_str}")
-                                else:
-                                    self.call_service(
-                                        "set_datetime",
-                                        entity_id=ma_entity_plan_end[m],
-                                        datetime=end_machine_str,
-                                    )
-                                    logging.info(f"Is klaar op {end_machine_str}")
-                    if start_machine_str == "":
-                        logging.info(f"Niet ingepland")
-
-                if self.log_level == logging.DEBUG:
-                    logging.debug(
-                        f"Per kwartier het berekende verbruik en het bijbehorende tarief"
-                    )
-                    for kw in range(KW[m]):
-                        logging.debug(
-                            f"kwartier {kw:>2} tijd: {ma_kw_dt[m][kw].strftime('%H:%M')} "
-                            f"consumption: {c_ma_kw[m][kw].x:>7.3f} "
-                            f"uur: {math.floor(kw / 4)} tarief: {pl[math.floor(kw / 4)]:.4f}"
-                        )
-                    logging.debug(
-                        f"Per uur het berekende verbruik, "
-                        f"het bijbehorende tarief en de kosten"
-                    )
-                    for u in range(U):
-                        logging.debug(
-                            f"uur {u:>2} tijdstip {tijd[u].strftime('%H:%M')} "
-                            f"consumption: {c_ma_u[m][u].x:>7.3f} tarief: {pl[u]:.4f}"
-                        )
+            """
+            # voorspellingen van pv opslaan
+            df_pv_prog = pd.DataFrame(columns=["time"]+pv_ac_varcode+pv_dc_varcode)
+            for u in range(U):
+                if hour_fraction[u] >= 1:
+                    row_pv = [tijd[u]]
+                    for s in range(solar_num):
+                        row_pv.append(pv_ac[s][u].x)
+                    for b in range(B):
+                        for s in range(pv_dc_num[b]):
+                            row_pv.append(pv_prod_dc[b][s][u].x * hour_fraction[u])
+                    df_pv_prog.loc[df_pv_prog.shape[0]] = row_pv_dc
+            tijd_pv = tijd[:len(df_pv_prog)]
+            if not self.debug:
+                self.save_df(tablename="prognoses", tijd=tijd_pv, df=df_pv_prog)
+            """
 
-        except Exception as ex:
-            error_handling(ex)
-            logging.error(f"Onverwachte fout: {ex}")
+            # totaal overzicht
+            components.begin("grid", "extract")
+            # pd.options.display.float_format = '{:,.3f}'.format
+            cols = ["uur", "bat_in", "bat_out"]
+            cols = cols + [
+                "cons",
+                "prod",
+                "base",
+                "boil",
+                "wp",
+                "ev",
+                "pv_ac",
+                "cost",
+                "profit",
+                "b_tem",
+            ]
+            if machines:
+                cols = cols + ["mach"]
+            columns = [
+                uur[:U],
+                accu_in_sum,
+                accu_out_sum,
+                c_l_x,
+                c_t_x,
+                b_l_x,
+                c_b_x,
+                c_hp_x,
+                c_ev_sum,
+                solar_hour_sum_opt,
+                c_l_x * pl_x,
+                -c_t_x * pt_x,
+                boiler_temp_x[1 : U + 1],
+            ]
+            if machines:
+                columns.append(c_ma_sum)
+            d_f = pd.DataFrame(dict(zip(cols, columns)))
+            if not self.debug:
+                d_f_save = d_f.drop(["b_tem"], axis=1)
+                save_tijd = tijd.copy()
+                save_tijd, d_f_save = expand_rows(
+                    save_tijd, d_f_save, interval_steps, self.interval_s
+                )
+                if interval_fraction_first_interval < 0.99:  # drop first row
+                    d_f_save = d_f_save.iloc[1:]
+                    save_tijd = save_tijd[1:]
+                self.save_df(tablename="prognoses", tijd=save_tijd, df=d_f_save)
+            else:
+                logging.info("Berekende prognoses zijn niet opgeslagen.")
+
+            d_f = d_f.astype({"uur": str})
+            d_f.loc["total"] = d_f.iloc[:, 1:].sum()
+            cost_consumption = d_f.loc["total"]["cost"]
+            tariff_consumption = cost_consumption / delivery.x if delivery.x != 0 else 0.0
+            profit_production = d_f.loc["total"]["profit"]
+            tariff_production = (
+                abs(profit_production) / production.x if production.x != 0 else 0.0
+            )
+            # d_f.loc['total'] = d_f.loc['total'].astype(object)
+
+            d_f.at[d_f.index[-1], "uur"] = "Totaal"
+            d_f.at[d_f.index[-1], "b_tem"] = pd.NA
+
+            logging.info(f"Berekende prognoses: \n{d_f.to_string(index=False)}\n")
+            # , formatters={'uur':'{:03d}'.format}))
+
+            logging.info(f"Consumption            {delivery.x: 7.2f} (kWh)")
+            logging.info(f"Cost consumption       {cost_consumption: 7.2f} (€)")
+            logging.info(f"Tariff consumption     {tariff_consumption: 8.3f} (€/kWh)")
+            logging.info(f"Production             {production.x: 7.2f} (kWh)")
+            logging.info(f"Profit production      {profit_production: 7.2f} (€)")
+            logging.info(f"Tariff production      {tariff_production: 8.3f} (€/kWh)\n")
+            battery_storage = battery.battery_storage if battery else 0.0
+            total_cycle_cost = battery.cycle_cost_x if battery else 0.0
+            total_penalty_cost = battery.penalty_cost_x if battery else 0.0
+            total_switch_cost = ev.switch_cost_x if ev else 0.0
+            total_low_soc_cost = ev.low_soc_penalty_x if ev else 0.0
+            boiler_storage = boiler.boiler_storage if boiler else 0.0
+            total_cost = (
+                cost_consumption
+                + profit_production
+                + total_cycle_cost
+                + total_penalty_cost
+                + total_switch_cost
+                + total_low_soc_cost
+                + battery_storage
+                + boiler_storage
+            )
 
-        #############################################
-        # graphs
-        #############################################
-        accu_in_n = []
-        accu_out_p = []
-        c_t_n = []
-        base_n = []
-        boiler_n = []
-        heatpump_n = []
-        mach_n = []
-        ev_n = []
-        c_l_p = []
-        soc_b = []
-        pv_p_org = []
-        pv_p_opt = []
-        pv_ac_p = []
-        max_y = 0
-        for u in range(U):
-            c_t_n.append(-c_t[u].x)
-            c_l_p.append(c_l[u].x)
-            base_n.append(-b_l[u])
-            boiler_n.append(-c_b[u].x)
-            heatpump_n.append(-c_hp[u].x)
-            ev_n.append(-c_ev_sum[u])
-            mach_n.append(-c_ma_sum[u])
-            pv_p_org.append(solar_hour_sum_org[u])
-            pv_p_opt.append(solar_hour_sum_opt[u])
-            pv_ac_p.append(pv_ac_hour_sum[u])
-            accu_in_sum = 0
-            accu_out_sum = 0
-            for b in range(B):
-                accu_in_sum += ac_to_dc[b][u].x
-                accu_out_sum += ac_from_dc[b][u].x
-            accu_in_n.append(-accu_in_sum * hour_fraction[u])
-            accu_out_p.append(accu_out_sum * hour_fraction[u])
+            logging.info(
+                "\nCalculation profit after optimize in €\n"
+                f"Cost before optimize           {old_cost_da: 7.2f}\n"
+                f"Cost consumption   {cost_consumption: 7.2f}\n"
+                f"Bat cycle cost     {total_cycle_cost: 7.2f}\n"
+                f"Bat penalty cost   {total_penalty_cost: 7.2f}\n"
+                f"EV switch costs    {total_switch_cost: 7.2f}\n"
+                f"EV low soc costs   {total_low_soc_cost: 7.2f}\n"
+                f"Battery storage    {battery_storage: 7.2f}\n"
+                f"Boiler storage     {boiler_storage: 7.2f}\n"
+                f"Profit production  {profit_production: 7.2f}\n"
+                f"Total              {total_cost: 7.2f}\n"
+                f"Cost after optimize            {cost.x: 7.2f}\n"
+                f"Profit:                        {old_cost_da - cost.x: 7.2f}"
+            )
+
+            self.calc_stats["components"]["extract"] = components.report("extract")
+
+            #############################################
+            # graphs
+            #############################################
+            c_t_n = -c_t_x
+            c_l_p = c_l_x
+            base_n = -b_l_x
+            boiler_n = -c_b_x
+            heatpump_n = -c_hp_x
+            ev_n = -c_ev_sum
+            mach_n = -c_ma_sum
+            pv_p_org = solar_hour_sum_org
+            pv_p_opt = solar_hour_sum_opt
+            pv_ac_p = pv_ac_hour_sum
+            accu_in_n = -accu_in_sum
+            accu_out_p = accu_out_sum
             max_y = max(
-                max_y,
-                (c_l_p[u] + pv_p_org[u] + accu_out_p[u]),
-                abs(c_t[u].x)
-                + b_l[u]
-                + c_b[u].x
-                + c_hp[u].x
-                + c_ev_sum[u]
-                + c_ma_sum[u]
-                + accu_in_sum * hour_fraction[u],
+                0,
+                np.max(c_l_p + pv_p_org + accu_out_p, initial=0),
+                np.max(
+                    np.abs(c_t_x)
+                    + b_l_x
+                    + c_b_x
+                    + c_hp_x
+                    + c_ev_sum
+                    + c_ma_sum
+                    - accu_in_n,
+                    initial=0,
+                ),
             )
-        soc_t = []
-        if B > 0:
-            soc_t = list(df_soc["soc"])
+            soc_b = []
+            soc_t = []
+            if battery:
+                soc_t = list(battery.df_soc["soc"])
+                for b in range(B):
+                    soc_b.append(list(battery.df_soc["soc_" + str(b)]))
+                """
+                    if u == 0:
+                        soc_p.append([])
+                    soc_p[b].append(soc[b][u].x)
             for b in range(B):
-                soc_b.append(list(df_soc["soc_" + str(b)]))
-            """
-                if u == 0:
-                    soc_p.append([])
-                soc_p[b].append(soc[b][u].x)
-        for b in range(B):
-            soc_p[b].append(soc[b][U].x)
-            """
-
-        # grafiek 1
-        import numpy as np
-        from dao.lib.da_graph import GraphBuilder
-
-        gr1_df = pd.DataFrame()
-        gr1_df["index"] = np.arange(U)
-        gr1_df["uur"] = uur[0:U]
-        gr1_df["verbruik"] = c_l_p
-        gr1_df["productie"] = c_t_n
-        gr1_df["baseload"] = base_n
-        gr1_df["boiler"] = boiler_n
-        gr1_df["heatpump"] = heatpump_n
-        gr1_df["ev"] = ev_n
-        gr1_df["mach"] = mach_n
-        gr1_df["pv_ac"] = pv_p_opt
-        gr1_df["pv_dc"] = pv_ac_p
-        gr1_df["accu_in"] = accu_in_n
-        gr1_df["accu_out"] = accu_out_p
-        style = self.config.graphics.style
-        gr1_options = {
-            "title": "Prognose berekend op: " + start_dt.strftime("%Y-%m-%d %H:%M"),
-            "style": style,
-            "haxis": {"values": "uur", "title": "uren van de dag"},
-            "graphs": [
-                {
-                    "vaxis": [{"title": "kWh"}],
-                    "series": [
-                        {"column": "verbruik", "type": "stacked", "color": "#00bfff"},
-                        {
-                            "column": "pv_ac",
-                            "title": "PV-AC",
-                            "type": "stacked",
-                            "color": "green",
-                        },
-                        {
-                            "column": "accu_out",
-                            "title": "Accu out",
-                            "type": "stacked",
-                            "color": "red",
-                        },
-                        {
-                            "column": "baseload",
-                            "title": "Overig verbr.",
-                            "type": "stacked",
-                            "color": "#f1a603",
-                        },
-                        {"column": "boiler", "type": "stacked", "color": "#e39ff6"},
-                        {
-                            "column": "heatpump",
-                            "title": "WP",
-                            "type": "stacked",
-                            "color": "#a32cc4",
-                        },
-                        {
-                            "column": "ev",
-                            "title": "EV",
-                            "type": "stacked",
-                            "color": "yellow",
-                        },
-                        {
-                            "column": "mach",
-                            "title": "App.",
-                            "type": "stacked",
-                            "color": "brown",
-                        },
-                        {
-                            "column": "productie",
-                            "title": "Teruglev.",
-                            "type": "stacked",
-                            "color": "#0080ff",
-                        },
-                        {
-                            "column": "accu_in",
-                            "title": "Accu in",
-                            "type": "stacked",
-                            "color": "#ff8000",
-                        },
-                    ],
-                }
-            ],
-        }
-
-        backend = self.config.graphical_backend or ""
-        gb = GraphBuilder(backend)
-
-        grid0_df = pd.DataFrame()
-        grid0_df["index"] = np.arange(U)
-        grid0_df["uur"] = uur[0:U]
-        grid0_df["uur"] = grid0_df["uur"].str[2:]
-        grid0_df["verbruik"] = org_l
-        grid0_df["productie"] = org_t
-        grid0_df["baseload"] = base_n
-        grid0_df["boiler"] = boiler_n
-        grid0_df["heatpump"] = heatpump_n
-        grid0_df["ev"] = ev_n
-        grid0_df["mach"] = mach_n
-        grid0_df["pv_ac"] = pv_ac_p
-        grid0_df["pv_dc"] = pv_p_org
-        style = self.config.graphics.style
-        import matplotlib.pyplot as plt
-        import matplotlib.ticker as ticker
-        import matplotlib.lines as mlines
-
-        plt.set_loglevel(level="warning")
-        pil_logger = logging.getLogger("PIL")
-        # override the logger logging level to INFO
-        pil_logger.setLevel(max(logging.INFO, self.log_level))
+                soc_p[b].append(soc[b][U].x)
+                """
 
-        show_battery_balance = (
-            str(self.config.graphics.battery_balance).lower() == "true"
-        )
-        plt.style.use(style)
-        uur_labels = [s[0:2] for s in uur]
-        nrows = 3
-        if show_battery_balance and B > 0:
-            nrows += B
-        fig, axis = plt.subplots(figsize=(8, 3 * nrows), nrows=nrows)
-        ind = np.arange(U)
-        # volgorde 1 pv_org 2 pv_ac 3 levering
-        if solar_num > 0:
-            axis[0].bar(
-                ind,
-                np.array(pv_p_org),
-                label="PV AC",
-                color="green",
-                align="edge",
-            )
-        # 2
-        if sum(pv_ac_p) > 0:
+            # grafiek 1
+            from dao.lib.da_graph import GraphBuilder
+
+            gr1_df = pd.DataFrame()
+            gr1_df["index"] = np.arange(U)
+            gr1_df["uur"] = uur[0:U]
+            gr1_df["verbruik"] = c_l_p
+            gr1_df["productie"] = c_t_n
+            gr1_df["baseload"] = base_n
+            gr1_df["boiler"] = boiler_n
+            gr1_df["heatpump"] = heatpump_n
+            gr1_df["ev"] = ev_n
+            gr1_df["mach"] = mach_n
+            gr1_df["pv_ac"] = pv_p_opt
+            gr1_df["pv_dc"] = pv_ac_p
+            gr1_df["accu_in"] = accu_in_n
+            gr1_df["accu_out"] = accu_out_p
+            style = self.config.graphics.style
+            gr1_options = {
+                "title": "Prognose berekend op: " + start_dt.strftime("%Y-%m-%d %H:%M"),
+                "style": style,
+                "haxis": {"values": "uur", "title": "uren van de dag"},
+                "graphs": [
+                    {
+                        "vaxis": [{"title": "kWh"}],
+                        "series": [
+                            {"column": "verbruik", "type": "stacked", "color": "#00bfff"},
+                            {
+                                "column": "pv_ac",
+                                "title": "PV-AC",
+                                "type": "stacked",
+                                "color": "green",
+                            },
+                            {
+                                "column": "accu_out",
+                                "title": "Accu out",
+                                "type": "stacked",
+                                "color": "red",
+                            },
+                            {
+                                "column": "baseload",
+                                "title": "Overig verbr.",
+                                "type": "stacked",
+                                "color": "#f1a603",
+                            },
+                            {"column": "boiler", "type": "stacked", "color": "#e39ff6"},
+                            {
+                                "column": "heatpump",
+                                "title": "WP",
+                                "type": "stacked",
+                                "color": "#a32cc4",
+                            },
+                            {
+                                "column": "ev",
+                                "title": "EV",
+                                "type": "stacked",
+                                "color": "yellow",
+                            },
+                            {
+                                "column": "mach",
+                                "title": "App.",
+                                "type": "stacked",
+                                "color": "brown",
+                            },
+                            {
+                                "column": "productie",
+                                "title": "Teruglev.",
+                                "type": "stacked",
+                                "color": "#0080ff",
+                            },
+                            {
+                                "column": "accu_in",
+                                "title": "Accu in",
+                                "type": "stacked",
+                                "color": "#ff8000",
+                            },
+                        ],
+                    }
+                ],
+            }
+
+            backend = self.config.graphical_backend or ""
+            gb = GraphBuilder(backend)
+
+            grid0_df = pd.DataFrame()
+            grid0_df["index"] = np.arange(U)
+            grid0_df["uur"] = uur[0:U]
+            grid0_df["uur"] = grid0_df["uur"].str[2:]
+            grid0_df["verbruik"] = org_l
+            grid0_df["productie"] = org_t
+            grid0_df["baseload"] = base_n
+            grid0_df["boiler"] = boiler_n
+            grid0_df["heatpump"] = heatpump_n
+            grid0_df["ev"] = ev_n
+            grid0_df["mach"] = mach_n
+            grid0_df["pv_ac"] = pv_ac_p
+            grid0_df["pv_dc"] = pv_p_org
+            style = self.config.graphics.style
+            import matplotlib.pyplot as plt
+            import matplotlib.ticker as ticker
+            import matplotlib.lines as mlines
+
+            plt.set_loglevel(level="warning")
+            pil_logger = logging.getLogger("PIL")
+            # override the logger logging level to INFO
+            pil_logger.setLevel(max(logging.INFO, self.log_level))
+
+            show_battery_balance = (
+                str(self.config.graphics.battery_balance).lower() == "true"
+            )
+            plt.style.use(style)
+            uur_labels = [s[0:2] for s in uur]
+            nrows = 3
+            if show_battery_balance and B > 0:
+                nrows += B
+            fig, axis = plt.subplots(figsize=(8, 3 * nrows), nrows=nrows)
+            ind = np.arange(U)
+            # volgorde 1 pv_org 2 pv_ac 3 levering
+            if solar_num > 0:
+                axis[0].bar(
+                    ind,
+                    np.array(pv_p_org),
+                    label="PV AC",
+                    color="green",
+                    align="edge",
+                )
+            # 2
+            if sum(pv_ac_p) > 0:
+                axis[0].bar(
+                    ind,
+                    np.array(pv_ac_p),
+                    bottom=np.array(pv_p_org),
+                    label="PV DC",
+                    color="lime",
+                    align="edge",
+                )
+            # 3
             axis[0].bar(
                 ind,
-                np.array(pv_ac_p),
-                bottom=np.array(pv_p_org),
-                label="PV DC",
-                color="lime",
+                np.array(org_l),
+                bottom=np.array(pv_p_org) + np.array(pv_ac_p),
+                label="Levering",
+                color="#00bfff",
                 align="edge",
             )
-        # 3
-        axis[0].bar(
-            ind,
-            np.array(org_l),
-            bottom=np.array(pv_p_org) + np.array(pv_ac_p),
-            label="Levering",
-            color="#00bfff",
-            align="edge",
-        )
 
-        axis[0].bar(
-            ind, np.array(base_n), label="Overig verbr.", color="#f1a603", align="edge"
-        )
-        if self.boiler_present:
-            axis[0].bar(
-                ind,
-                np.array(boiler_n),
-                bottom=np.array(base_n),
-                label="Boiler",
-                color="#e39ff6",
-                align="edge",
-            )
-        if self.hp_present:
             axis[0].bar(
-                ind,
-                np.array(heatpump_n),
-                bottom=np.array(base_n) + np.array(boiler_n),
-                label="WP",
-                color="#a32cc4",
-                align="edge",
-            )
-        if EV > 0:
-            axis[0].bar(
-                ind,
-                np.array(ev_n),
-                bottom=np.array(base_n) + np.array(boiler_n) + np.array(heatpump_n),
-                label="EV laden",
-                color="yellow",
-                align="edge",
+                ind, np.array(base_n), label="Overig verbr.", color="#f1a603", align="edge"
             )
-        if M > 0:
+            if boiler:
+                axis[0].bar(
+                    ind,
+                    np.array(boiler_n),
+                    bottom=np.array(base_n),
+                    label="Boiler",
+                    color="#e39ff6",
+                    align="edge",
+                )
+            if heating:
+                axis[0].bar(
+                    ind,
+                    np.array(heatpump_n),
+                    bottom=np.array(base_n) + np.array(boiler_n),
+                    label="WP",
+                    color="#a32cc4",
+                    align="edge",
+                )
+            if ev:
+                axis[0].bar(
+                    ind,
+                    np.array(ev_n),
+                    bottom=np.array(base_n) + np.array(boiler_n) + np.array(heatpump_n),
+                    label="EV laden",
+                    color="yellow",
+                    align="edge",
+                )
+            if machines:
+                axis[0].bar(
+                    ind,
+                    np.array(mach_n),
+                    bottom=np.array(base_n)
+                    + np.array(boiler_n)
+                    + np.array(heatpump_n)
+                    + np.array(ev_n),
+                    label="Apparatuur",
+                    color="brown",
+                    align="edge",
+                )
             axis[0].bar(
                 ind,
-                np.array(mach_n),
+                np.array(org_t),
                 bottom=np.array(base_n)
                 + np.array(boiler_n)
                 + np.array(heatpump_n)
-                + np.array(ev_n),
-                label="Apparatuur",
-                color="brown",
+                + np.array(ev_n)
+                + np.array(mach_n),
+                label="Teruglev.",
+                color="#0080ff",
                 align="edge",
             )
-        axis[0].bar(
-            ind,
-            np.array(org_t),
-            bottom=np.array(base_n)
-            + np.array(boiler_n)
-            + np.array(heatpump_n)
-            + np.array(ev_n)
-            + np.array(mach_n),
-            label="Teruglev.",
-            color="#0080ff",
-            align="edge",
-        )
-        axis[0].legend(loc="best", bbox_to_anchor=(1.05, 1.00))
-        axis[0].set_ylabel("kWh")
-        ylim = math.ceil(max_y)
-        axis[0].set_ylim([-ylim, ylim])
-        axis[0].set_xticks(ind, labels=uur_labels[: len(ind)])
-        if self.interval == "1hour":
-            ticker_multi = 2
-            ticker_offset = 0
-        else:
-            ticker_multi = 8
-            ticker_offset = U % 4
-        axis[0].xaxis.set_major_locator(
-            ticker.MultipleLocator(ticker_multi, offset=ticker_offset)
-        )
-        axis[0].xaxis.set_minor_locator(ticker.MultipleLocator(1))
-        axis[0].set_title(
-            f"Berekend op: {start_dt.strftime('%d-%m-%Y %H:%M')}\nNiet geoptimaliseerd"
-        )
-
-        axis[1].bar(
-            ind,
-            np.array(pv_p_opt),
-            label="PV AC",
-            color="green",
-            align="edge",
-        )
-        axis[1].bar(
-            ind,
-            np.array(accu_out_p),
-            bottom=np.array(pv_p_opt),
-            label="Accu uit",
-            color="red",
-            align="edge",
-        )
-        axis[1].bar(
-            ind,
-            np.array(c_l_p),
-            bottom=np.array(pv_p_opt) + np.array(accu_out_p),
-            label="Levering",
-            color="#00bfff",
-            align="edge",
-        )
+            axis[0].legend(loc="best", bbox_to_anchor=(1.05, 1.00))
+            axis[0].set_ylabel("kWh")
+            ylim = math.ceil(max_y)
+            axis[0].set_ylim([-ylim, ylim])
+            axis[0].set_xticks(ind, labels=uur_labels[: len(ind)])
+            if self.interval == "1hour":
+                ticker_multi = 2
+                ticker_offset = 0
+            else:
+                ticker_multi = 8
+                ticker_offset = U % 4
+            axis[0].xaxis.set_major_locator(
+                ticker.MultipleLocator(ticker_multi, offset=ticker_offset)
+            )
+            axis[0].xaxis.set_minor_locator(ticker.MultipleLocator(1))
+            axis[0].set_title(
+                f"Berekend op: {start_dt.strftime('%d-%m-%Y %H:%M')}\nNiet geoptimaliseerd"
+            )
 
-        # axis[1].bar(ind, np.array(cons_n), label="Verbruik", color='yellow')
-        axis[1].bar(
-            ind, np.array(base_n), label="Overig verbr.", color="#f1a603", align="edge"
-        )
-        if self.boiler_present:
             axis[1].bar(
                 ind,
-                np.array(boiler_n),
-                bottom=np.array(base_n),
-                label="Boiler",
-                color="#e39ff6",
+                np.array(pv_p_opt),
+                label="PV AC",
+                color="green",
                 align="edge",
             )
-        if self.hp_present:
             axis[1].bar(
                 ind,
-                np.array(heatpump_n),
-                bottom=np.array(base_n + np.array(boiler_n)),
-                label="WP",
-                color="#a32cc4",
+                np.array(accu_out_p),
+                bottom=np.array(pv_p_opt),
+                label="Accu uit",
+                color="red",
                 align="edge",
             )
-        if EV > 0:
             axis[1].bar(
                 ind,
-                np.array(ev_n),
-                bottom=np.array(base_n) + np.array(boiler_n) + np.array(heatpump_n),
-                label="EV laden",
-                color="yellow",
+                np.array(c_l_p),
+                bottom=np.array(pv_p_opt) + np.array(accu_out_p),
+                label="Levering",
+                color="#00bfff",
                 align="edge",
             )
-        if M > 0:
+
+            # axis[1].bar(ind, np.array(cons_n), label="Verbruik", color='yellow')
             axis[1].bar(
-                ind,
-                np.array(mach_n),
-                bottom=np.array(base_n)
-                + np.array(boiler_n)
-                + np.array(heatpump_n)
-                + np.array(ev_n),
-                label="Apparatuur",
-                color="brown",
-                align="edge",
+                ind, np.array(base_n), label="Overig verbr.", color="#f1a603", align="edge"
             )
-        if B > 0:
+            if boiler:
+                axis[1].bar(
+                    ind,
+                    np.array(boiler_n),
+                    bottom=np.array(base_n),
+                    label="Boiler",
+                    color="#e39ff6",
+                    align="edge",
+                )
+            if heating:
+                axis[1].bar(
+                    ind,
+                    np.array(heatpump_n),
+                    bottom=np.array(base_n + np.array(boiler_n)),
+                    label="WP",
+                    color="#a32cc4",
+                    align="edge",
+                )
+            if ev:
+                axis[1].bar(
+                    ind,
+                    np.array(ev_n),
+                    bottom=np.array(base_n) + np.array(boiler_n) + np.array(heatpump_n),
+                    label="EV laden",
+                    color="yellow",
+                    align="edge",
+                )
+            if machines:
+                axis[1].bar(
+                    ind,
+                    np.array(mach_n),
+                    bottom=np.array(base_n)
+                    + np.array(boiler_n)
+                    + np.array(heatpump_n)
+                    + np.array(ev_n),
+                    label="Apparatuur",
+                    color="brown",
+                    align="edge",
+                )
+            if B > 0:
+                axis[1].bar(
+                    ind,
+                    np.array(accu_in_n),
+                    bottom=np.array(base_n)
+                    + np.array(boiler_n)
+                    + np.array(heatpump_n)
+                    + np.array(ev_n)
+                    + np.array(mach_n),
+                    label="Accu in",
+                    color="#ff8000",
+                    align="edge",
+                )
             axis[1].bar(
                 ind,
-                np.array(accu_in_n),
+                np.array(c_t_n),
                 bottom=np.array(base_n)
                 + np.array(boiler_n)
                 + np.array(heatpump_n)
                 + np.array(ev_n)
-                + np.array(mach_n),
-                label="Accu in",
-                color="#ff8000",
+                + np.array(mach_n)
+                + np.array(accu_in_n),
+                label="Teruglev.",
+                color="#0080ff",
                 align="edge",
             )
-        axis[1].bar(
-            ind,
-            np.array(c_t_n),
-            bottom=np.array(base_n)
-            + np.array(boiler_n)
-            + np.array(heatpump_n)
-            + np.array(ev_n)
-            + np.array(mach_n)
-            + np.array(accu_in_n),
-            label="Teruglev.",
-            color="#0080ff",
-            align="edge",
-        )
-        axis[1].legend(loc="best", bbox_to_anchor=(1.05, 1.00))
-        axis[1].set_ylabel("kWh")
-        axis[1].set_ylim([-ylim, ylim])
-        axis[1].set_xticks(ind, labels=uur_labels[: len(ind)])
-        axis[1].xaxis.set_major_locator(
-            ticker.MultipleLocator(ticker_multi, offset=ticker_offset)
-        )
-        axis[1].xaxis.set_minor_locator(ticker.MultipleLocator(1))
-        axis[1].set_title(
-            f"Day Ahead geoptimaliseerd\nStrategie: {strategie}"
-            f" winst € {(old_cost_da - cost.x):0.2f}"
-        )
-        axis[1].sharex(axis[0])
-
-        gr_no = 1
-        if show_battery_balance:
-            ind = np.arange(U + 1)
-            uur.append("24:00")
-            uur_labels.append("24")
-            for b in range(B):
-                # make graph of battery
-                gr_no += 1
-                ac_p = []
-                ac_n = []
-                pv_p = []
-                bat_p = []
-                bat_n = []
-                for u in range(U):
-                    # model += (dc_from_ac[b][u] + dc_from_bat[b][u] + pv_prod_dc_sum[b][u] ==
-                    #           dc_to_ac[b][u] + dc_to_bat[b][u])
-                    ac_p.append(dc_from_ac[b][u].x * hour_fraction[u])
-                    ac_n.append(-dc_to_ac[b][u].x * hour_fraction[u])
-                    if pv_dc_num[b] > 0:
-                        pv_p.append(pv_prod_dc_sum[b][u].x * hour_fraction[u])
+            axis[1].legend(loc="best", bbox_to_anchor=(1.05, 1.00))
+            axis[1].set_ylabel("kWh")
+            axis[1].set_ylim([-ylim, ylim])
+            axis[1].set_xticks(ind, labels=uur_labels[: len(ind)])
+            axis[1].xaxis.set_major_locator(
+                ticker.MultipleLocator(ticker_multi, offset=ticker_offset)
+            )
+            axis[1].xaxis.set_minor_locator(ticker.MultipleLocator(1))
+            axis[1].set_title(
+                f"Day Ahead geoptimaliseerd\nStrategie: {strategie}"
+                f" winst € {(old_cost_da - cost.x):0.2f}"
+            )
+            axis[1].sharex(axis[0])
+
+            gr_no = 1
+            if show_battery_balance:
+                ind = np.arange(U + 1)
+                uur.append("24:00")
+                uur_labels.append("24")
+                for b in range(B):
+                    # make graph of battery
+                    gr_no += 1
+                    ac_p = []
+                    ac_n = []
+                    pv_p = []
+                    bat_p = []
+                    bat_n = []
+                    for u in range(U):
+                        # model += (dc_from_ac[b][u] + dc_from_bat[b][u] + pv_prod_dc_sum[b][u] ==
+                        #           dc_to_ac[b][u] + dc_to_bat[b][u])
+                        ac_p.append(battery.dc_from_ac_x[b][u] * hour_fraction[u])
+                        ac_n.append(-battery.dc_to_ac_x[b][u] * hour_fraction[u])
+                        if battery.pv_dc_num[b] > 0:
+                            pv_p.append(
+                                battery.pv_prod_dc_sum_x[b][u] * hour_fraction[u]
+                            )
+                        else:
+                            pv_p.append(0)
+                        bat_p.append(battery.dc_from_bat_x[b][u] * hour_fraction[u])
+                        bat_n.append(-battery.dc_to_bat_x[b][u] * hour_fraction[u])
+                    # extra uur voor sync aantal uur met laatste soc-waarde
+                    ac_p.append(0)
+                    ac_n.append(0)
+                    pv_p.append(0)
+                    bat_p.append(0)
+                    bat_n.append(0)
+                    leg1 = axis[gr_no].bar(
+                        ind, np.array(ac_p), label="AC<->", color="red", align="edge"
+                    )
+                    leg2 = axis[gr_no].bar(
+                        ind,
+                        np.array(bat_p),
+                        label="BAT<->",
+                        bottom=np.array(ac_p),
+                        color="blue",
+                        align="edge",
+                    )
+                    if battery.pv_dc_num[b] > 0:
+                        leg3 = axis[gr_no].bar(
+                            ind,
+                            np.array(pv_p),
+                            label="PV->",
+                            bottom=np.array(ac_p) + np.array(bat_p),
+                            color="lime",
+                            align="edge",
+                        )
                     else:
-                        pv_p.append(0)
-                    bat_p.append(dc_from_bat[b][u].x * hour_fraction[u])
-                    bat_n.append(-dc_to_bat[b][u].x * hour_fraction[u])
-                # extra uur voor sync aantal uur met laatste soc-waarde
-                ac_p.append(0)
-                ac_n.append(0)
-                pv_p.append(0)
-                bat_p.append(0)
-                bat_n.append(0)
-                leg1 = axis[gr_no].bar(
-                    ind, np.array(ac_p), label="AC<->", color="red", align="edge"
-                )
-                leg2 = axis[gr_no].bar(
-                    ind,
-                    np.array(bat_p),
-                    label="BAT<->",
-                    bottom=np.array(ac_p),
-                    color="blue",
-                    align="edge",
-                )
-                if pv_dc_num[b] > 0:
-                    leg3 = axis[gr_no].bar(
+                        leg3 = None
+                    axis[gr_no].bar(ind, np.array(ac_n), color="red", align="edge")
+                    axis[gr_no].bar(
                         ind,
-                        np.array(pv_p),
-                        label="PV->",
-                        bottom=np.array(ac_p) + np.array(bat_p),
-                        color="lime",
+                        np.array(bat_n),
+                        bottom=np.array(ac_n),
+                        color="blue",
                         align="edge",
                     )
-                else:
-                    leg3 = None
-                axis[gr_no].bar(ind, np.array(ac_n), color="red", align="edge")
-                axis[gr_no].bar(
+                    # axis[gr_no].legend(loc='best', bbox_to_anchor=(1.30, 1.00))
+                    axis[gr_no].set_ylabel("kWh")
+                    axis[gr_no].set_ylim([-ylim, ylim])
+                    axis[gr_no].set_xticks(ind, labels=uur_labels[: len(ind)])
+                    axis[gr_no].xaxis.set_major_locator(
+                        ticker.MultipleLocator(ticker_multi, offset=ticker_offset)
+                    )
+                    axis[gr_no].xaxis.set_minor_locator(ticker.MultipleLocator(1))
+                    axis[gr_no].set_title(
+                        f"Energiebalans per uur voor {self.battery_options[b].name}"
+                    )
+                    axis[gr_no].sharex(axis[0])
+                    axis_20 = axis[gr_no].twinx()
+                    leg4 = axis_20.plot(
+                        ind, soc_b[b], label="% SoC", linestyle="solid", color="olive"
+                    )[0]
+                    axis_20.set_ylabel("% SoC")
+                    axis_20.set_ylim([0, 102])
+                    soc_line = mlines.Line2D([], [], color="olive", label="SoC %")
+                    if battery.pv_dc_num[b] > 0:
+                        labels = ["AC<->", "BAT<->", "PV->", "% SoC"]
+                        handles = [leg1, leg2, leg3, leg4]
+                    else:
+                        labels = ["AC<->", "BAT<->", "% SoC"]
+                        handles = [leg1, leg2, leg4]
+                    axis[gr_no].legend(
+                        handles=handles,
+                        labels=labels,
+                        loc="best",
+                        bbox_to_anchor=(1.35, 1.00),
+                    )
+
+            gr_no += 1
+            ln1 = None
+            line_styles = ["solid", "dashed", "dotted"]
+            ind = np.arange(U + 1)
+            if len(uur) < U + 1:
+                uur.append("24:00")
+                uur_labels.append("24")
+            if B > 0:
+                ln1 = axis[gr_no].plot(
+                    ind, soc_t, label="SoC", linestyle=line_styles[0], color="olive"
+                )
+            axis[gr_no].set_xticks(ind, labels=uur_labels[: len(ind)])
+            axis[gr_no].set_ylabel("% SoC")
+            axis[gr_no].set_xlabel("uren van de dag")
+            axis[gr_no].xaxis.set_major_locator(
+                ticker.MultipleLocator(ticker_multi, offset=ticker_offset)
+            )
+            axis[gr_no].xaxis.set_minor_locator(ticker.MultipleLocator(1))
+            axis[gr_no].set_ylim([0, 102])
+            axis[gr_no].set_title("Verloop SoC en tarieven")
+            axis[gr_no].sharex(axis[0])
+
+            _g = self.config.graphics
+            _gx = (_g.model_extra or {}) if _g else {}
+
+            if _g and _g.prices_consumption is not None and "prices delivery" not in _gx:
+                prices_consumption_str = str(_g.prices_consumption)
+            elif "prices delivery" in _gx:
+                prices_consumption_str = str(_gx["prices delivery"])
+                logging.warning(f"Gebruik 'prices consumption' ipv `prices delivery'")
+            else:
+                prices_consumption_str = str(_g.prices_consumption) if _g else "True"
+            prices_consumption = prices_consumption_str.lower() == "true"
+
+            axis22 = axis[gr_no].twinx()
+            if prices_consumption:
+                pl.append(pl[-1])
+                ln2 = axis22.step(
                     ind,
-                    np.array(bat_n),
-                    bottom=np.array(ac_n),
-                    color="blue",
-                    align="edge",
-                )
-                # axis[gr_no].legend(loc='best', bbox_to_anchor=(1.30, 1.00))
-                axis[gr_no].set_ylabel("kWh")
-                axis[gr_no].set_ylim([-ylim, ylim])
-                axis[gr_no].set_xticks(ind, labels=uur_labels[: len(ind)])
-                axis[gr_no].xaxis.set_major_locator(
-                    ticker.MultipleLocator(ticker_multi, offset=ticker_offset)
-                )
-                axis[gr_no].xaxis.set_minor_locator(ticker.MultipleLocator(1))
-                axis[gr_no].set_title(
-                    f"Energiebalans per uur voor {self.battery_options[b].name}"
+                    np.array(pl),
+                    label="Tarief\nlevering",
+                    color="#00bfff",
+                    where="post",
                 )
-                axis[gr_no].sharex(axis[0])
-                axis_20 = axis[gr_no].twinx()
-                leg4 = axis_20.plot(
-                    ind, soc_b[b], label="% SoC", linestyle="solid", color="olive"
-                )[0]
-                axis_20.set_ylabel("% SoC")
-                axis_20.set_ylim([0, 102])
-                soc_line = mlines.Line2D([], [], color="olive", label="SoC %")
-                if pv_dc_num[b] > 0:
-                    labels = ["AC<->", "BAT<->", "PV->", "% SoC"]
-                    handles = [leg1, leg2, leg3, leg4]
-                else:
-                    labels = ["AC<->", "BAT<->", "% SoC"]
-                    handles = [leg1, leg2, leg4]
-                axis[gr_no].legend(
-                    handles=handles,
-                    labels=labels,
-                    loc="best",
-                    bbox_to_anchor=(1.35, 1.00),
+            else:
+                ln2 = None
+
+            if _g and _g.prices_production is not None and "prices redelivery" not in _gx:
+                prices_production_str = str(_g.prices_production)
+            elif "prices redelivery" in _gx:
+                prices_production_str = str(_gx["prices redelivery"])
+                logging.warning(f"Gebruik 'prices production' ipv `prices redelivery'")
+            else:
+                prices_production_str = str(_g.prices_production) if _g else "True"
+            prices_production = prices_production_str.lower() == "true"
+
+            if prices_production:
+                pt.append(pt[-1])
+                ln3 = axis22.step(
+                    ind,
+                    np.array(pt),
+                    label="Tarief\nteruglev.",
+                    color="green",  # "#0080ff",
+                    where="post",
                 )
+            else:
+                ln3 = None
 
-        gr_no += 1
-        ln1 = None
-        line_styles = ["solid", "dashed", "dotted"]
-        ind = np.arange(U + 1)
-        if len(uur) < U + 1:
-            uur.append("24:00")
-            uur_labels.append("24")
-        if B > 0:
-            ln1 = axis[gr_no].plot(
-                ind, soc_t, label="SoC", linestyle=line_styles[0], color="olive"
-            )
-        axis[gr_no].set_xticks(ind, labels=uur_labels[: len(ind)])
-        axis[gr_no].set_ylabel("% SoC")
-        axis[gr_no].set_xlabel("uren van de dag")
-        axis[gr_no].xaxis.set_major_locator(
-            ticker.MultipleLocator(ticker_multi, offset=ticker_offset)
-        )
-        axis[gr_no].xaxis.set_minor_locator(ticker.MultipleLocator(1))
-        axis[gr_no].set_ylim([0, 102])
-        axis[gr_no].set_title("Verloop SoC en tarieven")
-        axis[gr_no].sharex(axis[0])
+            if str((_g.prices_spot if _g else True) or "true").lower() == "true":
+                p_spot.append(p_spot[-1])
+                ln5 = axis22.step(
+                    ind,
+                    np.array(p_spot),
+                    label="Spot prijzen",
+                    color="orange",
+                    where="post",
+                )
+            else:
+                ln5 = None
 
-        _g = self.config.graphics
-        _gx = (_g.model_extra or {}) if _g else {}
+            if _g and _g.average_consumption is not None and "average delivery" not in _gx:
+                average_consumption_str = str(_g.average_consumption)
+            elif "average delivery" in _gx:
+                average_consumption_str = str(_gx["average delivery"])
+                logging.warning(f"Gebruik 'average consumption' ipv `average delivery'")
+            else:
+                average_consumption_str = str(_g.average_consumption) if _g else "True"
+            average_consumption = average_consumption_str.lower() == "true"
 
-        if _g and _g.prices_consumption is not None and "prices delivery" not in _gx:
-            prices_consumption_str = str(_g.prices_consumption)
-        elif "prices delivery" in _gx:
-            prices_consumption_str = str(_gx["prices delivery"])
-            logging.warning(f"Gebruik 'prices consumption' ipv `prices delivery'")
-        else:
-            prices_consumption_str = str(_g.prices_consumption) if _g else "True"
-        prices_consumption = prices_consumption_str.lower() == "true"
+            if average_consumption:
+                pl_avg.append(pl_avg[-1])
+                ln4 = axis22.plot(
+                    ind,
+                    np.array(pl_avg),
+                    label="Tarief lev.\ngemid.",
+                    linestyle="dashed",
+                    color="#00bfff",
+                )
+            else:
+                ln4 = None
+            axis22.set_ylabel("euro/kWh")
+            axis22.yaxis.set_major_formatter(ticker.FormatStrFormatter("% 1.2f"))
+            bottom, top = axis22.get_ylim()
+            if bottom > 0:
+                axis22.set_ylim([0, top])
+            lns = []
+            if B > 0:
+                lns += ln1
+            if ln2:
+                lns += ln2
+            if ln3:
+                lns += ln3
+            if ln4:
+                lns += ln4
+            if ln5:
+                lns += ln5
+            labels = [line.get_label() for line in lns]
+            axis22.legend(lns, labels, loc="best", bbox_to_anchor=(1.40, 1.00))
+
+            plt.subplots_adjust(right=0.75)
+            fig.tight_layout()
+            plt.savefig(
+                "../data/images/calc_" + start_dt.strftime("%Y-%m-%d__%H-%M") + ".png"
+            )
+            plt.close("all")
+            self.notify("DAO calc afgerond", self.notification_berekening)
+
+        # de nabewerking kan het aansturen van HA niet meer vertragen
+        self.results_stage.start(report_results)
+        return plan_source
+
+    def input_fingerprint(
+        self,
+        moment: dt.datetime,
+        price_data: pd.DataFrame,
+        prog_data: pd.DataFrame,
+        inputs,
+        ha_getter,
+    ) -> dict:
+        """
+        Maakt de vingerafdruk van de invoer van de berekening (zie da_fingerprint)
+        :param moment: tijdstip van de berekening
+        :param price_data: de prijzen vanaf het eerste interval
+        :param prog_data: de meteo-prognoses vanaf het eerste interval
+        :param inputs: CalcInputs van de berekening
+        :param ha_getter: functie entity_id -> state
+        :return: de vingerafdruk
+        """
 
-        axis22 = axis[gr_no].twinx()
-        if prices_consumption:
-            pl.append(pl[-1])
-            ln2 = axis22.step(
-                ind,
-                np.array(pl),
-                label="Tarief\nlevering",
-                color="#00bfff",
-                where="post",
-            )
-        else:
-            ln2 = None
+        def state(entity_id: str | None):
+            if entity_id is None:
+                return None
+            try:
+                return ha_getter(entity_id)
+            except Exception:
+                return None
 
-        if _g and _g.prices_production is not None and "prices redelivery" not in _gx:
-            prices_production_str = str(_g.prices_production)
-        elif "prices redelivery" in _gx:
-            prices_production_str = str(_gx["prices redelivery"])
-            logging.warning(f"Gebruik 'prices production' ipv `prices redelivery'")
-        else:
-            prices_production_str = str(_g.prices_production) if _g else "True"
-        prices_production = prices_production_str.lower() == "true"
+        def level(entity_id: str) -> float | str | None:
+            value = state(entity_id)
+            try:
+                return round(float(value), 1)
+            except (TypeError, ValueError):
+                return value
 
-        if prices_production:
-            pt.append(pt[-1])
-            ln3 = axis22.step(
-                ind,
-                np.array(pt),
-                label="Tarief\nteruglev.",
-                color="green",  # "#0080ff",
-                where="post",
-            )
-        else:
-            ln3 = None
+        prognoses = {
+            "temperatuur": vector(prog_data["tijd"], prog_data["temp"], 2),
+            "straling": vector(prog_data["tijd"], prog_data["glob_rad"], 2),
+        }
+        for name, solar in inputs.solar_prog.items():
+            prognoses[f"solar {name}"] = vector(solar["tijd"], solar["prediction"], 3)
+        if inputs.base_cons is not None:
+            midnight = dt.datetime.combine(moment.date(), dt.time())
+            base_cons = list(inputs.base_cons[0]) + list(inputs.base_cons[1])
+            step = dt.timedelta(days=2) / max(len(base_cons), 1)
+            prognoses["baseload"] = vector(
+                [midnight + i * step for i in range(len(base_cons))], base_cons, 3
+            )
+        levels = {}
+        for option in self.battery_options:
+            levels[f"batterij {option.name}"] = level(option.entity_actual_level)
+        temperatures = {}
+        states = {}
+        for option in self.battery_options:
+            for entity_id in (
+                option.entity_min_soc_end_opt,
+                option.entity_max_soc_end_opt,
+            ):
+                states[entity_id] = state(entity_id)
+        for option in self.ev_options:
+            levels[f"auto {option.name}"] = level(option.entity_actual_level)
+            entity_ids = [
+                option.entity_position,
+                option.entity_plugged_in,
+                option.entity_instant_start,
+                option.entity_instant_level,
+            ]
+            if option.charge_scheduler is not None:
+                entity_ids += [
+                    option.charge_scheduler.entity_set_level,
+                    option.charge_scheduler.entity_ready_datetime,
+                ]
+            for entity_id in entity_ids:
+                states[entity_id] = state(entity_id)
+        if self.boiler_options and self.boiler_options.boiler_present:
+            temperatures["boiler"] = level(self.boiler_options.entity_actual_temp)
+            for entity_id in (
+                self.boiler_options.entity_setpoint,
+                self.boiler_options.entity_hysterese,
+                self.boiler_options.entity_enabled,
+                self.boiler_options.entity_instant_start,
+            ):
+                states[entity_id] = state(entity_id)
+        if self.heating_options and self.heating_options.heater_present:
+            for entity_id in (
+                self.heating_options.entity_hp_enabled,
+                self.heating_options.entity_hp_heat_demand,
+            ):
+                states[entity_id] = state(entity_id)
+        for option in self.machines:
+            for entity_id in (
+                option.entity_start_window,
+                option.entity_end_window,
+                option.entity_selected_program,
+                option.entity_instant_start,
+            ):
+                states[entity_id] = state(entity_id)
+        states.pop(None, None)
+        return {
+            "time": moment.isoformat(),
+            "config": config_hash(self.config),
+            "prices": {
+                "levering": vector(price_data["time"], price_data["da_cons"], 5),
+                "teruglevering": vector(price_data["time"], price_data["da_prod"], 5),
+            },
+            "prognoses": prognoses,
+            "levels": levels,
+            "temperatures": temperatures,
+            "states": states,
+            "flex": resolve_flex_values(self.config, ha_getter),
+        }
 
-        if str((_g.prices_spot if _g else True) or "true").lower() == "true":
-            p_spot.append(p_spot[-1])
-            ln5 = axis22.step(
-                ind,
-                np.array(p_spot),
-                label="Spot prijzen",
-                color="orange",
-                where="post",
-            )
+    def apply_unchanged_plan(self, fingerprint: dict, moment: dt.datetime) -> bool:
+        """
+        Vergelijkt de invoer met die van het bewaarde plan; is die binnen de
+        toleranties gelijk, dan worden de instellingen van het bewaarde plan voor
+        het actuele interval opnieuw doorgezet naar HA
+        :param fingerprint: de vingerafdruk van de actuele invoer
+        :param moment: tijdstip van de berekening
+        :return: True als de berekening kan worden overgeslagen
+        """
+        scheduler = self.config.scheduler
+        tolerances = Tolerances(
+            price=scheduler.skip_tolerance_price,
+            prognose=scheduler.skip_tolerance_prognose,
+            soc=scheduler.skip_tolerance_soc,
+            temperature=scheduler.skip_tolerance_temperature,
+            max_age=scheduler.skip_max_age,
+        )
+        plan = FallbackPlan()
+        stored = plan.fingerprint()
+        setpoints = None
+        if stored is None:
+            reason = "geen bewaard plan met vingerafdruk"
         else:
-            ln5 = None
+            try:
+                reason = compare_fingerprints(stored, fingerprint, tolerances)
+            except Exception as ex:
+                reason = f"vingerafdrukken niet te vergelijken ({ex})"
+        if reason is None:
+            setpoints = plan.current(moment)
+            if setpoints is None:
+                reason = "het bewaarde plan heeft geen actueel interval"
+        if reason is not None:
+            logging.info(f"Invoer gewijzigd: {reason}, er wordt opnieuw gerekend")
+            return False
+        self.calc_stats["plan_source"] = "unchanged"
+        logging.info(
+            f"Invoer ongewijzigd sinds de berekening van {stored['time']}, "
+            f"berekening overgeslagen; instellingen uit het bewaarde plan "
+            f"(interval vanaf {setpoints['start']})"
+        )
+        self.release_state_snapshot()
+        self.actuate_plan(setpoints)
+        self.notify(
+            "DAO calc overgeslagen, invoer ongewijzigd", self.notification_berekening
+        )
+        return True
 
-        if _g and _g.average_consumption is not None and "average delivery" not in _gx:
-            average_consumption_str = str(_g.average_consumption)
-        elif "average delivery" in _gx:
-            average_consumption_str = str(_gx["average delivery"])
-            logging.warning(f"Gebruik 'average consumption' ipv `average delivery'")
+    def apply_fallback_plan(self, moment: dt.datetime, reason: str) -> str:
+        """
+        Zet bij een berekening zonder oplossing de instellingen van het
+        bewaarde plan voor het actuele interval door naar HA
+        :param moment: tijdstip van de berekening
+        :param reason: "timeout" (geen oplossing binnen de rekentijd) of
+            "infeasible" (het model heeft geen oplossing)
+        :return: de herkomst van de instellingen: "fallback" of "none"
+        """
+        if reason == "infeasible":
+            reason_text = "het model heeft geen oplossing"
         else:
-            average_consumption_str = str(_g.average_consumption) if _g else "True"
-        average_consumption = average_consumption_str.lower() == "true"
-
-        if average_consumption:
-            pl_avg.append(pl_avg[-1])
-            ln4 = axis22.plot(
-                ind,
-                np.array(pl_avg),
-                label="Tarief lev.\ngemid.",
-                linestyle="dashed",
-                color="#00bfff",
+            reason_text = "geen oplossing binnen de rekentijd"
+        self.calc_stats["fallback_reason"] = reason
+        setpoints = FallbackPlan().current(moment)
+        if setpoints is None:
+            self.calc_stats["plan_source"] = "none"
+            logging.error(
+                f"Geen oplossing ({reason_text}) en geen terugvalplan, "
+                f"niets doorgezet naar HA"
             )
-        else:
-            ln4 = None
-        axis22.set_ylabel("euro/kWh")
-        axis22.yaxis.set_major_formatter(ticker.FormatStrFormatter("% 1.2f"))
-        bottom, top = axis22.get_ylim()
-        if bottom > 0:
-            axis22.set_ylim([0, top])
-        lns = []
-        if B > 0:
-            lns += ln1
-        if ln2:
-            lns += ln2
-        if ln3:
-            lns += ln3
-        if ln4:
-            lns += ln4
-        if ln5:
-            lns += ln5
-        labels = [line.get_label() for line in lns]
-        axis22.legend(lns, labels, loc="best", bbox_to_anchor=(1.40, 1.00))
-
-        plt.subplots_adjust(right=0.75)
-        fig.tight_layout()
-        plt.savefig(
-            "../data/images/calc_" + start_dt.strftime("%Y-%m-%d__%H-%M") + ".png"
+            self.notify(
+                f"DAO calc zonder oplossing: {reason_text}",
+                self.notification_berekening,
+            )
+            return "none"
+        self.calc_stats["plan_source"] = "fallback"
+        logging.warning(
+            f"Geen oplossing: {reason_text}, instellingen uit het vorige plan "
+            f"(interval vanaf {setpoints['start']})"
+        )
+        self.release_state_snapshot()
+        if self.debug:
+            logging.info(f"Instellingen terugvalplan (debug-run): {setpoints}")
+            return "fallback"
+        self.actuate_plan(setpoints)
+        self.notify(
+            f"DAO calc afgerond met terugvalplan: {reason_text}",
+            self.notification_berekening,
         )
-        plt.close("all")
-        self.notify("DAO calc afgerond", self.notification_berekening)
-        return None
+        return "fallback"
+
+    def actuate_plan(self, setpoints: dict):
+        """
+        Zet de instellingen van een interval uit het bewaarde plan door naar HA
+        :param setpoints: de instellingen, zie FallbackPlan.current
+        """
+        self.begin_batch()
+        try:
+            balance_state = "on" if setpoints["grid_balance"] else "off"
+            self.set_entity_state("entity balance switch", self.grid, balance_state)
+            self.set_entity_value("entity_grid_setpoint", self.grid, setpoints["grid"])
+            logging.info(
+                f"Grid balanceren: {balance_state}, set point: {setpoints['grid']} W"
+            )
+            # de apparaten die bij de berekening van het plan meededen
+            for component in device_components():
+                component.actuate_setpoint(self, setpoints)
+        except Exception as ex:
+            logging.error(f"Fout bij het doorzetten van het bewaarde plan: {ex}")
+        self.send_batch()
 
     def calc_optimum_debug(self):
         self.debug = True
@@ -4986,6 +1972,9 @@ def main():
             if arg.lower() == "debug":
                 da_calc.debug = not da_calc.debug
                 continue
+            if arg.lower() == "capture":
+                da_calc.capture = True
+                continue
             if arg.lower() == "calc":
                 if da_calc.debug:
                     da_calc.run_task_function("calc_optimum_met_debug")
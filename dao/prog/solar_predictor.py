@@ -15,7 +15,6 @@ from typing import Optional, Union, Dict, Any
 import datetime as dt
 import logging
 import knmi
-import copy
 import math
 
 from pip._internal.utils import datetime
@@ -27,6 +26,11 @@ from sklearn.metrics import mean_absolute_error, r2_score, mean_squared_error
 from scipy import stats
 from dao.prog.da_base import DaBase
 from dao.prog.config.models.devices.solar import SolarConfig
+from dao.prog.solar_service import (
+    FEATURE_COLUMNS,
+    SolarPredictionService,
+    create_features,
+)
 # import pvlib
 
 warnings.filterwarnings("ignore")
@@ -69,18 +73,7 @@ class SolarPredictor(DaBase):
         self.azimut = 180
         self.random_state = random_state
         self.model = None
-        self.feature_columns = [
-            "temperature",
-            "irradiance",
-            "windvelocity",
-            "day_of_week",
-            "hour",
-            "quarter",
-            "month",
-            "season",
-            "week_nr",
-            # "cos_angle_of_inc"
-        ]
+        self.feature_columns = list(FEATURE_COLUMNS)
         self.is_trained = False
         self.training_stats = {}
         self.ml_training_start_date = dt.date(2000, 1, 1)
@@ -152,32 +145,7 @@ class SolarPredictor(DaBase):
             - weeknr: int
 
         """
-        df = copy.deepcopy(df)
-        df["day_of_week"] = df.index.dayofweek
-        df["hour"] = df.index.hour
-        df["quarter"] = df.index.quarter
-        df["month"] = df.index.month
-        df["season"] = df.index.month.map(
-            {
-                12: 0,
-                1: 0,
-                2: 0,  # winter
-                3: 1,
-                4: 1,
-                5: 1,  # spring
-                6: 2,
-                7: 2,
-                8: 2,  # summer
-                9: 3,
-                10: 3,
-                11: 3,  # autumn
-            }
-        )
-        df["week_nr"] = df.index.isocalendar().week
-        df["time"] = pd.to_datetime(df.index)
-        # df["cos_angle_of_inc"] = df.apply(lambda x: self.calc_cos_sun_angle(x["time"]), axis=1)
-        df.drop("time", axis=1, inplace=True)
-        return df
+        return create_features(df)
 
     def create_physics_based_constraints(
         self,
@@ -1041,30 +1009,10 @@ class SolarPredictor(DaBase):
         self.tilt = solar_option.effective_tilt
         self.azimut = solar_option.effective_orientation + 180
         self.solar_capacity = solar_option.total_capacity
-        file_name = "../data/prediction/models/" + self.solar_name + ".pkl"
-        if os.path.isfile(file_name):
-            self.load_model(file_name)
-        else:
-            raise FileNotFoundError(
-                f"Er is geen model aanwezig voor {self.solar_name},svp eerst trainen."
-            )
-        latest_dt = self.db_da.get_time_border_record(
-            "gr", latest=True, table_name="prognoses"
-        )
-        prognose = True  # latest_dt < end
-        weather_data = self.get_weatherdata(start, end, prognose=prognose)
-        prediction = self.predict(weather_data)
-        weather_data.reset_index(inplace=True)
-        """
-        this check is excluded for using this method for windmils
-        prediction["irradiance"] = weather_data["irradiance"]
-        prediction["prediction"] = prediction.apply(
-            lambda x: check_prediction(x["prediction"], x["irradiance"]), axis=1
-        )
-        prediction.drop("irradiance", axis=1, inplace=True)
-        """
-        prediction["prediction"][prediction["prediction"] < 0] = 0
-        prediction["prediction"].round(3)
+        # het model komt uit de gedeelde model-cache
+        service = SolarPredictionService(self.db_da, self.time_zone)
+        prediction = service.predict_device(solar_option, start, end)
+        prediction["prediction"] = prediction["prediction"].round(3)
         logging.info(f"ML prediction {self.solar_name}\n{prediction}")
         return prediction
 
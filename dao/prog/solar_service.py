@@ -0,0 +1,223 @@
+"""
+Lichtgewicht service voor ml-voorspellingen van solar-devices.
+In tegenstelling tot SolarPredictor is deze service niet afgeleid van DaBase:
+hij gebruikt de bestaande database-verbinding en tijdzone van de aanroeper.
+Geladen modellen blijven in een LRU-cache (sleutel: pad en mtime van het bestand)
+en alle devices worden voorspeld met een gedeeld weerframe.
+"""
+
+import datetime as dt
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import pandas as pd
+
+MODEL_DIR = "../data/prediction/models/"
+
+FEATURE_COLUMNS = (
+    "temperature",
+    "irradiance",
+    "windvelocity",
+    "day_of_week",
+    "hour",
+    "quarter",
+    "month",
+    "season",
+    "week_nr",
+)
+
+SEASONS = {
+    12: 0,
+    1: 0,
+    2: 0,  # winter
+    3: 1,
+    4: 1,
+    5: 1,  # spring
+    6: 2,
+    7: 2,
+    8: 2,  # summer
+    9: 3,
+    10: 3,
+    11: 3,  # autumn
+}
+
+
+def create_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Voegt de tijdsafhankelijke features toe aan een dataframe met een DatetimeIndex
+    :param df: dataframe met de kolommen temperature, irradiance en windvelocity
+    :return: kopie van het dataframe met de kolommen day_of_week, hour, quarter,
+        month, season en week_nr
+    """
+    df = df.copy()
+    df["day_of_week"] = df.index.dayofweek
+    df["hour"] = df.index.hour
+    df["quarter"] = df.index.quarter
+    df["month"] = df.index.month
+    df["season"] = df.index.month.map(SEASONS)
+    df["week_nr"] = df.index.isocalendar().week
+    return df
+
+
+class SolarModelCache:
+    """
+    LRU-cache van geladen ml-modellen
+    Een model wordt opnieuw geladen als het bestand is gewijzigd (bijv. na trainen)
+    """
+
+    def __init__(self, max_size: int = 16):
+        self.max_size = max_size
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_path: str):
+        """
+        :param model_path: pad van het pkl-bestand
+        :return: het geladen model
+        """
+        if not os.path.isfile(model_path):
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+        key = (os.path.abspath(model_path), os.path.getmtime(model_path))
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+        model = joblib.load(model_path)
+        with self._lock:
+            # oude versies van hetzelfde bestand verwijderen
+            for old_key in [k for k in self._models if k[0] == key[0]]:
+                del self._models[old_key]
+            self._models[key] = model
+            while len(self._models) > self.max_size:
+                self._models.popitem(last=False)
+        return model
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+model_cache = SolarModelCache()
+
+
+class SolarPredictionService:
+    """
+    Voorspelt de productie van solar-devices met de getrainde ml-modellen
+    """
+
+    def __init__(
+        self,
+        db_da,
+        time_zone: str,
+        model_dir: str = MODEL_DIR,
+        cache: SolarModelCache | None = None,
+    ):
+        """
+        :param db_da: DBmanagerObj van de dao-database
+        :param time_zone: tijdzone van HA, voor de tijden in het resultaat
+        :param model_dir: map met de modellen
+        :param cache: model-cache, default de gedeelde cache van dit proces
+        """
+        self.db_da = db_da
+        self.time_zone = time_zone
+        self.model_dir = model_dir
+        self.cache = model_cache if cache is None else cache
+
+    @staticmethod
+    def solar_name(solar_option) -> str:
+        return solar_option.name.replace(" ", "_").replace("-", "_")
+
+    def model_path(self, solar_option) -> str:
+        return os.path.join(self.model_dir, self.solar_name(solar_option) + ".pkl")
+
+    def get_weather_features(
+        self, start: dt.datetime, end: dt.datetime
+    ) -> pd.DataFrame:
+        """
+        haalt de weerprognoses op en berekent de features
+        :param start: begin
+        :param end: einde
+        :return: dataframe met utc-DatetimeIndex en de features
+        """
+        start = dt.datetime(start.year, start.month, start.day, start.hour)
+        weather_data = pd.DataFrame(columns=["utc", "gr", "temp", "winds"])
+        for weather_item in weather_data.columns[1:]:
+            df_item = self.db_da.get_column_data(
+                "prognoses", weather_item, start=start, end=end
+            )
+            if len(weather_data) == 0:
+                weather_data["utc"] = df_item["utc"]
+            weather_data[weather_item] = df_item["value"]
+        weather_data["utc"] = pd.to_datetime(weather_data["utc"], unit="s", utc=True)
+        weather_data = weather_data.set_index("utc")
+        weather_data.index.name = "datetime"
+        weather_data = weather_data.rename(
+            columns={
+                "gr": "irradiance",
+                "temp": "temperature",
+                "winds": "windvelocity",
+            }
+        )
+        return create_features(weather_data)
+
+    def predict_devices(
+        self,
+        solar_options: list,
+        start: dt.datetime,
+        end: dt.datetime,
+        features: pd.DataFrame | None = None,
+    ) -> dict[str, pd.DataFrame]:
+        """
+        voorspelt alle devices met een gedeeld weerframe
+        :param solar_options: lijst met de solar-devices
+        :param start: start-tijdstip voorspelling
+        :param end: eind-tijdstip voorspelling
+        :param features: optioneel al berekende features (get_weather_features)
+        :return: per device (naam met "_") een dataframe met kolommen date_time en
+            prediction; devices zonder model ontbreken
+        """
+        models = {}
+        for solar_option in solar_options:
+            solar_name = self.solar_name(solar_option)
+            try:
+                models[solar_name] = self.cache.get(self.model_path(solar_option))
+            except FileNotFoundError:
+                logging.warning(
+                    f"Er is geen model aanwezig voor {solar_name},svp eerst trainen."
+                )
+        if len(models) == 0:
+            return {}
+        if features is None:
+            features = self.get_weather_features(start, end)
+        feature_data = features[list(FEATURE_COLUMNS)]
+        date_time = pd.Series(feature_data.index).dt.tz_convert(self.time_zone)
+        result = {}
+        for solar_name, model in models.items():
+            if len(feature_data) == 0:
+                prediction = np.array([], dtype=float)
+            else:
+                prediction = np.maximum(0, model.predict(feature_data))
+            result[solar_name] = pd.DataFrame(
+                {"date_time": date_time, "prediction": prediction}
+            )
+            logging.debug(f"ML prediction {solar_name}\n{result[solar_name]}")
+        return result
+
+    def predict_device(
+        self, solar_option, start: dt.datetime, end: dt.datetime
+    ) -> pd.DataFrame:
+        """
+        voorspelt een device
+        :return: dataframe met kolommen date_time en prediction
+        """
+        result = self.predict_devices([solar_option], start, end)
+        solar_name = self.solar_name(solar_option)
+        if solar_name not in result:
+            raise FileNotFoundError(
+                f"Er is geen model aanwezig voor {solar_name},svp eerst trainen."
+            )
+        return result[solar_name]
@@ -10,7 +10,7 @@ import pandas as pd
 from requests import post
 import logging
 import traceback
-from sqlalchemy import Table, select, and_
+from sqlalchemy import select, and_
 from dao.prog.version import __version__
 
 
@@ -143,14 +143,12 @@ def get_tibber_data():
             last_invoice.year, last_invoice.month, last_invoice.day
         ).timestamp()
         timestamps = generate_hourly_timestamps(start_ts, now_ts)
-        values_table = Table("values", db_da.metadata, autoload_with=db_da.engine)
-        variabel_table = Table("variabel", db_da.metadata, autoload_with=db_da.engine)
+        values_table = db_da.get_table("values")
         for code in ["cons", "prod"]:
             # Query the existing timestamps from the values table
             query = select(values_table.c.time).where(
                 and_(
-                    variabel_table.c.code == code,
-                    variabel_table.c.id == values_table.c.variabel,
+                    values_table.c.variabel == db_da.get_variabel_id(code),
                     values_table.c.time.between(start_ts, now_ts),
                 )
             )
@@ -250,12 +248,16 @@ def get_tibber_data():
     db_da.savedata(tibber_df)
 
 
-def calc_uur_index(dt: datetime, tijd: list, interval: str) -> int:
+def calc_uur_index(
+    dt: datetime, tijd: list, interval: str, interval_end: list | None = None
+) -> int:
     """
     Berekent van parameter dt de index in lijst uur
     :param dt: de datetime waarvan de index wordt gezocht
     :param tijd: lijst met datetime van begin van het betreffende interval
     :param interval: str "1hour" of "15min"
+    :param interval_end: optioneel lijst met datetime van het einde van ieder interval,
+        voor intervallen met verschillende lengtes
     :return: het indexnummer in de lijst
     """
     result_index = len(tijd)
@@ -266,7 +268,11 @@ def calc_uur_index(dt: datetime, tijd: list, interval: str) -> int:
     else:
         delta = 15
     for u in range(len(tijd)):
-        if dt < (tijd[u] + datetime.timedelta(minutes=delta)):
+        if interval_end is None:
+            end = tijd[u] + datetime.timedelta(minutes=delta)
+        else:
+            end = interval_end[u]
+        if dt < end:
             result_index = u
             break
     return result_index
@@ -426,11 +432,15 @@ def interpolate_prognose_data():
     print(prognose_data.to_string())
 
 
-def interpolate(df: pd.DataFrame, field: str, quantity: bool = False) -> pd.DataFrame:
+def interpolate(
+    df: pd.DataFrame, field: str | list[str], quantity: bool | list[bool] = False
+) -> pd.DataFrame:
     """
     Interpoleert uurwaarden (gegeven op hele uren, feitelijk H:30) naar kwartierwaarden.
     Voor elk uurblok worden 4 kwartierwaarden berekend, zodanig dat het gemiddelde
     exact overeenkomt met de uurwaarde.
+    Alle uurblokken worden in een keer (met numpy) berekend; het eerste en laatste
+    uurblok gebruiken een lineair geextrapoleerde buurwaarde.
 
     Parameters
     ----------
@@ -438,79 +448,47 @@ def interpolate(df: pd.DataFrame, field: str, quantity: bool = False) -> pd.Data
         DataFrame met kolommen:
         - "tijd": datetime (op hele uren, bv. 09:00 betekent waarde voor 09:30)
         - field: float/int, uurwaarden
-    field: str, name of the column
-    quantity: bool, is it a quantity
+    field: str of list[str], naam of namen van de kolommen
+    quantity: bool of list[bool] (per kolom), is het een hoeveelheid
 
     Returns
     -------
     pd.DataFrame
-        DataFrame met kwartierwaarden in kolommen ["tijd", field]
+        DataFrame met kwartierwaarden in kolommen ["tijd", field(s)]
     """
+    fields = [field] if isinstance(field, str) else list(field)
+    if isinstance(quantity, bool):
+        quantities = [quantity] * len(fields)
+    else:
+        quantities = list(quantity)
 
-    result = []
-
-    for i in range(len(df)):
-        t_curr = df.loc[i, "tijd"]
-        v_curr = df.loc[i, field]
-
-        if i == 0:
-            # eerste uurblok (lineair richting volgende)
-            v_next = df.loc[i + 1, field]
-            """
-            q0 = v_curr
-            q1 = (2 * v_curr + v_next) / 3
-            q2 = (v_curr + 2 * v_next) / 3
-            q3 = v_next
-            """
-            q0 = v_curr + (v_curr - v_next) * 0.50  # 09:00 dicht bij 09:30
-            q1 = v_curr + (v_curr - v_next) * 0.25  # 9:15
-            q2 = v_curr  # 09:30 → ongeveer uurwaarde
-            q3 = v_curr + (v_next - v_curr) * 0.25  # 09:45 dicht bij 09:30
-
-        elif i == len(df) - 1:
-            # laatste uurblok (lineair vanaf vorige)
-            v_prev = df.loc[i - 1, field]
-            """
-            q0 = v_prev
-            q1 = (2 * v_prev + v_curr) / 3
-            q2 = (v_prev + 2 * v_curr) / 3
-            q3 = v_curr
-            """
-            q0 = v_curr + (v_prev - v_curr) * 0.50  # 09:00 dicht bij 09:30
-            q1 = v_curr + (v_prev - v_curr) * 0.25  # 9:15
-            q2 = v_curr  # 09:30 → ongeveer uurwaarde
-            q3 = v_curr + (v_curr - v_prev) * 0.25  # 09:45 dicht bij 09:30
+    n = len(df)
+    tijd = pd.DatetimeIndex(df["tijd"])
+    result_tijd = tijd.repeat(4) + pd.to_timedelta(
+        np.tile(np.arange(0, 60, 15), n), unit="min"
+    )
+    result = {"tijd": result_tijd}
+    for fld, qty in zip(fields, quantities):
+        v = df[fld].to_numpy(dtype=float)
+        if n > 1:
+            v_prev = np.concatenate(([2 * v[0] - v[1]], v[:-1]))
+            v_next = np.concatenate((v[1:], [2 * v[-1] - v[-2]]))
         else:
-            # tussenliggende blokken met jouw formule
-            v_prev = df.loc[i - 1, field]
-            v_next = df.loc[i + 1, field]
-
-            """
-            q0 = v_prev + (v_curr - v_prev) * 0.75
-            q1 = v_curr
-            q2 = v_next + (v_curr - v_next) * 0.75
-            q3 = (q0 + q1 + q2) / 3  # voorlopig
-            """
-            q0 = v_prev + (v_curr - v_prev) * 0.50  # 09:00 dicht bij 09:30
-            q1 = v_prev + (v_curr - v_prev) * 0.75  # 9:15
-            q2 = v_curr  # 09:30 → ongeveer uurwaarde
-            q3 = v_next + (v_curr - v_next) * 0.75  # 09:45 dicht bij 09:30
-
-        quarters = np.array([q0, q1, q2, q3], dtype=float)
-
+            v_prev = v
+            v_next = v
+        quarters = np.column_stack(
+            (
+                v_prev + (v - v_prev) * 0.50,  # 09:00 dicht bij 09:30
+                v_prev + (v - v_prev) * 0.75,  # 9:15
+                v,  # 09:30 → ongeveer uurwaarde
+                v_next + (v - v_next) * 0.75,  # 09:45 dicht bij 09:30
+            )
+        )
         # correctie zodat gemiddelde exact gelijk is aan uurwaarde
-        correction = v_curr - quarters.mean()
-        quarters += correction
-        if quantity:
+        quarters += (v - quarters.mean(axis=1))[:, np.newaxis]
+        if qty:
             quarters = quarters / 4
-
-        for k in range(4):
-            result.append(
-                {
-                    "tijd": t_curr + datetime.timedelta(minutes=15 * k),
-                    field: float(quarters[k]),
-                }
-            )
+        result[fld] = quarters.ravel()
     result_df = pd.DataFrame(result)
     result_df.index = pd.to_datetime(result_df["tijd"])
     return result_df
@@ -0,0 +1,35 @@
+"""
+Tests voor de nabewerking op de achtergrond
+"""
+
+import threading
+
+from dao.prog.da_background import BackgroundStage
+
+
+def test_background_stage():
+    stage = BackgroundStage()
+    release = threading.Event()
+    done = []
+
+    def report(value):
+        release.wait(5)
+        done.append(value)
+
+    stage.start(report, 1)
+    assert not stage.wait(timeout=0.01)
+    release.set()
+    # een volgende nabewerking wacht op de vorige
+    stage.start(report, 2)
+    assert stage.wait()
+    assert done == [1, 2] and stage.succeeded
+
+
+def test_background_stage_error():
+    def fail():
+        raise ValueError("fout in grafiek")
+
+    stage = BackgroundStage()
+    stage.start(fail)
+    assert stage.wait()
+    assert stage.succeeded is False and stage.duration is not None
@@ -0,0 +1,51 @@
+"""
+Tests voor de afgeleide grenzen van de modelvariabelen
+"""
+
+import pytest
+from mip import BINARY, minimize
+
+from dao.prog.da_bounds import BoundPass, log_relaxation_gap
+from dao.prog.da_live_model import LiveModel
+from dao.prog.da_solver import make_model
+
+
+def build(model) -> BoundPass:
+    """
+    min y - x met x <= 10y: met x <= 2 is de LP-relaxatie veel beter
+    """
+    x = model.add_var(lb=0, ub=10)
+    y = model.add_var(var_type=BINARY)
+    model += x <= 10 * y
+    bound_pass = BoundPass(model)
+    assert bound_pass.tighten(x, ub=2)
+    # grenzen worden nooit ruimer
+    assert not bound_pass.tighten(x, lb=-1, ub=5)
+    model.objective = minimize(y - x)
+    return bound_pass
+
+
+def test_relaxation_bounds():
+    model = make_model()
+    bound_pass = build(model)
+    loose, tight = bound_pass.relaxation_bounds()
+    assert loose == pytest.approx(-9)
+    assert tight == pytest.approx(-1.8)
+    assert model.vars[0].ub == 2
+    model.optimize()
+    stats = log_relaxation_gap(loose, tight, model.objective_value)
+    assert stats["lp_gap_loose"] == pytest.approx(8)
+    assert stats["lp_gap_tight"] == pytest.approx(0.8)
+
+
+def test_live_model_bounds():
+    live_model = LiveModel()
+    build(live_model.start_build("test"))
+    live_model.finish_build()
+    live_model.optimize()
+    build(live_model.start_build("test"))
+    stats = live_model.finish_build()
+    assert stats["reused"] is True
+    assert live_model.vars[0].ub == 2
+    live_model.optimize()
+    assert live_model.objective_value == pytest.approx(-1)
@@ -0,0 +1,47 @@
+"""
+Tests voor de opbouw van het model per blok
+"""
+
+import numpy as np
+from mip import Model, BINARY, EQUAL, LESS_OR_EQUAL, OptimizationStatus, maximize
+
+from dao.prog.da_build import (
+    add_constr_family,
+    add_interleaved,
+    add_var_block,
+    constr_family,
+)
+
+
+def test_var_block():
+    model = Model(solver_name="cbc")
+    block = add_var_block(model, (3, 2), ub=np.array([1.0, 2.0]))
+    assert block.shape == (3, 2)
+    assert [var.ub for var in block[1]] == [1.0, 2.0]
+    # zelfde volgorde als geneste lijsten [rij][kolom]
+    assert [var.idx for var in block.ravel()] == list(range(6))
+    on = add_var_block(model, 3, var_type=BINARY, ub=1)
+    assert on[2].var_type == BINARY
+
+
+def test_constr_family():
+    model = Model(solver_name="cbc")
+    model.verbose = 0
+    x = add_var_block(model, 4, ub=10)
+    w = add_var_block(model, (4, 2), ub=1)
+    # x[u] == 2 * w[u, 0] + 5 * w[u, 1], som w[u] == 1, x[u] <= 3 of 4 in de even rijen
+    added = add_constr_family(model, [(1, x), (-np.array([2.0, 5.0]), w)], EQUAL)
+    assert added == 4
+    families = [
+        constr_family([(1, w)], EQUAL, 1),
+        constr_family(
+            [(1, x)], LESS_OR_EQUAL, np.array([3.0, 9.0, 4.0, 9.0]), rows=[1, 0, 1, 0]
+        ),
+    ]
+    assert families[1][1] is None
+    assert add_interleaved(model, families) == 6
+    # rijen per interval na elkaar
+    assert [len(model.constrs[n].expr.expr) for n in range(4, 10)] == [2, 1, 2, 2, 1, 2]
+    model.objective = maximize(x.sum())
+    assert model.optimize() == OptimizationStatus.OPTIMAL
+    assert [round(var.x, 6) for var in x] == [3.0, 5.0, 4.0, 5.0]
@@ -0,0 +1,155 @@
+"""
+Tests voor de registratie en de statistiek per component van de berekening
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from mip import Model, xsum
+
+from dao.prog.da_boiler import BoilerComponent
+from dao.prog.da_components import Component, ComponentPipeline
+from dao.prog.da_heating import HeatingComponent
+from dao.prog.da_solar import SolarComponent
+
+
+def test_component_pipeline():
+    model = Model(solver_name="cbc")
+    components = ComponentPipeline()
+    components.begin("solar", model=model)
+    x = model.add_var(ub=1)
+    y = model.add_var(ub=1)
+    model += x + y <= 1
+    components.begin("battery")
+    model += x - y >= 0
+    components.begin("solar")
+    model.add_var()
+    build = components.report("build")
+    assert build["solar"]["variables"] == 3
+    assert build["solar"]["constraints"] == 1
+    assert build["battery"] == {
+        "time": build["battery"]["time"],
+        "variables": 0,
+        "constraints": 1,
+    }
+    components.begin("grid", phase="extract")
+    extract = components.report("extract")
+    assert list(extract) == ["grid"]
+    assert "variables" not in extract["grid"]
+    with pytest.raises(ValueError):
+        components.begin("wind")
+
+
+class Device(Component):
+    name = "boiler"
+
+    def __init__(self, present: bool):
+        self.present = present
+
+    def prepare(self, ctx) -> bool:
+        return self.present
+
+    def build(self, model, ctx):
+        self.x = [model.add_var(ub=2) for _ in range(2)]
+
+    def consumption(self, u: int):
+        return self.x[u]
+
+    def costs(self, model, ctx):
+        return xsum(self.x)
+
+
+def test_component_registry():
+    model = Model(solver_name="cbc")
+    components = ComponentPipeline()
+    # een apparaat dat niet meedoet wordt niet geregistreerd
+    assert not components.register(Device(False), None)
+    assert components.get("boiler") is None
+    components.build(model, None)
+    assert model.num_cols == 0
+    assert "boiler" not in components.report("build")
+
+    device = Device(True)
+    assert components.register(device, None)
+    assert components.get("boiler") is device
+    assert components.names() == ("boiler",)
+    components.build(model, None)
+    costs = components.costs(model, None)
+    assert len(costs.expr) == 2
+    assert components.report("build")["boiler"]["variables"] == 2
+
+    wind = Device(True)
+    wind.name = "wind"
+    with pytest.raises(ValueError):
+        components.register(wind, None)
+
+
+class RecordingHa:
+    """
+    Legt de schrijfacties naar HA vast
+    """
+
+    def __init__(self, states: dict, **options):
+        self.states = states
+        self.debug = False
+        self.calls = []
+        for key, value in options.items():
+            setattr(self, key, value)
+
+    def get_state(self, entity_id):
+        return SimpleNamespace(state=self.states[entity_id])
+
+    def turn_on(self, entity_id):
+        self.calls.append(("turn_on", entity_id))
+
+    def turn_off(self, entity_id):
+        self.calls.append(("turn_off", entity_id))
+
+    def set_value(self, entity_id, value):
+        self.calls.append(("set_value", entity_id, value))
+
+
+def test_actuate_setpoint():
+    ha = RecordingHa(
+        {
+            "switch.pv": "on",
+            "switch.boiler": "on",
+            "switch.hp": "off",
+            "input_number.curve": "0.0",
+        },
+        solar=[SimpleNamespace(name="dak", entity_pv_switch="switch.pv")],
+        boiler_options=SimpleNamespace(
+            activate_entity=None, switch_entity="switch.boiler"
+        ),
+        heating_options=SimpleNamespace(
+            entity_hp_switch="switch.hp",
+            entity_hp_power=None,
+            entity_adjust_heating_curve="input_number.curve",
+            adjustment_factor=0.04,
+        ),
+    )
+    # een interval uit het bewaarde plan: panelen uit, boiler uit, warmtepomp aan
+    # bij een prijs boven het gemiddelde
+    setpoint = {
+        "pv_ac_on": [False],
+        "boiler": False,
+        "hp_on": True,
+        "hp_power": 1.0,
+        "hp_adjustment": "heating curve",
+        "price": 0.4,
+        "price_avg": 0.2,
+    }
+    for component in (SolarComponent(), BoilerComponent(), HeatingComponent()):
+        component.actuate_setpoint(ha, setpoint)
+    assert ha.calls == [
+        ("turn_off", "switch.pv"),
+        ("turn_off", "switch.boiler"),
+        ("turn_on", "switch.hp"),
+        # stooklijn omlaag, begrensd op 10 x de aanpassingsfactor
+        ("set_value", "input_number.curve", -0.4),
+    ]
+    # zonder de sleutels van een apparaat (deed niet mee): niets aansturen
+    ha.calls = []
+    for component in (SolarComponent(), BoilerComponent(), HeatingComponent()):
+        component.actuate_setpoint(ha, {"grid": 0, "battery": []})
+    assert ha.calls == []
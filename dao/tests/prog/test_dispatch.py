@@ -0,0 +1,89 @@
+"""
+Tests voor de bijsturing tussen de berekeningen
+"""
+
+import datetime
+from types import SimpleNamespace
+
+from dao.prog.da_dispatch import Dispatcher, dispatch_setpoints
+from dao.prog.da_fallback import FallbackPlan
+from dao.prog.da_ha_client import HaClient
+from dao.prog.da_replay import ReplayHomeAssistant, make_state
+
+START = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
+INTERVAL = {
+    "start": START.isoformat(),
+    "end": (START + datetime.timedelta(hours=1)).isoformat(),
+    "grid": 1000,
+    "battery": [2000],
+    "soc_start": [50.0],
+    "soc_end": [70.0],
+}
+
+
+def setpoints(soc, grid_power=None, battery_power=(2000,)):
+    return dispatch_setpoints(
+        INTERVAL,
+        START + datetime.timedelta(minutes=30),
+        [soc],
+        [10],
+        [3000],
+        [3000],
+        grid_power,
+        list(battery_power),
+        5000,
+    )
+
+
+def test_dispatch_setpoints():
+    # volgens plan: geen correctie
+    assert setpoints(60.0) == {"grid": 1000, "battery": [2000]}
+    # 1% achter op het plan: 100 Wh extra in het resterende half uur
+    assert setpoints(59.0) == {"grid": 1200, "battery": [2200]}
+    # ver achter: begrensd op het maximale laadvermogen
+    assert setpoints(40.0)["battery"] == [3000]
+    # met meting: het net vangt de afwijking op
+    assert setpoints(59.0, grid_power=1500)["grid"] == 1700
+    # SoC onbekend: het plan
+    assert setpoints(None)["battery"] == [2000]
+
+
+def test_dispatcher_tick(tmp_path):
+    states = [
+        make_state("sensor.soc", 59.0),
+        make_state("sensor.grid_power", 1500),
+        make_state("input_number.battery_power", 2000),
+        make_state("input_number.grid_setpoint", 1000),
+    ]
+    battery = SimpleNamespace(
+        name="accu",
+        capacity=10,
+        entity_actual_level="sensor.soc",
+        entity_set_operating_mode=None,
+        entity_set_power_feedin="input_number.battery_power",
+        charge_stages=[SimpleNamespace(power=3000)],
+        discharge_stages=[SimpleNamespace(power=3000)],
+    )
+    grid = SimpleNamespace(
+        max_power=5,
+        entity_grid_power="sensor.grid_power",
+        entity_grid_setpoint="input_number.grid_setpoint",
+    )
+    plan = FallbackPlan(str(tmp_path / "fallback_plan.json"))
+    plan.save(
+        [START],
+        [START + datetime.timedelta(hours=1)],
+        [{k: v for k, v in INTERVAL.items() if k not in ("start", "end")}],
+        "optimal",
+    )
+    with ReplayHomeAssistant(states, {"time_zone": "Europe/Amsterdam"}) as ha:
+        client = HaClient(f"http://127.0.0.1:{ha.port}/", "token")
+        client.config = SimpleNamespace(battery=[battery], grid=grid)
+        dispatcher = Dispatcher(client, 5, plan)
+        moment = START + datetime.timedelta(minutes=30)
+        assert dispatcher.tick(moment) == {"grid": 1700, "battery": [2200]}
+        assert [call[1] for call in ha.service_calls] == ["set_value", "set_value"]
+        # de meter ziet het extra laden; verder niets veranderd: niets schrijven
+        ha.states["sensor.grid_power"]["state"] = "1700"
+        dispatcher.tick(moment)
+        assert len(ha.service_calls) == 2
@@ -0,0 +1,26 @@
+"""
+Tests voor het terugvalplan
+"""
+
+import datetime
+
+from dao.prog.da_fallback import FallbackPlan
+
+START = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
+
+
+def test_fallback_plan(tmp_path):
+    plan = FallbackPlan(str(tmp_path / "fallback_plan.json"))
+    assert plan.current(START) is None
+    times = [START + datetime.timedelta(hours=h) for h in range(3)]
+    ends = times[1:] + [START + datetime.timedelta(hours=5)]
+    setpoints = [{"grid": 100 * h, "battery": [h]} for h in range(3)]
+    plan.save(times, ends, setpoints, "incumbent")
+    # verschoven naar het actuele interval
+    current = plan.current(START + datetime.timedelta(minutes=75))
+    assert current["grid"] == 100 and current["battery"] == [1]
+    # laatste interval is een blok van drie uur
+    assert plan.current(START + datetime.timedelta(hours=4))["grid"] == 200
+    assert plan.current(START + datetime.timedelta(hours=5)) is None
+    old_plan = FallbackPlan(plan.file_name, max_age=datetime.timedelta(hours=1))
+    assert old_plan.current(START + datetime.timedelta(hours=4)) is None
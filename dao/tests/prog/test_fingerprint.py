@@ -0,0 +1,81 @@
+"""
+Tests voor de vingerafdruk van de invoer
+"""
+
+import datetime
+
+from pydantic import BaseModel
+
+from dao.prog.config.models.base import FlexFloat
+from dao.prog.da_fallback import FallbackPlan
+from dao.prog.da_fingerprint import (
+    Tolerances,
+    compare_fingerprints,
+    config_hash,
+    resolve_flex_values,
+    vector,
+)
+
+START = datetime.datetime(2025, 6, 2, 14, 0)
+TIMES = [START + datetime.timedelta(hours=h) for h in range(4)]
+
+
+class Device(BaseModel):
+    name: str
+    limit: FlexFloat
+    cop: FlexFloat
+
+
+def fingerprint(moment=START, prices=(0.25, 0.30, 0.20, 0.22), soc=50.0, state="on"):
+    start = TIMES.index(moment) if moment in TIMES else 0
+    return {
+        "time": moment.isoformat(),
+        "config": "abc",
+        "prices": {"levering": vector(TIMES[start:], prices[start:])},
+        "prognoses": {"straling": vector(TIMES[start:], [0, 400, 800, 200][start:])},
+        "levels": {"batterij accu": soc},
+        "temperatures": {},
+        "states": {"binary_sensor.ev": state},
+        "flex": {},
+    }
+
+
+def test_compare_fingerprints():
+    old = fingerprint()
+    tolerances = Tolerances()
+    assert compare_fingerprints(old, fingerprint(), tolerances) is None
+    # een uur later: de voorbije intervallen tellen niet mee
+    later = fingerprint(TIMES[1], soc=51.0)
+    assert compare_fingerprints(old, later, tolerances) is None
+    assert "SoC" in compare_fingerprints(old, fingerprint(soc=55.0), tolerances)
+    assert "state" in compare_fingerprints(old, fingerprint(state="off"), tolerances)
+    changed = fingerprint(prices=(0.25, 0.30, 0.25, 0.22))
+    assert "levering" in compare_fingerprints(old, changed, tolerances)
+    # nieuwe prijzen voor een interval buiten het plan
+    extended = fingerprint()
+    extended["prices"]["levering"][START.replace(hour=20).isoformat()] = 0.1
+    assert "nieuw interval" in compare_fingerprints(old, extended, tolerances)
+    # prognose binnen 5% van de piek
+    shifted = fingerprint()
+    shifted["prognoses"]["straling"][TIMES[1].isoformat()] = 430
+    assert compare_fingerprints(old, shifted, tolerances) is None
+    old_plan = fingerprint(TIMES[3])
+    old_plan["time"] = (START - datetime.timedelta(hours=2)).isoformat()
+    assert "ouder" in compare_fingerprints(old_plan, fingerprint(), tolerances)
+
+
+def test_resolve_flex_values():
+    device = Device(name="boiler", limit="input_number.limit", cop=3.0)
+    states = {"input_number.limit": "42.123456"}
+    assert resolve_flex_values([device], states.get, "boiler") == {
+        "boiler.0.limit": 42.123
+    }
+    other = Device(name="boiler", limit="input_number.limit", cop=3.5)
+    assert config_hash(device) != config_hash(other)
+
+
+def test_fallback_plan_fingerprint(tmp_path):
+    plan = FallbackPlan(str(tmp_path / "fallback_plan.json"))
+    assert plan.fingerprint() is None
+    plan.save(TIMES[:1], TIMES[1:2], [{"grid": 0}], "optimal", fingerprint())
+    assert plan.fingerprint() == fingerprint()
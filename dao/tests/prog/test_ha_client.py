@@ -0,0 +1,57 @@
+"""
+Tests voor de HA-client met gebundelde schrijfacties
+"""
+
+from dao.prog.da_ha_client import HaClient, state_matches
+from dao.prog.da_replay import ReplayHomeAssistant, make_state
+
+
+def test_state_matches():
+    assert state_matches(1500, "1500.0")
+    assert state_matches(0.123456, "0.12346")
+    assert not state_matches(1500, "1400")
+    assert not state_matches(10, "unavailable")
+    assert state_matches("on", "on")
+
+
+def test_ha_client_batch():
+    states = [
+        make_state("input_number.grid_setpoint", 0),
+        make_state("switch.ev_laden", "off"),
+    ]
+    with ReplayHomeAssistant(states, {"time_zone": "Europe/Amsterdam"}) as ha:
+        client = HaClient(f"http://127.0.0.1:{ha.port}/", "token")
+        # direct schrijven en teruglezen
+        client.set_value("input_number.grid_setpoint", 100)
+        assert len(ha.service_calls) == 1
+
+        client.begin_batch()
+        client.set_value("input_number.grid_setpoint", -1500)
+        client.turn_on("switch.ev_laden")
+        client.call_service(
+            "set_datetime",
+            entity_id="input_datetime.stop_laden",
+            datetime="2025-06-02 15:00",
+        )
+        client.set_state("input_boolean.balanceren", "on")
+        # nog niets verstuurd
+        assert len(ha.service_calls) == 1
+        writes = client.send_batch()
+        assert [call[1] for call in ha.service_calls[1:]] == [
+            "set_value",
+            "turn_on",
+            "set_datetime",
+        ]
+        assert [write.service for write in writes] == [
+            "set_value",
+            "turn_on",
+            "set_datetime",
+            "set_state",
+        ]
+        assert all(write.error is None for write in writes)
+        assert all(write.duration is not None for write in writes)
+        assert client.written_states["switch.ev_laden"].state == "on"
+        assert client.written_states["input_boolean.balanceren"].state == "on"
+        # na de batch wordt weer direct geschreven
+        client.turn_off("switch.ev_laden")
+        assert ha.service_calls[-1][1] == "turn_off"
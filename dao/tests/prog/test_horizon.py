@@ -0,0 +1,73 @@
+"""
+Tests voor de planningshorizon met variabele resolutie
+"""
+
+import datetime
+
+import pandas as pd
+
+from dao.prog.da_horizon import (
+    expand_rows,
+    horizon_steps,
+    intervals_for_steps,
+    merge_rows,
+    step_starts,
+    step_to_interval,
+)
+
+START = datetime.datetime(2025, 6, 2, 14, 15)
+
+
+def quarters(num: int) -> list:
+    return [START + datetime.timedelta(minutes=15 * q) for q in range(num)]
+
+
+def test_horizon_steps():
+    tijd = quarters(20)
+    assert horizon_steps(tijd, 900, None, 3600) == [1] * 20
+    steps = horizon_steps(tijd, 900, 1, 3600)
+    # 14:15 - 15:15 per kwartier, 15:15 - 16:00 een blok, daarna hele uren
+    assert steps == [1, 1, 1, 1, 3, 4, 4, 4, 1]
+    assert sum(steps) == 20
+    starts = step_starts(steps)
+    assert starts == [0, 1, 2, 3, 4, 7, 11, 15, 19, 20]
+    assert step_to_interval(starts, 5) == 4
+    assert step_to_interval(starts, 11) == 6
+    assert step_to_interval(starts, 25) == 8
+    assert intervals_for_steps(steps, 3, 4) == 2
+    assert intervals_for_steps(steps, 7, 5) == 2
+    assert intervals_for_steps(steps, 8, 3) == 3
+
+
+def test_merge_and_expand_rows():
+    tijd = quarters(8)
+    df = pd.DataFrame(
+        {
+            "tijd": tijd,
+            "da_cons": [0.1, 0.2, 0.3, 0.4, 0.2, 0.2, 0.4, 0.4],
+            "glob_rad": [1.0] * 8,
+            "time": [int(t.timestamp()) for t in tijd],
+        }
+    )
+    steps = horizon_steps(tijd, 900, 1, 3600)
+    assert steps == [1, 1, 1, 1, 3, 1]
+    merged = merge_rows(df, steps, ["glob_rad"])
+    assert len(merged) == 6
+    assert merged["tijd"].iloc[4] == tijd[4]
+    assert merged["time"].iloc[4] == df["time"].iloc[4]
+    assert merged["glob_rad"].iloc[4] == 3.0
+    assert abs(merged["da_cons"].iloc[4] - 0.8 / 3) < 1e-9
+
+    result = pd.DataFrame({"uur": ["a", "b", "c"], "cons": [1.0, 3.0, 0.5]})
+    new_tijd, expanded = expand_rows(
+        [tijd[3], tijd[4], tijd[7]], result, [1, 3, 1], 900
+    )
+    assert new_tijd == tijd[3:]
+    assert list(expanded["cons"]) == [1.0, 1.0, 1.0, 1.0, 0.5]
+
+    soc = pd.DataFrame({"tijd": [tijd[4], tijd[7]], "soc": [50.0, 80.0]})
+    soc_tijd, soc_expanded = expand_rows(
+        [tijd[4], tijd[7]], soc, [3], 900, levels=True
+    )
+    assert soc_tijd == tijd[4:]
+    assert list(soc_expanded["soc"]) == [50.0, 60.0, 70.0, 80.0]
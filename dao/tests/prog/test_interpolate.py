@@ -0,0 +1,156 @@
+"""
+Tests voor de gevectoriseerde utils.interpolate
+"""
+
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dao.prog.utils import interpolate
+
+
+def interpolate_per_row(
+    df: pd.DataFrame, field: str, quantity: bool = False
+) -> pd.DataFrame:
+    """
+    Oude implementatie per rij van interpolate, als referentie voor de test.
+    Interpoleert uurwaarden (gegeven op hele uren, feitelijk H:30) naar kwartierwaarden.
+    Voor elk uurblok worden 4 kwartierwaarden berekend, zodanig dat het gemiddelde
+    exact overeenkomt met de uurwaarde.
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        DataFrame met kolommen:
+        - "tijd": datetime (op hele uren, bv. 09:00 betekent waarde voor 09:30)
+        - field: float/int, uurwaarden
+    field: str, name of the column
+    quantity: bool, is it a quantity
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame met kwartierwaarden in kolommen ["tijd", field]
+    """
+
+    result = []
+
+    for i in range(len(df)):
+        t_curr = df.loc[i, "tijd"]
+        v_curr = df.loc[i, field]
+
+        if i == 0:
+            # eerste uurblok (lineair richting volgende)
+            v_next = df.loc[i + 1, field]
+            """
+            q0 = v_curr
+            q1 = (2 * v_curr + v_next) / 3
+            q2 = (v_curr + 2 * v_next) / 3
+            q3 = v_next
+            """
+            q0 = v_curr + (v_curr - v_next) * 0.50  # 09:00 dicht bij 09:30
+            q1 = v_curr + (v_curr - v_next) * 0.25  # 9:15
+            q2 = v_curr  # 09:30 → ongeveer uurwaarde
+            q3 = v_curr + (v_next - v_curr) * 0.25  # 09:45 dicht bij 09:30
+
+        elif i == len(df) - 1:
+            # laatste uurblok (lineair vanaf vorige)
+            v_prev = df.loc[i - 1, field]
+            """
+            q0 = v_prev
+            q1 = (2 * v_prev + v_curr) / 3
+            q2 = (v_prev + 2 * v_curr) / 3
+            q3 = v_curr
+            """
+            q0 = v_curr + (v_prev - v_curr) * 0.50  # 09:00 dicht bij 09:30
+            q1 = v_curr + (v_prev - v_curr) * 0.25  # 9:15
+            q2 = v_curr  # 09:30 → ongeveer uurwaarde
+            q3 = v_curr + (v_curr - v_prev) * 0.25  # 09:45 dicht bij 09:30
+        else:
+            # tussenliggende blokken met jouw formule
+            v_prev = df.loc[i - 1, field]
+            v_next = df.loc[i + 1, field]
+
+            """
+            q0 = v_prev + (v_curr - v_prev) * 0.75
+            q1 = v_curr
+            q2 = v_next + (v_curr - v_next) * 0.75
+            q3 = (q0 + q1 + q2) / 3  # voorlopig
+            """
+            q0 = v_prev + (v_curr - v_prev) * 0.50  # 09:00 dicht bij 09:30
+            q1 = v_prev + (v_curr - v_prev) * 0.75  # 9:15
+            q2 = v_curr  # 09:30 → ongeveer uurwaarde
+            q3 = v_next + (v_curr - v_next) * 0.75  # 09:45 dicht bij 09:30
+
+        quarters = np.array([q0, q1, q2, q3], dtype=float)
+
+        # correctie zodat gemiddelde exact gelijk is aan uurwaarde
+        correction = v_curr - quarters.mean()
+        quarters += correction
+        if quantity:
+            quarters = quarters / 4
+
+        for k in range(4):
+            result.append(
+                {
+                    "tijd": t_curr + datetime.timedelta(minutes=15 * k),
+                    field: float(quarters[k]),
+                }
+            )
+    result_df = pd.DataFrame(result)
+    result_df.index = pd.to_datetime(result_df["tijd"])
+    return result_df
+
+
+def make_hour_df(values: list, start=datetime.datetime(2025, 3, 29, 0, 0), tz=None):
+    tijd = pd.date_range(start, periods=len(values), freq="h", tz=tz)
+    return pd.DataFrame({"tijd": tijd, "value": values})
+
+
+@pytest.mark.parametrize("quantity", [False, True])
+@pytest.mark.parametrize(
+    "values",
+    [
+        [15, 17, 14, 18, 20],
+        [0.0, 0.0, 1.2, 3.4, 5.6, 3.3, 0.0],
+        [1.0, 2.0],
+        list(np.random.default_rng(42).uniform(-5, 30, 48)),
+    ],
+)
+def test_interpolate_equals_per_row(values, quantity):
+    df = make_hour_df(values)
+    expected = interpolate_per_row(df, "value", quantity)
+    result = interpolate(df, "value", quantity)
+    assert list(result.columns) == ["tijd", "value"]
+    assert (result["tijd"].to_numpy() == expected["tijd"].to_numpy()).all()
+    assert (result.index == expected.index).all()
+    np.testing.assert_allclose(
+        result["value"].to_numpy(), expected["value"].to_numpy(), rtol=1e-12, atol=1e-12
+    )
+
+
+def test_interpolate_mean_preserved():
+    df = make_hour_df([3.0, 8.0, 1.0, 4.0])
+    result = interpolate(df, "value", quantity=True)
+    sums = result["value"].to_numpy().reshape(-1, 4).sum(axis=1)
+    np.testing.assert_allclose(sums, df["value"].to_numpy())
+
+
+def test_interpolate_multiple_fields():
+    df = make_hour_df([10.0, 12.0, 11.0, 9.0])
+    df["gr"] = [0.0, 40.0, 80.0, 20.0]
+    result = interpolate(df, ["value", "gr"], [False, True])
+    expected_value = interpolate_per_row(df, "value", False)
+    expected_gr = interpolate_per_row(df, "gr", True)
+    np.testing.assert_allclose(result["value"], expected_value["value"])
+    np.testing.assert_allclose(result["gr"], expected_gr["gr"])
+
+
+def test_interpolate_timezone_aware():
+    df = make_hour_df([1.0, 2.0, 3.0], tz="Europe/Amsterdam")
+    result = interpolate(df, "value")
+    expected = interpolate_per_row(df, "value")
+    assert (result["tijd"] == expected["tijd"]).all()
+    assert str(result["tijd"].dt.tz) == "Europe/Amsterdam"
@@ -0,0 +1,71 @@
+"""
+Tests voor het blijvende model (hergebruik tussen berekeningen)
+"""
+
+import pytest
+from mip import xsum, maximize, BINARY, OptimizationStatus
+
+from dao.prog.da_live_model import LiveModel, LiveModelMismatch
+
+
+def build(model: LiveModel, prices: list, cap: float, extra: bool = False):
+    x = [model.add_var(ub=cap) for _ in prices]
+    on = model.add_var(var_type=BINARY)
+    model += xsum(x) <= 2 * cap
+    for p in range(len(prices)):
+        model += x[p] <= 10 * on
+    if extra:
+        model += x[0] <= 1
+    model += xsum(x[p] * prices[p] for p in range(len(prices))) <= 100
+    model.objective = maximize(xsum(x[p] * prices[p] for p in range(len(prices))))
+    return x
+
+
+def test_live_model_reuse():
+    live = LiveModel()
+    x = build(live.start_build("a"), [1, 2, 3], 2)
+    assert live.finish_build()["reused"] is False
+    live.optimize()
+    assert live.objective_value == pytest.approx(10)
+
+    # andere grenzen, prijzen en een extra constraint
+    x2 = build(live.start_build("a"), [3, 2, 1], 3, extra=True)
+    assert x2[0].idx == x[0].idx
+    stats = live.finish_build()
+    assert stats["reused"] is True
+    assert stats["bounds_updated"] == 3
+    assert stats["rows_replaced"] == 1
+    assert stats["rows_added"] == 1
+    assert live.num_rows == 6
+    assert live.optimize() == OptimizationStatus.OPTIMAL
+    assert live.objective_value == pytest.approx(1 * 3 + 3 * 2 + 2 * 1)
+
+    # vervallen constraint wordt verwijderd
+    build(live.start_build("a"), [3, 2, 1], 3)
+    assert live.finish_build()["rows_removed"] == 1
+    assert live.num_rows == 5
+    live.optimize()
+    assert live.objective_value == pytest.approx(3 * 3 + 3 * 2)
+
+    # andere opbouw van de variabelen
+    with pytest.raises(LiveModelMismatch):
+        build(live.start_build("a"), [3, 2, 1, 1], 3)
+    live.reset()
+    build(live.start_build("b"), [3, 2, 1, 1], 3)
+    assert live.finish_build()["reused"] is False
+
+
+def test_live_model_previous_start():
+    live = LiveModel()
+    build(live.start_build("a", times=(0, 1, 2)), [1, 2, 3], 2)
+    live.finish_build()
+    live.optimize()
+    # zelfde tijdstippen: de vorige oplossing is startoplossing
+    build(live.start_build("a", times=(0, 1, 2)), [1, 2, 3], 2)
+    assert len(live.previous_start) == 1
+    assert live.finish_build()["reused"] is True
+    live.optimize()
+    # verschoven tijdstippen: model hergebruikt, geen startoplossing
+    build(live.start_build("a", times=(1, 2, 3)), [1, 2, 3], 2)
+    assert len(live.previous_start) == 0
+    assert live.finish_build()["reused"] is True
@@ -0,0 +1,46 @@
+"""
+Tests voor de startmomenten van apparaten
+"""
+
+import numpy as np
+
+from dao.prog.da_machines import prune_dominated_starts, start_energy
+
+
+def test_start_energy():
+    # programma van 3 kwartieren, window van 6 kwartieren over 2 uur-intervallen
+    # (het laatste kwartier valt buiten de horizon)
+    energy = start_energy([4000, 2000, 1000], [0, 0, 0, 1, 1, 2], 2)
+    assert energy.shape == (4, 2)
+    np.testing.assert_allclose(energy[0], [1.75, 0])
+    np.testing.assert_allclose(energy[1], [1.5, 0.25])
+    np.testing.assert_allclose(energy[2], [1.0, 0.75])
+    np.testing.assert_allclose(energy[3], [0, 1.5])
+    assert start_energy([4000, 2000], [0], 1).shape == (0, 1)
+
+
+def test_prune_dominated_starts():
+    energy = np.array([[1.0, 0, 0], [0, 1.0, 0], [0, 0, 1.0]])
+    pl = [0.40, 0.20, 0.25]
+    pt = [0.30, 0.10, 0.15]
+    # start 0 kost minstens 0.30, start 1 hoogstens 0.20
+    assert list(prune_dominated_starts(energy, pl, pt)) == [1, 2]
+    # zonder teruglevertarief overlappen de grenzen: er valt niets af
+    assert list(prune_dominated_starts(energy, pl, [0.0] * 3)) == [0, 1, 2]
+
+
+def test_prune_dominated_starts_grid_limit():
+    energy = np.array([[1.0, 0, 0], [0, 1.0, 0], [0, 0, 1.0]])
+    pl = [0.40, 0.20, 0.25]
+    pt = [0.30, 0.10, 0.15]
+    # teruglevering begrensd in interval 0: verbruik kan daar gratis zijn
+    export_capped = [True, False, False]
+    assert list(prune_dominated_starts(energy, pl, pt, export_capped)) == [0, 1, 2]
+    # levering kan begrensd worden in interval 1 en 2: die starten zijn geen
+    # maatstaf meer, start 0 valt niet meer af
+    import_capped = [False, True, True]
+    kept = prune_dominated_starts(energy, pl, pt, None, import_capped)
+    assert list(kept) == [0, 1, 2]
+    # overal begrensd: er valt niets af
+    kept = prune_dominated_starts(energy, pl, pt, None, [True] * 3)
+    assert list(kept) == [0, 1, 2]
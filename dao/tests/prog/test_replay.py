@@ -0,0 +1,392 @@
+"""
+Naspelen van de optimaliseringsberekening met synthetische fixtures
+en de benchmark over een matrix van configuraties.
+De benchmark draait alleen met DAO_BENCHMARK=1, bijv.:
+DAO_BENCHMARK=1 python -m pytest -s -m benchmark dao/tests/prog/test_replay.py
+Met DAO_BENCHMARK_OUTPUT=<bestand.csv> worden de resultaten ook bewaard.
+"""
+
+import copy
+import datetime
+import itertools
+import json
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+from dao.prog.da_live_model import LiveModel
+from dao.prog.da_solver import highs_available
+from dao.prog.da_replay import (
+    FIXTURE_VERSION,
+    ReplayHomeAssistant,
+    make_state,
+    replay_calculation,
+)
+
+TEMPLATE = Path(__file__).parent.parent / "data" / "options_replay.json"
+START_DT = datetime.datetime(2025, 6, 2, 14, 0)
+
+
+def make_fixture(
+    interval: str = "1hour",
+    batteries: int = 1,
+    ev: bool = False,
+    machines: bool = False,
+    start_dt: datetime.datetime = START_DT,
+) -> dict:
+    """
+    Bouwt een fixture zoals capture_calculation die maakt, met prijzen en
+    straling volgens een vast dagpatroon tot het einde van morgen
+    """
+    with open(TEMPLATE) as f:
+        options = json.load(f)
+    options["interval"] = interval
+    interval_s = 3600 if interval == "1hour" else 900
+    battery_template = options["battery"][0]
+    options["battery"] = []
+    states = [
+        make_state("input_boolean.pv_woning_aan_uit", "on"),
+        make_state("input_boolean.pv_garage_aan_uit", "on"),
+        make_state("sensor.boiler_gemeten", 41),
+        make_state("sensor.boiler_ingesteld", 42),
+        make_state("sensor.hysterese_hot_water", 4),
+    ]
+    for b in range(batteries):
+        battery = copy.deepcopy(battery_template)
+        battery["name"] = f"Accu{b + 1}"
+        for key, value in battery.items():
+            if key.startswith("entity_") and "." in str(value):
+                battery[key] = f"{value}_{b + 1}"
+        battery["solar"][0]["name"] = f"tuinkamer {b + 1}"
+        options["battery"].append(battery)
+        states += [
+            make_state(battery["entity_actual_level"], 40 + 10 * b),
+            make_state(battery["entity_min_soc_end_opt"], 20),
+            make_state(battery["entity_max_soc_end_opt"], 80),
+        ]
+    if ev:
+        ev_options = options["electric_vehicle"][0]
+        states += [
+            make_state(ev_options["entity_position"], "home"),
+            make_state(ev_options["entity_actual_level"], 35),
+            make_state(ev_options["entity_plugged_in"], "on"),
+            make_state(ev_options["charge_scheduler"]["entity_set_level"], 80),
+            make_state(
+                ev_options["charge_scheduler"]["entity_ready_datetime"], "07:00:00"
+            ),
+            make_state(ev_options["charge_switch"], "off"),
+            make_state(ev_options["entity_set_charging_ampere"], 0),
+        ]
+    else:
+        options["electric_vehicle"] = []
+    if machines:
+        machine = options["machines"][0]
+        yesterday = start_dt - datetime.timedelta(days=1)
+        states += [
+            make_state(machine["entity_start_window"], "08:00:00"),
+            make_state(machine["entity_end_window"], "22:00:00"),
+            make_state(machine["entity_selected_program"], "kleur 30 graden"),
+            make_state(
+                machine["entity_calculated_start"],
+                yesterday.strftime("%Y-%m-%d 10:00:00"),
+            ),
+            make_state(
+                machine["entity_calculated_end"],
+                yesterday.strftime("%Y-%m-%d 11:30:00"),
+            ),
+        ]
+    else:
+        options["machines"] = []
+
+    start_hour = datetime.datetime(
+        start_dt.year, start_dt.month, start_dt.day, start_dt.hour
+    )
+    end = datetime.datetime(start_dt.year, start_dt.month, start_dt.day) + (
+        datetime.timedelta(days=2)
+    )
+    tijd = pd.date_range(start_hour, end, freq=f"{interval_s}s", inclusive="left")
+    hour = tijd.hour + tijd.minute / 60
+    da_ex = 0.08 + 0.06 * np.cos((hour - 19) / 24 * 2 * math.pi) - 0.04 * np.exp(
+        -(((hour - 13) / 2.5) ** 2)
+    )
+    price_data = pd.DataFrame(
+        {
+            "time": tijd,
+            "da_ex": da_ex,
+            "da_cons": (da_ex + 0.1088 + 0.0205) * 1.21,
+            "da_prod": (da_ex + 0.1088 + 0.0205) * 1.21,
+        }
+    )
+    glob_rad = np.maximum(0.0, 280 * np.sin((hour - 5.5) / 15 * math.pi))
+    glob_rad = glob_rad * interval_s / 3600
+    prog_data = pd.DataFrame(
+        {
+            "tijd": tijd,
+            "temp": 14 + 6 * np.sin((hour - 9) / 24 * 2 * math.pi),
+            "glob_rad": glob_rad,
+            "time": [int(t.timestamp()) for t in tijd.to_pydatetime()],
+        }
+    )
+    solar_names = [solar["name"] for solar in options["solar"]] + [
+        battery["solar"][0]["name"] for battery in options["battery"]
+    ]
+    solar_prog = {}
+    for name in solar_names:
+        solar_prog[name.replace(" ", "_").replace("-", "_")] = pd.DataFrame(
+            {"tijd": tijd, "prediction": np.round(glob_rad * 0.006, 3)}
+        )
+    return {
+        "version": FIXTURE_VERSION,
+        "created": datetime.datetime.now(),
+        "start_dt": start_dt,
+        "start_soc": None,
+        "start_ev_soc": None,
+        "options": options,
+        "ha_config": {
+            "latitude": 52.1,
+            "longitude": 5.2,
+            "time_zone": "Europe/Amsterdam",
+            "country": "NL",
+        },
+        "ha_states": states,
+        "inputs": {
+            "price_data": price_data,
+            "prog_data": prog_data,
+            "base_cons": None,
+            "solar_prog": solar_prog,
+            "degree_days": None,
+            "heatpump_run_hours": -1,
+            "timings": {},
+        },
+    }
+
+
+def test_replay_home_assistant():
+    with ReplayHomeAssistant(
+        [make_state("input_number.test", 1)], {"time_zone": "Europe/Amsterdam"}
+    ) as ha:
+        url = f"http://127.0.0.1:{ha.port}/api/"
+        assert requests.get(url).json() == {"message": "API running."}
+        assert requests.get(url + "config").json()["time_zone"] == "Europe/Amsterdam"
+        requests.post(
+            url + "services/input_number/set_value",
+            json={"entity_id": "input_number.test", "value": 2.5},
+        )
+        assert requests.get(url + "states/input_number.test").json()["state"] == "2.5"
+        assert requests.get(url + "states/sensor.unknown").status_code == 404
+        assert ha.service_calls == [
+            ("input_number", "set_value", {"entity_id": "input_number.test", "value": 2.5})
+        ]
+
+
+def test_replay_calculation():
+    result = replay_calculation(make_fixture(batteries=0, ev=True, machines=True))
+    assert result["status"] == "OPTIMAL"
+    assert result["plan_source"] == "optimal"
+    assert result["bounds_tightened"] > 0
+    # leveringstarief >= teruglevertarief: geen binaire variabelen voor het net
+    assert result["binaries_dropped"] == 2 * result["intervals"]
+    assert result["intervals"] == 34
+    assert result["variables"] > 0 and result["constraints"] > 0
+    assert result["build_time"] > 0 and result["solve_time"] > 0
+    assert len(result["stage_times"]) == 1
+    # debug-run: er wordt niets naar HA geschreven
+    assert result["service_calls"] == 0
+    build = result["components"]["build"]
+    assert build["machines"]["variables"] > 0
+    # geen warmtepomp: niet geregistreerd, niets in het model
+    assert "heating" not in build
+    assert "grid" in result["components"]["extract"]
+
+
+def test_replay_fine_horizon():
+    fixture = make_fixture("15min", batteries=0, ev=True, machines=True)
+    full = replay_calculation(copy.deepcopy(fixture))
+    fixture["options"]["fine horizon"] = 4
+    result = replay_calculation(fixture)
+    assert result["status"] == "OPTIMAL"
+    assert result["intervals"] < full["intervals"]
+    assert result["variables"] < full["variables"]
+    assert abs(result["objective"] - full["objective"]) < 0.05
+
+
+def test_replay_machines_running_quarter():
+    # berekening midden in een kwartier: een start in het lopende kwartier telt
+    # het hele kwartier in het (kortere) eerste interval
+    fixture = make_fixture(
+        "15min",
+        batteries=0,
+        machines=True,
+        start_dt=START_DT + datetime.timedelta(minutes=5),
+    )
+    result = replay_calculation(fixture)
+    assert result["status"] == "OPTIMAL"
+    assert result["machine_starts_pruned"] > 0
+
+
+def test_replay_live_model():
+    fixture = make_fixture(batteries=0, ev=True, machines=True)
+    live_model = LiveModel()
+    first = replay_calculation(copy.deepcopy(fixture), live_model=live_model)
+    assert first["reused"] is False
+    # vijf minuten later, met andere prijzen en een hoger EV-niveau
+    fixture["start_dt"] += datetime.timedelta(minutes=5)
+    fixture["inputs"]["price_data"]["da_cons"] *= 1.1
+    fixture["start_ev_soc"] = 45
+    result = replay_calculation(copy.deepcopy(fixture), live_model=live_model)
+    assert result["reused"] is True
+    assert result["status"] == "OPTIMAL"
+    assert result["bounds_updated"] > 0 and result["rows_replaced"] > 0
+    # een nieuw blijvend model: de opbouw hangt dan niet van de prijzen af
+    fresh = replay_calculation(fixture, live_model=LiveModel())
+    assert result["constraints"] == fresh["constraints"]
+    assert result["objective"] == pytest.approx(fresh["objective"], abs=1e-4)
+
+
+def test_replay_live_model_schedule():
+    # iedere 20 minuten: binnen het uur wordt het model hergebruikt, een nieuw
+    # eerste interval geeft minder intervallen en dus een nieuw model
+    live_model = LiveModel()
+    reused = []
+    for minutes in (0, 20, 40, 60):
+        fixture = make_fixture(
+            batteries=0,
+            ev=True,
+            machines=True,
+            start_dt=START_DT + datetime.timedelta(minutes=minutes),
+        )
+        result = replay_calculation(copy.deepcopy(fixture), live_model=live_model)
+        assert result["status"] == "OPTIMAL"
+        reused.append(result["reused"])
+        if minutes == 40:
+            fresh = replay_calculation(fixture)
+            assert result["objective"] == pytest.approx(fresh["objective"], rel=1e-3)
+    assert reused == [False, True, True, False]
+
+
+@pytest.mark.parametrize(
+    "interval, batteries, ev, objective",
+    [
+        ("1hour", 1, False, -17.09494),
+        ("15min", 1, False, -16.53013),
+        ("1hour", 2, True, -25.18533),
+    ],
+)
+def test_replay_batteries(interval, batteries, ev, objective):
+    # batterijen met HiGHS: de CBC-build in sommige omgevingen is hier onbetrouwbaar
+    pytest.importorskip("highspy")
+    fixture = make_fixture(interval, batteries=batteries, ev=ev, machines=True)
+    fixture["options"]["solver"] = "highs"
+    result = replay_calculation(fixture)
+    assert result["status"] == "OPTIMAL"
+    assert result["plan_source"] == "optimal"
+    assert result["objective"] == pytest.approx(objective, rel=1e-3)
+    assert result["components"]["build"]["battery"]["variables"] > 0
+    assert "battery" in result["components"]["extract"]
+    assert result["service_calls"] == 0
+
+
+def test_replay_battery_export_limit():
+    # de zonnepanelen leveren meer dan de netaansluiting kan terugleveren: daar
+    # mag de batterij niet tegelijk laden en ontladen om opwekking weg te stoken
+    pytest.importorskip("highspy")
+    fixture = make_fixture(batteries=1)
+    fixture["options"]["solver"] = "highs"
+    fixture["options"]["grid"]["max_power"] = 1.0
+    result = replay_calculation(fixture)
+    assert result["status"] == "OPTIMAL"
+    assert result["battery_sink_intervals"] == 0
+    # bij positieve prijzen vervallen de aan/uit-variabelen alleen buiten de uren
+    # waarin de teruglevering kan worden begrensd
+    assert 2 * result["intervals"] < result["binaries_dropped"]
+    assert result["binaries_dropped"] < 4 * result["intervals"]
+
+
+def test_replay_infeasible():
+    # zonnepanelen zonder schakelaar leveren meer dan de batterij en de
+    # netaansluiting kunnen opnemen: het model heeft geen oplossing
+    pytest.importorskip("highspy")
+    fixture = make_fixture(batteries=1)
+    options = fixture["options"]
+    options["solver"] = "highs"
+    options["grid"]["max_power"] = 1.0
+    for solar in options["solar"] + options["battery"][0]["solar"]:
+        del solar["entity_pv_switch"]
+    result = replay_calculation(fixture)
+    assert result["fallback_reason"] == "infeasible"
+    # geen bewaard plan: niets doorgezet
+    assert result["plan_source"] == "none"
+    assert result["service_calls"] == 0
+
+
+BENCHMARK_SOLVERS = ["cbc"] + (["highs"] if highs_available() else [])
+BENCHMARK_MATRIX = list(
+    itertools.product(
+        BENCHMARK_SOLVERS, ["1hour", "15min"], [0, 1, 2, 3], [False, True], [False, True]
+    )
+)
+benchmark_results = []
+
+
+@pytest.fixture(scope="module")
+def benchmark_report():
+    yield benchmark_results
+    if len(benchmark_results) == 0:
+        return
+    result = pd.DataFrame(benchmark_results)
+    print("\n" + result.to_string(index=False))
+    if result["solver"].nunique() > 1:
+        # per apparatenmix de rekentijd per solver en de snelste
+        mix = ["interval", "batteries", "ev", "machines"]
+        comparison = result.pivot_table(
+            index=mix, columns="solver", values="solve_time"
+        )
+        comparison["fastest"] = comparison.idxmin(axis=1)
+        print("\n" + comparison.to_string())
+    output = os.environ.get("DAO_BENCHMARK_OUTPUT")
+    if output:
+        result.to_csv(output, index=False)
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(
+    not os.environ.get("DAO_BENCHMARK"), reason="benchmark: zet DAO_BENCHMARK=1"
+)
+@pytest.mark.parametrize(
+    "solver, interval, batteries, ev, machines", BENCHMARK_MATRIX
+)
+def test_benchmark_calc_optimum(
+    benchmark_report, solver, interval, batteries, ev, machines
+):
+    fixture = make_fixture(interval, batteries, ev, machines)
+    fixture["options"]["solver"] = solver
+    result = replay_calculation(fixture)
+    benchmark_report.append(
+        {
+            "solver": solver,
+            "interval": interval,
+            "batteries": batteries,
+            "ev": ev,
+            "machines": machines,
+            **{
+                key: result.get(key)
+                for key in [
+                    "variables",
+                    "integer_variables",
+                    "constraints",
+                    "build_time",
+                    "solve_time",
+                    "objective",
+                    "gap",
+                    "nodes",
+                    "status",
+                ]
+            },
+        }
+    )
+    assert result["status"] in ["OPTIMAL", "FEASIBLE"]
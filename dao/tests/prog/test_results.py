@@ -0,0 +1,28 @@
+"""
+Tests voor het uitlezen van de oplossing
+"""
+
+import numpy as np
+import pytest
+from mip import Model, maximize
+
+from dao.prog.da_build import add_var_block
+from dao.prog.da_results import Solution
+
+
+def test_solution_get():
+    model = Model(solver_name="CBC")
+    model.verbose = 0
+    x = add_var_block(model, (2, 3), ub=np.array([[1, 2, 3], [4, 5, 6]]))
+    y = [model.add_var(ub=7), model.add_var(ub=8)]
+    model.objective = maximize(x.sum() + y[0] + y[1])
+    model.optimize()
+    sol = Solution(model)
+    np.testing.assert_allclose(sol.get(x), [1, 2, 3, 4, 5, 6])
+    np.testing.assert_allclose(sol.get(x, (2, 3))[1], [4, 5, 6])
+    # lijsten met variabelen en getallen door elkaar
+    np.testing.assert_allclose(sol.get([y[0], 0.5, y[1]]), [7, 0.5, 8])
+    # lege familie, bv zonder batterijen
+    assert sol.get([], (0, 3)).shape == (0, 3)
+    with pytest.raises(TypeError):
+        sol.get(["a"])
@@ -0,0 +1,63 @@
+"""
+Tests voor de DAO-predictor die alle solar-devices en strings in een keer berekent
+"""
+
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytz
+
+from dao.lib.da_meteo import Meteo
+from dao.prog.da_base import DaBase
+
+
+def make_dabase() -> DaBase:
+    meteo = Meteo.__new__(Meteo)
+    meteo.latitude = 52.1
+    meteo.longitude = 5.2
+    dabase = DaBase.__new__(DaBase)
+    dabase.meteo = meteo
+    return dabase
+
+
+def make_solar(tilt, orientation, yield_factor, max_power=None, strings=None):
+    return SimpleNamespace(
+        tilt=tilt,
+        orientation=orientation,
+        yield_factor=yield_factor,
+        max_power=max_power,
+        strings=strings,
+    )
+
+
+def test_calc_prod_solar_array_against_scalar():
+    dabase = make_dabase()
+    devices = [
+        make_solar(35, 0, 0.015),
+        make_solar(
+            None,
+            None,
+            None,
+            max_power=2.5,
+            strings=[make_solar(45, -90, 0.01), make_solar(20, 90, 0.02)],
+        ),
+        make_solar(90, 30, 0.005, max_power=0.4),
+    ]
+    start = datetime.datetime(2025, 6, 1, tzinfo=pytz.utc).timestamp()
+    utc_time = np.arange(start, start + 3 * 86400, 900)
+    rng = np.random.default_rng(3)
+    global_rad = rng.uniform(0, 90, len(utc_time))
+    result = dabase.calc_prod_solar_array(devices, utc_time, global_rad, 0.25)
+    assert result.shape == (len(devices), len(utc_time))
+    for d, device in enumerate(devices):
+        expected = np.array(
+            [
+                dabase.calc_prod_solar(device, t, gr, 0.25)
+                for t, gr in zip(utc_time, global_rad)
+            ]
+        )
+        np.testing.assert_allclose(result[d], expected, atol=0.02)
+        assert abs(result[d].sum() - expected.sum()) / expected.sum() < 0.002
+        if device.max_power is not None:
+            assert result[d].max() <= device.max_power
@@ -0,0 +1,75 @@
+"""
+Tests voor de model-cache en de gebundelde voorspelling van SolarPredictionService
+"""
+
+import datetime
+import os
+from types import SimpleNamespace
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.dummy import DummyRegressor
+
+from dao.prog.solar_service import (
+    FEATURE_COLUMNS,
+    SolarModelCache,
+    SolarPredictionService,
+)
+
+
+class FakeDb:
+    def __init__(self, start: datetime.datetime, hours: int):
+        self.start = start.timestamp()
+        self.hours = hours
+        self.calls = 0
+
+    def get_column_data(self, tablename, column_name, start=None, end=None):
+        self.calls += 1
+        utc = [self.start + 3600 * h for h in range(self.hours)]
+        return pd.DataFrame({"utc": utc, "value": np.linspace(0, 100, self.hours)})
+
+
+def save_model(path, value: float):
+    model = DummyRegressor(strategy="constant", constant=value)
+    features = pd.DataFrame(
+        np.zeros((2, len(FEATURE_COLUMNS))), columns=list(FEATURE_COLUMNS)
+    )
+    model.fit(features, [value, value])
+    joblib.dump(model, path)
+
+
+def test_model_cache_reloads_on_mtime(tmp_path):
+    path = str(tmp_path / "pv.pkl")
+    save_model(path, 1.0)
+    cache = SolarModelCache(max_size=2)
+    model = cache.get(path)
+    assert cache.get(path) is model
+    save_model(path, 2.0)
+    mtime = os.path.getmtime(path) + 10
+    os.utime(path, (mtime, mtime))
+    assert cache.get(path) is not model
+    assert len(cache._models) == 1
+
+
+def test_predict_devices_shares_weather(tmp_path):
+    save_model(str(tmp_path / "pv_oost.pkl"), 0.5)
+    save_model(str(tmp_path / "pv_west.pkl"), -1.0)
+    start = datetime.datetime(2025, 6, 1)
+    db = FakeDb(start, 24)
+    service = SolarPredictionService(
+        db, "Europe/Amsterdam", model_dir=str(tmp_path), cache=SolarModelCache()
+    )
+    options = [
+        SimpleNamespace(name="pv oost"),
+        SimpleNamespace(name="pv-west"),
+        SimpleNamespace(name="pv zuid"),
+    ]
+    result = service.predict_devices(options, start, start + datetime.timedelta(1))
+    assert set(result) == {"pv_oost", "pv_west"}
+    # een keer temp, gr en winds voor alle devices samen
+    assert db.calls == 3
+    assert (result["pv_oost"]["prediction"] == 0.5).all()
+    assert (result["pv_west"]["prediction"] == 0.0).all()
+    assert str(result["pv_oost"]["date_time"].dt.tz) == "Europe/Amsterdam"
+    assert len(result["pv_oost"]) == 24
@@ -0,0 +1,69 @@
+"""
+Tests voor de solver-keuze en de SOS-formulering met binaire variabelen
+"""
+
+import pytest
+from mip import xsum, maximize, OptimizationStatus
+
+from dao.prog.da_solver import (
+    add_sos_binary,
+    configure,
+    highs_available,
+    make_model,
+    optimize,
+    solve_stats,
+)
+
+X = [0, 1, 2, 3]
+F = [0, 5, 0, 6]
+
+
+def piecewise(solver: str, binary: bool) -> tuple:
+    """
+    Maximaliseer f(x) bij x = 1.5 met f stuksgewijs lineair door (X, F):
+    zonder SOS2 zou de combinatie van x=0 en x=3 (f=3) worden gekozen
+    """
+    model = make_model(solver)
+    w = [model.add_var(lb=0, ub=1) for _ in X]
+    model += xsum(w) == 1
+    model += xsum(w[i] * X[i] for i in range(len(X))) == 1.5
+    if binary:
+        add_sos_binary(model, list(zip(w, X)), 2)
+    else:
+        model.add_sos(list(zip(w, X)), 2)
+    model.objective = maximize(xsum(w[i] * F[i] for i in range(len(X))))
+    configure(model, 0.0001)
+    return model, model.optimize()
+
+
+def test_sos2_binary():
+    model, status = piecewise("cbc", binary=True)
+    assert status == OptimizationStatus.OPTIMAL
+    assert model.objective_value == pytest.approx(2.5)
+    stats = solve_stats(model)
+    assert stats["solver"] == "cbc"
+    assert stats["status"] == "OPTIMAL"
+    assert stats["gap"] == pytest.approx(0, abs=1e-4)
+
+
+@pytest.mark.skipif(not highs_available(), reason="highspy is niet geinstalleerd")
+def test_highs():
+    model, status = piecewise("highs", binary=True)
+    assert status == OptimizationStatus.OPTIMAL
+    assert model.objective_value == pytest.approx(2.5)
+    stats = solve_stats(model)
+    assert stats["solver"] == "highs"
+    assert stats["nodes"] is not None
+
+
+def test_make_model_fallback():
+    model = make_model("highs")
+    assert solve_stats(model)["solver"] == ("highs" if highs_available() else "cbc")
+
+
+def test_optimize_with_time_limit():
+    model, _ = piecewise("cbc", binary=True)
+    assert optimize(model, max_seconds=10) == "optimal"
+    x = model.add_var(lb=2)
+    model += x <= 1
+    assert optimize(model, max_seconds=10) is None
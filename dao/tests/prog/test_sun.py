@@ -0,0 +1,69 @@
+"""
+Tests voor de gevectoriseerde zonnestand (da_sun) en de array-versies in Meteo,
+gevalideerd tegen ephem
+"""
+
+import datetime
+import math
+
+import numpy as np
+import pytz
+
+from dao.lib import da_sun
+from dao.lib.da_meteo import Meteo
+
+LATITUDE = 52.1
+LONGITUDE = 5.2
+
+
+def make_meteo() -> Meteo:
+    meteo = Meteo.__new__(Meteo)
+    meteo.latitude = LATITUDE
+    meteo.longitude = LONGITUDE
+    return meteo
+
+
+def year_timestamps(step: int = 3600 * 5 + 900) -> np.ndarray:
+    start = datetime.datetime(2025, 1, 1, tzinfo=pytz.utc).timestamp()
+    end = datetime.datetime(2026, 1, 1, tzinfo=pytz.utc).timestamp()
+    return np.arange(start, end, step)
+
+
+def test_sun_position_against_ephem():
+    meteo = make_meteo()
+    utc_times = year_timestamps()
+    h, a = da_sun.sun_position(utc_times, LATITUDE, LONGITUDE)
+    ephem_pos = [meteo.sun_position(t) for t in utc_times]
+    ephem_h = np.array([pos["h"] for pos in ephem_pos])
+    ephem_a = np.array([pos["A"] for pos in ephem_pos])
+    day = ephem_h > math.radians(1)
+    assert np.degrees(np.abs(h - ephem_h)[day]).max() < 0.05
+    diff_a = np.angle(np.exp(1j * (a - ephem_a)))
+    assert np.degrees(np.abs(diff_a)[day]).max() < 0.05
+
+
+def test_direct_radiation_factor_array():
+    rng = np.random.default_rng(1)
+    hzon = rng.uniform(-0.2, math.pi / 2, 200)
+    azon = rng.uniform(0, 2 * math.pi, 200)
+    for hcol, acol in [(0.0, 0.0), (math.radians(35), math.radians(-90))]:
+        result = da_sun.direct_radiation_factor(hcol, acol, hzon, azon)
+        expected = [
+            Meteo.direct_radiation_factor(hcol, acol, h, a) for h, a in zip(hzon, azon)
+        ]
+        np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-12)
+
+
+def test_solar_rad_array_against_scalar():
+    meteo = make_meteo()
+    utc_times = year_timestamps(step=3600 * 3 + 900)
+    rng = np.random.default_rng(2)
+    radiation = rng.choice([0.0, 3.0, 50.0, 150.0, 300.0], len(utc_times))
+    hcol = math.radians(35)
+    acol = math.radians(20)
+    result = meteo.solar_rad_array(utc_times, radiation, hcol, acol)
+    expected = np.array(
+        [meteo.solar_rad(t, r, hcol, acol) for t, r in zip(utc_times, radiation)]
+    )
+    np.testing.assert_allclose(result, expected, atol=1.0)
+    assert abs(result.sum() - expected.sum()) / expected.sum() < 0.002
@@ -0,0 +1,36 @@
+"""
+Tests voor de telemetrie van de berekening
+"""
+
+from dao.lib.db_manager import DBmanagerObj
+from dao.prog.da_telemetry import (
+    telemetry_table,
+    telemetry_record,
+    save_telemetry,
+    get_telemetry,
+)
+
+
+def test_telemetry(tmp_path):
+    db_da = DBmanagerObj("sqlite", "day_ahead.db", db_path=str(tmp_path))
+    telemetry_table(db_da.metadata).create(db_da.engine, checkfirst=True)
+    calc_stats = {
+        "interval": "15min",
+        "intervals": 96,
+        "constraints": 4000,
+        "build_time": 0.5,
+        "solve_time": 2.25,
+        "stage_times": [1.5, 0.75],
+        "status": "OPTIMAL",
+        "components": {"build": {}},
+    }
+    assert save_telemetry(db_da, telemetry_record(calc_stats, 1000))
+    assert save_telemetry(db_da, telemetry_record({"solve_time": 1.0}, 2000))
+    rows = get_telemetry(db_da, 0)
+    assert [row["time"] for row in rows] == [1000, 2000]
+    assert rows[0]["intervals"] == 96 and rows[0]["status"] == "OPTIMAL"
+    assert rows[0]["stage_times"] == [1.5, 0.75]
+    assert rows[1]["stage_times"] == [] and rows[1]["variables"] is None
+    assert len(get_telemetry(db_da, 0, 2000)) == 1
+    # een fout bij het opslaan stopt de berekening niet
+    assert not save_telemetry(db_da, {"time": None})
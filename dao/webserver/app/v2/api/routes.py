@@ -3,6 +3,7 @@ from markupsafe import escape
 from dao.prog.da_report import Report
 from subprocess import run as subprocess_run
 from dao.prog.da_base import DaBase
+from dao.prog.da_telemetry import get_telemetry
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
@@ -51,6 +52,40 @@ def data():
 
     return data
 
+@api.route("/telemetry/")
+def telemetry():
+    """
+    Retourneert in json de kengetallen van de berekeningen (tabel telemetry)
+    :return: lijst met per berekening de kengetallen, tijd als "ts"
+    """
+    start = request.args.get('start')
+    end = request.args.get('end')
+    timezone_raw = "Europe/Amsterdam"
+
+    try:
+        if start:
+            start_dt = datetime.fromisoformat(start)
+        else:
+            start_dt = datetime.now() - timedelta(days=7)
+        start_ts = int(start_dt.replace(tzinfo=ZoneInfo(timezone_raw)).timestamp())
+        end_ts = None
+        if end:
+            end_dt = datetime.fromisoformat(end).replace(tzinfo=ZoneInfo(timezone_raw))
+            end_ts = int(end_dt.timestamp())
+        data = get_telemetry(Report().db_da, start_ts, end_ts)
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+    return [
+        {
+            **row,
+            "ts": datetime.fromtimestamp(row["time"], ZoneInfo(timezone_raw)).strftime(
+                "%Y-%m-%d %H:%M"
+            ),
+        }
+        for row in data
+    ]
+
 @api.route("/run/<string:task>")
 def run(task: str):
     tasks = DaBase.generate_tasks()
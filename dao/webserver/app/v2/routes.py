@@ -627,6 +627,27 @@ def reportsv2():
     )
 
 
+@v2.route("/telemetry", methods=["GET"])
+def telemetry():
+    today = datetime.datetime.combine(
+        datetime.date.today(),
+        datetime.time.min
+    )
+
+    start = request.args.get(
+        "start", default=(today - datetime.timedelta(days=7)).isoformat()
+    )
+    end = request.args.get(
+        "end", default=(today + datetime.timedelta(days=1)).isoformat()
+    )
+
+    return render_template(
+        "v2/telemetry.html",
+        start=start,
+        end=end,
+    )
+
+
 @v2.route("/config", methods=["GET", "POST"])
 def config():
     path = app_datapath + "options.json"